@@ -0,0 +1,24 @@
+"""
+Local benchmarks for the music backend.
+
+Run from the backend/ directory, e.g.:
+    python -m benchmarks.bench_async_upstream
+
+Every benchmark talks to a stub upstream started in-process
+(benchmarks/stub_upstream.py), never to the real JioSaavn API.
+"""
+
+import os
+
+
+def setup_django(**overrides):
+    """Configure Django for a benchmark run (LocMem cache, no real secrets)."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    os.environ.setdefault("SECRET_KEY", "benchmark-only-secret-key")
+    os.environ.setdefault("DEBUG", "True")
+    os.environ.setdefault("SHM_CACHE", "False")
+    for key, value in overrides.items():
+        os.environ[key] = value
+
+    import django
+    django.setup()
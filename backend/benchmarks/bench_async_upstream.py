@@ -0,0 +1,165 @@
+"""
+Sync vs async upstream path: requests/sec on cache misses, through the
+deployed stack (the whole MIDDLEWARE chain and Django's request handler).
+
+Sync:  core.wsgi with ASYNC_UPSTREAM_VIEWS off; WORKERS threads, each a
+       stand-in for one sync gunicorn worker, sending requests back to back.
+Async: core.asgi with ASYNC_UPSTREAM_VIEWS on (what render.yaml runs under
+       uvicorn workers); one event loop keeping CONCURRENCY requests in
+       flight through the ASGI application.
+
+Each path runs in its own process (ASYNC_UPSTREAM_VIEWS is read when the
+URLconf loads) with DEBUG off, as deployed; requests arrive over HTTPS. Every request uses a fresh song ID so each one goes
+upstream, and its own X-Forwarded-For, so RateLimitMiddleware counts it
+but never limits it; every response must be a 200.
+
+    python -m benchmarks.bench_async_upstream [--latency 0.1] [--requests 400]
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+import subprocess
+from collections import Counter
+
+from benchmarks.stub_upstream import StubUpstream
+
+
+def client_ip(n: int) -> str:
+    return f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}"
+
+
+# --------------------
+# LOAD (child process)
+# --------------------
+def run_sync(application, requests: int, workers: int) -> tuple:
+    from io import BytesIO
+    from wsgiref.util import setup_testing_defaults
+
+    ids = iter(range(requests))
+    lock = threading.Lock()
+    statuses = Counter()
+
+    def worker():
+        while True:
+            with lock:
+                n = next(ids, None)
+            if n is None:
+                return
+            environ = {
+                "PATH_INFO": f"/api/song/bench{n}/", "REQUEST_METHOD": "GET",
+                "HTTP_HOST": "localhost", "HTTP_X_FORWARDED_FOR": client_ip(n), "wsgi.input": BytesIO(),
+                "wsgi.url_scheme": "https", "HTTPS": "on",
+            }
+            setup_testing_defaults(environ)
+            status = []
+            body = application(environ, lambda s, headers, exc_info=None: status.append(s))
+            b"".join(body)
+            body.close()
+            with lock:
+                statuses[status[0].split()[0]] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, statuses
+
+
+async def run_async(application, requests: int, concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = Counter()
+
+    async def one(n):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "https", "path": f"/api/song/bench{n}/", "raw_path": f"/api/song/bench{n}/".encode(),
+            "query_string": b"", "root_path": "", "client": (client_ip(n), 40000), "server": ("localhost", 443),
+            "headers": [(b"host", b"localhost"), (b"x-forwarded-for", client_ip(n).encode())],
+        }
+        received = asyncio.Event()
+        done = asyncio.Event()
+
+        async def receive():
+            if not received.is_set():
+                received.set()
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await done.wait()  # the client never disconnects mid-request
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses[str(message["status"])] += 1
+            elif not message.get("more_body"):
+                done.set()
+
+        async with semaphore:
+            await application(scope, receive, send)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(requests)))
+    return time.perf_counter() - start, statuses
+
+
+def load(args):
+    from benchmarks import setup_django
+
+    setup_django(ASYNC_UPSTREAM_VIEWS=str(args.path == "async"), DEBUG="False",
+                 JIOSAAVN_SNAPSHOT_ENABLED="False", JIOSAAVN_WARMER_ENABLED="False")
+    import logging
+    from music import views, async_views
+
+    logging.disable(logging.ERROR)
+    for service in (views.service, async_views.service):
+        service.BASE_URL = args.base_url
+    if args.path == "async":
+        from core.asgi import application
+        elapsed, statuses = asyncio.run(run_async(application, args.requests, args.concurrency))
+    else:
+        from core.wsgi import application
+        elapsed, statuses = run_sync(application, args.requests, args.workers)
+    print(json.dumps({"elapsed": elapsed, "statuses": statuses}))
+
+
+def run_path(path: str, args, base_url: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_async_upstream", "--load", path, "--base-url", base_url,
+         "--requests", str(args.requests), "--workers", str(args.workers),
+         "--concurrency", str(args.concurrency)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    assert result["statuses"] == {"200": args.requests}, (path, result["statuses"])
+    return result["elapsed"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub upstream latency (s)")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=4, help="sync workers (render.yaml WEB_CONCURRENCY)")
+    parser.add_argument("--concurrency", type=int, default=200, help="async in-flight requests")
+    parser.add_argument("--load", choices=["sync", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        args.path = args.load
+        return load(args)
+
+    with StubUpstream(latency=args.latency) as stub:
+        sync_elapsed = run_path("sync", args, stub.base_url)
+        async_elapsed = run_path("async", args, stub.base_url)
+
+    print(f"upstream latency: {args.latency * 1000:.0f} ms, requests per path: {args.requests}")
+    print(f"sync  (core.wsgi, {args.workers} workers):        {args.requests / sync_elapsed:8.1f} req/s")
+    print(f"async (core.asgi, 1 process, {args.concurrency} in flight): {args.requests / async_elapsed:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+CDN bandwidth and time to first byte of /api/stream/<id>/ with and without
+the range-aware audio cache (music/services/audio_cache.py).
+
+Replays listeners against views.stream_song and a stub CDN that answers
+after LATENCY ms: songs are Zipf-popular, most requests play from the
+start, the rest seek to a random offset (an open-ended Range, so seeks
+leave scattered ranges that later requests stitch). Every body is checked
+against the CDN file. The cache budget is smaller than the catalog, so
+cold songs are evicted.
+
+    python -m benchmarks.bench_audio_cache [--requests 1000] [--budget-mb 32]
+"""
+
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import warnings
+
+from benchmarks import setup_django
+from benchmarks.stub_cdn import StubCDN, audio_bytes
+from benchmarks.stub_upstream import StubUpstream
+
+
+def workload(requests: int, songs: int, size: int, seek_share: float):
+    rng = random.Random(0)
+    weights = [1 / (rank + 1) for rank in range(songs)]
+    for _ in range(requests):
+        song = f"song{rng.choices(range(songs), weights)[0]}"
+        first = rng.randrange(size) if rng.random() < seek_share else 0
+        yield song, first
+
+
+def run(views, cache, args) -> dict:
+    from django.test import RequestFactory
+    from music.services.stream_proxy import StreamProxy
+
+    factory = RequestFactory()
+    views.audio_cache = cache
+    views.stream_proxy = StreamProxy.from_settings()
+    for song, first in workload(args.requests, args.songs, args.size, args.seek_share):
+        extra = {"HTTP_RANGE": f"bytes={first}-"} if first else {}
+        response = views.stream_song(factory.get(f"/api/stream/{song}/", **extra), song)
+        assert b"".join(response.streaming_content) == audio_bytes(first, args.size - first), song
+    return views.stream_proxy.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--songs", type=int, default=200)
+    parser.add_argument("--size", type=int, default=512 * 1024, help="bytes per song")
+    parser.add_argument("--seek-share", type=float, default=0.3)
+    parser.add_argument("--latency-ms", type=float, default=40, help="CDN time to response headers")
+    parser.add_argument("--budget-mb", type=float, default=32, help="audio cache MAX_BYTES")
+    args = parser.parse_args()
+
+    setup_django(JIOSAAVN_SNAPSHOT_ENABLED="False", JIOSAAVN_WARMER_ENABLED="False")
+    logging.disable(logging.WARNING)
+    warnings.simplefilter("ignore")
+    from music import views
+    from music.services.audio_cache import AudioCache
+
+    path = tempfile.mkdtemp()
+    print(f"{args.requests} requests, {args.songs} songs of {args.size // 1024} KB, "
+          f"{args.seek_share:.0%} seeks, CDN latency {args.latency_ms:.0f} ms, cache budget {args.budget_mb:.0f} MB")
+    with StubCDN(size=args.size, bitrate=0, latency=args.latency_ms / 1000) as cdn, \
+            StubUpstream(latency=0, cdn_url=cdn.base_url) as upstream:
+        views.service.BASE_URL = upstream.base_url
+        views.service.catalog.enabled = False
+        modes = {
+            "no audio cache": AudioCache(path, enabled=False),
+            "audio cache": AudioCache(path, max_bytes=int(args.budget_mb * 1024 * 1024)),
+        }
+        for name, cache in modes.items():
+            requests, sent = cdn.requests, cdn.bytes_sent
+            stats = run(views, cache, args)
+            print(f"  {name:>14}: CDN {cdn.requests - requests:5} requests, {(cdn.bytes_sent - sent) / 2**20:7.1f} MB; "
+                  f"{stats['bytes_from_disk'] / max(stats['bytes'], 1):.0%} of bytes from disk; TTFB mean "
+                  f"play {stats['play']['ttfb_ms']['mean']} ms, seek {stats['seek']['ttfb_ms']['mean']} ms")
+            if cache.enabled:
+                c = cache.stats()
+                print(f"{'':>18}hits {c['hits']}, partial {c['partial_hits']}, misses {c['misses']}, "
+                      f"evictions {c['evictions']}, {c['stored_bytes'] / 2**20:.1f} MB stored")
+    shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
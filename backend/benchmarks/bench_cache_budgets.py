@@ -0,0 +1,113 @@
+"""
+Do aggregate cache entries survive a burst of searches?
+
+Caches trending (three languages), charts, suggested artists and a few
+cache_page responses, then runs distinct searches against a stub upstream;
+each one caches a search page and up to 30 song records. Afterwards the
+benchmark counts how many of the aggregate entries are still cached, on:
+- Django's LocMemCache with its default 300 entries (the old fallback)
+- core.budget_cache.BudgetedLocMemCache with the CACHE_BUDGETS of settings
+- core.shm_cache.SharedMemoryCache with the same budgets
+
+    python -m benchmarks.bench_cache_budgets [--searches 500]
+"""
+
+import os
+import time
+import logging
+import argparse
+import tempfile
+import warnings
+
+from benchmarks import setup_django
+from benchmarks.stub_upstream import StubUpstream
+
+PAGE_KEYS = [f"views.decorators.cache.cache_page.discover.GET.{i:032x}" for i in range(4)]
+
+
+def run(stub, searches: int) -> dict:
+    from django.core.cache import cache
+    from music.services.jiosaavn_service import JioSaavnService
+
+    cache.clear()
+    service = JioSaavnService()
+    service.BASE_URL = stub.base_url
+    service.catalog.enabled = False
+    service.query_canon.enabled = False
+
+    languages = ("hindi", "english", "punjabi")
+    for language in languages:
+        service.get_trending(language)
+    service.get_charts()
+    service.get_suggested_artists()
+    for key in PAGE_KEYS:
+        cache.set(key, b"x" * 20000, timeout=3600)  # a rendered discover response
+    aggregates = [service._key("trending", language) for language in languages]
+    aggregates += [service._key("charts", "top"), service._key("discover", "suggested_artists")] + PAGE_KEYS
+
+    start = time.perf_counter()
+    for i in range(searches):
+        service.search(f"burst query {i}")
+    seconds = time.perf_counter() - start
+
+    stats = getattr(cache, "stats", None)
+    return {
+        "kept": sum(cache.has_key(key) for key in aggregates),
+        "total": len(aggregates),
+        "generations": sum(cache.has_key(f"jio:gen:{name}") for name in service.namespaces.names),
+        "searches_kept": sum(cache.has_key(service._search_page_key(f"burst query {i}", 0))
+                             for i in range(searches)),
+        "seconds": seconds,
+        "stats": stats() if callable(stats) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--searches", type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django(JIOSAAVN_SNAPSHOT_ENABLED="False")
+    logging.disable(logging.INFO)
+    warnings.simplefilter("ignore")  # memcached key warnings for queries with spaces
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    shm_path = os.path.join(tempfile.mkdtemp(), "cache")
+    backends = {
+        "LocMemCache (300 entries)": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "bench-locmem",
+        },
+        "budgeted, per process": {
+            "BACKEND": "core.budget_cache.BudgetedLocMemCache",
+            "LOCATION": "bench-budgeted",
+            "OPTIONS": {"BUDGETS": settings.CACHE_BUDGETS},
+        },
+        "budgeted, shared memory": {
+            "BACKEND": "core.shm_cache.SharedMemoryCache",
+            "LOCATION": shm_path,
+            "OPTIONS": {"BUDGETS": settings.CACHE_BUDGETS, "CLASSES": settings.SHM_CACHE_CLASSES},
+        },
+    }
+
+    print(f"{args.searches} distinct searches after caching the aggregates")
+    with StubUpstream(latency=0) as stub:
+        for name, config in backends.items():
+            with override_settings(CACHES={"default": config}):
+                r = run(stub, args.searches)
+            line = (f"{name:>26}: aggregates kept {r['kept']}/{r['total']}, "
+                    f"generation keys kept {r['generations']}, search pages kept {r['searches_kept']}, "
+                    f"{r['seconds']:.1f} s")
+            print(line)
+            if r["stats"]:
+                for ns, s in r["stats"]["namespaces"].items():
+                    if s["entries"]:
+                        print(f"{'':>28}{ns:<9} {s['entries']:6} entries, {s['bytes'] / 1024:8.0f} KB "
+                              f"({s['occupancy']:.0%} of budget), {s['evictions']} evictions")
+    if os.path.exists(shm_path):
+        os.remove(shm_path)
+
+
+if __name__ == "__main__":
+    main()
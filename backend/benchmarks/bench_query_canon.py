@@ -0,0 +1,109 @@
+"""
+Search cache hit rate with and without query canonicalization.
+
+Replays a synthetic search log: a Zipf-ish mix of popular queries, each
+typed in one of the spellings real users produce (case and spacing,
+romanization variants, Devanagari, single-letter typos). A query is a
+cache hit if its cache key was seen earlier in the log; the raw key is
+the lower-cased, whitespace-folded query the service used before. Also
+reports how many searches were sent upstream as the intended spelling
+rather than a variant or typo of it.
+
+    python -m benchmarks.bench_query_canon [--searches 50000] [--intents 2000]
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks import setup_django
+from benchmarks.bench_suggest import NAMES, SURNAMES, WORDS, percentile
+
+# Romanizations of the same sound, as users type them
+VARIANTS = [("ee", "i"), ("i", "ee"), ("oo", "u"), ("aa", "a"), ("ph", "f"), ("w", "v"), ("z", "j"), ("sh", "s")]
+DEVANAGARI = {
+    "arijit singh": "अरिजीत सिंह",
+    "kesariya": "केसरिया",
+    "tum hi ho": "तुम ही हो",
+    "channa mereya": "चन्ना मेरेया",
+    "shreya ghoshal": "श्रेया घोषाल",
+    "pasoori": "पसूरी",
+}
+
+
+def intents(rng: random.Random, n: int) -> list:
+    found = set(DEVANAGARI)
+    while len(found) < n:
+        if rng.random() < 0.4:
+            found.add(f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}")
+        else:
+            found.add(" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))))
+    return sorted(found)
+
+
+def spelling(rng: random.Random, intent: str) -> str:
+    """One way a user might type intent."""
+    roll = rng.random()
+    if roll < 0.45:
+        return intent
+    if roll < 0.6:
+        return rng.choice([intent.title(), intent.upper(), f"  {intent} ", intent.replace(" ", "  ")])
+    if roll < 0.8:
+        old, new = rng.choice(VARIANTS)
+        return intent.replace(old, new, 1)
+    if roll < 0.85 and intent in DEVANAGARI:
+        return DEVANAGARI[intent]
+    # Typo in a longer word: a dropped or doubled letter
+    words = intent.split(" ")
+    long_words = [i for i, word in enumerate(words) if len(word) >= 5]
+    if not long_words:
+        return intent
+    i = rng.choice(long_words)
+    pos = rng.randrange(1, len(words[i]))
+    words[i] = words[i][:pos] + words[i][pos + 1:] if rng.random() < 0.5 else words[i][:pos] + words[i][pos - 1:]
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--searches", type=int, default=50_000)
+    parser.add_argument("--intents", type=int, default=2000, help="distinct things users look for")
+    args = parser.parse_args()
+
+    setup_django()
+    from music.services.query_canon import QueryCanonicalizer, fold
+
+    rng = random.Random(11)
+    pool = intents(rng, args.intents)
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    searches = [(intent, spelling(rng, intent)) for intent in rng.choices(pool, weights, k=args.searches)]
+
+    canon = QueryCanonicalizer()
+    raw_seen, canonical_seen = set(), set()
+    raw_hits = canonical_hits = intended = 0
+    timings = []
+    for intent, query in searches:
+        raw = query.strip().lower()
+        raw_hits += raw in raw_seen
+        raw_seen.add(raw)
+
+        start = time.perf_counter()
+        key = canon.canonical(query)
+        timings.append(time.perf_counter() - start)
+        canonical_hits += key in canonical_seen
+        canonical_seen.add(key)
+        intended += key == fold(intent)
+
+    stats = canon.stats()
+    print(f"searches: {args.searches} over {len(pool)} intents")
+    print(f"raw keys:       {len(raw_seen):6d}  hit rate {raw_hits / args.searches:6.1%}")
+    print(f"canonical keys: {len(canonical_seen):6d}  hit rate {canonical_hits / args.searches:6.1%}")
+    print(f"searched as the intended spelling: {intended / args.searches:6.1%}")
+    print(f"matched: exact {stats['exact']}, variant {stats['variant']}, fuzzy {stats['fuzzy']}, new {stats['new']}, "
+          f"promoted {stats['promoted']}")
+    for q in (0.5, 0.99):
+        print(f"canonical() p{q * 100:g}: {percentile(timings, q) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+CPU per request and bytes on the wire for the hot GET endpoints, with and
+without the pre-encoded response cache (music/services/response_cache.py).
+
+Calls the song, album, artist and trending views in-process (RequestFactory)
+against a stub upstream. Every value is cached first, so each timed request
+is a cache hit: "before" re-encodes the cached dict with JsonResponse and
+sends it uncompressed ("before+gzip": through Django's GZipMiddleware,
+compressed on every request); the other columns send the kept bytes for
+the client's Accept-Encoding. The stub's payloads are more repetitive
+than real ones, so real compression ratios are lower.
+
+    python -m benchmarks.bench_response_cache [--requests 2000]
+"""
+
+import time
+import logging
+import argparse
+import warnings
+
+from benchmarks import setup_django
+from benchmarks.stub_upstream import StubUpstream
+
+ENDPOINTS = {
+    "song": ("/api/song/s1/", "song_details", {"song_id": "s1"}),
+    "album": ("/api/album/al1/", "album_details", {"album_id": "al1"}),
+    "artist": ("/api/artist/ar1/", "artist_details", {"artist_id": "ar1"}),
+    "trending": ("/api/trending/?language=hindi", "trending_songs", {}),
+}
+
+
+def gzip_middleware(view):
+    from django.middleware.gzip import GZipMiddleware
+
+    def wrapped(request, **kwargs):
+        return GZipMiddleware(lambda r: view(r, **kwargs))(request)
+    return wrapped
+
+
+def cpu_us(view, request, kwargs, requests: int) -> float:
+    start = time.process_time()
+    for _ in range(requests):
+        view(request, **kwargs)
+    return (time.process_time() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000, help="timed requests per endpoint and mode")
+    args = parser.parse_args()
+
+    setup_django(JIOSAAVN_SNAPSHOT_ENABLED="False", JIOSAAVN_WARMER_ENABLED="False")
+    logging.disable(logging.WARNING)
+    warnings.simplefilter("ignore")
+    from django.test import RequestFactory
+    from music import views
+
+    factory = RequestFactory()
+    modes = {
+        "before": (False, "", False),
+        "before+gzip": (False, "gzip, deflate", True),
+        "identity": (True, "", False),
+        "gzip": (True, "gzip, deflate", False),
+        "br": (True, "gzip, deflate, br", False),
+    }
+    with StubUpstream(latency=0) as stub:
+        views.service.BASE_URL = stub.base_url
+        views.service.catalog.enabled = False
+        print(f"{args.requests} cache hits per endpoint; CPU microseconds per request, bytes sent")
+        print(f"{'':>10}" + "".join(f"{mode:>22}" for mode in modes))
+        for name, (path, view_name, kwargs) in ENDPOINTS.items():
+            cells = []
+            for enabled, accept, middleware in modes.values():
+                view = getattr(views, view_name)
+                if middleware:
+                    view = gzip_middleware(view)
+                views.responses.enabled = enabled
+                request = factory.get(path, HTTP_ACCEPT_ENCODING=accept)
+                response = view(request, **kwargs)  # load, cache and (after) encode
+                response = view(request, **kwargs)
+                assert response.status_code == 200, (name, response.status_code)
+                us = cpu_us(view, request, kwargs, args.requests)
+                cells.append(f"{us:8.1f} us {len(response.content):7} B")
+            print(f"{name:>10}" + "".join(f"{cell:>22}" for cell in cells))
+        print(f"\nresponse cache: {views.responses.stats()}")
+
+
+if __name__ == "__main__":
+    main()
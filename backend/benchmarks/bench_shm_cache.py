@@ -0,0 +1,209 @@
+"""
+The per-process cache (core.budget_cache) vs the shared-memory cache
+(core.shm_cache) vs Redis.
+
+Latency: get/set of typical cache values (a song record envelope, a search
+page, a trending list) through Django's cache API, one process.
+
+Cross-worker hits: WORKERS processes, each a separate interpreter with its
+own JioSaavnService (as under gunicorn), replay the same Zipf-distributed
+mix of song lookups, searches and trending against one stub upstream. With
+the per-process cache every worker fills its own; with a shared cache a song one
+worker fetched is a hit for all of them. "served from cache" is
+1 - upstream calls / requests over all workers.
+
+Redis runs only if --redis-url answers PING.
+
+    python -m benchmarks.bench_shm_cache [--workers 4] [--requests 3000] [--redis-url redis://localhost:6379/15]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import warnings
+import subprocess
+
+from benchmarks.stub_upstream import StubUpstream, fake_song
+
+
+def backend_env(backend: str, redis_url: str, shm_path: str) -> dict:
+    """Environment selecting the backend through core/settings.py."""
+    env = {"JIOSAAVN_SNAPSHOT_ENABLED": "False", "JIOSAAVN_WARMER_ENABLED": "False"}
+    if backend == "redis":
+        env["REDIS_URL"] = redis_url
+    else:
+        env["SHM_CACHE"] = str(backend == "shm")
+        env["SHM_CACHE_PATH"] = shm_path
+    return env
+
+
+def redis_reachable(url: str) -> bool:
+    try:
+        import redis
+        return bool(redis.Redis.from_url(url, socket_connect_timeout=0.5).ping())
+    except Exception:
+        return False
+
+
+# --------------------
+# WORKER (child process)
+# --------------------
+def workload(rng: random.Random, songs: int, queries: int):
+    """Endless (method name, args) stream, Zipf-distributed popularity."""
+    song_weights = [1 / (rank + 1) ** 1.1 for rank in range(songs)]
+    query_weights = [1 / (rank + 1) for rank in range(queries)]
+    while True:
+        roll = rng.random()
+        if roll < 0.7:
+            yield "get_song_details", (f"s{rng.choices(range(songs), song_weights)[0]}",)
+        elif roll < 0.95:
+            yield "search", (f"query {rng.choices(range(queries), query_weights)[0]}",)
+        else:
+            yield "get_trending", (rng.choice(["hindi", "english", "punjabi"]),)
+
+
+def percentile(samples, pct: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def ops_worker(args) -> dict:
+    """Median/p99 get and set microseconds per value shape."""
+    from django.core.cache import cache
+    from music.services.jiosaavn_service import JioSaavnService
+
+    service = JioSaavnService()
+    fresh_until = time.time() + 3600
+    values = {
+        "song": (service._song_record(fake_song("s1")), fresh_until),
+        "search page": ([service._song_record(fake_song(f"s{i}")) for i in range(20)], fresh_until),
+        "trending": ([fake_song(f"t{i}") for i in range(10)], fresh_until),
+    }
+    cache.clear()
+    results = {}
+    for name, value in values.items():
+        keys = [f"bench:{name}:{i}" for i in range(1000)]
+        sets, gets = [], []
+        for _ in range(args.rounds):
+            for key in keys:
+                start = time.perf_counter()
+                cache.set(key, value, timeout=3600)
+                sets.append(time.perf_counter() - start)
+            for key in keys:
+                start = time.perf_counter()
+                cache.get(key)
+                gets.append(time.perf_counter() - start)
+        results[name] = {
+            "set_p50": percentile(sets, 0.5) * 1e6, "set_p99": percentile(sets, 0.99) * 1e6,
+            "get_p50": percentile(gets, 0.5) * 1e6, "get_p99": percentile(gets, 0.99) * 1e6,
+        }
+    return results
+
+
+def replay_worker(args) -> dict:
+    from music.services.jiosaavn_service import JioSaavnService
+
+    service = JioSaavnService()
+    service.BASE_URL = args.base_url
+    service.catalog.enabled = False
+    service.query_canon.enabled = False
+
+    stream = workload(random.Random(args.seed), args.songs, args.queries)
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        name, call_args = next(stream)
+        getattr(service, name)(*call_args)
+    return {"requests": args.requests, "seconds": time.perf_counter() - start}
+
+
+def worker(args):
+    from benchmarks import setup_django
+
+    setup_django(**backend_env(args.backend, args.redis_url, args.shm_path))
+    logging.disable(logging.INFO)
+    warnings.simplefilter("ignore")  # memcached key warnings for queries with spaces
+    result = ops_worker(args) if args.worker == "ops" else replay_worker(args)
+    print(json.dumps(result))
+
+
+# --------------------
+# DRIVER
+# --------------------
+def spawn(args, backend: str, mode: str, **extra) -> subprocess.Popen:
+    command = [sys.executable, "-m", "benchmarks.bench_shm_cache", "--worker", mode, "--backend", backend,
+               "--redis-url", args.redis_url, "--shm-path", args.shm_path,
+               "--songs", str(args.songs), "--queries", str(args.queries),
+               "--requests", str(args.requests), "--rounds", str(args.rounds)]
+    for name, value in extra.items():
+        command += [f"--{name.replace('_', '-')}", str(value)]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, cwd=os.path.dirname(os.path.dirname(__file__)))
+
+
+def collect(process: subprocess.Popen) -> dict:
+    out, _ = process.communicate()
+    if process.returncode:
+        raise SystemExit(f"worker failed ({process.returncode})")
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=3000, help="requests per worker")
+    parser.add_argument("--songs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01, help="stub upstream latency, seconds")
+    parser.add_argument("--rounds", type=int, default=5, help="passes over 1000 keys per value shape")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--shm-path", default=os.path.join(tempfile.gettempdir(), "villen-music-bench-cache"))
+    # Internal: run one worker
+    parser.add_argument("--worker", choices=["ops", "replay"], help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--seed", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args)
+
+    backends = ["locmem", "shm"]
+    if redis_reachable(args.redis_url):
+        backends.append("redis")
+    else:
+        print(f"Redis at {args.redis_url} not reachable, skipped")
+
+    print("Latency, microseconds (p50 / p99), one process:")
+    for backend in backends:
+        for name, r in collect(spawn(args, backend, "ops")).items():
+            print(f"  {backend:>6} {name:<12} get {r['get_p50']:6.1f} / {r['get_p99']:6.1f}   "
+                  f"set {r['set_p50']:6.1f} / {r['set_p99']:6.1f}")
+
+    print(f"\n{args.workers} workers x {args.requests} requests, {args.songs} songs, {args.queries} queries, "
+          f"upstream latency {args.latency * 1000:.0f} ms:")
+    with StubUpstream(latency=args.latency) as stub:
+        for backend in backends:
+            if os.path.exists(args.shm_path):
+                os.remove(args.shm_path)  # every run starts cold
+            if backend == "redis":
+                import redis
+                redis.Redis.from_url(args.redis_url).flushdb()
+            before = stub.requests
+            processes = [spawn(args, backend, "replay", base_url=stub.base_url, seed=seed)
+                         for seed in range(args.workers)]
+            results = [collect(p) for p in processes]
+            requests = sum(r["requests"] for r in results)
+            calls = stub.requests - before
+            seconds = max(r["seconds"] for r in results)
+            print(f"  {backend:>6}: {calls} upstream calls, served from cache {1 - calls / requests:.1%}, "
+                  f"{requests / seconds:.0f} requests/s")
+    if os.path.exists(args.shm_path):
+        os.remove(args.shm_path)
+
+
+if __name__ == "__main__":
+    main()
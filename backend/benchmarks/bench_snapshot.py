@@ -0,0 +1,130 @@
+"""
+Hit-rate recovery after a worker restart, with and without the hot-key
+snapshot (the per-process cache, as deployed with SHM_CACHE=False).
+
+Replays a Zipf-distributed mix of song lookups, searches and trending
+against a stub upstream until the hit rate is steady, then "restarts":
+the cache and the service are thrown away and the same traffic resumes,
+once cold and once after loading the snapshot the old worker saved. A
+request is a hit if it made no upstream call; recovery is the first
+window whose hit rate is back within 90% of the steady state.
+
+    python -m benchmarks.bench_snapshot [--songs 2000] [--latency 0.01]
+"""
+
+import os
+import time
+import random
+import logging
+import argparse
+import tempfile
+import warnings
+
+from benchmarks import setup_django
+from benchmarks.stub_upstream import StubUpstream
+
+
+def workload(rng: random.Random, songs: int, queries: int):
+    """Endless (method name, args) stream, Zipf-distributed popularity."""
+    song_weights = [1 / (rank + 1) ** 1.1 for rank in range(songs)]
+    query_weights = [1 / (rank + 1) for rank in range(queries)]
+    while True:
+        roll = rng.random()
+        if roll < 0.7:
+            yield "get_song_details", (f"s{rng.choices(range(songs), song_weights)[0]}",)
+        elif roll < 0.95:
+            yield "search", (f"query {rng.choices(range(queries), query_weights)[0]}",)
+        else:
+            yield "get_trending", (rng.choice(["hindi", "english", "punjabi"]),)
+
+
+def replay(service, stub, stream, requests: int, window: int):
+    """Per-window (hit rate, seconds) for the next requests."""
+    windows = []
+    hits, start = 0, time.perf_counter()
+    for i in range(1, requests + 1):
+        name, args = next(stream)
+        before = stub.requests
+        getattr(service, name)(*args)
+        hits += stub.requests == before
+        if i % window == 0:
+            windows.append((hits / window, time.perf_counter() - start))
+            hits, start = 0, time.perf_counter()
+    return windows
+
+
+def recovery(windows, target: float, window: int):
+    """(requests, seconds) until the first window at or above target."""
+    seconds = 0.0
+    for n, (rate, elapsed) in enumerate(windows, 1):
+        seconds += elapsed
+        if rate >= target:
+            return n * window, seconds
+    return None, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01, help="stub upstream latency, seconds")
+    parser.add_argument("--warmup", type=int, default=6000, help="requests before the restart")
+    parser.add_argument("--after", type=int, default=6000, help="requests after the restart")
+    parser.add_argument("--window", type=int, default=250)
+    args = parser.parse_args()
+
+    setup_django(JIOSAAVN_SNAPSHOT_ENABLED="False")
+    logging.disable(logging.INFO)
+    warnings.simplefilter("ignore")  # memcached key warnings for queries with spaces
+    from django.core.cache import cache
+    from music.services.jiosaavn_service import JioSaavnService
+    from music.services.snapshot import HotKeySnapshot
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "hot_keys.pickle")
+
+    def new_service(stub, snapshot):
+        service = JioSaavnService()
+        service.BASE_URL = stub.base_url
+        service.catalog.enabled = False
+        service.query_canon.enabled = False
+        service.hot_keys = snapshot
+        return service
+
+    with StubUpstream(latency=args.latency) as stub:
+        results = {}
+        for mode in ("cold", "snapshot"):
+            cache.clear()
+            rng = random.Random(3)
+            stream = workload(rng, args.songs, args.queries)
+
+            old = new_service(stub, HotKeySnapshot(path, interval=3600))
+            old.start_snapshots()
+            steady = replay(old, stub, stream, args.warmup, args.window)
+            steady_rate = sum(rate for rate, _ in steady[-4:]) / 4
+            old.hot_keys.save()
+            old.hot_keys.stop()
+
+            # Restart: empty cache, fresh process state
+            cache.clear()
+            snapshot = HotKeySnapshot(path, enabled=mode == "snapshot")
+            start = time.perf_counter()
+            restored = snapshot.load()
+            load_ms = (time.perf_counter() - start) * 1000
+            service = new_service(stub, snapshot)
+            after = replay(service, stub, stream, args.after, args.window)
+            results[mode] = (steady_rate, restored, load_ms, after)
+            old.hot_keys.enabled = False  # no save at exit
+
+    print(f"{args.songs} songs, {args.queries} queries, upstream latency {args.latency * 1000:.0f} ms, "
+          f"window {args.window} requests")
+    for mode, (steady_rate, restored, load_ms, after) in results.items():
+        target = 0.9 * steady_rate
+        requests, seconds = recovery(after, target, args.window)
+        recovered = f"{requests} requests / {seconds:.2f} s" if requests else f"not within {args.after} requests"
+        print(f"{mode:>8}: steady {steady_rate:.1%}, restored {restored} entries ({load_ms:.0f} ms), "
+              f"first window {after[0][0]:.1%}, back to {target:.1%} after {recovered}")
+
+
+if __name__ == "__main__":
+    main()
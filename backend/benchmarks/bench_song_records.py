@@ -0,0 +1,97 @@
+"""
+Raw upstream song dicts vs compact song records in the song:{id} cache.
+
+Memory: serialized size of N cached songs (the bytes Redis stores per
+value, pickled like django-redis does). With REDIS_URL set, the songs are
+also written to that Redis and its used_memory delta is reported.
+
+CPU: one cache hit = unpickle the envelope + build the API response.
+
+    python -m benchmarks.bench_song_records [--songs 100000]
+    REDIS_URL=redis://localhost:6379/15 python -m benchmarks.bench_song_records
+"""
+
+import argparse
+import gc
+import pickle
+import time
+
+from benchmarks import setup_django
+from benchmarks.stub_upstream import fake_song
+
+
+def serialized_sizes(envelopes) -> int:
+    return sum(len(pickle.dumps(e, pickle.HIGHEST_PROTOCOL)) for e in envelopes)
+
+
+def per_hit_us(payloads, build) -> float:
+    # Keep collections of the 100k-song fixtures out of the timing
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for payload in payloads:
+            value, _ = pickle.loads(payload)
+            build(value)
+        return (time.perf_counter() - start) / len(payloads) * 1e6
+    finally:
+        gc.enable()
+
+
+def redis_used_memory(cache, entries: dict) -> int:
+    """used_memory delta after writing entries to the configured Redis."""
+    client = cache.client.get_client(write=True)
+    client.flushdb()
+    before = client.info("memory")["used_memory"]
+    keys = list(entries)
+    for start in range(0, len(keys), 1000):
+        cache.set_many({k: entries[k] for k in keys[start:start + 1000]}, timeout=3600)
+    used = client.info("memory")["used_memory"] - before
+    client.flushdb()
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=100_000)
+    parser.add_argument("--hits", type=int, default=50_000, help="cache hits timed per layout")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.cache import cache
+    from music.services import song_record
+    from music.services.jiosaavn_service import JioSaavnService
+
+    service = JioSaavnService()
+    fresh_until = time.time() + 3600
+    raw = [fake_song(f"song{i}") for i in range(args.songs)]
+    records = [service._song_record(song) for song in raw]
+
+    raw_bytes = serialized_sizes((song, fresh_until) for song in raw)
+    record_bytes = serialized_sizes((rec, fresh_until) for rec in records)
+
+    hits = min(args.hits, args.songs)
+    raw_payloads = [pickle.dumps((song, fresh_until), pickle.HIGHEST_PROTOCOL) for song in raw[:hits]]
+    record_payloads = [pickle.dumps((rec, fresh_until), pickle.HIGHEST_PROTOCOL) for rec in records[:hits]]
+    # Raw dicts went through _normalize_song on every hit
+    raw_us = per_hit_us(raw_payloads, service._normalize_song)
+    record_us = per_hit_us(record_payloads, song_record.to_dict)
+
+    mb = 1024 * 1024
+    print(f"songs: {args.songs}")
+    print(f"serialized raw dicts:   {raw_bytes / mb:8.1f} MB ({raw_bytes // args.songs} B/song)")
+    print(f"serialized records:     {record_bytes / mb:8.1f} MB ({record_bytes // args.songs} B/song)")
+    print(f"saved:                  {(raw_bytes - record_bytes) / mb:8.1f} MB "
+          f"({100 * (1 - record_bytes / raw_bytes):.0f}%)")
+    print(f"cache hit, raw dict:    {raw_us:8.2f} us")
+    print(f"cache hit, record:      {record_us:8.2f} us ({raw_us - record_us:.2f} us saved)")
+
+    if cache.__class__.__name__ == "RedisCache":
+        raw_used = redis_used_memory(cache, {f"song:{s['id']}": (s, fresh_until) for s in raw})
+        record_used = redis_used_memory(cache, {f"song:{r[song_record.ID]}": (r, fresh_until) for r in records})
+        print(f"redis used_memory raw:     {raw_used / mb:8.1f} MB")
+        print(f"redis used_memory records: {record_used / mb:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Time to first byte of seeks through /api/stream/<id>/, with and without
+the CDN keep-alive pool (music/services/stream_proxy.py).
+
+The stub CDN (benchmarks/stub_cdn.py) holds the first response on every
+new connection for HANDSHAKE ms, the TCP + TLS round trips a real CDN
+costs. A listener plays songs as bounded Range windows (the way AVPlayer
+fetches) and seeks to a random window SEEKS times, through:
+- fresh connection: module-level requests.get per request (the old proxy)
+- pooled, sync view: StreamProxy's requests.Session
+- pooled, async view: StreamProxy's per-loop aiohttp session
+TTFB is the views' own measurement, as exposed in /api/cache/stats/.
+
+    python -m benchmarks.bench_stream_seek [--seeks 200] [--handshake-ms 90]
+"""
+
+import random
+import asyncio
+import logging
+import argparse
+import warnings
+
+import requests
+
+from benchmarks import setup_django
+from benchmarks.stub_cdn import StubCDN, audio_bytes
+from benchmarks.stub_upstream import StubUpstream
+
+
+def seeks(count: int, size: int, window: int):
+    rng = random.Random(0)
+    for i in range(count):
+        first = rng.randrange(0, size - window)
+        yield f"seek{i % 5}", first, f"bytes={first}-{first + window - 1}"
+
+
+def fresh_connection_proxy():
+    """A StreamProxy that opens a new CDN connection per request, like the old view."""
+    from music.services.stream_proxy import StreamProxy
+
+    class FreshConnectionProxy(StreamProxy):
+        def open(self, url, byte_range=None):
+            headers = {"User-Agent": "VILLEN-Music/1.0", "Accept-Encoding": "identity"}
+            if byte_range:
+                headers["Range"] = byte_range
+            return requests.get(url, stream=True, timeout=30, headers=headers)
+
+    return FreshConnectionProxy.from_settings()
+
+
+def run_sync(views, proxy, args) -> dict:
+    from django.test import RequestFactory
+
+    factory = RequestFactory()
+    views.stream_proxy = proxy
+    for song_id, first, byte_range in seeks(args.seeks, args.size, args.window):
+        response = views.stream_song(factory.get(f"/api/stream/{song_id}/", HTTP_RANGE=byte_range), song_id)
+        assert b"".join(response.streaming_content) == audio_bytes(first, args.window)
+    return proxy.stats()
+
+
+async def run_async(async_views, proxy, args) -> dict:
+    from django.test import AsyncRequestFactory
+
+    factory = AsyncRequestFactory()
+    async_views.stream_proxy = proxy
+    for song_id, first, byte_range in seeks(args.seeks, args.size, args.window):
+        request = factory.get(f"/api/stream/{song_id}/", headers={"Range": byte_range})
+        response = await async_views.stream_song(request, song_id)
+        assert b"".join([chunk async for chunk in response.streaming_content]) == audio_bytes(first, args.window)
+    await proxy.aclose()
+    await async_views.service.aclose()
+    return proxy.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seeks", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=90, help="CDN cost of a new connection")
+    parser.add_argument("--size", type=int, default=4 * 1024 * 1024, help="bytes per song")
+    parser.add_argument("--window", type=int, default=64 * 1024, help="bytes per Range request")
+    args = parser.parse_args()
+
+    setup_django(JIOSAAVN_SNAPSHOT_ENABLED="False", JIOSAAVN_WARMER_ENABLED="False")
+    logging.disable(logging.WARNING)
+    warnings.simplefilter("ignore")
+    from music import views, async_views
+    from music.services.stream_proxy import StreamProxy
+
+    print(f"{args.seeks} seeks ({args.window // 1024} KB Range windows), "
+          f"new CDN connection costs {args.handshake_ms:.0f} ms; view TTFB buckets (mean):")
+    with StubCDN(size=args.size, bitrate=0, handshake=args.handshake_ms / 1000) as cdn, \
+            StubUpstream(latency=0, cdn_url=cdn.base_url) as upstream:
+        views.service.BASE_URL = async_views.service.BASE_URL = upstream.base_url
+        views.service.catalog.enabled = async_views.service.catalog.enabled = False
+        runs = {
+            "fresh connection": lambda: run_sync(views, fresh_connection_proxy(), args),
+            "pooled, sync view": lambda: run_sync(views, StreamProxy.from_settings(), args),
+            "pooled, async view": lambda: asyncio.run(run_async(async_views, StreamProxy.from_settings(), args)),
+        }
+        for name, run in runs.items():
+            connections = cdn.connections
+            stats = run()
+            ttfb = stats["seek"]["ttfb_ms"]
+            print(f"  {name:>18}: p50 {ttfb['p50']:>8}  p90 {ttfb['p90']:>8}  p99 {ttfb['p99']:>8}  "
+                  f"({ttfb['mean']} ms), {cdn.connections - connections} CDN connections")
+
+
+if __name__ == "__main__":
+    main()
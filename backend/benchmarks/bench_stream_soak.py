@@ -0,0 +1,228 @@
+"""
+Soak test of /api/stream/<id>/ under core/asgi.py: how many listeners can
+one uvicorn process hold?
+
+Starts a stub upstream (song lookups) and a stub CDN (benchmarks/stub_cdn.py)
+that sends each file at player speed, then one uvicorn process serving
+core.asgi with ASYNC_UPSTREAM_VIEWS on (async_views.stream_song) or off
+(views.stream_song: Django runs the sync view in its one thread-sensitive
+executor and reads the whole blocking iterator before sending a byte).
+STREAMS clients open streams over RAMP seconds; a third of them seek (Range).
+Every body is checked byte for byte against the CDN file; the server's RSS,
+open file descriptors and CPU time are sampled from /proc while it runs.
+
+    python -m benchmarks.bench_stream_soak [--streams 2000] [--sync-streams 4]
+"""
+
+import os
+import sys
+import time
+import random
+import socket
+import asyncio
+import argparse
+import resource
+import subprocess
+
+import aiohttp
+
+from benchmarks.stub_cdn import StubCDN, audio_bytes
+from benchmarks.stub_upstream import StubUpstream
+
+
+def raise_fd_limit():
+    """Each stream holds a client and a CDN socket in this process."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(samples, pct: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))] if samples else float("nan")
+
+
+# --------------------
+# SERVER (child process)
+# --------------------
+def serve(args):
+    from benchmarks import setup_django
+
+    raise_fd_limit()
+    setup_django(ASYNC_UPSTREAM_VIEWS=str(args.mode == "async"),
+                 JIOSAAVN_SNAPSHOT_ENABLED="False", JIOSAAVN_WARMER_ENABLED="False")
+    import logging
+    import warnings
+    import uvicorn
+    from core.asgi import application
+    from music import views, async_views
+
+    logging.disable(logging.ERROR)
+    warnings.simplefilter("ignore")  # Django's notice that it buffers the sync view's iterator
+    for service in (views.service, async_views.service):
+        service.BASE_URL = args.base_url
+        service.catalog.enabled = False
+    uvicorn.run(application, host="127.0.0.1", port=args.port, log_level="error",
+                lifespan="off", backlog=4096, timeout_keep_alive=60)
+
+
+class ServerProcess:
+    """Proxy process plus /proc sampling of its resource use."""
+
+    def __init__(self, args, mode: str, base_url: str):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_stream_soak", "--serve", "--mode", mode,
+             "--port", str(self.port), "--base-url", base_url],
+            cwd=os.path.dirname(os.path.dirname(__file__)),
+        )
+        self.peak_rss = 0
+        self.peak_fds = 0
+
+    def wait_ready(self, timeout: float = 60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise SystemExit("stream proxy did not start")
+
+    def sample(self):
+        pid = self.process.pid
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    self.peak_rss = max(self.peak_rss, int(line.split()[1]) * 1024)
+        self.peak_fds = max(self.peak_fds, len(os.listdir(f"/proc/{pid}/fd")))
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.process.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+
+# --------------------
+# CLIENTS
+# --------------------
+async def listen(session, url: str, size: int, rng: random.Random, stats: dict):
+    """One listener: play (or seek into) a song and check every byte."""
+    headers, first = {}, 0
+    if rng.random() < 1 / 3:
+        first = rng.randrange(size // 2)
+        headers["Range"] = f"bytes={first}-"
+
+    start = time.perf_counter()
+    stats["open"] += 1
+    stats["peak_open"] = max(stats["peak_open"], stats["open"])
+    try:
+        async with session.get(url, headers=headers) as response:
+            expected_status = 206 if headers else 200
+            if response.status != expected_status:
+                stats["errors"][f"status {response.status}"] = stats["errors"].get(f"status {response.status}", 0) + 1
+                return
+            if headers and response.headers.get("Content-Range") != f"bytes {first}-{size - 1}/{size}":
+                stats["errors"]["content-range"] = stats["errors"].get("content-range", 0) + 1
+                return
+            body = bytearray()
+            async for chunk in response.content.iter_any():
+                if not body:
+                    stats["ttfb"].append(time.perf_counter() - start)
+                body += chunk
+        if body != audio_bytes(first, size - first):
+            stats["errors"]["corrupt body"] = stats["errors"].get("corrupt body", 0) + 1
+            return
+        stats["completed"] += 1
+        stats["bytes"] += len(body)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        name = type(e).__name__
+        stats["errors"][name] = stats["errors"].get(name, 0) + 1
+    finally:
+        stats["open"] -= 1
+
+
+async def soak(server: ServerProcess, streams: int, songs: int, ramp: float, size: int) -> dict:
+    stats = {"open": 0, "peak_open": 0, "completed": 0, "bytes": 0, "ttfb": [], "errors": {}}
+    rng = random.Random(0)
+    connector = aiohttp.TCPConnector(limit=0, force_close=True)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=60, sock_read=300)
+
+    async def sampler():
+        while True:
+            server.sample()
+            await asyncio.sleep(0.5)
+
+    sampling = asyncio.create_task(sampler())
+    cpu_before = server.cpu_seconds()
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, auto_decompress=False) as session:
+        tasks = []
+        for i in range(streams):
+            url = f"http://127.0.0.1:{server.port}/api/stream/soak{i % songs}/"
+            tasks.append(asyncio.create_task(listen(session, url, size, rng, stats)))
+            await asyncio.sleep(ramp / streams)
+        await asyncio.gather(*tasks)
+    stats["seconds"] = time.perf_counter() - start
+    stats["cpu"] = server.cpu_seconds() - cpu_before
+    sampling.cancel()
+    return stats
+
+
+def report(mode: str, streams: int, stats: dict, server: ServerProcess, cdn: StubCDN):
+    ttfb = stats["ttfb"]
+    print(f"  {mode:>5}: {stats['completed']}/{streams} streams complete and byte-exact, "
+          f"peak {stats['peak_open']} open (CDN peak {cdn.peak_active} downloads), {stats['seconds']:.1f} s")
+    print(f"         time to first byte p50 {percentile(ttfb, 0.5) * 1000:.0f} ms, "
+          f"p99 {percentile(ttfb, 0.99) * 1000:.0f} ms; {stats['bytes'] / stats['seconds'] / 1e6:.1f} MB/s relayed")
+    print(f"         proxy process: peak RSS {server.peak_rss / 2**20:.0f} MB, peak fds {server.peak_fds}, "
+          f"CPU {stats['cpu']:.1f} s ({stats['cpu'] / max(stats['completed'], 1) * 1000:.1f} ms per stream)")
+    if stats["errors"]:
+        print(f"         errors: {stats['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=2000, help="listeners on the async proxy")
+    parser.add_argument("--sync-streams", type=int, default=4, help="listeners on the sync proxy (0 skips it)")
+    parser.add_argument("--songs", type=int, default=100, help="distinct songs")
+    parser.add_argument("--size", type=int, default=256 * 1024, help="bytes per song")
+    parser.add_argument("--bitrate", type=int, default=16 * 1024, help="CDN bytes/s per download")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which streams open")
+    # Internal: run the proxy
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=["async", "sync"], default="async", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args)
+
+    raise_fd_limit()
+    runs = [("async", args.streams)] + ([("sync", args.sync_streams)] if args.sync_streams else [])
+    print(f"{args.size // 1024} KB songs sent at {args.bitrate // 1024} KB/s "
+          f"({args.size / args.bitrate:.0f} s each), {args.songs} songs, one uvicorn process:")
+    for mode, streams in runs:
+        with StubCDN(size=args.size, bitrate=args.bitrate) as cdn, \
+                StubUpstream(latency=0, cdn_url=cdn.base_url) as upstream:
+            server = ServerProcess(args, mode, upstream.base_url)
+            try:
+                server.wait_ready()
+                stats = asyncio.run(soak(server, streams, args.songs, args.ramp if mode == "async" else 0, args.size))
+            finally:
+                server.stop()
+            report(mode, streams, stats, server, cdn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+CDN downloads and bytes per song during a release spike on
+/api/stream/<id>/, with and without shared downloads
+(music/services/shared_download.py).
+
+LISTENERS listeners of a few new songs (Zipf: most want the first)
+arrive within SPREAD seconds at the async view; a share of them read
+slowly (a stalled phone), the rest as fast as they can. The stub CDN
+sends each download at BITRATE, so downloads overlap like real ones, and
+the audio cache is off, so every listener would need the CDN. Every
+body is checked against the CDN file.
+
+    python -m benchmarks.bench_stream_spike [--listeners 400] [--spread 2]
+"""
+
+import time
+import random
+import asyncio
+import logging
+import argparse
+import warnings
+
+from benchmarks import setup_django
+from benchmarks.stub_cdn import StubCDN, audio_bytes
+from benchmarks.stub_upstream import StubUpstream
+
+
+async def listen(async_views, factory, song: str, delay: float, pace: float, size: int) -> float:
+    """Play a song after delay seconds; the time the whole body took."""
+    await asyncio.sleep(delay)
+    started = time.perf_counter()
+    response = await async_views.stream_song(factory.get(f"/api/stream/{song}/"), song)
+    body = bytearray()
+    async for chunk in response.streaming_content:
+        body += chunk
+        if pace:
+            await asyncio.sleep(pace)
+    assert bytes(body) == audio_bytes(0, size), song
+    return time.perf_counter() - started
+
+
+async def spike(async_views, args) -> dict:
+    from django.test import AsyncRequestFactory
+
+    factory = AsyncRequestFactory()
+    rng = random.Random(0)
+    weights = [1 / (rank + 1) for rank in range(args.songs)]
+    plan = [
+        (f"new{rng.choices(range(args.songs), weights)[0]}", rng.uniform(0, args.spread),
+         args.slow_pace if rng.random() < args.slow_share else 0)
+        for _ in range(args.listeners)
+    ]
+    took = await asyncio.gather(*[listen(async_views, factory, *listener, args.size) for listener in plan])
+    await async_views.stream_proxy.aclose()
+    await async_views.service.aclose()
+    fast = sorted(t for t, (_, _, pace) in zip(took, plan) if not pace)
+    return {"songs": len({song for song, _, _ in plan}), "fast_p50": fast[len(fast) // 2], "fast_max": fast[-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listeners", type=int, default=400)
+    parser.add_argument("--songs", type=int, default=5, help="new songs in the spike")
+    parser.add_argument("--spread", type=float, default=2, help="seconds over which listeners arrive")
+    parser.add_argument("--size", type=int, default=1024 * 1024, help="bytes per song")
+    parser.add_argument("--bitrate", type=int, default=512 * 1024, help="CDN bytes/s per download")
+    parser.add_argument("--slow-share", type=float, default=0.1, help="listeners reading slowly")
+    parser.add_argument("--slow-pace", type=float, default=0.2, help="slow listeners' pause per chunk (s)")
+    args = parser.parse_args()
+
+    setup_django(JIOSAAVN_SNAPSHOT_ENABLED="False", JIOSAAVN_WARMER_ENABLED="False",
+                 JIOSAAVN_AUDIO_CACHE_ENABLED="False")
+    logging.disable(logging.WARNING)
+    warnings.simplefilter("ignore")
+    from music import async_views, views
+
+    print(f"{args.listeners} listeners of {args.songs} new songs ({args.size // 1024} KB) within {args.spread:.0f} s, "
+          f"CDN {args.bitrate // 1024} KB/s per download, {args.slow_share:.0%} slow readers")
+    with StubCDN(size=args.size, bitrate=args.bitrate, tick=0.05, latency=0.03) as cdn, \
+            StubUpstream(latency=0.05, cdn_url=cdn.base_url) as upstream:
+        async_views.service.BASE_URL = upstream.base_url
+        async_views.service.catalog.enabled = False
+        for name, enabled in (("per listener", False), ("shared", True)):
+            views.shared_downloads.enabled = enabled
+            requests, sent, cdn.peak_active = cdn.requests, cdn.bytes_sent, 0
+            result = asyncio.run(spike(async_views, args))
+            per_song = (cdn.bytes_sent - sent) / result["songs"] / 2**20
+            print(f"  {name:>12}: CDN {cdn.requests - requests:4} downloads (peak {cdn.peak_active:3} at once), "
+                  f"{(cdn.bytes_sent - sent) / 2**20:6.1f} MB, {per_song:6.1f} MB per song; "
+                  f"fast listeners' body p50 {result['fast_p50']:.2f} s, max {result['fast_max']:.2f} s")
+        shared = views.shared_downloads.stats()
+        print(f"{'':>16}{shared['listeners']} listeners on {shared['downloads']} shared downloads, "
+              f"{shared['delivered_per_downloaded']} bytes delivered per byte downloaded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Latency of /api/search/suggest/ lookups against the in-memory prefix index.
+
+Builds a PrefixIndex from N synthetic catalog songs (titles + artists) and
+a popular query log, then replays every keystroke prefix of sampled
+queries, the way a client typing into the search box would.
+
+    python -m benchmarks.bench_suggest [--songs 100000] [--queries 5000]
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks import setup_django
+
+WORDS = (
+    "tum hi ho kesariya channa mereya raataan lambiyan apna bana le pasoori "
+    "kal ho naa ho dil diyan gallan tera ban jaunga ae watan agar tum saath "
+    "ho chaleya heeriye naatu jhoome jo pathaan besharam rang maan meri jaan "
+    "baarish tujhe kitna chahne lage hum shayad bekhayali kho gaye ishq mein "
+    "zaroor pal pal dil ke paas mann mast magan hawayein sajni ve kamli"
+).split()
+NAMES = (
+    "arijit shreya atif sonu neha jubin armaan darshan badshah diljit ap "
+    "karan vishal shekhar pritam anuv jasleen king sidhu lata kishore"
+).split()
+SURNAMES = "singh ghoshal aslam nigam kakkar nautiyal malik raval dhillon aujla".split()
+
+
+def phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).title()
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=5000, help="popular query log size")
+    parser.add_argument("--typed", type=int, default=2000, help="queries typed keystroke by keystroke")
+    args = parser.parse_args()
+
+    setup_django()
+    from music.services.suggest import ARTIST_WEIGHT, QUERY_WEIGHT, TITLE_WEIGHT, PrefixIndex, normalize
+
+    rng = random.Random(7)
+    artists = [f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}".title() for _ in range(500)]
+    phrases = {}
+
+    def add(text, kind, weight):
+        key = normalize(text)
+        if key in phrases:
+            phrases[key][2] += weight
+        else:
+            phrases[key] = [text, kind, weight]
+
+    for i in range(args.queries):
+        add(phrase(rng, rng.randint(1, 3)).lower(), "query", rng.randint(1, 50) * QUERY_WEIGHT)
+    for i in range(args.songs):
+        add(f"{phrase(rng, rng.randint(1, 4))} {i}", "song", TITLE_WEIGHT)
+        add(rng.choice(artists), "artist", ARTIST_WEIGHT)
+
+    start = time.perf_counter()
+    index = PrefixIndex(phrases)
+    build = time.perf_counter() - start
+
+    typed = [phrase(rng, rng.randint(1, 3)) for _ in range(args.typed)]
+    prefixes = [q[:n] for q in typed for n in range(1, len(q) + 1)]
+    timings = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.complete(prefix, 10)
+        timings.append(time.perf_counter() - start)
+
+    print(f"phrases: {len(index)} ({args.songs} songs, {args.queries} queries)")
+    print(f"build:   {build:.2f} s")
+    print(f"lookups: {len(prefixes)} keystroke prefixes")
+    for q in (0.5, 0.9, 0.99, 0.999):
+        print(f"p{q * 100:g}:{percentile(timings, q) * 1e6:10.1f} us")
+    print(f"max:  {max(timings) * 1e6:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Stub audio CDN for stream proxy benchmarks.
+
+Serves /<song>_<quality>.mp4 as SIZE deterministic bytes (byte i is
+i % 251, see audio_bytes) with single-range Range support (206 +
+Content-Range, 416 when unsatisfiable), paced at BITRATE bytes/s like a
+player-speed download. The first response on each new connection waits
+HANDSHAKE seconds, standing in for the TCP + TLS round trips to a real
+CDN that a local socket does not have. Runs an aiohttp server on its own
+event loop in a background thread, so thousands of slow downloads cost
+no threads.
+"""
+
+import asyncio
+import threading
+from typing import Optional, Tuple
+
+from aiohttp import web
+
+_PATTERN = bytes(range(251)) * 1024
+
+
+def audio_bytes(start: int, length: int) -> bytes:
+    """The CDN's bytes start..start+length of every file."""
+    out = bytearray()
+    while length > 0:
+        offset = start % 251
+        piece = _PATTERN[offset:offset + length]
+        out += piece
+        start += len(piece)
+        length -= len(piece)
+    return bytes(out)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single "bytes=" range, None if unsatisfiable."""
+    first, _, last = header.strip()[len("bytes="):].partition("-")
+    if not first:  # suffix range: the last N bytes
+        return (max(0, size - int(last)), size - 1) if last and int(last) > 0 else None
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    return (first, last) if first <= last else None
+
+
+class StubCDN:
+    """Run the stub CDN on a background thread."""
+
+    def __init__(self, size: int = 256 * 1024, bitrate: int = 40 * 1024, tick: float = 0.25,
+                 latency: float = 0.0, handshake: float = 0.0, port: int = 0):
+        self.size = size
+        self.bitrate = bitrate  # bytes per second per download; 0 sends as fast as possible
+        self.tick = tick  # pacing interval
+        self.latency = latency  # before the response headers
+        self.handshake = handshake
+        self.port = port
+        self.requests = 0
+        self.connections = 0
+        self._peers = set()
+        self.bytes_sent = 0
+        self.active = 0
+        self.peak_active = 0
+
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._runner = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        peer = request.transport.get_extra_info("peername") if request.transport else None
+        if peer not in self._peers:
+            self._peers.add(peer)
+            self.connections += 1
+            if self.handshake:
+                await asyncio.sleep(self.handshake)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        first, last = 0, self.size - 1
+        status = 200
+        headers = {"Content-Type": "audio/mp4", "Accept-Ranges": "bytes", "ETag": '"stub-audio"'}
+        if "Range" in request.headers:
+            byte_range = parse_range(request.headers["Range"], self.size)
+            if byte_range is None:
+                return web.Response(status=416, headers={"Content-Range": f"bytes */{self.size}"})
+            first, last = byte_range
+            status = 206
+            headers["Content-Range"] = f"bytes {first}-{last}/{self.size}"
+        headers["Content-Length"] = str(last - first + 1)
+
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            step = max(1, int(self.bitrate * self.tick)) if self.bitrate else 64 * 1024
+            position = first
+            while position <= last:
+                piece = audio_bytes(position, min(step, last - position + 1))
+                await response.write(piece)
+                position += len(piece)
+                self.bytes_sent += len(piece)
+                if self.bitrate and position <= last:
+                    await asyncio.sleep(self.tick)
+            await response.write_eof()
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # the proxy hung up (listener left)
+        finally:
+            self.active -= 1
+        return response
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_get("/{name}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port, backlog=4096)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self) -> "StubCDN":
+        self.thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        future = asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop)
+        future.result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self.thread.join(timeout=10)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
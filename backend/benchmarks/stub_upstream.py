@@ -0,0 +1,164 @@
+"""
+Stub JioSaavn upstream for benchmarks.
+
+Serves deterministic fake payloads for the endpoints JioSaavnService uses,
+with a configurable artificial latency, on a local ThreadingHTTPServer.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def fake_song(song_id: str, cdn_url: str = "https://aac.saavncdn.com") -> dict:
+    """Upstream-shaped song dict (all image sizes and download qualities)."""
+    return {
+        "id": song_id,
+        "name": f"Song {song_id}",
+        "type": "song",
+        "year": "2024",
+        "releaseDate": "2024-01-01",
+        "duration": 215,
+        "label": "Stub Records",
+        "explicitContent": False,
+        "playCount": 123456,
+        "language": "hindi",
+        "hasLyrics": True,
+        "url": f"https://www.jiosaavn.com/song/{song_id}",
+        "copyright": "(c) 2024 Stub Records",
+        "album": {"id": f"al{song_id}", "name": f"Album {song_id}", "url": "https://www.jiosaavn.com/album/x"},
+        "artists": {
+            "primary": [{"id": "a1", "name": "Stub Artist", "role": "singer", "type": "artist",
+                         "image": [], "url": "https://www.jiosaavn.com/artist/a1"}],
+            "featured": [],
+            "all": [],
+        },
+        "image": [
+            {"quality": q, "url": f"https://c.saavncdn.com/{song_id}-{q}.jpg"}
+            for q in ("50x50", "150x150", "500x500")
+        ],
+        "downloadUrl": [
+            {"quality": q, "url": f"{cdn_url}/{song_id}_{q}.mp4"}
+            for q in ("12kbps", "48kbps", "96kbps", "160kbps", "320kbps")
+        ],
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # benchmarks open hundreds of connections at once
+
+
+class StubUpstream:
+    """Run the stub upstream on a background thread."""
+
+    def __init__(self, latency: float = 0.05, port: int = 0, search_total: int = 100,
+                 cdn_url: str = "https://aac.saavncdn.com"):
+        self.latency = latency
+        self.search_total = search_total  # songs each search query has, over all pages
+        self.cdn_url = cdn_url  # where download URLs of song lookups point (see stub_cdn.py)
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status, payload = stub.route(self.path)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = _Server(("127.0.0.1", port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def route(self, path: str):
+        parsed = urlparse(path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        parts = parsed.path.strip("/").split("/")[1:]  # drop "api"
+
+        # IDs starting with "missing" don't exist upstream
+        if any(p.startswith("missing") for p in parts + [params.get("id", "")]):
+            return 404, {"success": False, "message": "not found"}
+
+        if parts[:2] == ["search", "songs"]:
+            limit = int(params.get("limit", 20))
+            page = int(params.get("page", 0))
+            query = params.get("query", "")
+            total = self.search_total
+            indices = range(page * limit, min(total, (page + 1) * limit))
+            songs = [fake_song(f"s{abs(hash(query)) % 10000}x{i}") for i in indices]
+            for i, song in zip(indices, songs):
+                song["name"] = f"{query.title()} {i}"  # results match the query, like the real API
+            return 200, {"success": True, "data": {"total": total, "start": page * limit, "results": songs}}
+        if parts[:2] == ["search", "artists"]:
+            return 200, {"success": True, "data": {"results": [
+                {"id": f"ar{i}", "name": f"Artist {i}", "role": "singer", "image": []} for i in range(5)
+            ]}}
+        if parts[:2] == ["search", "albums"]:
+            return 200, {"success": True, "data": {"results": [
+                {"id": f"al{i}", "name": f"Album {i}", "year": "2024", "language": "hindi", "type": "album",
+                 "artists": {"primary": [{"id": "a1", "name": "Stub Artist"}]}, "image": [],
+                 "url": f"https://www.jiosaavn.com/album/al{i}"} for i in range(int(params.get("limit", 10)))
+            ]}}
+        if parts and parts[0] == "songs" and len(parts) == 1:
+            ids = params.get("ids", "").split(",")
+            return 200, {"success": True, "data": [fake_song(i, self.cdn_url) for i in ids if i and not i.startswith("missing")]}
+        if parts and parts[0] == "songs" and len(parts) == 2:
+            return 200, {"success": True, "data": [fake_song(parts[1], self.cdn_url)]}
+        if parts and parts[0] == "songs" and parts[-1] == "suggestions":
+            limit = int(params.get("limit", 10))
+            return 200, {"success": True, "data": [fake_song(f"{parts[1]}r{i}") for i in range(limit)]}
+        if parts and parts[0] == "songs" and parts[-1] == "lyrics":
+            return 200, {"success": True, "data": {"lyrics": "la la la\nla la", "snippet": "la", "copyright": ""}}
+        if parts and parts[0] == "albums":
+            album_id = params.get("id", "al")
+            return 200, {"success": True, "data": {
+                "id": album_id, "name": f"Album {album_id}", "year": "2024", "songCount": 10,
+                "image": [], "songs": [fake_song(f"{album_id}t{i}") for i in range(10)],
+            }}
+        if parts and parts[0] == "artists":
+            artist_id = params.get("id", "ar")
+            return 200, {"success": True, "data": {
+                "id": artist_id, "name": f"Artist {artist_id}", "image": [],
+                "topSongs": [fake_song(f"{artist_id}t{i}") for i in range(10)], "topAlbums": [],
+            }}
+        if parts and parts[0] == "modules":
+            return 200, {"success": True, "data": {
+                "trending": {"data": [fake_song(f"tr{i}") for i in range(20)]},
+                "charts": [{"id": f"ch{i}", "title": f"Chart {i}", "image": "", "count": 50} for i in range(10)],
+            }}
+        return 404, {"success": False, "message": "not found"}
+
+    def start(self) -> "StubUpstream":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,188 @@
+"""
+In-process cache backend with a memory budget per key namespace.
+- A key's namespace is its prefix before the first ':' ("song:<gen>:<id>"
+  -> "song"); cache_page entries go to "pages", everything else (and
+  namespaces without a budget) to "default"
+- Each namespace is its own LRU, measured in bytes (pickled value + key);
+  writing past the budget evicts that namespace's least recently used
+  entries, never another namespace's. Bulk, cheap song writes cannot push
+  out trending, charts or cached pages
+- Values larger than their namespace's budget are not cached
+- Per-namespace occupancy, evictions, hits and misses from stats()
+- Like LocMemCache: per process, shared by every thread, keyed by LOCATION
+
+    CACHES = {"default": {
+        "BACKEND": "core.budget_cache.BudgetedLocMemCache",
+        "OPTIONS": {"BUDGETS": {"song": 16 * 1024 * 1024, "default": 8 * 1024 * 1024}},
+    }}
+"""
+
+import time
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+PAGES_PREFIX = "views.decorators.cache."
+DEFAULT_NAMESPACE = "default"
+DEFAULT_BUDGET = 8 * 1024 * 1024
+
+
+def budget_namespace(key: str, names: Iterable[str]) -> str:
+    """Namespace whose budget key (before make_key) is charged to."""
+    if key.startswith(PAGES_PREFIX):
+        namespace = "pages"
+    else:
+        namespace = key.split(":", 1)[0]
+    return namespace if namespace in names else DEFAULT_NAMESPACE
+
+
+def budgets_from_options(options: Dict, size: int = DEFAULT_BUDGET) -> Dict[str, int]:
+    """OPTIONS["BUDGETS"] as name -> bytes, always with a default namespace."""
+    budgets = {name: int(budget) for name, budget in options.get("BUDGETS", {}).items()}
+    budgets.setdefault(DEFAULT_NAMESPACE, size)
+    return budgets
+
+
+class _Partition:
+    """One namespace: LRU of key -> (pickled value, expires), oldest first."""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0, "too_large": 0}
+
+    def live(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        item = self.entries.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.time():
+            self.pop(key)
+            self.stats["expired"] += 1
+            return None
+        return item
+
+    def pop(self, key: str):
+        value, _ = self.entries.pop(key)
+        self.bytes -= len(key) + len(value)
+
+    def put(self, key: str, value: bytes, expires: Optional[float]) -> bool:
+        if key in self.entries:
+            self.pop(key)
+        size = len(key) + len(value)
+        if size > self.budget:
+            self.stats["too_large"] += 1
+            return False
+        while self.bytes + size > self.budget:
+            self.pop(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+        self.entries[key] = (value, expires)
+        self.bytes += size
+        self.stats["sets"] += 1
+        return True
+
+
+_stores: Dict[str, Dict[str, _Partition]] = {}
+_locks: Dict[str, threading.Lock] = {}
+
+
+class BudgetedLocMemCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        budgets = budgets_from_options(params.get("OPTIONS", {}))
+        self._lock = _locks.setdefault(name, threading.Lock())
+        with self._lock:
+            self._partitions = _stores.setdefault(
+                name, {namespace: _Partition(budget) for namespace, budget in budgets.items()}
+            )
+
+    def _locate(self, key, version) -> Tuple[_Partition, str]:
+        partition = self._partitions[budget_namespace(key, self._partitions)]
+        return partition, self.make_and_validate_key(key, version=version)
+
+    def _expires(self, timeout) -> Optional[float]:
+        return self.get_backend_timeout(timeout)
+
+    def get(self, key, default=None, version=None):
+        partition, key = self._locate(key, version)
+        with self._lock:
+            item = partition.live(key)
+            if item is None:
+                partition.stats["misses"] += 1
+                return default
+            partition.entries.move_to_end(key)
+            partition.stats["hits"] += 1
+        return pickle.loads(item[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        partition, key = self._locate(key, version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            partition.put(key, pickled, self._expires(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        partition, key = self._locate(key, version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            if partition.live(key) is not None:
+                return False
+            return partition.put(key, pickled, self._expires(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        partition, key = self._locate(key, version)
+        with self._lock:
+            item = partition.live(key)
+            if item is None:
+                return False
+            partition.entries[key] = (item[0], self._expires(timeout))
+            return True
+
+    def delete(self, key, version=None):
+        partition, key = self._locate(key, version)
+        with self._lock:
+            if partition.live(key) is None:
+                return False
+            partition.pop(key)
+            return True
+
+    def has_key(self, key, version=None):
+        partition, key = self._locate(key, version)
+        with self._lock:
+            return partition.live(key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        partition, made_key = self._locate(key, version)
+        with self._lock:
+            item = partition.live(made_key)
+            if item is None:
+                raise ValueError("Key '%s' not found" % made_key)
+            value = pickle.loads(item[0]) + delta
+            partition.put(made_key, pickle.dumps(value, self.pickle_protocol), item[1])
+        return value
+
+    def clear(self):
+        with self._lock:
+            for partition in self._partitions.values():
+                partition.entries.clear()
+                partition.bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            namespaces = {
+                name: dict(
+                    p.stats,
+                    entries=len(p.entries),
+                    bytes=p.bytes,
+                    budget_bytes=p.budget,
+                    occupancy=round(p.bytes / p.budget, 3) if p.budget else 0.0,
+                )
+                for name, p in self._partitions.items()
+            }
+        totals = {
+            name: sum(ns[name] for ns in namespaces.values())
+            for name in ("hits", "misses", "sets", "evictions", "too_large", "entries", "bytes", "budget_bytes")
+        }
+        return dict(totals, namespaces=namespaces)
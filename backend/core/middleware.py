@@ -1,12 +1,20 @@
 """
 Rate Limiting Middleware
 Simple IP-based rate limiting for API protection.
+
+Every middleware here is sync and async capable: under ASGI (uvicorn
+workers) Django then runs the whole chain and the async views on the
+event loop, instead of handing each request to its one thread-sensitive
+executor to run sync middleware.
 """
 
 import time
 import logging  # FIX #21: Request logging
 from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.http import JsonResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
 
 logger = logging.getLogger(__name__)  # FIX #21: For request logging
 
@@ -31,8 +39,13 @@ class RateLimitMiddleware:
     or implement per-endpoint tiering.
     """
     
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
         self.requests = defaultdict(list)  # {ip: [timestamp1, timestamp2, ...]}
         self.rate_limit = 120  # requests per window - FIX #11: Verified good balance
         self.window = 60  # seconds
@@ -46,15 +59,30 @@ class RateLimitMiddleware:
         ]
     
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        limited = self.check(request)
+        if limited is not None:
+            return limited
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        limited = self.check(request)
+        if limited is not None:
+            return limited
+        return await self.get_response(request)
+
+    def check(self, request):
+        """The 429 response for a request over the limit, else None (and the request is counted)."""
         # Only rate limit API endpoints
         if not request.path.startswith('/api/'):
-            return self.get_response(request)
+            return None
         
         # ✅ FIX: Skip rate limiting for streaming/download endpoints
         for excluded in self.excluded_paths:
             if excluded in request.path:
                 # Bypass rate limiting for audio streams
-                return self.get_response(request)
+                return None
         
         ip = self.get_client_ip(request)
         now = time.time()
@@ -74,8 +102,7 @@ class RateLimitMiddleware:
         
         # Record this request
         self.requests[ip].append(now)
-        
-        return self.get_response(request)
+        return None
     
     def get_client_ip(self, request):
         """Get client IP from request, handling proxies."""
@@ -93,13 +120,33 @@ class AdminRateLimitMiddleware:
     Max 10 login attempts per 5 minutes per IP.
     """
     
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
         self.admin_attempts = defaultdict(list)  # {ip: [timestamp1, timestamp2, ...]}
         self.max_attempts = 10 
         self.window = 300  # 5 minutes
     
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        limited = self.check(request)
+        if limited is not None:
+            return limited
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        limited = self.check(request)
+        if limited is not None:
+            return limited
+        return await self.get_response(request)
+
+    def check(self, request):
+        """The 429 response for one login attempt too many, else None."""
         # Only protect /admin/login/ POST requests (Brute force protection)
         # Allow navigation (GET) and other admin pages
         if request.path == '/admin/login/' and request.method == 'POST':
@@ -124,8 +171,7 @@ class AdminRateLimitMiddleware:
             
             # Record this attempt
             self.admin_attempts[ip].append(now)
-        
-        return self.get_response(request)
+        return None
     
     def get_client_ip(self, request):
         """Get client IP from request, handling proxies."""
@@ -153,18 +199,30 @@ class RequestLoggingMiddleware:
     - Rate limiting verification
     """
     
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
     
     def __call__(self, request):
-        import time
-        
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         # Log incoming request
         start_time = time.time()
         
         # Process request
         response = self.get_response(request)
-        
+        return self.log(request, response, start_time)
+
+    async def __acall__(self, request):
+        start_time = time.time()
+        response = await self.get_response(request)
+        return self.log(request, response, start_time)
+
+    def log(self, request, response, start_time):
         # Calculate response time
         duration = time.time() - start_time
         
@@ -181,3 +239,34 @@ class RequestLoggingMiddleware:
             )
         
         return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that is also async capable (WhiteNoise itself is sync only,
+    which would make every middleware outside it, and so the whole chain,
+    run sync under ASGI). Static files are still looked up and opened in
+    a worker thread; other requests go straight on to the next handler.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -3,6 +3,7 @@ Django settings for core project.
 """
 
 import os
+import tempfile
 from pathlib import Path
 import dj_database_url
 
@@ -52,7 +53,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be first
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise, async capable under ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -108,6 +109,9 @@ TEMPLATES = [
 WSGI_APPLICATION = 'core.wsgi.application'
 ASGI_APPLICATION = 'core.asgi.application'
 
+# Serve upstream-bound music endpoints as async views (requires running core.asgi)
+ASYNC_UPSTREAM_VIEWS = os.environ.get('ASYNC_UPSTREAM_VIEWS', 'False') == 'True'
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels.layers.InMemoryChannelLayer'
@@ -136,7 +140,30 @@ DATABASES = {
 
 
 # Caching Strategy
-# Use Redis if REDIS_URL is present, otherwise fallback to Local Memory
+# Use Redis if REDIS_URL is present, otherwise a shared-memory store that
+# every worker on this host shares, otherwise fallback to Local Memory
+
+# Memory budget per key namespace (shared-memory and local memory caches):
+# a namespace only evicts its own entries, so bulk song writes never push
+# out trending, charts or cached pages ("pages" = cache_page, "default" =
+# everything else). Override in MB: CACHE_BUDGETS_MB="song=32,pages=8"
+CACHE_BUDGETS_MB = {
+    'song': 16, 'search': 24, 'lyrics': 8, 'album': 8, 'artist': 4, 'related': 8,
+    'trending': 4, 'charts': 2, 'discover': 4, 'pages': 16, 'default': 8,
+}
+for _item in filter(None, os.environ.get('CACHE_BUDGETS_MB', '').split(',')):
+    _name, _mb = _item.split('=')
+    CACHE_BUDGETS_MB[_name.strip()] = float(_mb)
+CACHE_BUDGETS = {name: int(mb * 1024 * 1024) for name, mb in CACHE_BUDGETS_MB.items()}
+
+# Slot sizes of the shared-memory cache for namespaces with uniform values
+# (slot bytes, share of the budget): song records are 0.5-1 KB, search
+# pages of 30 songs ~11 KB
+SHM_CACHE_CLASSES = {
+    'song': [(256, 0.05), (512, 0.3), (1024, 0.6), (4096, 0.05)],
+    'search': [(1024, 0.05), (4096, 0.15), (16384, 0.75), (65536, 0.05)],
+}
+
 if 'REDIS_URL' in os.environ:
     CACHES = {
         "default": {
@@ -148,16 +175,172 @@ if 'REDIS_URL' in os.environ:
             }
         }
     }
+elif os.environ.get('SHM_CACHE', 'False') == 'True':
+    # One cache in shared memory for every worker on the host. Opt-in:
+    # /dev/shm must hold the sum of CACHE_BUDGETS_MB (else per-process)
+    CACHES = {
+        "default": {
+            "BACKEND": "core.shm_cache.SharedMemoryCache",
+            # Default: /dev/shm/villen-music-cache (tempdir without /dev/shm)
+            "LOCATION": os.environ.get('SHM_CACHE_PATH', ''),
+            "OPTIONS": {
+                "BUDGETS": CACHE_BUDGETS,
+                "CLASSES": SHM_CACHE_CLASSES,
+            },
+        }
+    }
 else:
     CACHES = {
         "default": {
-            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "BACKEND": "core.budget_cache.BudgetedLocMemCache",
             "LOCATION": "unique-snowflake",
+            "OPTIONS": {
+                "BUDGETS": CACHE_BUDGETS,
+            },
         }
     }
 
 
 
+# Per-namespace (fresh, stale) TTLs in seconds for JioSaavnService, on top
+# of its NAMESPACE_TTLS defaults. Override: JIOSAAVN_CACHE_TTLS="trending=900/43200"
+JIOSAAVN_CACHE_TTLS = {}
+for _item in filter(None, os.environ.get('JIOSAAVN_CACHE_TTLS', '').split(',')):
+    _name, _ttls = _item.split('=')
+    _fresh, _stale = _ttls.split('/')
+    JIOSAAVN_CACHE_TTLS[_name.strip()] = (int(_fresh), int(_stale))
+
+# In-process L1 cache in front of CACHES['default'] for JioSaavnService.
+# Short TTL keeps workers close to L2; BROADCAST lets clear_cache() and
+# entity invalidations drop L1 keys in every worker via the shared cache.
+JIOSAAVN_L1_CACHE = {
+    'MAX_ENTRIES': int(os.environ.get('JIOSAAVN_L1_MAX_ENTRIES', 2048)),
+    'MAX_BYTES': int(os.environ.get('JIOSAAVN_L1_MAX_BYTES', 32 * 1024 * 1024)),
+    'TTL': float(os.environ.get('JIOSAAVN_L1_TTL', 5)),
+    'BROADCAST': os.environ.get('JIOSAAVN_L1_BROADCAST', 'True') == 'True',
+}
+
+# Per endpoint family circuit breakers for the JioSaavn API
+JIOSAAVN_CIRCUIT_BREAKER = {
+    'WINDOW': float(os.environ.get('JIOSAAVN_CB_WINDOW', 60)),
+    'MIN_REQUESTS': int(os.environ.get('JIOSAAVN_CB_MIN_REQUESTS', 10)),
+    'ERROR_THRESHOLD': float(os.environ.get('JIOSAAVN_CB_ERROR_THRESHOLD', 0.5)),
+    'CONSECUTIVE_FAILURES': int(os.environ.get('JIOSAAVN_CB_CONSECUTIVE_FAILURES', 5)),
+    'OPEN_SECONDS': float(os.environ.get('JIOSAAVN_CB_OPEN_SECONDS', 30)),
+    'MIN_TIMEOUT': float(os.environ.get('JIOSAAVN_CB_MIN_TIMEOUT', 1.0)),
+    'TIMEOUT_MULTIPLIER': float(os.environ.get('JIOSAAVN_CB_TIMEOUT_MULTIPLIER', 3.0)),
+}
+
+# Local song catalog (full-text index) consulted before search/songs
+JIOSAAVN_CATALOG = {
+    'ENABLED': os.environ.get('JIOSAAVN_CATALOG_ENABLED', 'True') == 'True',
+    # Share of a page the catalog must match to answer an exact-title query itself
+    'MIN_COVERAGE': float(os.environ.get('JIOSAAVN_CATALOG_MIN_COVERAGE', 0.8)),
+    # Matches older than this are re-fetched in the background
+    'REFRESH_AFTER': int(os.environ.get('JIOSAAVN_CATALOG_REFRESH_AFTER', 7 * 24 * 3600)),
+}
+
+# /api/search/suggest/ prefix index (catalog titles, artists, popular queries)
+JIOSAAVN_SUGGEST = {
+    'REBUILD_INTERVAL': float(os.environ.get('JIOSAAVN_SUGGEST_REBUILD_INTERVAL', 300)),
+    'MAX_CATALOG_SONGS': int(os.environ.get('JIOSAAVN_SUGGEST_MAX_CATALOG_SONGS', 200000)),
+    'MAX_QUERIES': int(os.environ.get('JIOSAAVN_SUGGEST_MAX_QUERIES', 5000)),
+}
+
+# Spelling variants and typos of a past search reuse its cache entries
+JIOSAAVN_QUERY_CANON = {
+    'ENABLED': os.environ.get('JIOSAAVN_QUERY_CANON_ENABLED', 'True') == 'True',
+    'MAX_QUERIES': int(os.environ.get('JIOSAAVN_QUERY_CANON_MAX_QUERIES', 50000)),
+    # Shorter queries only match variants exactly, never by edit distance
+    'MIN_FUZZY_LENGTH': int(os.environ.get('JIOSAAVN_QUERY_CANON_MIN_FUZZY_LENGTH', 5)),
+}
+
+
+# Hot-key snapshot: the most hit cache entries are saved to PATH every
+# INTERVAL seconds and at exit, and reloaded when a worker boots. On by
+# default only for LocMemCache, which starts empty in every new worker.
+JIOSAAVN_SNAPSHOT = {
+    'ENABLED': os.environ.get(
+        'JIOSAAVN_SNAPSHOT_ENABLED', str(CACHES['default']['BACKEND'].endswith('LocMemCache'))
+    ) == 'True',
+    'PATH': os.environ.get('JIOSAAVN_SNAPSHOT_PATH', os.path.join(BASE_DIR, 'cache_snapshot.pickle')),
+    'MAX_ENTRIES': int(os.environ.get('JIOSAAVN_SNAPSHOT_MAX_ENTRIES', 5000)),
+    'INTERVAL': float(os.environ.get('JIOSAAVN_SNAPSHOT_INTERVAL', 300)),
+}
+
+# Cache warmer: trending, charts, suggested artists, mood and time-of-day
+# playlists refreshed before they expire (also: manage.py warm_cache)
+JIOSAAVN_WARMER = {
+    'ENABLED': os.environ.get('JIOSAAVN_WARMER_ENABLED', 'True') == 'True',
+    'LANGUAGES': os.environ.get('JIOSAAVN_WARMER_LANGUAGES', 'hindi,english,punjabi').split(','),
+    'CONCURRENCY': int(os.environ.get('JIOSAAVN_WARMER_CONCURRENCY', 4)),
+    # Seconds between runs; entries expiring within HORIZON are reloaded
+    'INTERVAL': float(os.environ.get('JIOSAAVN_WARMER_INTERVAL', 900)),
+    'HORIZON': float(os.environ.get('JIOSAAVN_WARMER_HORIZON', 1200)),
+    'INITIAL_DELAY': float(os.environ.get('JIOSAAVN_WARMER_INITIAL_DELAY', 30)),
+}
+
+# Song, album, artist and trending responses: JSON-encoded, gzip- and
+# brotli-compressed once per cached value, per worker, up to MAX_BYTES
+JIOSAAVN_RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('JIOSAAVN_RESPONSE_CACHE_ENABLED', 'True') == 'True',
+    'MAX_BYTES': int(os.environ.get('JIOSAAVN_RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    'MIN_COMPRESS_BYTES': int(os.environ.get('JIOSAAVN_RESPONSE_CACHE_MIN_COMPRESS_BYTES', 256)),
+    'GZIP_LEVEL': int(os.environ.get('JIOSAAVN_RESPONSE_CACHE_GZIP_LEVEL', 6)),
+    'BROTLI_QUALITY': int(os.environ.get('JIOSAAVN_RESPONSE_CACHE_BROTLI_QUALITY', 8)),
+}
+
+# Audio stream proxy (/api/stream/<id>/): keep-alive pools to the CDN hosts,
+# apart from the API session. KEEPALIVE (seconds an idle connection stays
+# pooled) applies to the async view; READ_BUFFER is per download
+JIOSAAVN_STREAM_PROXY = {
+    'MAX_CONNECTIONS': int(os.environ.get('JIOSAAVN_STREAM_MAX_CONNECTIONS', 4096)),
+    'MAX_PER_HOST': int(os.environ.get('JIOSAAVN_STREAM_MAX_PER_HOST', 2048)),
+    'KEEPALIVE': float(os.environ.get('JIOSAAVN_STREAM_KEEPALIVE', 60)),
+    'CONNECT_TIMEOUT': float(os.environ.get('JIOSAAVN_STREAM_CONNECT_TIMEOUT', 10)),
+    'READ_TIMEOUT': float(os.environ.get('JIOSAAVN_STREAM_READ_TIMEOUT', 30)),
+    'CHUNK_SIZE': int(os.environ.get('JIOSAAVN_STREAM_CHUNK_SIZE', 64 * 1024)),
+    'READ_BUFFER': int(os.environ.get('JIOSAAVN_STREAM_READ_BUFFER', 256 * 1024)),
+}
+
+# How /api/stream/<id>/ delivers audio: "proxy" (relay through this server),
+# "redirect" (302 to the CDN URL) or "descriptor" (JSON naming it). Rules
+# per client type (app, web, other or an X-Client-Type) and per reported
+# network condition (Save-Data as save-data, ECT as ect-2g, X-Network-Type)
+# override MODE, networks first: JIOSAAVN_STREAM_DELIVERY_CLIENTS="web=descriptor",
+# JIOSAAVN_STREAM_DELIVERY_NETWORKS="restricted=proxy". TTL bounds redirects,
+# descriptors and their signed proxy fallback URLs
+JIOSAAVN_STREAM_DELIVERY = {
+    'MODE': os.environ.get('JIOSAAVN_STREAM_DELIVERY', 'proxy'),
+    'CLIENT_MODES': {},
+    'NETWORK_MODES': {},
+    'TTL': int(os.environ.get('JIOSAAVN_STREAM_DELIVERY_TTL', 300)),
+}
+for _setting, _env in (('CLIENT_MODES', 'JIOSAAVN_STREAM_DELIVERY_CLIENTS'),
+                       ('NETWORK_MODES', 'JIOSAAVN_STREAM_DELIVERY_NETWORKS')):
+    for _item in filter(None, os.environ.get(_env, '').split(',')):
+        _name, _mode = _item.split('=')
+        JIOSAAVN_STREAM_DELIVERY[_setting][_name.strip().lower()] = _mode.strip()
+
+# One CDN download per song and range for concurrent listeners in a worker:
+# MAX_BYTES of download buffers per process, JOIN_AHEAD how far past the
+# bytes already downloaded a listener may start and still join
+JIOSAAVN_SHARED_DOWNLOADS = {
+    'ENABLED': os.environ.get('JIOSAAVN_SHARED_DOWNLOADS_ENABLED', 'True') == 'True',
+    'MAX_BYTES': int(float(os.environ.get('JIOSAAVN_SHARED_DOWNLOADS_MAX_MB', 256)) * 1024 * 1024),
+    'JOIN_AHEAD': int(float(os.environ.get('JIOSAAVN_SHARED_DOWNLOADS_JOIN_AHEAD_KB', 1024)) * 1024),
+}
+
+# Proxied audio on local disk, by song, quality and byte range; LRU over
+# MAX_BYTES for every worker on the host, songs above MAX_FILE_BYTES skipped
+JIOSAAVN_AUDIO_CACHE = {
+    'ENABLED': os.environ.get('JIOSAAVN_AUDIO_CACHE_ENABLED', 'True') == 'True',
+    'PATH': os.environ.get('JIOSAAVN_AUDIO_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'villen-music-audio')),
+    'MAX_BYTES': int(float(os.environ.get('JIOSAAVN_AUDIO_CACHE_MAX_MB', 512)) * 1024 * 1024),
+    'MAX_FILE_BYTES': int(float(os.environ.get('JIOSAAVN_AUDIO_CACHE_MAX_FILE_MB', 32)) * 1024 * 1024),
+}
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -0,0 +1,494 @@
+"""
+Shared-memory cache backend: one store for every worker process on a host.
+- A fixed-size file (in /dev/shm by default) mmap'd by each process, so
+  gunicorn/uvicorn workers share entries without Redis or memcached
+- Split into one partition per key namespace (BUDGETS, as in
+  core.budget_cache); a namespace only ever evicts its own entries
+- Per partition, an index: set-associative hash table (key hash -> set of
+  WAYS entries), LRU within a set; full keys are stored and compared, so
+  hash collisions never return the wrong value
+- Values live in slab size classes (256 B ... 1 MB). Until a partition is
+  full, a value may take a never-used slot of a larger class; after that
+  each class reuses its slots with the CLOCK algorithm (approximate LRU:
+  recently read slots get a second chance). Values larger than the
+  largest class are not cached. CLASSES can give a namespace its own mix
+  (song records all fit in 1 KB)
+- One lock for the whole store: flock across processes plus a thread
+  lock inside each; pickling happens outside it
+- add() and incr() are atomic across workers, like on Redis
+- Per-namespace counters (occupancy, evictions, hits) live in the file
+  and are host-wide
+- The file outlives worker restarts (not reboots). A store with another
+  layout (BUDGETS / CLASSES changed) is re-created empty
+- Its pages are reserved when it is opened (posix_fallocate): a tmpfs
+  smaller than the store (Docker's default /dev/shm is 64 MB) would
+  otherwise kill the worker with SIGBUS on the first write past it.
+  Without the space, the backend is a BudgetedLocMemCache instead
+
+    CACHES = {"default": {
+        "BACKEND": "core.shm_cache.SharedMemoryCache",
+        "LOCATION": "/dev/shm/villen-music-cache",
+        "OPTIONS": {"BUDGETS": {"song": 16 * 1024 * 1024, "default": 32 * 1024 * 1024}},
+    }}
+"""
+
+import os
+import mmap
+import errno
+import time
+import fcntl
+import pickle
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core.budget_cache import BudgetedLocMemCache, budget_namespace, budgets_from_options
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"VLNSHM03"
+WAYS = 8
+PAGE = 4096
+CLOCK_SCAN = 32  # slots the CLOCK hand may skip before evicting anyway
+MAX_CLASSES = 8
+
+# (slot size, share of the partition)
+DEFAULT_CLASSES = (
+    (256, 0.04), (1024, 0.24), (4096, 0.22), (16384, 0.25),
+    (65536, 0.15), (262144, 0.07), (1048576, 0.03),
+)
+
+# Header: magic, layout fingerprint, then per partition its state
+_HEAD = struct.Struct("<8s8s")
+_COUNTERS = ("hits", "misses", "sets", "evictions", "too_large", "entries", "bytes")
+_COUNTER = struct.Struct("<q")
+_HAND = struct.Struct("<I")
+# Counters, then per class its CLOCK hand and how many slots were ever used
+_STATE_SIZE = _COUNTER.size * len(_COUNTERS) + _HAND.size * MAX_CLASSES * 2
+# Index entry: key hash, class + 1 (0 = empty), slot, expires (0 = never), last access
+_ENTRY = struct.Struct("<QBxxxIdd")
+_SET = struct.Struct("<" + "QBxxxIdd" * WAYS)
+# Slot header: owner set, owner way, referenced, in use, key length, value length
+_SLOT = struct.Struct("<IHBBHxxI")
+
+
+class _Partition:
+    """Index and slabs of one namespace; offsets into the mapped file."""
+
+    def __init__(self, name: str, size: int, classes, state_at: int, offset: int):
+        self.name = name
+        self.size = size
+        self.state_at = state_at
+        slabs = [(slot_size, int(size * share) // slot_size) for slot_size, share in classes]
+        slabs = [(slot_size, n) for slot_size, n in slabs if n] or [(classes[0][0], 1)]
+        total_slots = sum(n for _, n in slabs)
+        self.sets = max(1, -(-total_slots * 3 // 2) // WAYS)  # index 1.5x the slots
+        self.set_base = offset
+        offset += self.sets * _SET.size
+        self.classes: List[Tuple[int, int, int]] = []
+        for slot_size, n in slabs:
+            self.classes.append((slot_size, n, offset))
+            offset += slot_size * n
+        self.end = offset
+
+    def layout(self) -> tuple:
+        return self.name, self.sets, self.set_base, tuple(self.classes)
+
+    def counter_at(self, name: str) -> int:
+        return self.state_at + _COUNTERS.index(name) * _COUNTER.size
+
+    def hand_at(self, cls: int) -> int:
+        return self.state_at + _COUNTER.size * len(_COUNTERS) + cls * _HAND.size
+
+    def used_at(self, cls: int) -> int:
+        return self.hand_at(MAX_CLASSES + cls)
+
+
+def _layout(budgets: Dict[str, int], classes: Dict[str, tuple]) -> Tuple[Dict[str, _Partition], int]:
+    """Partitions by name and the file size."""
+    header = -(-(_HEAD.size + _STATE_SIZE * len(budgets)) // PAGE) * PAGE
+    partitions, offset = {}, header
+    for i, (name, size) in enumerate(sorted(budgets.items())):
+        partition = _Partition(name, size, classes.get(name, DEFAULT_CLASSES)[:MAX_CLASSES],
+                               _HEAD.size + i * _STATE_SIZE, offset)
+        partitions[name] = partition
+        offset = -(-partition.end // PAGE) * PAGE
+    return partitions, offset
+
+
+class _Store:
+    """One mapped file, shared by every backend instance (thread) of a process."""
+
+    def __init__(self, path: str, budgets: Dict[str, int], classes: Dict[str, tuple]):
+        self.path = path
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.partitions, file_size = _layout(budgets, classes)
+        fingerprint = hashlib.blake2b(
+            repr([p.layout() for p in self.partitions.values()]).encode(), digest_size=8
+        ).digest()
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self.fd).st_size != file_size or os.pread(self.fd, _HEAD.size, 0) != MAGIC + fingerprint:
+                    os.ftruncate(self.fd, 0)  # drop the old contents and layout
+                    try:
+                        self._reserve(file_size)
+                    except OSError:
+                        os.ftruncate(self.fd, 0)  # give back what was reserved
+                        raise
+                    self.mm = mmap.mmap(self.fd, file_size)
+                    _HEAD.pack_into(self.mm, 0, MAGIC, fingerprint)
+                else:
+                    self._reserve(file_size)  # the file of an older version may be sparse
+                    self.mm = mmap.mmap(self.fd, file_size)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _reserve(self, size: int):
+        """Allocate every page of the file up to size; OSError if the filesystem cannot hold them."""
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(self.fd, 0, size)
+            return
+        fs = os.fstatvfs(self.fd)  # no fallocate (macOS): check the free space instead
+        if fs.f_bavail * fs.f_frsize < size - os.fstat(self.fd).st_blocks * 512:
+            raise OSError(errno.ENOSPC, f"{size} bytes do not fit", self.path)
+        os.ftruncate(self.fd, size)
+
+    # --------------------
+    # LOCKING
+    # --------------------
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        except BaseException:
+            self.lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
+
+    # --------------------
+    # INDEX (caller holds the lock)
+    # --------------------
+    def _entry_at(self, part: _Partition, set_no: int, way: int = 0) -> int:
+        return part.set_base + set_no * _SET.size + way * _ENTRY.size
+
+    def _slot_at(self, part: _Partition, cls: int, slot: int) -> int:
+        slot_size, _, offset = part.classes[cls]
+        return offset + slot * slot_size
+
+    def count(self, part: _Partition, name: str, n: int = 1):
+        at = part.counter_at(name)
+        _COUNTER.pack_into(self.mm, at, _COUNTER.unpack_from(self.mm, at)[0] + n)
+
+    def find(self, part: _Partition, key: bytes, fp: int) -> Optional[tuple]:
+        """(set, way, class, slot, expires) of key, None if absent."""
+        set_no = fp % part.sets
+        fields = _SET.unpack_from(self.mm, self._entry_at(part, set_no))
+        for way in range(WAYS):
+            entry_fp, cls, slot, expires, _ = fields[way * 5:way * 5 + 5]
+            if entry_fp != fp or not cls:
+                continue
+            at = self._slot_at(part, cls - 1, slot)
+            _, _, _, in_use, key_len, _ = _SLOT.unpack_from(self.mm, at)
+            start = at + _SLOT.size
+            if in_use and key_len == len(key) and self.mm[start:start + key_len] == key:
+                return set_no, way, cls - 1, slot, expires
+        return None
+
+    def read(self, part: _Partition, found: tuple) -> bytes:
+        """Value bytes of a found entry; marks it recently used."""
+        set_no, way, cls, slot, expires = found
+        at = self._slot_at(part, cls, slot)
+        owner_set, owner_way, _, in_use, key_len, value_len = _SLOT.unpack_from(self.mm, at)
+        _SLOT.pack_into(self.mm, at, owner_set, owner_way, 1, in_use, key_len, value_len)
+        struct.pack_into("<d", self.mm, self._entry_at(part, set_no, way) + 24, time.time())
+        start = at + _SLOT.size + key_len
+        return self.mm[start:start + value_len]
+
+    def set_expires(self, part: _Partition, found: tuple, expires: float):
+        struct.pack_into("<d", self.mm, self._entry_at(part, found[0], found[1]) + 16, expires)
+
+    def remove(self, part: _Partition, found: tuple):
+        set_no, way, cls, slot, _ = found
+        self._clear_entry(part, set_no, way)
+        self._release_slot(part, cls, slot)
+
+    def _clear_entry(self, part: _Partition, set_no: int, way: int):
+        _ENTRY.pack_into(self.mm, self._entry_at(part, set_no, way), 0, 0, 0, 0.0, 0.0)
+        self.count(part, "entries", -1)
+
+    def _release_slot(self, part: _Partition, cls: int, slot: int):
+        at = self._slot_at(part, cls, slot)
+        owner_set, owner_way, _, in_use, key_len, value_len = _SLOT.unpack_from(self.mm, at)
+        if in_use:
+            _SLOT.pack_into(self.mm, at, owner_set, owner_way, 0, 0, key_len, value_len)
+            self.count(part, "bytes", -(key_len + value_len))
+
+    def store(self, part: _Partition, key: bytes, fp: int, value: bytes, expires: float,
+              found: Optional[tuple]) -> bool:
+        """Write key -> value (replacing found, if any); False if too large."""
+        needed = _SLOT.size + len(key) + len(value)
+        cls = next((i for i, (slot_size, _, _) in enumerate(part.classes) if slot_size >= needed), None)
+        if cls is None:
+            if found is not None:
+                self.remove(part, found)
+            self.count(part, "too_large")
+            return False
+
+        set_no = fp % part.sets
+        if found is not None and part.classes[found[2]][0] >= needed:
+            way, cls, slot = found[1], found[2], found[3]  # rewrite in place
+            self._release_slot(part, cls, slot)
+        else:
+            if found is not None:
+                self.remove(part, found)
+            cls, slot = self._allocate(part, cls)
+            way = self._free_way(part, set_no)
+            self.count(part, "entries")
+
+        at = self._slot_at(part, cls, slot)
+        _SLOT.pack_into(self.mm, at, set_no, way, 0, 1, len(key), len(value))
+        start = at + _SLOT.size
+        self.mm[start:start + len(key)] = key
+        self.mm[start + len(key):start + len(key) + len(value)] = value
+        _ENTRY.pack_into(self.mm, self._entry_at(part, set_no, way), fp, cls + 1, slot, expires, time.time())
+        self.count(part, "bytes", len(key) + len(value))
+        self.count(part, "sets")
+        return True
+
+    def _free_way(self, part: _Partition, set_no: int) -> int:
+        """An empty way of the set, else its least recently used one (evicted)."""
+        fields = _SET.unpack_from(self.mm, self._entry_at(part, set_no))
+        oldest, oldest_at = 0, float("inf")
+        for way in range(WAYS):
+            _, cls, _, _, accessed = fields[way * 5:way * 5 + 5]
+            if not cls:
+                return way
+            if accessed < oldest_at:
+                oldest, oldest_at = way, accessed
+        _, cls, slot, expires, _ = fields[oldest * 5:oldest * 5 + 5]
+        self.remove(part, (set_no, oldest, cls - 1, slot, expires))
+        self.count(part, "evictions")
+        return oldest
+
+    def _allocate(self, part: _Partition, cls: int) -> Tuple[int, int]:
+        """
+        (class, slot) for a value of class cls: a never-used slot of it or
+        a larger class, else one chosen by its CLOCK hand (owner evicted).
+        """
+        for larger in range(cls, len(part.classes)):
+            used = _HAND.unpack_from(self.mm, part.used_at(larger))[0]
+            if used < part.classes[larger][1]:
+                _HAND.pack_into(self.mm, part.used_at(larger), used + 1)
+                return larger, used
+
+        slot_size, n, offset = part.classes[cls]
+        hand_at = part.hand_at(cls)
+        hand = _HAND.unpack_from(self.mm, hand_at)[0] % n
+        for _ in range(CLOCK_SCAN):
+            owner_set, owner_way, referenced, in_use, key_len, value_len = _SLOT.unpack_from(
+                self.mm, offset + hand * slot_size
+            )
+            if not in_use or not referenced:
+                break
+            # Second chance
+            _SLOT.pack_into(self.mm, offset + hand * slot_size, owner_set, owner_way, 0, in_use, key_len, value_len)
+            hand = (hand + 1) % n
+        slot = hand
+        _HAND.pack_into(self.mm, hand_at, (hand + 1) % n)
+
+        owner_set, owner_way, _, in_use, _, _ = _SLOT.unpack_from(self.mm, offset + slot * slot_size)
+        if in_use:
+            _, entry_cls, entry_slot, _, _ = _ENTRY.unpack_from(self.mm, self._entry_at(part, owner_set, owner_way))
+            if entry_cls == cls + 1 and entry_slot == slot:
+                self._clear_entry(part, owner_set, owner_way)
+            self._release_slot(part, cls, slot)
+            self.count(part, "evictions")
+        return cls, slot
+
+    def clear(self):
+        for part in self.partitions.values():
+            self.mm[part.set_base:part.set_base + part.sets * _SET.size] = bytes(part.sets * _SET.size)
+            for slot_size, n, offset in part.classes:
+                for slot in range(n):
+                    at = offset + slot * slot_size
+                    self.mm[at:at + _SLOT.size] = bytes(_SLOT.size)
+            for name in ("entries", "bytes"):
+                _COUNTER.pack_into(self.mm, part.counter_at(name), 0)
+            for cls in range(len(part.classes)):
+                _HAND.pack_into(self.mm, part.used_at(cls), 0)
+
+    def stats(self) -> Dict:
+        namespaces = {}
+        for name, part in self.partitions.items():
+            counters = {c: _COUNTER.unpack_from(self.mm, part.counter_at(c))[0] for c in _COUNTERS}
+            namespaces[name] = dict(
+                counters,
+                budget_bytes=part.size,
+                occupancy=round(counters["bytes"] / part.size, 3),
+                index_capacity=part.sets * WAYS,
+                classes={slot_size: n for slot_size, n, _ in part.classes},
+            )
+        totals = {
+            c: sum(ns[c] for ns in namespaces.values())
+            for c in ("hits", "misses", "sets", "evictions", "too_large", "entries", "bytes", "budget_bytes")
+        }
+        return dict(totals, path=self.path, size_bytes=len(self.mm), namespaces=namespaces)
+
+
+_stores: Dict[str, _Store] = {}
+_stores_lock = threading.Lock()
+_unavailable: Dict[str, str] = {}  # path -> why it could not be opened (per process)
+
+
+def _default_location() -> str:
+    shm = "/dev/shm"
+    return os.path.join(shm if os.path.isdir(shm) else tempfile.gettempdir(), "villen-music-cache")
+
+
+def _options(location, params) -> Tuple[str, Dict[str, int], Dict[str, tuple]]:
+    """(path, budgets, classes) of a CACHES entry."""
+    options = params.get("OPTIONS", {})
+    # Without BUDGETS the whole store is one partition of SIZE_MB
+    budgets = budgets_from_options(options, int(options.get("SIZE_MB", 128)) * 1024 * 1024)
+    classes = {name: tuple(tuple(c) for c in classes) for name, classes in options.get("CLASSES", {}).items()}
+    return location or _default_location(), budgets, classes
+
+
+def _open_store(path: str, budgets: Dict[str, int], classes: Dict[str, tuple]) -> _Store:
+    # Shared by every thread of this process; re-opened after a fork
+    store = _stores.get(path)
+    if store is None or store.pid != os.getpid():
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None or store.pid != os.getpid():
+                store = _stores[path] = _Store(path, budgets, classes)
+    return store
+
+
+class SharedMemoryCache(BaseCache):
+    def __new__(cls, location, params):
+        # The store is opened (and its memory reserved) before the backend is used
+        path, budgets, classes = _options(location, params)
+        if path not in _unavailable:
+            try:
+                _open_store(path, budgets, classes)
+            except OSError as e:
+                _unavailable[path] = str(e)
+                logger.warning(f"Shared-memory cache unavailable, using a per-process cache instead: {e}")
+        if path in _unavailable:
+            return BudgetedLocMemCache(path, params)
+        return super().__new__(cls)
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path, self.budgets, self.classes = _options(location, params)
+
+    def _store(self) -> _Store:
+        return _open_store(self.path, self.budgets, self.classes)
+
+    def _encode(self, store: _Store, key, version) -> Tuple[_Partition, bytes, int]:
+        part = store.partitions[budget_namespace(key, store.partitions)]
+        key = self.make_and_validate_key(key, version=version).encode()
+        return part, key, int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+    def _expires(self, timeout) -> float:
+        expires = self.get_backend_timeout(timeout)
+        return 0.0 if expires is None else expires
+
+    def _live(self, store: _Store, part: _Partition, key: bytes, fp: int) -> Optional[tuple]:
+        # Caller holds the lock; expired entries are dropped on sight
+        found = store.find(part, key, fp)
+        if found is not None and found[4] and found[4] <= time.time():
+            store.remove(part, found)
+            return None
+        return found
+
+    def get(self, key, default=None, version=None):
+        store = self._store()
+        part, key, fp = self._encode(store, key, version)
+        with store:
+            found = self._live(store, part, key, fp)
+            store.count(part, "hits" if found else "misses")
+            if found is None:
+                return default
+            value = store.read(part, found)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        store = self._store()
+        part, key, fp = self._encode(store, key, version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self._expires(timeout)
+        with store:
+            store.store(part, key, fp, value, expires, store.find(part, key, fp))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        store = self._store()
+        part, key, fp = self._encode(store, key, version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self._expires(timeout)
+        with store:
+            if self._live(store, part, key, fp) is not None:
+                return False
+            return store.store(part, key, fp, value, expires, None)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        store = self._store()
+        part, key, fp = self._encode(store, key, version)
+        with store:
+            found = self._live(store, part, key, fp)
+            if found is None:
+                return False
+            store.set_expires(part, found, self._expires(timeout))
+            return True
+
+    def delete(self, key, version=None):
+        store = self._store()
+        part, key, fp = self._encode(store, key, version)
+        with store:
+            found = self._live(store, part, key, fp)
+            if found is None:
+                return False
+            store.remove(part, found)
+            return True
+
+    def has_key(self, key, version=None):
+        store = self._store()
+        part, key, fp = self._encode(store, key, version)
+        with store:
+            return self._live(store, part, key, fp) is not None
+
+    def incr(self, key, delta=1, version=None):
+        store = self._store()
+        part, key, fp = self._encode(store, key, version)
+        with store:
+            found = self._live(store, part, key, fp)
+            if found is None:
+                raise ValueError("Key '%s' not found" % key.decode())
+            value = pickle.loads(store.read(part, found)) + delta
+            store.store(part, key, fp, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), found[4], found)
+        return value
+
+    def clear(self):
+        with self._store() as store:
+            store.clear()
+
+    def stats(self) -> Dict:
+        with self._store() as store:
+            return store.stats()
@@ -0,0 +1,179 @@
+import os
+import shutil
+import errno
+import tempfile
+import multiprocessing
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.budget_cache import BudgetedLocMemCache, budget_namespace
+from core.shm_cache import SharedMemoryCache
+
+KB = 1024
+
+
+def shm_cache(path, budgets=None, classes=None):
+    options = {"BUDGETS": budgets or {"default": 256 * KB}}
+    if classes:
+        options["CLASSES"] = classes
+    return SharedMemoryCache(path, {"OPTIONS": options})
+
+
+def _incr_many(path, budgets, n):
+    cache = shm_cache(path, budgets)
+    for _ in range(n):
+        cache.incr("counter")
+
+
+def _add_once(path, budgets, worker, won):
+    if shm_cache(path, budgets).add("leader", worker, timeout=None):
+        won.put(worker)
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "cache")
+        self.cache = shm_cache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_workers(self, target, args_for, n=4):
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=target, args=args_for(i)) for i in range(n)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+
+    def test_get_set_add_delete(self):
+        self.assertIsNone(self.cache.get("song:1"))
+        self.cache.set("song:1", {"title": "Kesariya"})
+        self.assertEqual(self.cache.get("song:1"), {"title": "Kesariya"})
+        self.assertFalse(self.cache.add("song:1", "other"))
+        self.assertTrue(self.cache.add("song:2", "new"))
+        self.assertTrue(self.cache.delete("song:1"))
+        self.assertIsNone(self.cache.get("song:1"))
+        self.assertEqual(self.cache.get_many(["song:1", "song:2"]), {"song:2": "new"})
+
+    def test_incr(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr("counter")
+        self.cache.set("counter", 5, timeout=None)
+        self.assertEqual(self.cache.incr("counter"), 6)
+        self.assertEqual(self.cache.incr("counter", 10), 16)
+
+    def test_expired_entries_are_gone(self):
+        self.cache.set("song:1", "x", timeout=-1)
+        self.assertIsNone(self.cache.get("song:1"))
+        self.assertTrue(self.cache.add("song:1", "y"))
+
+    def test_values_are_shared_across_processes(self):
+        self.run_workers(lambda: shm_cache(self.path).set("from_child", os.getpid()), lambda i: (), n=1)
+        self.assertIsInstance(self.cache.get("from_child"), int)
+        self.assertNotEqual(self.cache.get("from_child"), os.getpid())
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set("counter", 0, timeout=None)
+        self.run_workers(_incr_many, lambda i: (self.path, None, 200))
+        self.assertEqual(self.cache.get("counter"), 800)
+
+    def test_add_elects_one_process(self):
+        won = multiprocessing.get_context("fork").Queue()
+        self.run_workers(_add_once, lambda i: (self.path, None, i, won), n=8)
+        winners = [won.get(timeout=5)]
+        self.assertTrue(won.empty())
+        self.assertEqual(self.cache.get("leader"), winners[0])
+
+    def test_eviction_stays_within_budget(self):
+        cache = shm_cache(self.path + "-small", {"default": 64 * KB}, {"default": [(256, 1.0)]})
+        for i in range(1000):
+            cache.set(f"k{i}", i)
+        stats = cache.stats()
+        self.assertGreater(stats["evictions"], 0)
+        self.assertLessEqual(stats["bytes"], 64 * KB)
+        self.assertEqual(cache.get("k999"), 999)
+        self.assertIsNone(cache.get("k0"))
+
+    def test_values_larger_than_every_class_are_not_cached(self):
+        cache = shm_cache(self.path + "-small", {"default": 64 * KB}, {"default": [(256, 1.0)]})
+        cache.set("big", b"x" * 1024)
+        self.assertIsNone(cache.get("big"))
+        self.assertEqual(cache.stats()["too_large"], 1)
+
+    def test_namespaces_only_evict_their_own_entries(self):
+        cache = shm_cache(self.path + "-parts", {"song": 64 * KB, "default": 64 * KB},
+                          {"song": [(256, 1.0)], "default": [(256, 1.0)]})
+        cache.set("search:kept", "yes")
+        for i in range(1000):
+            cache.set(f"song:{i}", i)
+        self.assertEqual(cache.get("search:kept"), "yes")
+        namespaces = cache.stats()["namespaces"]
+        self.assertGreater(namespaces["song"]["evictions"], 0)
+        self.assertEqual(namespaces["default"]["evictions"], 0)
+
+    def test_store_memory_is_reserved_up_front(self):
+        self.cache.set("song:1", "x")
+        self.assertGreaterEqual(os.stat(self.path).st_blocks * 512, os.stat(self.path).st_size)
+
+    def test_falls_back_to_a_per_process_cache_without_the_space(self):
+        path = self.path + "-full"
+        no_space = OSError(errno.ENOSPC, "No space left on device")
+        with mock.patch("os.posix_fallocate", side_effect=no_space), \
+                self.assertLogs("core.shm_cache", "WARNING"):
+            cache = shm_cache(path)
+        self.assertIsInstance(cache, BudgetedLocMemCache)
+        self.assertEqual(os.stat(path).st_size, 0)
+        cache.set("song:1", "x")
+        self.assertEqual(cache.get("song:1"), "x")
+        self.assertIsInstance(shm_cache(path), BudgetedLocMemCache)  # not retried in this process
+
+
+class BudgetedLocMemCacheTests(SimpleTestCase):
+    def budgeted(self, budgets):
+        return BudgetedLocMemCache(f"budget-{self.id()}", {"OPTIONS": {"BUDGETS": budgets}})
+
+    def test_keys_are_charged_to_their_namespace(self):
+        names = {"song", "pages", "default"}
+        self.assertEqual(budget_namespace("song:12:abc", names), "song")
+        self.assertEqual(budget_namespace("views.decorators.cache.cache_page.x", names), "pages")
+        self.assertEqual(budget_namespace("trending:3:hindi", names), "default")
+        self.assertEqual(budget_namespace("throttle_user_1", names), "default")
+
+    def test_bulk_writes_only_evict_their_own_namespace(self):
+        cache = self.budgeted({"song": 4 * KB, "default": 4 * KB})
+        cache.set("trending:1:hindi", "kept")
+        for i in range(200):
+            cache.set(f"song:1:{i}", "x" * 100)
+        self.assertEqual(cache.get("trending:1:hindi"), "kept")
+        stats = cache.stats()["namespaces"]
+        self.assertLessEqual(stats["song"]["bytes"], 4 * KB)
+        self.assertGreater(stats["song"]["evictions"], 0)
+        self.assertEqual(stats["default"]["evictions"], 0)
+
+    def test_least_recently_used_goes_first(self):
+        cache = self.budgeted({"song": 600})
+        for key in ("song:a", "song:b", "song:c"):
+            cache.set(key, "x" * 150)
+        cache.get("song:a")
+        cache.set("song:d", "x" * 150)
+        self.assertIsNotNone(cache.get("song:a"))
+        self.assertIsNone(cache.get("song:b"))
+
+    def test_values_over_budget_are_not_cached(self):
+        cache = self.budgeted({"song": 100})
+        cache.set("song:big", "x" * 200)
+        self.assertIsNone(cache.get("song:big"))
+        self.assertEqual(cache.stats()["namespaces"]["song"]["too_large"], 1)
+
+    def test_timeouts_add_and_incr(self):
+        cache = self.budgeted({})
+        cache.set("a", 1, timeout=-1)
+        self.assertIsNone(cache.get("a"))
+        self.assertTrue(cache.add("a", 1))
+        self.assertFalse(cache.add("a", 2))
+        self.assertEqual(cache.incr("a", 5), 6)
+
@@ -1,5 +1,34 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def serving() -> bool:
+    """
+    True in a process that serves requests: a gunicorn/uvicorn worker or
+    runserver's serving process. Management commands, migrations and
+    shells start no background threads.
+    """
+    if "gunicorn" in sys.modules or "uvicorn" in sys.modules:
+        return True
+    if sys.argv[1:2] == ["runserver"]:
+        # The autoreloader's parent process only watches files
+        return os.environ.get("RUN_MAIN") == "true" or "--noreload" in sys.argv
+    return False
+
+
 class MusicConfig(AppConfig):
     name = 'music'
+
+    def ready(self):
+        if not serving():
+            return
+        # Refill an empty LocMemCache from the last hot-key snapshot before
+        # this worker serves requests (no-op unless JIOSAAVN_SNAPSHOT is on)
+        from .services.snapshot import hot_key_snapshot
+        hot_key_snapshot().load()
+
+        # Cache warmer and snapshot threads (see views.start_background_tasks)
+        from .views import start_background_tasks
+        start_background_tasks()
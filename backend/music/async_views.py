@@ -0,0 +1,325 @@
+# backend/music/async_views.py
+"""
+Async counterparts of the upstream-bound function views in views.py.
+
+Served through core/asgi.py, a single worker process keeps hundreds of
+JioSaavn requests in flight instead of blocking on each cache miss.
+Enabled with ASYNC_UPSTREAM_VIEWS=True (see music/urls.py).
+"""
+
+import time
+import asyncio
+import logging
+
+import aiohttp
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .services.async_jiosaavn_service import AsyncJioSaavnService
+from .services.stream_proxy import server_timing, stream_kind
+from .views import (
+    MAX_BATCH_SONGS, MAX_SEARCH_OFFSET, MAX_SEARCH_SECTION, MAX_SUGGESTIONS,
+    add_cache_headers, audio_cache, cached_audio, cached_audio_headers, delivery, forward_stream_headers,
+    responses, search_offset, shared_downloads, stream_proxy,
+)
+from .views import service as sync_service
+
+logger = logging.getLogger(__name__)
+
+# Async face of views.service: same caches, filters and metrics (one aiohttp pool per event loop)
+service = AsyncJioSaavnService(shared=sync_service)
+
+
+async def pre_encoded_response(request, key, load, cache_control, not_found=None):
+    """JSON response encoded once per cached value (see views.pre_encoded_response)."""
+    if not responses.enabled or key is None:
+        data = await load()
+        if data is None:
+            return JsonResponse({"error": not_found}, status=404)
+        return add_cache_headers(JsonResponse(data), cache_control)
+
+    version = await service.entry_version(key)
+    if version is not None and time.time() < version:
+        body = responses.get(key, version)
+        if body is not None:
+            service.count_hit(key)
+            return add_cache_headers(responses.response(request, body), cache_control)
+
+    data = await load()
+    if data is None:
+        return JsonResponse({"error": not_found}, status=404)
+    latest = await service.entry_version(key)
+    if latest is None or (version is not None and latest != version):
+        return add_cache_headers(JsonResponse(data), cache_control)
+    body = responses.get(key, latest) or responses.put(key, latest, data)
+    return add_cache_headers(responses.response(request, body), cache_control)
+
+
+@require_GET
+async def search_songs(request):
+    """Search for songs by query."""
+    query = request.GET.get("q", "").strip()
+    limit = min(int(request.GET.get("limit", 20)), 50)
+    offset = search_offset(request, limit)
+    if offset is None:
+        return JsonResponse({"error": "page and offset must be integers"}, status=400)
+
+    if not query:
+        return JsonResponse({"results": []})
+
+    if offset == 0:
+        service.record_query(query)  # later pages are the same search
+    results = await service.search(query, limit=limit, offset=offset)
+    response = JsonResponse({
+        "results": results,
+        "count": len(results),
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if len(results) == limit and offset + limit <= MAX_SEARCH_OFFSET else None,
+    })
+    return add_cache_headers(response, 'max-age=1800, public')
+
+
+@require_GET
+async def search_all(request):
+    """Songs, artists and albums for ?q= in one response (sections fetched concurrently)."""
+    query = request.GET.get("q", "").strip()
+    limit = min(int(request.GET.get("limit", 20)), 50)
+    artists_limit = min(int(request.GET.get("artists_limit", 6)), MAX_SEARCH_SECTION)
+    albums_limit = min(int(request.GET.get("albums_limit", 6)), MAX_SEARCH_SECTION)
+
+    if not query:
+        return JsonResponse({"query": query, "songs": [], "artists": [], "albums": []})
+
+    service.record_query(query)
+    sections = await service.search_all(query, limit=limit, artists_limit=artists_limit, albums_limit=albums_limit)
+    response = JsonResponse({"query": query, **sections})
+    return add_cache_headers(response, 'max-age=1800, public')
+
+
+@require_GET
+async def search_suggest(request):
+    """Search-as-you-type completions for ?q=, served from memory."""
+    prefix = request.GET.get("q", "").strip()
+    limit = min(int(request.GET.get("limit", 10)), MAX_SUGGESTIONS)
+
+    results = await service.suggest(prefix, limit=limit)
+    response = JsonResponse({
+        "results": results,
+        "count": len(results),
+    })
+    return add_cache_headers(response, 'max-age=300, public')
+
+
+@require_GET
+async def stream_song(request, song_id):
+    """
+    Stream audio by proxying from upstream CDN (see views.stream_song).
+
+    Bytes are relayed as they arrive, so a listener holds two sockets and
+    a coroutine for the length of a song instead of a worker. CDN
+    connections come from the per-loop pool of views.stream_proxy; audio
+    cache hits are read from disk in chunks (ASGI has no sendfile), and
+    concurrent listeners of a song share one CDN download.
+    """
+    started = time.perf_counter()
+    preferred_quality = request.GET.get("quality", "320")
+
+    if not service._validate_id(song_id):
+        return JsonResponse({"error": "Invalid song ID"}, status=400)
+
+    mode, client, network = delivery.choose(request)
+    if mode != "proxy":
+        source = await service.get_stream_source(song_id, preferred_quality)
+        if not source:
+            logger.warning(f"Stream not available for song: {song_id}")
+            return JsonResponse({"error": "Stream not available for this song"}, status=404)
+        return delivery.respond(request, song_id, source, mode, client, network)
+    delivery.record("proxy", client, network)
+
+    # Bytes already in the audio cache skip the song lookup and the CDN
+    byte_range = request.META.get("HTTP_RANGE")
+    kind = stream_kind(byte_range)
+    entry, span = cached_audio(song_id, preferred_quality, byte_range)
+    if entry is not None and entry.covers(*span):
+        audio_cache.record("hits")
+        response = StreamingHttpResponse(
+            stream_proxy.astitch(entry, *span, song_id, kind, started),
+            content_type=entry.headers.get("Content-Type", "audio/mpeg"),
+            status=206 if byte_range else 200,
+        )
+        response["Server-Timing"] = server_timing(started)
+        return cached_audio_headers(response, entry, span, byte_range)
+
+    # Downloads shared on this event loop (see views.stream_song)
+    loop = asyncio.get_running_loop()
+    download, shared_span = shared_downloads.join(song_id, preferred_quality, byte_range, loop)
+    if download is not None and shared_span is None:
+        shared_span = await download.await_opened(byte_range, stream_proxy.connect_timeout + stream_proxy.read_timeout)
+    if shared_span is not None:
+        if entry is not None:
+            entry.close()
+        response = StreamingHttpResponse(
+            stream_proxy.afollow(download, *shared_span, song_id, kind, started),
+            content_type=download.headers.get("Content-Type", "audio/mpeg"),
+            status=206 if byte_range else 200,
+        )
+        response["Server-Timing"] = server_timing(started, source="shared")
+        return cached_audio_headers(response, download, shared_span, byte_range)
+
+    download = shared_downloads.claim(song_id, preferred_quality, byte_range, loop) if entry is None else None
+    try:
+        stream_url = delivery.fallback_source(request, song_id) or await service.get_stream(song_id, preferred_quality)
+    except asyncio.CancelledError:  # the listener hung up; waiting listeners open their own
+        if download is not None:
+            download.cancel()
+        raise
+    if not stream_url:
+        if entry is not None:
+            entry.close()
+        if download is not None:
+            download.cancel()
+        logger.warning(f"Stream not available for song: {song_id}")
+        return JsonResponse(
+            {"error": "Stream not available for this song"},
+            status=404
+        )
+
+    if entry is not None:
+        audio_cache.record("partial_hits")
+        writer = audio_cache.writer(song_id, preferred_quality, entry.size, entry.headers)
+        response = StreamingHttpResponse(
+            stream_proxy.astitch(entry, *span, song_id, kind, started, stream_url, writer),
+            content_type=entry.headers.get("Content-Type", "audio/mpeg"),
+            status=206 if byte_range else 200,
+        )
+        response["Server-Timing"] = server_timing(started)
+        return cached_audio_headers(response, entry, span, byte_range)
+
+    audio_cache.record("misses")
+    upstream = None
+    try:
+        # Forward Range header for seeking support
+        sent = time.perf_counter()
+        upstream = await stream_proxy.aopen(stream_url, byte_range)
+        upstream.raise_for_status()
+    except asyncio.CancelledError:
+        if download is not None:
+            download.cancel()
+        raise
+    except asyncio.TimeoutError:
+        if download is not None:
+            download.cancel()
+        logger.error(f"Stream proxy timeout for {song_id}")
+        return JsonResponse({"error": "Stream server timeout"}, status=504)
+    except aiohttp.ClientError as e:
+        if upstream is not None:
+            upstream.release()
+        if download is not None:
+            download.cancel()
+        logger.error(f"Stream proxy error for {song_id}: {e}")
+        return JsonResponse({"error": "Failed to proxy stream"}, status=502)
+
+    writer = audio_cache.writer_for_response(song_id, preferred_quality, upstream.status, upstream.headers)
+    if download is not None and download.opened(upstream.status, upstream.headers):
+        stream_proxy.apump(download, upstream, song_id, kind, sent, writer)
+        body = stream_proxy.afollow(download, download.first, download.last, song_id, kind, started)
+    else:
+        body = stream_proxy.arelay(upstream, song_id, kind, started, sent, writer)
+    response = StreamingHttpResponse(
+        body,
+        content_type=upstream.headers.get("Content-Type", "audio/mpeg"),
+        status=upstream.status,
+    )
+    response["Server-Timing"] = server_timing(started, sent)
+    return forward_stream_headers(response, upstream.headers)
+
+
+@require_GET
+async def song_details(request, song_id):
+    """Get full song metadata."""
+    async def load():
+        return await service.get_song_details(song_id) or None
+
+    return await pre_encoded_response(
+        request, service.endpoint_key("song", song_id), load, 'max-age=86400, public', not_found="Song not found",
+    )
+
+
+@require_GET
+async def songs_batch(request):
+    """Get metadata for many songs in one call: ?ids=id1,id2,..."""
+    ids = [i.strip() for i in request.GET.get("ids", "").split(",") if i.strip()]
+    if not ids:
+        return JsonResponse({"error": "ids parameter is required"}, status=400)
+    if len(ids) > MAX_BATCH_SONGS:
+        return JsonResponse({"error": f"At most {MAX_BATCH_SONGS} ids per request"}, status=400)
+
+    songs = await service.get_songs(ids)
+    response = JsonResponse({
+        "results": songs,
+        "count": sum(1 for song in songs if song),
+    })
+    return add_cache_headers(response, 'max-age=86400, public')
+
+
+@require_GET
+async def song_lyrics(request, song_id):
+    """Get lyrics for a song."""
+    lyrics = await service.get_lyrics(song_id)
+
+    if not lyrics:
+        return JsonResponse({"error": "Lyrics not available"}, status=404)
+
+    return JsonResponse(lyrics)
+
+
+@require_GET
+async def song_related(request, song_id):
+    """Get related songs/recommendations."""
+    limit = min(int(request.GET.get("limit", 10)), 30)
+    related = await service.get_related(song_id, limit=limit)
+
+    return JsonResponse({
+        "results": related,
+        "count": len(related),
+    })
+
+
+@require_GET
+async def album_details(request, album_id):
+    """Get album details with track list."""
+    async def load():
+        return await service.get_album(album_id) or None
+
+    return await pre_encoded_response(
+        request, service.endpoint_key("album", album_id), load, 'max-age=86400, public', not_found="Album not found",
+    )
+
+
+@require_GET
+async def artist_details(request, artist_id):
+    """Get artist details with top songs."""
+    async def load():
+        return await service.get_artist(artist_id) or None
+
+    return await pre_encoded_response(
+        request, service.endpoint_key("artist", artist_id), load, 'max-age=86400, public',
+        not_found="Artist not found",
+    )
+
+
+@require_GET
+async def trending_songs(request):
+    """Get trending/popular songs."""
+    language = request.GET.get("language", "hindi")
+
+    async def load():
+        trending = await service.get_trending(language=language)
+        return {
+            "results": trending,
+            "count": len(trending),
+            "language": language,
+        }
+
+    return await pre_encoded_response(request, service.endpoint_key("trending", language), load, 'max-age=3600, public')
@@ -0,0 +1,52 @@
+"""
+Refresh hot cache keys ahead of expiry.
+
+    python manage.py warm_cache                      # what the scheduler does
+    python manage.py warm_cache --force              # reload everything now
+    python manage.py warm_cache --only trending --language tamil
+"""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from music.services.jiosaavn_service import JioSaavnService
+from music.services.warmer import CacheWarmer
+
+
+class Command(BaseCommand):
+    help = "Warm trending, charts, suggested artists and discover playlists in the cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--language", action="append", dest="languages",
+                            help="Trending language to warm (repeatable; default: settings)")
+        parser.add_argument("--only", action="append",
+                            help="Warm targets whose name starts with this (repeatable), e.g. trending, mood")
+        parser.add_argument("--concurrency", type=int, help="Targets warmed at once")
+        parser.add_argument("--horizon", type=float,
+                            help="Reload entries expiring within this many seconds")
+        parser.add_argument("--force", action="store_true", help="Reload every target, however fresh")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        warmer = CacheWarmer.from_settings(JioSaavnService())
+        if options["languages"]:
+            warmer.languages = options["languages"]
+        if options["concurrency"]:
+            warmer.concurrency = options["concurrency"]
+        # Every fresh entry expires within the longest soft TTL
+        longest = max([warmer.service.CACHE_TTL] + [soft for soft, _ in warmer.service.ttls.values()])
+        horizon = longest if options["force"] else options["horizon"]
+
+        report = warmer.warm(only=options["only"], horizon=horizon)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2, default=str))
+            return
+        for target in report["targets"]:
+            line = f"{target['name']:<32} {target['status']:<6} {target['items']:>4} items {target['seconds']:>7.2f}s"
+            self.stdout.write(self.style.SUCCESS(line) if target["status"] == "ok" else self.style.WARNING(line))
+        self.stdout.write(
+            f"{report['warmed']}/{len(report['targets'])} targets warmed in {report['seconds']:.2f}s "
+            f"(concurrency {report['concurrency']})"
+        )
@@ -0,0 +1,113 @@
+from django.db import migrations, models
+
+# The full-text index is backend specific, so it is created here in SQL and
+# kept out of the model: FTS5 (external content + triggers) on SQLite, a
+# generated tsvector column with a GIN index on Postgres. Other backends get
+# no index and the catalog falls back to LIKE queries.
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE music_catalogsong_fts USING fts5(
+        title, artist, album,
+        content='music_catalogsong', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER music_catalogsong_fts_ai AFTER INSERT ON music_catalogsong BEGIN
+        INSERT INTO music_catalogsong_fts(rowid, title, artist, album)
+        VALUES (new.id, new.title, new.artist, new.album);
+    END
+    """,
+    """
+    CREATE TRIGGER music_catalogsong_fts_ad AFTER DELETE ON music_catalogsong BEGIN
+        INSERT INTO music_catalogsong_fts(music_catalogsong_fts, rowid, title, artist, album)
+        VALUES ('delete', old.id, old.title, old.artist, old.album);
+    END
+    """,
+    """
+    CREATE TRIGGER music_catalogsong_fts_au AFTER UPDATE ON music_catalogsong BEGIN
+        INSERT INTO music_catalogsong_fts(music_catalogsong_fts, rowid, title, artist, album)
+        VALUES ('delete', old.id, old.title, old.artist, old.album);
+        INSERT INTO music_catalogsong_fts(rowid, title, artist, album)
+        VALUES (new.id, new.title, new.artist, new.album);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS music_catalogsong_fts_au",
+    "DROP TRIGGER IF EXISTS music_catalogsong_fts_ad",
+    "DROP TRIGGER IF EXISTS music_catalogsong_fts_ai",
+    "DROP TABLE IF EXISTS music_catalogsong_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE music_catalogsong ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('simple', title || ' ' || artist || ' ' || album)
+    ) STORED
+    """,
+    """
+    CREATE INDEX music_catalogsong_search_idx
+    ON music_catalogsong USING GIN (search_vector)
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS music_catalogsong_search_idx",
+    "ALTER TABLE music_catalogsong DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music", "0003_syncedlyrics_playbackhistory_artist_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogSong",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("song_id", models.CharField(max_length=100, unique=True)),
+                ("title", models.CharField(max_length=255)),
+                (
+                    "artist",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                (
+                    "album",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                (
+                    "language",
+                    models.CharField(blank=True, default="", max_length=50),
+                ),
+                ("data", models.JSONField(default=dict)),
+                ("refreshed_at", models.DateTimeField(db_index=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            _run({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
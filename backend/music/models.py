@@ -263,3 +263,28 @@ class MonthlyStats(models.Model):
         return f"{self.user.username} - {self.year}/{self.month}"
 
 
+
+
+# =============================================================================
+# SONG CATALOG - Local Full-Text Search
+# =============================================================================
+
+class CatalogSong(models.Model):
+    """
+    Every song seen in an upstream response, searchable without the API.
+
+    The full-text index lives outside the ORM (migration 0004): an FTS5
+    table kept in sync by triggers on SQLite, a generated tsvector column
+    with a GIN index on Postgres.
+    """
+    song_id = models.CharField(max_length=100, unique=True)
+    title = models.CharField(max_length=255)
+    artist = models.CharField(max_length=255, blank=True, default='')
+    album = models.CharField(max_length=255, blank=True, default='')
+    language = models.CharField(max_length=50, blank=True, default='')
+    data = models.JSONField(default=dict)  # Search result shape, returned as is
+    refreshed_at = models.DateTimeField(db_index=True)  # Last seen upstream
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.title} - {self.artist}"
@@ -0,0 +1,629 @@
+"""
+Async JioSaavn Music Service
+- Same public API as JioSaavnService; every method that may do I/O is a coroutine
+- Non-blocking upstream calls with aiohttp
+- One ClientSession per event loop (keep-alive pool shared by all requests)
+- Retries transient 5xx/connection failures with exponential backoff
+- Single-flight coalescing of concurrent misses (asyncio futures)
+- Reuses the sync service's normalization helpers, cache keys and
+  stale-while-revalidate envelopes (refreshes run as asyncio tasks)
+- Catalog searches run in a thread (sync_to_async); catalog writes stay
+  on the sync service's background thread
+- Every cache round trip is awaited (cache.aget & co.); the periodic
+  syncs shared with the sync service (namespace generations, L1 epoch,
+  metrics and query-log snapshots) run as tasks (housekeeping.py)
+- Cache warming runs on the sync service (refresh_ahead is per thread);
+  both read the same shared cache
+- Wraps a sync service (shared=, else its own) rather than subclassing
+  it: attributes it does not define (per-process state such as L1, the
+  negative filter, namespaces, single-flight, breakers, catalog and
+  metrics, constants and sync helpers) are that service's, and its
+  methods run with the sync service as self, so sync code never reaches
+  one of the coroutines here. Invalidation and stats through either
+  service cover both, and the worker publishes one metrics snapshot
+"""
+
+import time
+import asyncio
+import logging
+import weakref
+from functools import partial
+from typing import Awaitable, Callable, Optional, Dict, List, Any
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from . import song_record
+from .jiosaavn_service import JioSaavnService, NOT_FOUND
+from .local_cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncJioSaavnService:
+    # Mirrors Retry(total=3, backoff_factor=0.5) on the sync session
+    MAX_RETRIES = 3
+    BACKOFF_FACTOR = 0.5
+    RETRY_STATUSES = {500, 502, 503, 504}
+
+    # Upper bound on in-flight upstream requests per process
+    MAX_CONNECTIONS = 500
+
+    def __init__(self, shared: Optional[JioSaavnService] = None):
+        self.sync = shared if shared is not None else JioSaavnService()
+        # ClientSession is bound to the loop it was created on
+        self._clients = weakref.WeakKeyDictionary()
+        # Strong references keep background refresh tasks alive
+        self._refresh_tasks = set()
+
+    def __getattr__(self, name: str):
+        # Only for names not defined here: the sync service's (see module docstring)
+        if name == "sync":
+            raise AttributeError(name)
+        return getattr(self.sync, name)
+
+    # --------------------
+    # HTTP CLIENT
+    # --------------------
+    def _get_client(self) -> aiohttp.ClientSession:
+        """Return the ClientSession for the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.closed:
+            client = aiohttp.ClientSession(
+                headers=dict(self.session.headers),
+                timeout=aiohttp.ClientTimeout(total=self.TIMEOUT),
+                connector=aiohttp.TCPConnector(limit=self.MAX_CONNECTIONS),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """Close the session bound to the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    # --------------------
+    # VALIDATION & CACHING
+    # --------------------
+    async def _get_entry(self, key: str) -> Optional[tuple]:
+        """Get (value, fresh_until) from L1, falling back to the shared cache."""
+        entry = self.local_cache.get(key)
+        if entry is not MISSING:
+            return entry
+
+        entry = self._unpack(await cache.aget(key))
+        self.local_cache.record_l2(key, hit=entry is not None)
+        if entry is not None:
+            self.local_cache.set(key, entry)
+        return entry
+
+    async def entry_version(self, key: str) -> Optional[float]:
+        """Soft expiry of the value cached under key (see JioSaavnService)."""
+        entry = await self._get_entry(key)
+        return entry[1] if entry and entry[0] is not None else None
+
+    async def _get_cached(self, key: str) -> Optional[Any]:
+        """Get data from cache, fresh or stale."""
+        entry = await self._get_entry(key)
+        return entry[0] if entry else None
+
+    async def _set_cache(self, key: str, data: Any):
+        """Cache data: fresh for its soft TTL, kept stale until its hard TTL."""
+        entry = self._pack(key, data)
+        await cache.aset(key, entry, timeout=self._ttl(key)[1])
+        self.local_cache.set(key, entry, size=self._count_writes({key: entry})[key])
+
+    async def _cached_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """Stale-while-revalidate read-through cache (see JioSaavnService)."""
+        if key in self.missing_keys:
+            self.negative_stats["filter_rejects"] += 1
+            self.metrics.cache_event(key, "negative")
+            return None
+
+        entry = await self._get_entry(key)
+        if entry:
+            value, fresh_until = entry
+            if value is None:
+                self.negative_stats["negative_hits"] += 1
+                self.metrics.cache_event(key, "negative")
+                self.missing_keys.add(key)
+                return None
+            if time.time() >= fresh_until:
+                self._cache_hit(key, "stale")
+                await self._refresh_in_background(key, loader)
+            else:
+                self._cache_hit(key, "hits")
+            return value
+
+        self.metrics.cache_event(key, "misses")
+        return await self.flight.ado(
+            key,
+            lambda: self._load_and_cache(key, loader),
+            probe=lambda: self._get_cached(key),
+        )
+
+    async def _load_and_cache(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """Await loader() and cache a non-empty result (or a negative entry)."""
+        value = await loader()
+        if value is NOT_FOUND:
+            await self._set_negative(key)
+            return None
+        if value:
+            await self._set_cache(key, value)
+        return value
+
+    async def _set_negative(self, key: str):
+        """Remember a known-missing item for NEGATIVE_TTL."""
+        entry = (None, time.time() + self.NEGATIVE_TTL)
+        await cache.aset(key, entry, timeout=self.NEGATIVE_TTL)
+        self._count_writes({key: entry})
+        self.local_cache.delete(key)
+        self.missing_keys.add(key)
+        self.negative_stats["negative_stored"] += 1
+
+    async def _refresh_in_background(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        """Schedule one refresh of a stale key (per process and per window)."""
+        # _refreshing is the sync service's, shared with its refresh threads
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        if not await cache.aadd(f"refresh:{key}", 1, timeout=self.REFRESH_LOCK_TTL):
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+            return
+
+        task = asyncio.create_task(self._run_refresh(key, loader))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _run_refresh(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        try:
+            if await self._load_and_cache(key, loader):
+                await cache.adelete(f"refresh:{key}")
+            else:
+                logger.warning(f"Refresh failed, serving stale data: {key}")
+        except Exception as e:
+            logger.error(f"Background refresh error for {key}: {e}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
+    async def _cache_songs_from_list(self, songs: list):
+        """Optimistically cache individual songs from a list response."""
+        if not songs:
+            return
+
+        entries = self._song_list_entries(songs)
+        if entries:
+            await cache.aset_many(entries, timeout=self.ttls["song"][1])
+            self._count_writes(entries)
+            logger.info(f"Optimistically cached {len(entries)} songs")
+
+    async def _api_get(self, endpoint: str, params: dict = None) -> Optional[Dict]:
+        """Make API GET request, sharing it with identical in-flight requests."""
+        return await self.flight.ado(
+            self._flight_key(endpoint, params),
+            lambda: self._api_request(endpoint, params),
+        )
+
+    async def _api_request(self, endpoint: str, params: dict = None) -> Optional[Dict]:
+        """Make API GET request without blocking the event loop."""
+        breaker = self.breakers.for_endpoint(endpoint)
+        if not breaker.allow():
+            logger.debug(f"Circuit open, skipping upstream: {endpoint}")
+            return None
+
+        start = time.monotonic()
+        outcome, result = "error", None
+        try:
+            outcome, result = await self._api_attempts(
+                endpoint, params, aiohttp.ClientTimeout(total=breaker.timeout())
+            )
+            return result
+        finally:
+            # Cancellation counts as a failure so a half-open trial is released
+            latency = time.monotonic() - start
+            breaker.record(latency, outcome != "error")
+            self.metrics.upstream_call(breaker.name, latency, outcome)
+
+    async def _api_attempts(self, endpoint: str, params: dict, timeout: aiohttp.ClientTimeout) -> tuple:
+        """GET with retries; returns (outcome, data), data None on transport errors and 5xx."""
+        client = self._get_client()
+        url = f"{self.BASE_URL}/{endpoint}"
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                async with client.get(url, params=params, timeout=timeout) as response:
+                    if response.status in self.NOT_FOUND_STATUSES:
+                        return "not_found", {"success": False, "status": response.status}
+                    response.raise_for_status()
+                    return "ok", await response.json(content_type=None)
+            except aiohttp.ClientResponseError as e:
+                if e.status not in self.RETRY_STATUSES or attempt >= self.MAX_RETRIES:
+                    logger.error(f"API request failed: {endpoint} - {e}")
+                    return "error", None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.MAX_RETRIES:
+                    logger.error(f"API request failed: {endpoint} - {e}")
+                    return "error", None
+            except ValueError as e:
+                logger.error(f"API request failed: {endpoint} - {e}")
+                return "error", None
+            await asyncio.sleep(self.BACKOFF_FACTOR * (2 ** attempt))
+        return "error", None
+
+    # --------------------
+    # SEARCH
+    # --------------------
+    async def search(self, query: str, limit: int = 20, offset: int = 0, typed: bool = True) -> List[Dict]:
+        """Search for songs; the pages covering offset/limit are loaded concurrently."""
+        if not query or not query.strip() or limit <= 0:
+            return []
+        return await self._search_songs(self.query_canon.canonical(query, fuzzy=typed), limit, offset)
+
+    async def _search_songs(self, query: str, limit: int, offset: int = 0) -> List[Dict]:
+        pages = await asyncio.gather(*(self._search_page(query, page) for page in self._search_pages(offset, limit)))
+        return self._slice_search_pages(list(pages), offset, limit)
+
+    async def _search_page(self, query: str, page: int) -> List[Dict]:
+        cache_key = self._search_page_key(query, page)
+        songs = await self._cached_load(cache_key, lambda: self._load_search(query, page))
+        if songs is None and self._search_unavailable():
+            songs = await self._search_catalog(query, page, degraded=True)
+        return songs or []
+
+    async def _load_search(self, query: str, page: int) -> Optional[List[Dict]]:
+        local = await self._search_catalog(query, page)
+        if local is not None:
+            return local
+
+        data = await self._api_get("search/songs", {
+            "query": query.strip(),
+            "page": page,
+            "limit": self.SEARCH_PAGE_SIZE,
+        })
+        if not data:
+            return None
+
+        raw_results = data.get("data", {}).get("results", [])
+        await self._cache_songs_from_list(raw_results)
+
+        return self._normalize_search(data)
+
+    async def _search_catalog(self, query: str, page: int, degraded: bool = False) -> Optional[List[Dict]]:
+        size = self.SEARCH_PAGE_SIZE
+        found = await sync_to_async(self.catalog.search)(query, size, offset=page * size)
+        return self._accept_catalog_results(query, found, size, degraded, self._refresh_catalog_songs)
+
+    def _refresh_catalog_songs(self, song_ids: List[str]):
+        if song_ids:
+            task = asyncio.create_task(self._run_catalog_refresh(song_ids))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _run_catalog_refresh(self, song_ids: List[str]):
+        try:
+            await self._load_song_batch(song_ids)
+        except Exception as e:
+            logger.error(f"Catalog refresh error: {e}")
+        finally:
+            self.catalog.release_refresh(song_ids)
+
+    async def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        # In-memory lookup; index builds run on the sync service's thread
+        return self.sync.suggest(prefix, limit)
+
+    async def search_artists(self, query: str, limit: int = 10) -> List[Dict]:
+        """Search for artists."""
+        if not query or not query.strip():
+            return []
+
+        cache_key = self._key("search", "artists", query.strip().lower(), limit)
+        return await self._cached_load(cache_key, lambda: self._load_search_artists(query, limit)) or []
+
+    async def _load_search_artists(self, query: str, limit: int) -> Optional[List[Dict]]:
+        data = await self._api_get("search/artists", {"query": query.strip(), "limit": limit})
+        if not data:
+            return None
+
+        return self._normalize_artist_results(data)
+
+    async def search_albums(self, query: str, limit: int = 10) -> List[Dict]:
+        """Search for albums."""
+        if not query or not query.strip():
+            return []
+
+        cache_key = self._key("search", "albums", query.strip().lower(), limit)
+        return await self._cached_load(cache_key, lambda: self._load_search_albums(query, limit)) or []
+
+    async def _load_search_albums(self, query: str, limit: int) -> Optional[List[Dict]]:
+        data = await self._api_get("search/albums", {"query": query.strip(), "limit": limit})
+        if not data:
+            return None
+
+        return self._normalize_album_results(data)
+
+    async def search_all(self, query: str, limit: int = 20, artists_limit: int = 6,
+                         albums_limit: int = 6) -> Dict[str, List[Dict]]:
+        """Songs, artists and albums for one query, fetched concurrently."""
+        if not query or not query.strip():
+            return {"songs": [], "artists": [], "albums": []}
+
+        query = self.query_canon.canonical(query)
+        sections = ("songs", "artists", "albums")
+        results = await asyncio.gather(
+            self._search_songs(query, limit),
+            self.search_artists(query, artists_limit),
+            self.search_albums(query, albums_limit),
+            return_exceptions=True,
+        )
+        merged = {}
+        for section, result in zip(sections, results):
+            if isinstance(result, Exception):
+                logger.error(f"Search section {section} failed: {result}")
+                result = []
+            merged[section] = result
+        return merged
+
+    # --------------------
+    # SONGS
+    # --------------------
+    async def get_stream(self, song_id: str, preferred_quality: str = "320") -> Optional[str]:
+        """Get stream URL with quality fallback - fetches data only once."""
+        source = await self.get_stream_source(song_id, preferred_quality)
+        return source["url"] if source else None
+
+    async def get_stream_source(self, song_id: str, preferred_quality: str = "320") -> Optional[Dict[str, Any]]:
+        """Stream URL with quality fallback, the quality picked and the song's duration."""
+        if not self._validate_id(song_id):
+            logger.warning(f"Invalid song ID format: {song_id}")
+            return None
+
+        song_data = await self._fetch_song_data(song_id)
+        if not song_data:
+            return None
+
+        return self._select_stream_source(song_id, song_data, preferred_quality)
+
+    async def _fetch_song_data(self, song_id: str) -> Optional[tuple]:
+        """Fetch the song record with caching."""
+        key = self._key("song", song_id)
+        loader = partial(self._load_song_data, song_id)
+        record = self._as_song_record(await self._cached_load(key, loader))
+        if record is MISSING:
+            return await self._load_and_cache(key, loader)
+        return record
+
+    async def _load_song_data(self, song_id: str) -> Optional[tuple]:
+        data = await self._api_get(f"songs/{song_id}")
+        if not data:
+            return None
+
+        song = self._extract_song_data(data)
+        return self._song_record(song) if song else NOT_FOUND
+
+    async def get_song_details(self, song_id: str) -> Optional[Dict]:
+        """Get full song details with metadata."""
+        if not self._validate_id(song_id):
+            return None
+
+        song_data = await self._fetch_song_data(song_id)
+        if not song_data:
+            return None
+
+        return song_record.to_dict(song_data)
+
+    async def get_songs(self, song_ids: List[str]) -> List[Optional[Dict]]:
+        """Get details for many songs at once, in request order (see JioSaavnService)."""
+        found, stale, l2_keys = self._split_cached_songs(song_ids)
+        if l2_keys:
+            self._merge_cached_songs(found, stale, l2_keys, await cache.aget_many(list(l2_keys)))
+
+        for song_id in stale:
+            await self._refresh_in_background(self._key("song", song_id), lambda sid=song_id: self._load_song_data(sid))
+
+        misses = [song_id for song_id in l2_keys.values() if song_id not in found]
+        if misses:
+            self.metrics.cache_event("song", "misses", len(misses))
+        chunks = [misses[i:i + self.SONG_BATCH_SIZE] for i in range(0, len(misses), self.SONG_BATCH_SIZE)]
+        for songs in await asyncio.gather(*(self._load_song_batch(chunk) for chunk in chunks)):
+            found.update(songs)
+
+        return [song_record.to_dict(found[i]) if found.get(i) else None for i in song_ids]
+
+    async def _load_song_batch(self, chunk: List[str]) -> Dict:
+        data = await self._api_get("songs", {"ids": ",".join(chunk)})
+        songs, entries, negatives = self._song_batch_entries(chunk, data)
+        if entries:
+            await cache.aset_many(entries, timeout=self.ttls["song"][1])
+        if negatives:
+            await cache.aset_many(negatives, timeout=self.NEGATIVE_TTL)
+        self._remember_song_batch(entries, negatives)
+        return songs
+
+    async def get_lyrics(self, song_id: str) -> Optional[Dict]:
+        """Get lyrics for a song."""
+        if not self._validate_id(song_id):
+            return None
+
+        result = await self._cached_load(self._key("lyrics", song_id), lambda: self._load_lyrics(song_id))
+        if result:
+            return result
+
+        # Fallback: check song data for lyrics
+        song_data = await self._fetch_song_data(song_id)
+        if song_data and not song_data[song_record.HAS_LYRICS]:
+            return {"has_lyrics": False, "lyrics": None}
+        return None
+
+    async def _load_lyrics(self, song_id: str) -> Optional[Dict]:
+        data = await self._api_get(f"songs/{song_id}/lyrics")
+        if not data:
+            return None
+        if not data.get("success"):
+            return NOT_FOUND
+
+        return self._normalize_lyrics(data)
+
+    async def get_synced_lyrics(self, song_id: str) -> Optional[str]:
+        """Get synced LRC format lyrics for karaoke mode."""
+        if not self._validate_id(song_id):
+            return None
+
+        async def load():
+            data = await self._api_get(f"songs/{song_id}/lyrics")
+            if not data:
+                return None
+            return self._extract_synced_lyrics(data) or NOT_FOUND
+
+        return await self._cached_load(self._key("lyrics", "synced", song_id), load)
+
+    # --------------------
+    # ALBUM & ARTIST
+    # --------------------
+    async def get_album(self, album_id: str) -> Optional[Dict]:
+        """Get album details with track list."""
+        if not self._validate_id(album_id):
+            return None
+
+        return await self._cached_load(self._key("album", album_id), lambda: self._load_album(album_id))
+
+    async def _load_album(self, album_id: str) -> Optional[Dict]:
+        data = await self._api_get("albums", {"id": album_id})
+        if not data:
+            return None
+        if not data.get("success"):
+            return NOT_FOUND
+
+        album_data = data.get("data", {})
+        await self._cache_songs_from_list(album_data.get("songs", []))
+
+        return self._normalize_album(album_data)
+
+    async def get_artist(self, artist_id: str) -> Optional[Dict]:
+        """Get artist details with top songs."""
+        if not self._validate_id(artist_id):
+            return None
+
+        return await self._cached_load(self._key("artist", artist_id), lambda: self._load_artist(artist_id))
+
+    async def _load_artist(self, artist_id: str) -> Optional[Dict]:
+        data = await self._api_get("artists", {"id": artist_id})
+        if not data:
+            return None
+        if not data.get("success"):
+            return NOT_FOUND
+
+        artist_data = data.get("data", {})
+        await self._cache_songs_from_list(artist_data.get("topSongs", []))
+
+        return self._normalize_artist(artist_data)
+
+    # --------------------
+    # RELATED / TRENDING / CHARTS
+    # --------------------
+    async def get_related(self, song_id: str, limit: int = 10) -> List[Dict]:
+        """Get enhanced related songs based on language and era."""
+        if not self._validate_id(song_id):
+            return []
+
+        cache_key = self._key("related", song_id, limit)
+        return await self._cached_load(cache_key, lambda: self._load_related(song_id, limit)) or []
+
+    async def _load_related(self, song_id: str, limit: int) -> Optional[List[Dict]]:
+        source_song = await self._fetch_song_data(song_id)
+        if not source_song:
+            return None
+
+        lang, artist = self._related_profile(source_song)
+
+        candidates = []
+        data = await self._api_get(f"songs/{song_id}/suggestions", {"limit": limit * 2})
+        if data and data.get("success"):
+            raw_candidates = data.get("data", [])
+            await self._cache_songs_from_list(raw_candidates)
+            candidates = [self._normalize_song(s) for s in raw_candidates]
+
+        filtered = self._rank_related(source_song, candidates)
+
+        if len(filtered) < 5 and artist and lang:
+            logger.info(f"Fallback search for related: {artist} {lang}")
+            search_results = await self.search(f"{artist} {lang}", limit=10, typed=False)
+            self._merge_related_fallback(filtered, search_results, song_id, lang)
+
+        return filtered[:limit]
+
+    async def get_trending(self, language: str = "hindi") -> List[Dict]:
+        """Get trending/popular songs."""
+        cache_key = self._key("trending", language)
+        return await self._cached_load(cache_key, lambda: self._load_trending(language)) or []
+
+    async def _load_trending(self, language: str) -> Optional[List[Dict]]:
+        data = await self._api_get("modules", {"language": language})
+        if data and data.get("success"):
+            trending = data.get("data", {}).get("trending", {})
+
+            if trending:
+                songs = trending.get("data", [])
+                await self._cache_songs_from_list(songs)
+                result = [self._normalize_song(s) for s in songs if s.get("type") == "song"]
+                if result:
+                    return result
+
+        return await self.search(self._trending_fallback_query(language), limit=20, typed=False)
+
+    async def get_charts(self) -> List[Dict]:
+        """Get top charts (playlists)."""
+        return await self._cached_load(self._key("charts", "top"), self._load_charts) or []
+
+    async def _load_charts(self) -> Optional[List[Dict]]:
+        data = await self._api_get("modules", {"language": "hindi,english"})
+        if not data or not data.get("success"):
+            return None
+
+        return self._normalize_charts(data)
+
+    # --------------------
+    # DISCOVER
+    # --------------------
+    async def get_mood_playlist(self, mood: str) -> List[Dict]:
+        """Songs for a mood (unknown moods get top hits)."""
+        return await self.search(self.MOOD_QUERIES.get(mood, self.DEFAULT_MOOD_QUERY), limit=20, typed=False)
+
+    async def get_time_of_day_playlist(self, hour: int) -> Dict:
+        query, title = self.time_of_day_playlist(hour)
+        return {"title": title, "songs": await self.search(query, limit=20, typed=False)}
+
+    async def get_suggested_artists(self) -> List[Dict]:
+        """Curated artists for onboarding, cached as one entry."""
+        cache_key = self._key("discover", "suggested_artists")
+        return await self._cached_load(cache_key, self._load_suggested_artists) or []
+
+    async def _load_suggested_artists(self) -> Optional[List[Dict]]:
+        lookups = [self.search_artists(q, 1) for q in self.SUGGESTED_ARTIST_QUERIES]
+        lookups.append(self.search_artists(self.SUGGESTED_ARTISTS_FILL, 10))
+        results = await asyncio.gather(*lookups, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Search section suggested artists failed: {result}")
+        return self._merge_artists([[] if isinstance(r, Exception) else r for r in results])
+
+    # --------------------
+    # CACHE MANAGEMENT
+    # --------------------
+    async def clear_cache(self):
+        """Invalidate every service namespace (and L1 in every worker)."""
+        await sync_to_async(self.sync.clear_cache)()
+
+    async def invalidate_namespace(self, namespace: str) -> int:
+        """Invalidate one namespace in O(1); returns its new generation."""
+        return await sync_to_async(self.sync.invalidate_namespace)(namespace)
+
+    async def invalidate_entity(self, kind: str, item_id: str) -> int:
+        """Drop one song, album or artist and the entries derived from it."""
+        return await sync_to_async(self.sync.invalidate_entity)(kind, item_id)
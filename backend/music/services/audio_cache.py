@@ -0,0 +1,461 @@
+"""
+Range-aware disk cache for proxied audio (/api/stream/<id>/).
+- One sparse file per (song ID, quality) plus a JSON sidecar holding its
+  size, response headers and the byte ranges stored so far; ranges merge
+  as more of a song is fetched, in any order (seeks included)
+- A request the stored ranges cover is served from the file (FileSlice:
+  gunicorn sends it with sendfile); a partly covered one is stitched from
+  file pieces and CDN Range requests for the gaps, which get stored too
+- LRU by total stored bytes across every worker on the host: a hit bumps
+  the sidecar's mtime, and the worker whose write takes the total over
+  MAX_BYTES evicts the least recently used songs
+- Workers coordinate with flock on striped lock files; a sidecar records
+  its data file's inode, so bytes of an evicted file are never served
+"""
+
+import os
+import json
+import time
+import fcntl
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upstream response headers kept with a cached song and sent on hits
+STORED_HEADERS = ("Content-Type", "ETag", "Cache-Control")
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte a Range header asks of size bytes (all of them without one).
+
+    None for a header that is not one satisfiable "bytes=" range.
+    """
+    if not header:
+        return (0, size - 1) if size > 0 else None
+    header = header.strip()
+    if not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].partition("-")
+    try:
+        if not first.strip():  # suffix range: the last N bytes
+            suffix = int(last)
+            return (max(0, size - suffix), size - 1) if suffix > 0 and size > 0 else None
+        first = int(first)
+        last = min(int(last), size - 1) if last.strip() else size - 1
+    except ValueError:
+        return None
+    return (first, last) if 0 <= first <= last else None
+
+
+def parse_content_range(value: str) -> Optional[Tuple[int, int, int]]:
+    """(first, last, size) of a "bytes first-last/size" Content-Range; None if any is unknown."""
+    try:
+        unit, _, spec = value.strip().partition(" ")
+        span, _, size = spec.partition("/")
+        first, _, last = span.partition("-")
+        return (int(first), int(last), int(size)) if unit == "bytes" else None
+    except ValueError:
+        return None
+
+
+def response_span(status: int, headers) -> Optional[Tuple[int, int, int]]:
+    """(first, last, size) of the bytes in an unencoded 200 or single-range 206 CDN response."""
+    if headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    if status == 200 and "Content-Length" in headers:
+        size = int(headers["Content-Length"])
+        return (0, size - 1, size) if size > 0 else None
+    if status == 206 and "Content-Range" in headers:
+        return parse_content_range(headers["Content-Range"])
+    return None
+
+
+def merge_ranges(ranges: List[List[int]]) -> List[List[int]]:
+    """Sorted, merged copy of half-open [start, end) ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def stored_bytes(ranges: List[List[int]]) -> int:
+    return sum(end - start for start, end in ranges)
+
+
+class FileSlice:
+    """
+    Bytes first..first+length of an open file, read once.
+
+    Has fileno() but no tell(): gunicorn sends it with sendfile from the
+    current offset for Content-Length bytes, and FileResponse leaves
+    Content-Length to the caller.
+    """
+
+    def __init__(self, fd: int, first: int, length: int):
+        self._fd = fd
+        self._left = length
+        os.lseek(fd, first, os.SEEK_SET)
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def read(self, size: int = -1) -> bytes:
+        size = self._left if size is None or size < 0 else min(size, self._left)
+        data = os.read(self._fd, size) if size else b""
+        self._left -= len(data)
+        return data
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class AudioEntry:
+    """An open cached song: its data file and the ranges stored when it was looked up."""
+
+    def __init__(self, fd: int, meta: Dict):
+        self.fd = fd
+        self.size = meta["size"]
+        self.headers = meta.get("headers", {})
+        self.ranges = meta["ranges"]
+
+    def segments(self, first: int, last: int) -> List[Tuple[int, int, bool]]:
+        """Split first..last (inclusive) into (first, last, stored) runs."""
+        runs, position = [], first
+        for start, end in self.ranges:
+            if end <= position or start > last:
+                continue
+            if start > position:
+                runs.append((position, start - 1, False))
+                position = start
+            runs.append((position, min(end, last + 1) - 1, True))
+            position = min(end, last + 1)
+            if position > last:
+                break
+        if position <= last:
+            runs.append((position, last, False))
+        return runs
+
+    def covers(self, first: int, last: int) -> bool:
+        return all(stored for _, _, stored in self.segments(first, last))
+
+    def iter_range(self, first: int, last: int, chunk_size: int) -> Iterator[bytes]:
+        """Stored bytes first..last, chunk by chunk (pread: the file offset is left alone)."""
+        position = first
+        while position <= last:
+            data = os.pread(self.fd, min(chunk_size, last - position + 1), position)
+            if not data:
+                raise OSError(f"cached audio file ends at byte {position}")
+            position += len(data)
+            yield data
+
+    def file_slice(self, first: int, last: int) -> FileSlice:
+        """Hand the file over as a FileSlice (the entry is closed with it)."""
+        fd, self.fd = self.fd, -1
+        return FileSlice(fd, first, last - first + 1)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class RangeWriter:
+    """Stores downloaded bytes of one song; commit() adds their ranges to its sidecar."""
+
+    def __init__(self, cache: "AudioCache", key: str, fd: int, size: int, headers: Dict):
+        self.cache = cache
+        self.key = key
+        self.fd = fd
+        self.inode = os.fstat(fd).st_ino
+        self.size = size
+        self.headers = headers
+        self.position = 0
+        self.written: List[List[int]] = []
+        self.failed = False
+
+    def seek(self, offset: int):
+        self.position = offset
+
+    def write(self, data: bytes):
+        if self.failed or not data:
+            return
+        if self.position + len(data) > self.size:
+            self.failed = True  # longer than the Content-Range said; keep nothing past it
+            return
+        try:
+            os.pwrite(self.fd, data, self.position)
+        except OSError as e:
+            logger.warning(f"Audio cache write failed for {self.key}: {e}")
+            self.failed = True
+            return
+        if self.written and self.written[-1][1] == self.position:
+            self.written[-1][1] += len(data)
+        else:
+            self.written.append([self.position, self.position + len(data)])
+        self.position += len(data)
+
+    def commit(self):
+        if self.fd < 0:
+            return
+        try:
+            if self.written:
+                self.cache._commit(self)
+        finally:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class AudioCache:
+    LOCK_STRIPES = 64
+    EVICT_TO = 0.9  # share of MAX_BYTES left after an eviction pass
+    ORPHAN_AGE = 3600  # seconds before a data file without a sidecar is removed
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024,
+                 max_file_bytes: int = 32 * 1024 * 1024, enabled: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None  # stored bytes on disk, all workers (rescanned on eviction)
+        self._stats = {
+            "hits": 0, "partial_hits": 0, "misses": 0,
+            "bytes_stored": 0, "evictions": 0, "write_conflicts": 0,
+        }
+        if enabled:
+            try:
+                os.makedirs(os.path.join(path, "locks"), exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Audio cache disabled, cannot use {path}: {e}")
+                self.enabled = False
+
+    @classmethod
+    def from_settings(cls) -> "AudioCache":
+        ac = getattr(settings, "JIOSAAVN_AUDIO_CACHE", {})
+        return cls(
+            path=ac.get("PATH", os.path.join(tempfile.gettempdir(), "villen-music-audio")),
+            max_bytes=ac.get("MAX_BYTES", 512 * 1024 * 1024),
+            max_file_bytes=ac.get("MAX_FILE_BYTES", 32 * 1024 * 1024),
+            enabled=ac.get("ENABLED", True),
+        )
+
+    # --------------------
+    # FILES & LOCKS
+    # --------------------
+    @staticmethod
+    def _key(song_id: str, quality: str) -> str:
+        return hashlib.blake2b(f"{song_id}:{quality}".encode(), digest_size=12).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.path, key)
+        return base + ".audio", base + ".json"
+
+    @contextmanager
+    def _locked(self, name: str, blocking: bool = True):
+        """flock on a lock file; yields False if non-blocking and held elsewhere."""
+        fd = os.open(os.path.join(self.path, "locks", name), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+        finally:
+            os.close(fd)  # releases the lock
+
+    def _entry_lock(self, key: str):
+        return self._locked(str(int(key, 16) % self.LOCK_STRIPES))
+
+    @staticmethod
+    def _read_meta(meta_path: str) -> Optional[Dict]:
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_meta(meta_path: str, meta: Dict):
+        tmp = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def _drop(self, key: str):
+        """Remove a song's files (caller holds its entry lock)."""
+        for path in reversed(self._paths(key)):  # sidecar first: no sidecar, no hit
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    # --------------------
+    # READ
+    # --------------------
+    def lookup(self, song_id: str, quality: str) -> Optional[AudioEntry]:
+        """Open the cached song, if any bytes of it are stored; the caller closes it."""
+        if not self.enabled:
+            return None
+        data_path, meta_path = self._paths(self._key(song_id, quality))
+        meta = self._read_meta(meta_path)
+        if meta is None:
+            return None
+        try:
+            fd = os.open(data_path, os.O_RDONLY)
+        except OSError:
+            return None
+        if os.fstat(fd).st_ino != meta.get("inode"):
+            os.close(fd)  # evicted and refetched between the two reads
+            return None
+        try:
+            os.utime(meta_path)  # most recently used
+        except OSError:
+            pass
+        return AudioEntry(fd, meta)
+
+    def record(self, outcome: str):
+        """Count a request by outcome: "hits", "partial_hits" or "misses"."""
+        with self._lock:
+            self._stats[outcome] += 1
+
+    # --------------------
+    # WRITE
+    # --------------------
+    def writer(self, song_id: str, quality: str, size: int, headers: Dict) -> Optional[RangeWriter]:
+        """A RangeWriter for a song of size bytes, or None if it is not cached."""
+        if not self.enabled or not 0 < size <= min(self.max_file_bytes, self.max_bytes):
+            return None
+        key = self._key(song_id, quality)
+        data_path, meta_path = self._paths(key)
+        try:
+            with self._entry_lock(key):
+                meta = self._read_meta(meta_path)
+                if meta is not None and (meta["size"] != size or meta.get("headers", {}).get("ETag")
+                                         != headers.get("ETag")):
+                    self._drop(key)  # the CDN file changed
+                fd = os.open(data_path, os.O_RDWR | os.O_CREAT, 0o644)
+                if os.fstat(fd).st_size != size:
+                    os.ftruncate(fd, size)  # sparse: holes until bytes are written
+        except OSError as e:
+            logger.warning(f"Audio cache unavailable for {song_id}: {e}")
+            return None
+        return RangeWriter(self, key, fd, size, headers)
+
+    def writer_for_response(self, song_id: str, quality: str, status: int, headers) -> Optional[RangeWriter]:
+        """A RangeWriter positioned at the first byte of a CDN response (200 or single-range 206)."""
+        span = response_span(status, headers)
+        if span is None:
+            return None
+        first, _, size = span
+        stored = {name: headers[name] for name in STORED_HEADERS if name in headers}
+        writer = self.writer(song_id, quality, size, stored)
+        if writer is not None:
+            writer.seek(first)
+        return writer
+
+    def _commit(self, writer: RangeWriter):
+        data_path, meta_path = self._paths(writer.key)
+        with self._entry_lock(writer.key):
+            try:
+                current = os.stat(data_path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current != writer.inode:
+                with self._lock:
+                    self._stats["write_conflicts"] += 1  # evicted or replaced while downloading
+                return
+            meta = self._read_meta(meta_path)
+            if meta is None or meta.get("inode") != writer.inode:
+                meta = {"size": writer.size, "headers": writer.headers, "inode": writer.inode, "ranges": []}
+            before = stored_bytes(meta["ranges"])
+            meta["ranges"] = merge_ranges(meta["ranges"] + writer.written)
+            added = stored_bytes(meta["ranges"]) - before
+            self._write_meta(meta_path, meta)
+
+        with self._lock:
+            self._stats["bytes_stored"] += added
+            if self._total is not None:
+                self._total += added
+        if self._total is None or self._total > self.max_bytes:
+            self.evict()
+
+    # --------------------
+    # EVICTION
+    # --------------------
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """(last used, key, stored bytes) of every cached song; drops abandoned data files."""
+        names = set(os.listdir(self.path))
+        songs = []
+        for name in names:
+            if name.endswith(".audio") and name[:-len(".audio")] + ".json" not in names:
+                self._drop_orphan(name[:-len(".audio")])
+                continue
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.path, name)
+            meta = self._read_meta(meta_path)
+            try:
+                used = os.stat(meta_path).st_mtime
+            except OSError:
+                continue
+            if meta is not None:
+                songs.append((used, name[:-len(".json")], stored_bytes(meta["ranges"])))
+        return songs
+
+    def _drop_orphan(self, key: str):
+        """Remove a data file no write ever committed, once its download is surely over."""
+        data_path, meta_path = self._paths(key)
+        with self._entry_lock(key):
+            try:
+                if not os.path.exists(meta_path) and time.time() - os.stat(data_path).st_mtime > self.ORPHAN_AGE:
+                    os.unlink(data_path)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Drop least recently used songs until the total is EVICT_TO of MAX_BYTES."""
+        with self._locked("evict", blocking=False) as acquired:
+            if not acquired:
+                return  # another worker is evicting
+            songs = sorted(self._scan())
+            total = sum(size for _, _, size in songs)
+            evicted = 0
+            if total > self.max_bytes:
+                for _, key, size in songs:
+                    if total <= self.max_bytes * self.EVICT_TO:
+                        break
+                    with self._entry_lock(key):
+                        self._drop(key)
+                    total -= size
+                    evicted += 1
+            with self._lock:
+                self._total = total
+                self._stats["evictions"] += evicted
+
+    # --------------------
+    # STATS
+    # --------------------
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(
+                self._stats,
+                enabled=self.enabled,
+                path=self.path,
+                stored_bytes=self._total,
+                max_bytes=self.max_bytes,
+                max_file_bytes=self.max_file_bytes,
+            )
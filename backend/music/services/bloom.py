@@ -0,0 +1,77 @@
+"""
+Rotating Bloom filter for "recently seen" membership tests.
+- Fixed memory regardless of how many keys are added
+- Two generations: keys are remembered for between window/2 and window
+- No false negatives inside the window; false positive rate is bounded
+  by the configured error rate per generation
+"""
+
+import hashlib
+import math
+import threading
+import time
+from typing import Dict
+
+
+class RotatingBloomFilter:
+    def __init__(self, capacity: int = 50000, error_rate: float = 0.0001, window: float = 300):
+        # Standard sizing: m = -n ln p / (ln 2)^2, k = m/n ln 2
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.window = window
+
+        self._lock = threading.Lock()
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._count = 0
+        self._rotated_at = time.monotonic()
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def _maybe_rotate(self):
+        # Caller holds the lock
+        now = time.monotonic()
+        if now - self._rotated_at >= self.window / 2 or self._count >= self.capacity:
+            self._previous = self._current
+            self._current = bytearray(len(self._previous))
+            self._count = 0
+            self._rotated_at = now
+
+    def add(self, key: str):
+        positions = self._positions(key)
+        with self._lock:
+            self._maybe_rotate()
+            for pos in positions:
+                self._current[pos >> 3] |= 1 << (pos & 7)
+            self._count += 1
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        with self._lock:
+            self._maybe_rotate()
+            for bits in (self._current, self._previous):
+                if all(bits[pos >> 3] & (1 << (pos & 7)) for pos in positions):
+                    return True
+        return False
+
+    def clear(self):
+        with self._lock:
+            self._current = bytearray(len(self._current))
+            self._previous = bytearray(len(self._current))
+            self._count = 0
+            self._rotated_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "keys_in_generation": self._count,
+                "capacity": self.capacity,
+                "bytes": len(self._current) * 2,
+                "hashes": self.num_hashes,
+                "window_seconds": self.window,
+            }
@@ -0,0 +1,269 @@
+"""
+Local song catalog with a full-text index.
+- Every song in an upstream response is upserted into CatalogSong, in the
+  search result shape
+- Full-text search: SQLite FTS5 locally, Postgres tsvector in production
+  (migration 0004); other databases fall back to LIKE
+- Every query token matches as a prefix, so near-repeat queries
+  ("arijit sin", "Arijit  Singh") find the same rows
+- Prefix matches ranked locally are no substitute for the upstream's
+  relevance order: a page is answered from here only when the query names a
+  song exactly (its title, or title and artist) and the catalog fills the
+  page, or when the upstream is unavailable
+- Writes are buffered and flushed by a background thread in one upsert
+- A database error never fails a search; the caller goes upstream instead,
+  and the catalog is skipped for a short backoff
+"""
+
+import re
+import time
+import logging
+import threading
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# \w alone splits Indic words at their vowel signs (combining marks)
+TOKEN_RE = re.compile(r"[\w\u0900-\u0DFF]+", re.UNICODE)
+MAX_TOKENS = 8
+
+
+def query_tokens(query: str) -> List[str]:
+    """Lower-cased word tokens of a search query."""
+    return TOKEN_RE.findall(query.lower())[:MAX_TOKENS]
+
+
+class SongCatalog:
+    def __init__(self, submit: Callable, enabled: bool = True, min_coverage: float = 0.8,
+                 refresh_after: float = 7 * 24 * 3600, error_backoff: float = 30):
+        # submit(fn, *args) runs fn on a background thread
+        self.submit = submit
+        self.enabled = enabled
+        self.min_coverage = min_coverage
+        self.refresh_after = refresh_after
+        self.error_backoff = error_backoff
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict] = {}
+        self._pending_removals = set()
+        self._flush_scheduled = False
+        self._refreshing = set()
+        self._skip_until = 0.0
+        self._stats = {"answered": 0, "answered_degraded": 0, "insufficient": 0,
+                       "errors": 0, "upserted": 0, "removed": 0}
+
+    # --------------------
+    # WRITES
+    # --------------------
+    def add(self, songs: Iterable[Dict]):
+        """Queue songs (search result dicts) for the next upsert."""
+        if not self.enabled:
+            return
+        with self._lock:
+            for song in songs:
+                if song.get("id") and song.get("title"):
+                    self._pending[song["id"]] = song
+                    self._pending_removals.discard(song["id"])
+                    self._refreshing.discard(song["id"])
+        self._schedule_flush()
+
+    def remove(self, song_ids: Iterable[str]):
+        """Queue songs the upstream no longer knows for deletion."""
+        if not self.enabled:
+            return
+        with self._lock:
+            for song_id in song_ids:
+                self._pending.pop(song_id, None)
+                self._pending_removals.add(song_id)
+                self._refreshing.discard(song_id)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        with self._lock:
+            if self._flush_scheduled or not (self._pending or self._pending_removals):
+                return
+            self._flush_scheduled = True
+        self.submit(self.flush)
+
+    def flush(self):
+        """Write everything queued so far (runs on the background thread)."""
+        with self._lock:
+            songs, self._pending = self._pending, {}
+            removals, self._pending_removals = self._pending_removals, set()
+            self._flush_scheduled = False
+
+        close_old_connections()
+        try:
+            self._upsert(list(songs.values()))
+            if removals:
+                self._model().objects.filter(song_id__in=removals).delete()
+            self._stats["upserted"] += len(songs)
+            self._stats["removed"] += len(removals)
+        except DatabaseError as e:
+            self._stats["errors"] += 1
+            logger.error(f"Catalog write failed ({len(songs)} songs): {e}")
+        finally:
+            close_old_connections()
+
+    def _upsert(self, songs: List[Dict]):
+        if not songs:
+            return
+        CatalogSong = self._model()
+        now = timezone.now()
+        rows = [
+            CatalogSong(
+                song_id=song["id"],
+                title=song["title"][:255],
+                artist=(song.get("artist") or "")[:255],
+                album=(song.get("album") or "")[:255],
+                language=(song.get("language") or "")[:50],
+                data=song,
+                refreshed_at=now,
+            )
+            for song in songs
+        ]
+        CatalogSong.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["song_id"],
+            update_fields=["title", "artist", "album", "language", "data", "refreshed_at"],
+        )
+
+    def _model(self):
+        # Imported lazily: services load before the app registry is ready
+        from music.models import CatalogSong
+        return CatalogSong
+
+    # --------------------
+    # SEARCH
+    # --------------------
+    def search(self, query: str, limit: int, offset: int = 0) -> Optional[tuple]:
+        """
+        Best local matches as (songs, stale_ids); None on database errors.
+
+        stale_ids are matches not seen upstream for refresh_after seconds.
+        """
+        tokens = query_tokens(query)
+        if not self.enabled or not tokens or time.monotonic() < self._skip_until:
+            return None
+        try:
+            rows = self._match(tokens, limit, offset)
+        except DatabaseError as e:
+            # e.g. database down or not migrated; don't pay for it on every search
+            self._stats["errors"] += 1
+            self._skip_until = time.monotonic() + self.error_backoff
+            logger.error(f"Catalog search failed for {query!r}: {e}")
+            return None
+
+        cutoff = timezone.now() - timedelta(seconds=self.refresh_after)
+        songs = [data for data, _ in rows]
+        stale_ids = [data["id"] for data, refreshed_at in rows if refreshed_at < cutoff]
+        return songs, stale_ids
+
+    def _match(self, tokens: List[str], limit: int, offset: int) -> List[tuple]:
+        """(data, refreshed_at) rows matching every token as a prefix, best first."""
+        CatalogSong = self._model()
+        vendor = connection.vendor
+        if vendor == "sqlite":
+            rows = CatalogSong.objects.raw(
+                "SELECT c.id, c.data, c.refreshed_at FROM music_catalogsong_fts f "
+                "JOIN music_catalogsong c ON c.id = f.rowid "
+                "WHERE music_catalogsong_fts MATCH %s "
+                "ORDER BY bm25(music_catalogsong_fts), c.id LIMIT %s OFFSET %s",
+                [" ".join(f'"{token}"*' for token in tokens), limit, offset],
+            )
+        elif vendor == "postgresql":
+            tsquery = " & ".join(f"{token}:*" for token in tokens)
+            rows = CatalogSong.objects.raw(
+                "SELECT id, data, refreshed_at FROM music_catalogsong "
+                "WHERE search_vector @@ to_tsquery('simple', %s) "
+                "ORDER BY ts_rank(search_vector, to_tsquery('simple', %s)) DESC, id LIMIT %s OFFSET %s",
+                [tsquery, tsquery, limit, offset],
+            )
+        else:
+            rows = CatalogSong.objects.all()
+            for token in tokens:
+                rows = rows.filter(
+                    Q(title__icontains=token) | Q(artist__icontains=token) | Q(album__icontains=token)
+                )
+            rows = rows.order_by("id").only("data", "refreshed_at")[offset:offset + limit]
+        return [(row.data, row.refreshed_at) for row in rows]
+
+    def titles_and_artists(self, limit: int) -> List[tuple]:
+        """(title, artist) of the most recently seen songs; [] on database errors."""
+        if not self.enabled:
+            return []
+        close_old_connections()
+        try:
+            return list(
+                self._model().objects.order_by("-refreshed_at").values_list("title", "artist")[:limit]
+            )
+        except DatabaseError as e:
+            self._stats["errors"] += 1
+            logger.error(f"Catalog read failed: {e}")
+            return []
+        finally:
+            close_old_connections()
+
+    def answer(self, query: str, songs: List[Dict], limit: int) -> Optional[List[Dict]]:
+        """
+        The local matches if they can stand in for the upstream's page, else None.
+
+        Only when the query is exactly a song's title (or title and artist)
+        and there are enough matches; exact matches go first.
+        """
+        tokens = query_tokens(query)
+        exact = [song for song in songs if self.is_exact(tokens, song)]
+        if not exact or len(songs) < max(1, round(limit * self.min_coverage)):
+            self._stats["insufficient"] += 1
+            return None
+        self._stats["answered"] += 1
+        return exact + [song for song in songs if not self.is_exact(tokens, song)]
+
+    def answer_degraded(self, songs: List[Dict]) -> Optional[List[Dict]]:
+        """Any local matches, for when the upstream can't be asked."""
+        if not songs:
+            return None
+        self._stats["answered_degraded"] += 1
+        return songs
+
+    @staticmethod
+    def is_exact(tokens: List[str], song: Dict) -> bool:
+        """True if tokens spell the song's whole title, or its title and artist."""
+        title = query_tokens(song.get("title") or "")
+        return tokens == title or tokens == title + query_tokens(song.get("artist") or "")
+
+    # --------------------
+    # BACKGROUND REFRESH
+    # --------------------
+    def claim_refresh(self, song_ids: List[str]) -> List[str]:
+        """IDs not already being refreshed by this process (now claimed)."""
+        with self._lock:
+            claimed = [song_id for song_id in song_ids if song_id not in self._refreshing]
+            self._refreshing.update(claimed)
+        return claimed
+
+    def release_refresh(self, song_ids: List[str]):
+        with self._lock:
+            self._refreshing.difference_update(song_ids)
+
+    # --------------------
+    # STATS
+    # --------------------
+    def stats(self) -> Dict:
+        with self._lock:
+            pending = len(self._pending) + len(self._pending_removals)
+            refreshing = len(self._refreshing)
+        return dict(
+            self._stats,
+            enabled=self.enabled,
+            min_coverage=self.min_coverage,
+            refresh_after_seconds=self.refresh_after,
+            pending_writes=pending,
+            refreshing=refreshing,
+        )
@@ -0,0 +1,183 @@
+"""
+Circuit breakers for upstream endpoint families.
+- Rolling window of call outcomes and latencies per family
+- Opens when the error rate crosses a threshold (or after a run of
+  consecutive failures), then fails fast
+- Half-open after a cooldown: one trial call decides whether to close
+- Timeouts derived from the observed p99 latency instead of a constant
+"""
+
+import math
+import time
+import threading
+from collections import deque
+from typing import Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Upstream endpoint families, e.g. "songs/abc/lyrics" -> "lyrics"
+FAMILIES = ("search", "songs", "albums", "artists", "modules", "lyrics", "suggestions")
+
+
+def endpoint_family(endpoint: str) -> str:
+    """Map an upstream endpoint path to its breaker family."""
+    parts = endpoint.strip("/").split("/")
+    if parts[0] == "songs" and len(parts) > 2 and parts[-1] in ("lyrics", "suggestions"):
+        return parts[-1]
+    return parts[0] if parts[0] in FAMILIES else "other"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window: float = 60, min_requests: int = 10,
+                 error_threshold: float = 0.5, consecutive_failures: int = 5,
+                 open_seconds: float = 30,
+                 default_timeout: float = 10, min_timeout: float = 1.0,
+                 timeout_multiplier: float = 3.0, max_samples: int = 500):
+        self.name = name
+        self.window = window
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.consecutive_failures = consecutive_failures
+        self.open_seconds = open_seconds
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+
+        self._lock = threading.Lock()
+        self._samples: deque = deque(maxlen=max_samples)  # (at, latency, ok)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._failure_run = 0
+        self._timeout = default_timeout
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    # --------------------
+    # GATE
+    # --------------------
+    def allow(self) -> bool:
+        """True if a call may go upstream now; False means fail fast."""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self._stats["rejected"] += 1
+                    return False
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self._stats["rejected"] += 1
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def timeout(self) -> float:
+        """Per-attempt timeout for the next call."""
+        return self._timeout
+
+    # --------------------
+    # OUTCOMES
+    # --------------------
+    def record(self, latency: float, ok: bool):
+        """Record a finished call (ok=False for timeouts, transport errors, 5xx)."""
+        now = time.monotonic()
+        with self._lock:
+            self._stats["calls"] += 1
+            if ok:
+                self._failure_run = 0
+            else:
+                self._stats["failures"] += 1
+                self._failure_run += 1
+
+            if self._state == HALF_OPEN:
+                self._trial_in_flight = False
+                if ok:
+                    self._state = CLOSED
+                    self._samples.clear()
+                else:
+                    self._open(now)
+                    return
+
+            self._samples.append((now, latency, ok))
+            self._expire(now)
+            self._timeout = self._compute_timeout()
+
+            if self._state != CLOSED:
+                return
+            if self._failure_run >= self.consecutive_failures:
+                self._open(now)
+            elif len(self._samples) >= self.min_requests:
+                errors = sum(1 for _, _, s in self._samples if not s)
+                if errors / len(self._samples) >= self.error_threshold:
+                    self._open(now)
+
+    def _open(self, now: float):
+        # Caller holds the lock
+        self._state = OPEN
+        self._opened_at = now
+        self._failure_run = 0
+        self._stats["opened"] += 1
+
+    def _expire(self, now: float):
+        # Caller holds the lock
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def _p99(self) -> float:
+        # Caller holds the lock; successful calls only (failures are capped by the timeout)
+        latencies = sorted(lat for _, lat, ok in self._samples if ok)
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, math.ceil(0.99 * len(latencies)) - 1)]
+
+    def _compute_timeout(self) -> float:
+        # Caller holds the lock
+        if sum(1 for _, _, ok in self._samples if ok) < self.min_requests:
+            return self.default_timeout
+        return min(self.default_timeout, max(self.min_timeout, self._p99() * self.timeout_multiplier))
+
+    # --------------------
+    # STATS
+    # --------------------
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def stats(self) -> Dict:
+        state = self.state
+        with self._lock:
+            self._expire(time.monotonic())
+            window_calls = len(self._samples)
+            errors = sum(1 for _, _, ok in self._samples if not ok)
+            return dict(
+                self._stats,
+                state=state,
+                window_calls=window_calls,
+                error_rate=round(errors / window_calls, 4) if window_calls else 0.0,
+                p99_ms=round(self._p99() * 1000, 1),
+                timeout_seconds=round(self._timeout, 3),
+            )
+
+
+class CircuitBreakerRegistry:
+    """One breaker per endpoint family, created on first use."""
+
+    def __init__(self, **options):
+        self.options = options
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def for_endpoint(self, endpoint: str) -> CircuitBreaker:
+        family = endpoint_family(endpoint)
+        breaker = self._breakers.get(family)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(family, CircuitBreaker(family, **self.options))
+        return breaker
+
+    def stats(self) -> Dict:
+        return {name: breaker.stats() for name, breaker in sorted(self._breakers.items())}
@@ -0,0 +1,38 @@
+"""
+Periodic syncs with the shared cache that never block an event loop.
+- Namespace generations, the L1 epoch and the metrics and query-log
+  snapshots are synced at most once per interval, by whichever lookup
+  comes due
+- In a sync worker (or a thread) that lookup makes the round trip inline;
+  on an event loop (async views under ASGI) a Redis round trip would
+  stall every request in flight, so the sync runs as a task over the
+  cache's async API (cache.aget & co.) and the lookup goes on with the
+  values it has
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# Strong references keep scheduled syncs alive until they finish
+_tasks = set()
+
+
+def sync_shared(sync: Callable[[], None], async_sync: Callable[[], Awaitable[None]]):
+    """Call sync() here, or schedule async_sync() if called on a running event loop."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        sync()
+        return
+    task = loop.create_task(async_sync())
+    _tasks.add(task)
+    task.add_done_callback(_finished)
+
+
+def _finished(task: asyncio.Task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Shared cache sync failed: {task.exception()!r}")
@@ -2,8 +2,24 @@
 JioSaavn Music Service - Extended API
 - Connection pooling with requests.Session
 - Retry logic for transient failures  
-- Response caching with TTL
+- Response caching with soft/hard TTL (stale-while-revalidate)
+- Serves last known data when the upstream fails
+- In-process L1 LRU in front of the shared Django/Redis cache
+- Short-TTL negative cache and Bloom filter for known-missing IDs
+- Circuit breaker and p99-based timeouts per upstream endpoint family
 - Single API call for quality fallback
+- Batch song lookups: one cache get_many, multi-ID upstream fetches
+- Songs cached as compact versioned records built once at ingest
+- Versioned cache namespaces: invalidation without cache.clear()
+- Hit/miss/stale, upstream latency and bytes-written stats across workers
+- Local song catalog (full-text index) answers searches it covers well
+- Search-as-you-type suggestions from an in-memory prefix index
+- Query canonicalization: case, script, spelling variants and typos of a
+  past query share its search cache entries
+- Federated search: songs, artists and albums fetched concurrently
+- Refresh-ahead mode for the cache warmer (see warmer.py)
+- Hottest entries snapshotted to disk and restored at boot (snapshot.py)
+- Single-flight coalescing of concurrent cache misses
 - Enhanced metadata normalization
 - Lyrics, Albums, Artists, Related, Trending endpoints
 """
@@ -11,19 +27,92 @@ JioSaavn Music Service - Extended API
 import re
 import time
 import logging
-from typing import Optional, Dict, List, Any
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Optional, Dict, List, Any
 
 import requests
+from django.conf import settings
 from django.core.cache import cache
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from .bloom import RotatingBloomFilter
+from .catalog import SongCatalog
+from .circuit_breaker import OPEN, CircuitBreakerRegistry
+from . import song_record
+from .local_cache import LocalLRUCache, MISSING, entry_size, namespace_of
+from .metrics import ServiceMetrics
+from .namespaces import CacheNamespaces
+from .query_canon import QueryCanonicalizer
+from .singleflight import SingleFlight
+from .snapshot import hot_key_snapshot
+from .suggest import QueryLog, SearchSuggestions
+
 logger = logging.getLogger(__name__)
 
+# Returned by loaders when the upstream answered that the item does not
+# exist (as opposed to None, which means the request itself failed)
+NOT_FOUND = object()
+
+# Background revalidation of stale entries (shared by all service instances)
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="jio-refresh")
+
+# Side branches of search_all() (artists, albums) run here, in parallel
+# with the songs branch on the request thread
+_search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="jio-search")
+
+
 class JioSaavnService:
     BASE_URL = "https://jiosavan-api-pi.vercel.app/api"
-    TIMEOUT = 10
-    CACHE_TTL = 3600  # 1 hour
+    TIMEOUT = 10  # upper bound; breakers adapt it to the observed p99
+    CACHE_TTL = 3600  # 1 hour - soft TTL, entries are fresh until then
+    STALE_TTL = 24 * 3600  # hard TTL, stale entries kept as fallback
+    # (soft, hard) TTL per namespace; others use CACHE_TTL / STALE_TTL.
+    # Song details and lyrics barely change; trending moves fastest.
+    NAMESPACE_TTLS = {
+        "song": (6 * 3600, 7 * 24 * 3600),
+        "lyrics": (7 * 24 * 3600, 30 * 24 * 3600),
+        "album": (6 * 3600, 3 * 24 * 3600),
+        "artist": (6 * 3600, 3 * 24 * 3600),
+        "related": (6 * 3600, 24 * 3600),
+        "search": (3600, 24 * 3600),
+        "trending": (1800, 12 * 3600),
+        "charts": (3600, 24 * 3600),
+        "discover": (3600, 24 * 3600),
+    }
+    REFRESH_LOCK_TTL = 30  # one background refresh per key per window
+    NEGATIVE_TTL = 300  # known-missing songs/albums/artists/lyrics
+    NOT_FOUND_STATUSES = {400, 404, 410}
+    SONG_BATCH_SIZE = 50  # IDs per upstream songs?ids= call
+    MAX_RELATED = 30  # largest related limit the views accept
+    SEARCH_PAGE_SIZE = 30  # songs per upstream search call / cached page
+    # Namespaces whose entries embed an entity; invalidating it bumps them
+    ENTITY_DEPENDENTS = {
+        "song": ("search", "album", "artist", "related", "trending", "charts"),
+        "album": ("search", "artist"),
+        "artist": ("search", "discover"),
+    }
+
+    # Discover playlists (mood, time of day) are cached searches
+    MOOD_QUERIES = {
+        "happy": "party hits",
+        "sad": "sad songs",
+        "romantic": "romantic hits",
+        "workout": "workout motivation",
+    }
+    DEFAULT_MOOD_QUERY = "top hits"
+    # (from hour, to hour, query, title)
+    TIME_OF_DAY_PLAYLISTS = (
+        (5, 12, "morning motivation", "Morning Motivation"),
+        (12, 18, "afternoon vibes", "Afternoon Vibes"),
+        (18, 22, "evening relax", "Evening Relax"),
+        (22, 29, "sleep lo-fi", "Late Night Lo-Fi"),  # wraps past midnight
+    )
+    SUGGESTED_ARTIST_QUERIES = ("Arijit Singh", "Atif Aslam", "Pritam", "Badshah", "Kishore Kumar", "AR Rahman")
+    SUGGESTED_ARTISTS_FILL = "Singers"
 
     # Valid ID pattern (alphanumeric, typically 4-20 chars)
     ID_PATTERN = re.compile(r"^[a-zA-Z0-9_-]{2,30}$")
@@ -46,6 +135,77 @@ class JioSaavnService:
         adapter = HTTPAdapter(max_retries=retry_strategy)
         self.session.mount("https://", adapter)
 
+        # Every cache key carries its namespace generation (see _key)
+        self.namespaces = CacheNamespaces()
+        self.ttls = dict(self.NAMESPACE_TTLS, **getattr(settings, "JIOSAAVN_CACHE_TTLS", {}))
+        self.metrics = ServiceMetrics()
+
+        # Concurrent misses for the same key share one upstream call
+        self.flight = SingleFlight()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        # Per thread: refresh-ahead horizon set by the cache warmer
+        self._warming = threading.local()
+        # Hit counts per key; the hottest entries survive restarts
+        self.hot_keys = hot_key_snapshot()
+
+        # Keys the upstream recently reported missing, answered without I/O
+        self.missing_keys = RotatingBloomFilter(window=self.NEGATIVE_TTL)
+        self.negative_stats = {"negative_hits": 0, "filter_rejects": 0, "negative_stored": 0}
+
+        # L1: hot keys served from process memory, skipping the L2 round trip.
+        # Another worker's invalidation broadcast may also reset the negative filter
+        l1 = getattr(settings, "JIOSAAVN_L1_CACHE", {})
+        self.local_cache = LocalLRUCache(
+            max_entries=l1.get("MAX_ENTRIES", 2048),
+            max_bytes=l1.get("MAX_BYTES", 32 * 1024 * 1024),
+            ttl=l1.get("TTL", 5),
+            broadcast=l1.get("BROADCAST", True),
+            on_broadcast=self._forget_missing,
+        )
+
+        # A slow or failing upstream family fails fast instead of tying up workers
+        cb = getattr(settings, "JIOSAAVN_CIRCUIT_BREAKER", {})
+        self.breakers = CircuitBreakerRegistry(
+            window=cb.get("WINDOW", 60),
+            min_requests=cb.get("MIN_REQUESTS", 10),
+            error_threshold=cb.get("ERROR_THRESHOLD", 0.5),
+            consecutive_failures=cb.get("CONSECUTIVE_FAILURES", 5),
+            open_seconds=cb.get("OPEN_SECONDS", 30),
+            default_timeout=self.TIMEOUT,
+            min_timeout=cb.get("MIN_TIMEOUT", 1.0),
+            timeout_multiplier=cb.get("TIMEOUT_MULTIPLIER", 3.0),
+        )
+
+        # Every song seen upstream, searchable without the API
+        catalog = getattr(settings, "JIOSAAVN_CATALOG", {})
+        self.catalog = SongCatalog(
+            submit=_refresh_executor.submit,
+            enabled=catalog.get("ENABLED", True),
+            min_coverage=catalog.get("MIN_COVERAGE", 0.8),
+            refresh_after=catalog.get("REFRESH_AFTER", 7 * 24 * 3600),
+        )
+
+        # Search-as-you-type from an in-memory prefix index
+        sg = getattr(settings, "JIOSAAVN_SUGGEST", {})
+        self.query_log = QueryLog(max_queries=sg.get("MAX_QUERIES", 5000))
+        self.suggestions = SearchSuggestions(
+            self.catalog,
+            self.query_log,
+            submit=_refresh_executor.submit,
+            rebuild_interval=sg.get("REBUILD_INTERVAL", 300),
+            max_catalog_songs=sg.get("MAX_CATALOG_SONGS", 200_000),
+            max_queries=sg.get("MAX_QUERIES", 5000),
+        )
+
+        # "Arijeet singh", "अरिजीत सिंह" and "arjit singh" search as one query
+        qc = getattr(settings, "JIOSAAVN_QUERY_CANON", {})
+        self.query_canon = QueryCanonicalizer(
+            enabled=qc.get("ENABLED", True),
+            max_queries=qc.get("MAX_QUERIES", 50_000),
+            min_fuzzy_length=qc.get("MIN_FUZZY_LENGTH", 5),
+        )
+
     # --------------------
     # VALIDATION & CACHING
     # --------------------
@@ -55,105 +215,470 @@ class JioSaavnService:
             return False
         return bool(self.ID_PATTERN.match(item_id))
 
+    def _key(self, namespace: str, *parts) -> str:
+        """Cache key in the current generation of a namespace."""
+        return self.namespaces.key(namespace, *parts)
+
+    def _unpack(self, entry: Any) -> Optional[tuple]:
+        """Return (value, fresh_until) for a cache envelope, None otherwise."""
+        if isinstance(entry, tuple) and len(entry) == 2:
+            return entry
+        return None
+
+    def _get_entry(self, key: str) -> Optional[tuple]:
+        """Get (value, fresh_until) from L1, falling back to the shared cache."""
+        entry = self.local_cache.get(key)
+        if entry is not MISSING:
+            return entry
+
+        entry = self._unpack(cache.get(key))
+        self.local_cache.record_l2(key, hit=entry is not None)
+        if entry is not None:
+            self.local_cache.set(key, entry)
+        return entry
+
     def _get_cached(self, key: str) -> Optional[Any]:
-        """Get data from cache."""
-        return cache.get(key)
+        """Get data from cache, fresh or stale."""
+        entry = self._get_entry(key)
+        return entry[0] if entry else None
+
+    def _ttl(self, key: str) -> tuple:
+        """(soft, hard) TTL of a service key, from its namespace."""
+        return self.ttls.get(namespace_of(key), (self.CACHE_TTL, self.STALE_TTL))
+
+    def _pack(self, key: str, data: Any) -> tuple:
+        """Wrap data in an envelope carrying its soft expiry."""
+        return (data, time.time() + self._ttl(key)[0])
 
     def _set_cache(self, key: str, data: Any):
-        """Cache data with standard TTL."""
-        cache.set(key, data, timeout=self.CACHE_TTL)
-        
+        """Cache data: fresh for its soft TTL, kept stale until its hard TTL."""
+        entry = self._pack(key, data)
+        cache.set(key, entry, timeout=self._ttl(key)[1])
+        self.local_cache.set(key, entry, size=self._count_writes({key: entry})[key])
+
+    def _count_writes(self, entries: Dict[str, Any]) -> Dict[str, Optional[int]]:
+        """Record writes for stats; returns the pickled size of each entry."""
+        sizes = {}
+        for key, entry in entries.items():
+            sizes[key] = entry_size(entry)
+            self.metrics.stored(key, sizes[key] or 0)
+        return sizes
+
+    def _cached_load(self, key: str, loader: Callable[[], Any]) -> Optional[Any]:
+        """
+        Stale-while-revalidate read-through cache.
+
+        Fresh entries are returned as is. Stale entries are returned
+        immediately while loader() refreshes them in the background; if the
+        refresh fails the stale value keeps being served. Misses call
+        loader() once per key across concurrent callers. loader() returns
+        None (or an empty result) when there is nothing worth caching, and
+        NOT_FOUND when the upstream says the item does not exist; that is
+        cached as a short-lived negative entry (value None).
+        """
+        if key in self.missing_keys:
+            self.negative_stats["filter_rejects"] += 1
+            self.metrics.cache_event(key, "negative")
+            return None
+
+        entry = self._get_entry(key)
+        if entry:
+            value, fresh_until = entry
+            if value is None:
+                # Negative entry written by another worker
+                self.negative_stats["negative_hits"] += 1
+                self.metrics.cache_event(key, "negative")
+                self.missing_keys.add(key)
+                return None
+            if self._refresh_ahead_due(fresh_until):
+                # Cache warmer: reload now; the old value stays if that fails
+                self._cache_hit(key, "hits" if time.time() < fresh_until else "stale")
+                return self.flight.do(key, lambda: self._load_and_cache(key, loader)) or value
+            if time.time() >= fresh_until:
+                self._cache_hit(key, "stale")
+                self._refresh_in_background(key, loader)
+            else:
+                self._cache_hit(key, "hits")
+            return value
+
+        self.metrics.cache_event(key, "misses")
+        return self.flight.do(
+            key,
+            lambda: self._load_and_cache(key, loader),
+            probe=lambda: self._get_cached(key),
+        )
+
+    def _cache_hit(self, key: str, event: str):
+        """Count a lookup answered from the cache ("hits" or "stale")."""
+        self.metrics.cache_event(key, event)
+        self.hot_keys.hit(key)
+
+    def _export_entries(self, keys: List[str]) -> Dict[str, tuple]:
+        """
+        key -> (envelope, hard expiry) for the snapshot.
+
+        Hot keys are read from L1 first: served from there, they look idle
+        to the shared cache and may already be evicted from it.
+        """
+        found, l2_keys = {}, []
+        for key in keys:
+            entry = self.local_cache.peek(key)
+            if entry is MISSING:
+                l2_keys.append(key)
+            else:
+                found[key] = entry
+        found.update(cache.get_many(l2_keys))
+
+        exported = {}
+        for key, entry in found.items():
+            entry = self._unpack(entry)
+            if entry is not None and entry[0] is not None:  # negative entries expire soon anyway
+                soft, hard = self._ttl(key)
+                exported[key] = (entry, entry[1] - soft + hard)
+        return exported
+
+    def start_snapshots(self):
+        """Snapshot hot entries periodically and at exit (server processes only)."""
+        self.hot_keys.start(self._export_entries)
+
+    @contextmanager
+    def refresh_ahead(self, horizon: float):
+        """
+        Within the block (on this thread), cached entries that expire in
+        less than horizon seconds are reloaded from the upstream instead of
+        being served, so they are fresh again before users see them stale.
+        """
+        previous = getattr(self._warming, "horizon", None)
+        self._warming.horizon = horizon
+        try:
+            yield
+        finally:
+            self._warming.horizon = previous
+
+    def _submit_search(self, fn: Callable, *args) -> Future:
+        """Run fn on the search pool, under this thread's refresh_ahead horizon (if any)."""
+        return _search_executor.submit(self._with_horizon, getattr(self._warming, "horizon", None), fn, *args)
+
+    def _with_horizon(self, horizon: Optional[float], fn: Callable, *args):
+        self._warming.horizon = horizon
+        try:
+            return fn(*args)
+        finally:
+            self._warming.horizon = None  # pool threads are reused
+
+    def _refresh_ahead_due(self, fresh_until: float) -> bool:
+        horizon = getattr(self._warming, "horizon", None)
+        return horizon is not None and time.time() + horizon >= fresh_until
+
+    def _load_and_cache(self, key: str, loader: Callable[[], Any]) -> Optional[Any]:
+        """Call loader() and cache a non-empty result (or a negative entry)."""
+        value = loader()
+        if value is NOT_FOUND:
+            self._set_negative(key)
+            return None
+        if value:
+            self._set_cache(key, value)
+        return value
+
+    def _set_negative(self, key: str):
+        """Remember a known-missing item for NEGATIVE_TTL."""
+        entry = (None, time.time() + self.NEGATIVE_TTL)
+        cache.set(key, entry, timeout=self.NEGATIVE_TTL)
+        self._count_writes({key: entry})
+        self.local_cache.delete(key)
+        self.missing_keys.add(key)
+        self.negative_stats["negative_stored"] += 1
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Any]):
+        """Schedule one refresh of a stale key (per process and per window)."""
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        # Other workers serving the same stale key skip their refresh; on
+        # failure the lock also spaces out retries against a down upstream.
+        if not cache.add(f"refresh:{key}", 1, timeout=self.REFRESH_LOCK_TTL):
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+            return
+
+        _refresh_executor.submit(self._run_refresh, key, loader)
+
+    def _run_refresh(self, key: str, loader: Callable[[], Any]):
+        try:
+            if self._load_and_cache(key, loader):
+                cache.delete(f"refresh:{key}")
+            else:
+                logger.warning(f"Refresh failed, serving stale data: {key}")
+        except Exception as e:
+            logger.error(f"Background refresh error for {key}: {e}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
+
     def _cache_songs_from_list(self, songs: list):
         """Optimistically cache individual songs from a list response."""
         if not songs:
             return
             
-        count = 0
+        entries = self._song_list_entries(songs)
+        if entries:
+            # One L2 round trip; bulk songs stay out of L1 until they are read
+            cache.set_many(entries, timeout=self.ttls["song"][1])
+            self._count_writes(entries)
+            logger.info(f"Optimistically cached {len(entries)} songs")
+
+    def _song_list_entries(self, songs: list) -> Dict[str, tuple]:
+        """Cache entries for the songs of a list response; also feeds the catalog."""
+        entries = {}
         for song in songs:
             song_id = song.get("id")
             # Only cache if we have ID and crucial data (downloadUrl or encrypted_media_url)
             if song_id and (song.get("downloadUrl") or song.get("more_info", {}).get("encrypted_media_url")):
-                cache_key = f"song:{song_id}"
                 # Don't overwrite existing full details if we only have partial, 
                 # but search results usually have everything needed for stream.
-                self._set_cache(cache_key, song)
-                count += 1
-        
-        if count > 0:
-            logger.info(f"Optimistically cached {count} songs")
+                key = self._key("song", song_id)
+                entries[key] = self._pack(key, self._song_record(song))
+        self.catalog.add(song_record.to_dict(value) for value, _ in entries.values())
+        return entries
+
+    def _flight_key(self, endpoint: str, params: dict = None) -> str:
+        """Stable key for an upstream request, used to coalesce duplicates."""
+        if not params:
+            return f"api:{endpoint}"
+        query = "&".join(f"{k}={params[k]}" for k in sorted(params))
+        return f"api:{endpoint}?{query}"
 
     def _api_get(self, endpoint: str, params: dict = None) -> Optional[Dict]:
-        """Make authenticated API GET request."""
+        """Make API GET request, sharing it with identical in-flight requests."""
+        return self.flight.do(
+            self._flight_key(endpoint, params),
+            lambda: self._api_request(endpoint, params),
+        )
+
+    def _api_request(self, endpoint: str, params: dict = None) -> Optional[Dict]:
+        """Make authenticated API GET request, unless its circuit is open."""
+        breaker = self.breakers.for_endpoint(endpoint)
+        if not breaker.allow():
+            # Callers fall back to stale cache entries
+            logger.debug(f"Circuit open, skipping upstream: {endpoint}")
+            return None
+
+        start = time.monotonic()
+        outcome = "error"
         try:
             response = self.session.get(
                 f"{self.BASE_URL}/{endpoint}",
                 params=params,
-                timeout=self.TIMEOUT,
+                timeout=breaker.timeout(),
             )
+            if response.status_code in self.NOT_FOUND_STATUSES:
+                # The upstream answered; the item does not exist
+                outcome = "not_found"
+                return {"success": False, "status": response.status_code}
             response.raise_for_status()
-            return response.json()
+            data = response.json()
+            outcome = "ok"
+            return data
         except requests.RequestException as e:
             logger.error(f"API request failed: {endpoint} - {e}")
             return None
+        finally:
+            latency = time.monotonic() - start
+            breaker.record(latency, outcome != "error")
+            self.metrics.upstream_call(breaker.name, latency, outcome)
 
     # --------------------
     # SEARCH SONGS
     # --------------------
-    def search(self, query: str, limit: int = 20) -> List[Dict]:
-        """Search for songs with enhanced metadata."""
-        if not query or not query.strip():
+    def search(self, query: str, limit: int = 20, offset: int = 0, typed: bool = True) -> List[Dict]:
+        """
+        Search for songs with enhanced metadata.
+
+        Results are fetched and cached in fixed pages of SEARCH_PAGE_SIZE and
+        any offset/limit window is sliced from them, so limit=20 and
+        limit=30 share one upstream call and one cache entry. The query is
+        canonicalized first, so spelling variants share them too; typos
+        are matched only in queries a user typed (typed=False for the
+        service's own).
+        """
+        if not query or not query.strip() or limit <= 0:
             return []
-            
-        # Check cache for query
-        cache_key = f"search:{query.strip().lower()}:{limit}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
-
-        data = self._api_get("search/songs", {"query": query.strip(), "limit": limit})
+        return self._search_songs(self.query_canon.canonical(query, fuzzy=typed), limit, offset)
+
+    def _search_songs(self, query: str, limit: int, offset: int = 0) -> List[Dict]:
+        pages = []
+        for page in self._search_pages(offset, limit):
+            songs = self._search_page(query, page)
+            pages.append(songs)
+            if len(songs) < self.SEARCH_PAGE_SIZE:
+                break  # last page
+        return self._slice_search_pages(pages, offset, limit)
+
+    def _search_pages(self, offset: int, limit: int) -> range:
+        """Page numbers covering results [offset, offset + limit)."""
+        return range(offset // self.SEARCH_PAGE_SIZE, (offset + limit - 1) // self.SEARCH_PAGE_SIZE + 1)
+
+    def _search_page_key(self, query: str, page: int) -> str:
+        return self._key("search", "songs", query.strip().lower(), f"p{page}")
+
+    def _search_page(self, query: str, page: int) -> List[Dict]:
+        cache_key = self._search_page_key(query, page)
+        songs = self._cached_load(cache_key, lambda: self._load_search(query, page))
+        if songs is None and self._search_unavailable():
+            # Not cached: the upstream's own page replaces it once the breaker closes
+            songs = self._search_catalog(query, page, degraded=True)
+        return songs or []
+
+    def _search_unavailable(self) -> bool:
+        return self.breakers.for_endpoint("search/songs").state == OPEN
+
+    def _slice_search_pages(self, pages: List[List[Dict]], offset: int, limit: int) -> List[Dict]:
+        """Window [offset, offset + limit) of consecutive pages starting at offset's page."""
+        start = offset % self.SEARCH_PAGE_SIZE
+        return [song for songs in pages for song in songs][start:start + limit]
+
+    def _load_search(self, query: str, page: int) -> Optional[List[Dict]]:
+        local = self._search_catalog(query, page)
+        if local is not None:
+            return local
+
+        data = self._api_get("search/songs", {
+            "query": query.strip(),
+            "page": page,  # 0-based, the upstream default
+            "limit": self.SEARCH_PAGE_SIZE,
+        })
         if not data:
-            return []
+            return None
             
         raw_results = data.get("data", {}).get("results", [])
         self._cache_songs_from_list(raw_results)
 
-        results = self._normalize_search(data)
-        self._set_cache(cache_key, results)
-        return results
+        return self._normalize_search(data)
+
+    def _search_catalog(self, query: str, page: int, degraded: bool = False) -> Optional[List[Dict]]:
+        """
+        Catalog matches standing in for the upstream's page; None to go upstream.
+
+        Exact queries only, unless degraded (the upstream is unavailable).
+        """
+        size = self.SEARCH_PAGE_SIZE
+        found = self.catalog.search(query, size, offset=page * size)
+        return self._accept_catalog_results(query, found, size, degraded, self._refresh_catalog_songs)
+
+    def _accept_catalog_results(self, query: str, found: Optional[tuple], limit: int, degraded: bool,
+                                refresh: Callable[[List[str]], None]) -> Optional[List[Dict]]:
+        """The catalog's answer, if any; refresh() gets the stale songs this worker claimed."""
+        if found is None:
+            return None
+        songs, stale_ids = found
+        if degraded:
+            songs = self.catalog.answer_degraded(songs)
+        else:
+            songs = self.catalog.answer(query, songs, limit)
+        if songs is None:
+            return None
+        refresh(self.catalog.claim_refresh(stale_ids))
+        return songs
+
+    def _refresh_catalog_songs(self, song_ids: List[str]):
+        """Re-fetch catalog songs not seen upstream for a while, off the request path."""
+        if song_ids:
+            _refresh_executor.submit(self._run_catalog_refresh, song_ids)
+
+    def _run_catalog_refresh(self, song_ids: List[str]):
+        try:
+            self._load_song_batch(song_ids)
+        except Exception as e:
+            logger.error(f"Catalog refresh error: {e}")
+        finally:
+            self.catalog.release_refresh(song_ids)
 
     def search_artists(self, query: str, limit: int = 10) -> List[Dict]:
         """Search for artists."""
         if not query or not query.strip():
             return []
             
-        cache_key = f"search_artist:{query.strip().lower()}:{limit}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        cache_key = self._key("search", "artists", query.strip().lower(), limit)
+        return self._cached_load(cache_key, lambda: self._load_search_artists(query, limit)) or []
 
+    def _load_search_artists(self, query: str, limit: int) -> Optional[List[Dict]]:
         data = self._api_get("search/artists", {"query": query.strip(), "limit": limit})
         if not data:
-            return []
+            return None
             
-        raw_results = data.get("data", {}).get("results", [])
-        results = []
-        for item in raw_results:
-             results.append({
-                 "id": item.get("id"),
-                 "name": item.get("name"),
-                 "image": self._get_best_image(item.get("image", [])),
-                 "type": "artist",
-                 "role": item.get("role"),
-             })
+        return self._normalize_artist_results(data)
 
-        self._set_cache(cache_key, results)
-        return results
+    def search_albums(self, query: str, limit: int = 10) -> List[Dict]:
+        """Search for albums."""
+        if not query or not query.strip():
+            return []
+
+        cache_key = self._key("search", "albums", query.strip().lower(), limit)
+        return self._cached_load(cache_key, lambda: self._load_search_albums(query, limit)) or []
+
+    def _load_search_albums(self, query: str, limit: int) -> Optional[List[Dict]]:
+        data = self._api_get("search/albums", {"query": query.strip(), "limit": limit})
+        if not data:
+            return None
+
+        return self._normalize_album_results(data)
+
+    def search_all(self, query: str, limit: int = 20, artists_limit: int = 6,
+                   albums_limit: int = 6) -> Dict[str, List[Dict]]:
+        """
+        Songs, artists and albums for one query, fetched concurrently.
+
+        Each section is cached on its own (the same entries as search(),
+        search_artists() and search_albums()), so latency is that of the
+        slowest uncached section. A failed section comes back empty.
+        """
+        if not query or not query.strip():
+            return {"songs": [], "artists": [], "albums": []}
+
+        query = self.query_canon.canonical(query)
+        artists = self._submit_search(self.search_artists, query, artists_limit)
+        albums = self._submit_search(self.search_albums, query, albums_limit)
+        # Songs stay on this thread: the catalog lookup uses its DB connection
+        songs = self._search_songs(query, limit)
+        return {
+            "songs": songs,
+            "artists": self._section_result(artists, "artists"),
+            "albums": self._section_result(albums, "albums"),
+        }
+
+    def _section_result(self, future, section: str) -> List[Dict]:
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"Search section {section} failed: {e}")
+            return []
+
+    # --------------------
+    # SEARCH SUGGESTIONS
+    # --------------------
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """Completions for a partial query, without cache or upstream I/O."""
+        if not prefix or not prefix.strip():
+            return []
+        return self.suggestions.suggest(prefix, limit)
+
+    def record_query(self, query: str):
+        """Log a submitted search; popular queries become suggestions."""
+        self.query_log.record(query)
 
     # --------------------
     # STREAM WITH QUALITY FALLBACK
     # --------------------
     def get_stream(self, song_id: str, preferred_quality: str = "320") -> Optional[str]:
         """Get stream URL with quality fallback - fetches data only once."""
+        source = self.get_stream_source(song_id, preferred_quality)
+        return source["url"] if source else None
+
+    def get_stream_source(self, song_id: str, preferred_quality: str = "320") -> Optional[Dict[str, Any]]:
+        """Stream URL with quality fallback, the quality picked and the song's duration."""
         if not self._validate_id(song_id):
             logger.warning(f"Invalid song ID format: {song_id}")
             return None
@@ -162,7 +687,11 @@ class JioSaavnService:
         if not song_data:
             return None
 
-        downloads = song_data.get("downloadUrl", [])
+        return self._select_stream_source(song_id, song_data, preferred_quality)
+
+    def _select_stream_source(self, song_id: str, song_data: tuple, preferred_quality: str) -> Optional[Dict[str, Any]]:
+        """Pick the download closest to the preferred quality: {url, quality, duration}."""
+        downloads = song_record.downloads(song_data)
         if not downloads:
             return None
 
@@ -173,28 +702,35 @@ class JioSaavnService:
             for item in downloads:
                 if item.get("quality") == quality:
                     logger.info(f"Stream found: {song_id} @ {quality}")
-                    return item.get("url")
+                    return {"url": item.get("url"), "quality": quality,
+                            "duration": song_data[song_record.DURATION]}
 
         return None
 
-    def _fetch_song_data(self, song_id: str) -> Optional[Dict]:
-        """Fetch song data with caching."""
-        cache_key = f"song:{song_id}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
-
+    def _fetch_song_data(self, song_id: str) -> Optional[tuple]:
+        """Fetch the song record with caching."""
+        key = self._key("song", song_id)
+        loader = partial(self._load_song_data, song_id)
+        record = self._as_song_record(self._cached_load(key, loader))
+        if record is MISSING:
+            # Cached with another record layout: reload
+            return self._load_and_cache(key, loader)
+        return record
+
+    def _load_song_data(self, song_id: str) -> Optional[tuple]:
         data = self._api_get(f"songs/{song_id}")
         if not data:
             return None
 
+        song = self._extract_song_data(data)
+        return self._song_record(song) if song else NOT_FOUND
+
+    def _extract_song_data(self, data: dict) -> Optional[Dict]:
+        """Pull the raw song dict out of a songs/{id} response."""
         songs = data.get("data", [])
         if not songs:
             return None
-
-        song_data = songs[0]
-        self._set_cache(cache_key, song_data)
-        return song_data
+        return songs[0]
 
     # --------------------
     # SONG DETAILS
@@ -208,7 +744,129 @@ class JioSaavnService:
         if not song_data:
             return None
 
-        return self._normalize_song(song_data)
+        return song_record.to_dict(song_data)
+
+    # --------------------
+    # BATCH SONG DETAILS
+    # --------------------
+    def get_songs(self, song_ids: List[str]) -> List[Optional[Dict]]:
+        """
+        Get details for many songs at once, in request order.
+
+        Cached songs come from L1 and a single get_many; the rest are fetched
+        SONG_BATCH_SIZE IDs per upstream call. Unknown or invalid IDs give None.
+        """
+        found, stale, l2_keys = self._split_cached_songs(song_ids)
+        if l2_keys:
+            self._merge_cached_songs(found, stale, l2_keys, cache.get_many(list(l2_keys)))
+
+        for song_id in stale:
+            self._refresh_in_background(self._key("song", song_id), lambda sid=song_id: self._load_song_data(sid))
+
+        misses = [song_id for song_id in l2_keys.values() if song_id not in found]
+        if misses:
+            self.metrics.cache_event("song", "misses", len(misses))
+        for start in range(0, len(misses), self.SONG_BATCH_SIZE):
+            found.update(self._load_song_batch(misses[start:start + self.SONG_BATCH_SIZE]))
+
+        return [song_record.to_dict(found[i]) if found.get(i) else None for i in song_ids]
+
+    def _load_song_batch(self, chunk: List[str]) -> Dict:
+        """One upstream songs?ids= call; caches and returns song ID -> record."""
+        data = self._api_get("songs", {"ids": ",".join(chunk)})
+        songs, entries, negatives = self._song_batch_entries(chunk, data)
+        if entries:
+            cache.set_many(entries, timeout=self.ttls["song"][1])
+        if negatives:
+            cache.set_many(negatives, timeout=self.NEGATIVE_TTL)
+        self._remember_song_batch(entries, negatives)
+        return songs
+
+    def _split_cached_songs(self, song_ids: List[str]) -> tuple:
+        """
+        First pass of a batch lookup: Bloom filter and L1.
+
+        Returns (found, stale, l2_keys): song ID -> song record (None for
+        known missing), IDs to revalidate, and cache key -> song ID still to
+        look up.
+        """
+        found, stale, l2_keys = {}, [], {}
+        for song_id in dict.fromkeys(song_ids):
+            if not self._validate_id(song_id):
+                continue
+            key = self._key("song", song_id)
+            if key in self.missing_keys:
+                self.negative_stats["filter_rejects"] += 1
+                self.metrics.cache_event(key, "negative")
+                found[song_id] = None
+                continue
+            entry = self.local_cache.get(key)
+            if entry is MISSING or not self._accept_song_entry(found, stale, song_id, key, entry):
+                l2_keys[key] = song_id
+        return found, stale, l2_keys
+
+    def _merge_cached_songs(self, found: dict, stale: list, l2_keys: dict, hits: dict):
+        """Second pass of a batch lookup: results of one get_many."""
+        for key, song_id in l2_keys.items():
+            entry = self._unpack(hits.get(key))
+            self.local_cache.record_l2(key, hit=entry is not None)
+            if entry is not None:
+                self.local_cache.set(key, entry)
+                self._accept_song_entry(found, stale, song_id, key, entry)
+
+    def _accept_song_entry(self, found: dict, stale: list, song_id: str, key: str, entry: tuple) -> bool:
+        """Add a cached entry to found; False if its record layout is unusable."""
+        value, fresh_until = entry
+        if value is None:
+            self.negative_stats["negative_hits"] += 1
+            self.metrics.cache_event(key, "negative")
+            self.missing_keys.add(key)
+        else:
+            value = self._as_song_record(value)
+            if value is MISSING:
+                return False
+            if time.time() >= fresh_until:
+                self._cache_hit(key, "stale")
+                stale.append(song_id)
+            else:
+                self._cache_hit(key, "hits")
+        found[song_id] = value
+        return True
+
+    def _song_batch_entries(self, chunk: List[str], data: Optional[Dict]) -> tuple:
+        """
+        Split a songs?ids= response into (songs, cache entries, negative entries).
+
+        IDs missing from a successful response are cached as known missing;
+        if the request failed nothing is cached.
+        """
+        if not data:
+            return {}, {}, {}
+
+        by_id = {song.get("id"): song for song in data.get("data") or [] if isinstance(song, dict)}
+        songs, entries, negatives = {}, {}, {}
+        for song_id in chunk:
+            song = by_id.get(song_id)
+            key = self._key("song", song_id)
+            if song:
+                songs[song_id] = self._song_record(song)
+                entries[key] = self._pack(key, songs[song_id])
+            else:
+                negatives[key] = (None, time.time() + self.NEGATIVE_TTL)
+        return songs, entries, negatives
+
+    def _remember_song_batch(self, entries: dict, negatives: dict):
+        """Mirror a stored batch into L1, the missing-ID filter and the catalog."""
+        sizes = self._count_writes(entries)
+        self._count_writes(negatives)
+        for key, entry in entries.items():
+            self.local_cache.set(key, entry, size=sizes[key])
+        for key in negatives:
+            self.local_cache.delete(key)
+            self.missing_keys.add(key)
+        self.negative_stats["negative_stored"] += len(negatives)
+        self.catalog.add(song_record.to_dict(value) for value, _ in entries.values())
+        self.catalog.remove(key.rsplit(":", 1)[1] for key in negatives)
 
     # --------------------
     # LYRICS
@@ -218,27 +876,33 @@ class JioSaavnService:
         if not self._validate_id(song_id):
             return None
 
-        cache_key = f"lyrics:{song_id}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        result = self._cached_load(self._key("lyrics", song_id), lambda: self._load_lyrics(song_id))
+        if result:
+            return result
 
+        # Fallback: check song data for lyrics
+        song_data = self._fetch_song_data(song_id)
+        if song_data and not song_data[song_record.HAS_LYRICS]:
+            return {"has_lyrics": False, "lyrics": None}
+        return None
+
+    def _load_lyrics(self, song_id: str) -> Optional[Dict]:
         data = self._api_get(f"songs/{song_id}/lyrics")
-        if not data or not data.get("success"):
-            # Fallback: check song data for lyrics
-            song_data = self._fetch_song_data(song_id)
-            if song_data and not song_data.get("hasLyrics"):
-                return {"has_lyrics": False, "lyrics": None}
+        if not data:
             return None
+        if not data.get("success"):
+            return NOT_FOUND
 
-        result = {
+        return self._normalize_lyrics(data)
+
+    def _normalize_lyrics(self, data: dict) -> Dict:
+        """Normalize a successful lyrics response."""
+        return {
             "has_lyrics": True,
             "lyrics": data.get("data", {}).get("lyrics"),
             "snippet": data.get("data", {}).get("snippet"),
             "copyright": data.get("data", {}).get("copyright"),
         }
-        self._set_cache(cache_key, result)
-        return result
 
     def get_synced_lyrics(self, song_id: str) -> Optional[str]:
         """
@@ -248,37 +912,40 @@ class JioSaavnService:
         if not self._validate_id(song_id):
             return None
 
-        cache_key = f"synced_lyrics:{song_id}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
-
         # Try to get synced lyrics from API
+        return self._cached_load(self._key("lyrics", "synced", song_id), lambda: self._load_synced_lyrics(song_id))
+
+    def _load_synced_lyrics(self, song_id: str) -> Optional[str]:
         data = self._api_get(f"songs/{song_id}/lyrics")
-        if data and data.get("success"):
-            lyrics_data = data.get("data", {})
-            # Check if we have synced/timed lyrics
-            synced_lyrics = lyrics_data.get("syncedLyrics")
-            if synced_lyrics:
-                self._set_cache(cache_key, synced_lyrics)
-                return synced_lyrics
-            
-            # Try to convert plain lyrics to pseudo-LRC format
-            plain_lyrics = lyrics_data.get("lyrics")
-            if plain_lyrics:
-                # Create simple LRC format (no real timestamps, but shows structure)
-                lines = plain_lyrics.split('\n')
-                lrc_lines = []
-                for i, line in enumerate(lines):
-                    # Generate pseudo-timestamps (every ~3 seconds per line)
-                    minutes = (i * 3) // 60
-                    seconds = (i * 3) % 60
-                    lrc_lines.append(f"[{minutes:02d}:{seconds:02d}.00]{line}")
-                lrc_content = '\n'.join(lrc_lines)
-                self._set_cache(cache_key, lrc_content)
-                return lrc_content
+        if not data:
+            return None
+        return self._extract_synced_lyrics(data) or NOT_FOUND
 
-        return None
+    def _extract_synced_lyrics(self, data: Optional[dict]) -> Optional[str]:
+        """Return LRC content from a lyrics response, synthesizing it if needed."""
+        if not data or not data.get("success"):
+            return None
+
+        lyrics_data = data.get("data", {})
+        # Check if we have synced/timed lyrics
+        synced_lyrics = lyrics_data.get("syncedLyrics")
+        if synced_lyrics:
+            return synced_lyrics
+
+        # Try to convert plain lyrics to pseudo-LRC format
+        plain_lyrics = lyrics_data.get("lyrics")
+        if not plain_lyrics:
+            return None
+
+        # Create simple LRC format (no real timestamps, but shows structure)
+        lines = plain_lyrics.split('\n')
+        lrc_lines = []
+        for i, line in enumerate(lines):
+            # Generate pseudo-timestamps (every ~3 seconds per line)
+            minutes = (i * 3) // 60
+            seconds = (i * 3) % 60
+            lrc_lines.append(f"[{minutes:02d}:{seconds:02d}.00]{line}")
+        return '\n'.join(lrc_lines)
 
 
     # --------------------
@@ -289,21 +956,25 @@ class JioSaavnService:
         if not self._validate_id(album_id):
             return None
 
-        cache_key = f"album:{album_id}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        return self._cached_load(self._key("album", album_id), lambda: self._load_album(album_id))
 
+    def _load_album(self, album_id: str) -> Optional[Dict]:
         data = self._api_get(f"albums", {"id": album_id})
-        if not data or not data.get("success"):
+        if not data:
             return None
+        if not data.get("success"):
+            return NOT_FOUND
 
         album_data = data.get("data", {})
         
         # Optimistically cache songs in the album
         self._cache_songs_from_list(album_data.get("songs", []))
         
-        result = {
+        return self._normalize_album(album_data)
+
+    def _normalize_album(self, album_data: dict) -> Dict:
+        """Normalize album details with track list."""
+        return {
             "id": album_data.get("id"),
             "name": album_data.get("name"),
             "year": album_data.get("year"),
@@ -314,8 +985,6 @@ class JioSaavnService:
             "url": album_data.get("url"),
             "songs": [self._normalize_song(s) for s in album_data.get("songs", [])],
         }
-        self._set_cache(cache_key, result)
-        return result
 
     # --------------------
     # ARTIST
@@ -325,21 +994,25 @@ class JioSaavnService:
         if not self._validate_id(artist_id):
             return None
 
-        cache_key = f"artist:{artist_id}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        return self._cached_load(self._key("artist", artist_id), lambda: self._load_artist(artist_id))
 
+    def _load_artist(self, artist_id: str) -> Optional[Dict]:
         data = self._api_get(f"artists", {"id": artist_id})
-        if not data or not data.get("success"):
+        if not data:
             return None
+        if not data.get("success"):
+            return NOT_FOUND
 
         artist_data = data.get("data", {})
         
         # Optimistically cache top songs
         self._cache_songs_from_list(artist_data.get("topSongs", []))
         
-        result = {
+        return self._normalize_artist(artist_data)
+
+    def _normalize_artist(self, artist_data: dict) -> Dict:
+        """Normalize artist details with top songs."""
+        return {
             "id": artist_data.get("id"),
             "name": artist_data.get("name"),
             "image": self._get_best_image(artist_data.get("image", [])),
@@ -352,8 +1025,6 @@ class JioSaavnService:
             "top_songs": [self._normalize_song(s) for s in artist_data.get("topSongs", [])],
             "top_albums": artist_data.get("topAlbums", []),
         }
-        self._set_cache(cache_key, result)
-        return result
 
     # --------------------
     # RELATED SONGS / RECOMMENDATIONS
@@ -363,19 +1034,16 @@ class JioSaavnService:
         if not self._validate_id(song_id):
             return []
 
-        cache_key = f"related_v2:{song_id}:{limit}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        cache_key = self._key("related", song_id, limit)
+        return self._cached_load(cache_key, lambda: self._load_related(song_id, limit)) or []
 
+    def _load_related(self, song_id: str, limit: int) -> Optional[List[Dict]]:
         # 1. Get source song details to know language and year
         source_song = self._fetch_song_data(song_id)
         if not source_song:
-            return []
+            return None
 
-        lang = source_song.get("language", "").lower()
-        year = int(source_song.get("year") or 0)
-        artist = (source_song.get("primaryArtists") or "").split(',')[0].strip()
+        lang, artist = self._related_profile(source_song)
 
         # 2. Get API Suggestions
         candidates = []
@@ -386,6 +1054,26 @@ class JioSaavnService:
              candidates = [self._normalize_song(s) for s in raw_candidates]
 
         # 3. Filter and Rank
+        filtered = self._rank_related(source_song, candidates)
+        
+        # 4. Fallback: If not enough related songs, search by Artist + Language
+        if len(filtered) < 5 and artist and lang:
+            logger.info(f"Fallback search for related: {artist} {lang}")
+            search_results = self.search(f"{artist} {lang}", limit=10, typed=False)
+            self._merge_related_fallback(filtered, search_results, song_id, lang)
+
+        return filtered[:limit]
+
+    def _related_profile(self, source_song: tuple) -> tuple:
+        """Return (language, lead artist) used to match related songs."""
+        lang = (source_song[song_record.LANGUAGE] or "").lower()
+        artist = (source_song[song_record.PRIMARY_ARTISTS] or "").split(',')[0].strip()
+        return lang, artist
+
+    def _rank_related(self, source_song: tuple, candidates: List[Dict]) -> List[Dict]:
+        """Keep same-language candidates, closest release year first."""
+        lang = (source_song[song_record.LANGUAGE] or "").lower()
+        year = int(source_song[song_record.YEAR] or 0)
         filtered = []
         
         # Strict Language Filter
@@ -402,35 +1090,28 @@ class JioSaavnService:
             
             scored.sort(key=lambda x: x[0], reverse=True)
             filtered = [s for _, s in scored]
-        
-        # 4. Fallback: If not enough related songs, search by Artist + Language
-        if len(filtered) < 5 and artist and lang:
-            logger.info(f"Fallback search for related: {artist} {lang}")
-            fallback_query = f"{artist} {lang}"
-            search_results = self.search(fallback_query, limit=10)
-            
-            # Avoid duplicates
-            existing_ids = {s['id'] for s in filtered}
-            existing_ids.add(song_id)
-            
-            for s in search_results:
-                if s['id'] not in existing_ids and s.get("language", "").lower() == lang:
-                     filtered.append(s)
 
-        results = filtered[:limit]
-        self._set_cache(cache_key, results)
-        return results
+        return filtered
+
+    def _merge_related_fallback(self, filtered: List[Dict], search_results: List[Dict], song_id: str, lang: str):
+        """Append same-language search results that are not already related."""
+        # Avoid duplicates
+        existing_ids = {s['id'] for s in filtered}
+        existing_ids.add(song_id)
+        
+        for s in search_results:
+            if s['id'] not in existing_ids and s.get("language", "").lower() == lang:
+                 filtered.append(s)
 
     # --------------------
     # TRENDING SONGS
     # --------------------
     def get_trending(self, language: str = "hindi") -> List[Dict]:
         """Get trending/popular songs."""
-        cache_key = f"trending:{language}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        cache_key = self._key("trending", language)
+        return self._cached_load(cache_key, lambda: self._load_trending(language)) or []
 
+    def _load_trending(self, language: str) -> Optional[List[Dict]]:
         # Try modules endpoint for trending
         data = self._api_get("modules", {"language": language})
         if data and data.get("success"):
@@ -442,20 +1123,19 @@ class JioSaavnService:
                 self._cache_songs_from_list(songs)
                 result = [self._normalize_song(s) for s in songs if s.get("type") == "song"]
                 if result:
-                    self._set_cache(cache_key, result)
                     return result
 
         # Fallback: search for popular songs
+        return self.search(self._trending_fallback_query(language), limit=20, typed=False)
+
+    def _trending_fallback_query(self, language: str) -> str:
+        """Search query used when the modules endpoint has no trending data."""
         popular_queries = {
             "hindi": "top hindi songs 2024",
             "english": "top english songs 2024",
             "punjabi": "top punjabi songs 2024",
         }
-        query = popular_queries.get(language, f"top {language} songs")
-        result = self.search(query, limit=20)
-        if result:
-            self._set_cache(cache_key, result)
-        return result
+        return popular_queries.get(language, f"top {language} songs")
 
     def _extract_chart_songs(self, chart: dict) -> List[Dict]:
         """Extract songs from a chart/playlist."""
@@ -475,35 +1155,72 @@ class JioSaavnService:
     # --------------------
     def get_charts(self) -> List[Dict]:
         """Get top charts (playlists)."""
-        cache_key = "charts:top"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        return self._cached_load(self._key("charts", "top"), self._load_charts) or []
 
+    def _load_charts(self) -> Optional[List[Dict]]:
         # Use modules endpoint to find charts
         data = self._api_get("modules", {"language": "hindi,english"})
-        if data and data.get("success"):
-            modules = data.get("data", {})
-            charts = modules.get("charts", [])
-            
-            # Normalize charts structure
-            result = []
-            for chart in charts:
-                result.append({
-                    "id": chart.get("id"),
-                    "title": chart.get("title"),
-                    "image": chart.get("image"),
-                    "type": "playlist", # Treat as playlist for frontend
-                    "song_count": chart.get("count", 0),
-                    "subtitle": chart.get("subtitle", "Chart"),
-                })
-            
-            if result:
-                self._set_cache(cache_key, result)
-                return result
+        if not data or not data.get("success"):
+            return None
+
+        return self._normalize_charts(data)
+
+    def _normalize_charts(self, data: dict) -> List[Dict]:
+        """Normalize the charts section of a modules response."""
+        modules = data.get("data", {})
+        charts = modules.get("charts", [])
         
-        return []
+        # Normalize charts structure
+        result = []
+        for chart in charts:
+            result.append({
+                "id": chart.get("id"),
+                "title": chart.get("title"),
+                "image": chart.get("image"),
+                "type": "playlist", # Treat as playlist for frontend
+                "song_count": chart.get("count", 0),
+                "subtitle": chart.get("subtitle", "Chart"),
+            })
+        return result
 
+    # --------------------
+    # DISCOVER
+    # --------------------
+    def get_mood_playlist(self, mood: str) -> List[Dict]:
+        """Songs for a mood (unknown moods get top hits)."""
+        return self.search(self.MOOD_QUERIES.get(mood, self.DEFAULT_MOOD_QUERY), limit=20, typed=False)
+
+    def time_of_day_playlist(self, hour: int) -> tuple:
+        """(query, title) of the playlist for an hour of the day."""
+        for start, end, query, title in self.TIME_OF_DAY_PLAYLISTS:
+            if start <= hour < end or start <= hour + 24 < end:
+                return query, title
+        return self.TIME_OF_DAY_PLAYLISTS[-1][2:]
+
+    def get_time_of_day_playlist(self, hour: int) -> Dict:
+        query, title = self.time_of_day_playlist(hour)
+        return {"title": title, "songs": self.search(query, limit=20, typed=False)}
+
+    def get_suggested_artists(self) -> List[Dict]:
+        """Curated artists for onboarding, cached as one entry."""
+        cache_key = self._key("discover", "suggested_artists")
+        return self._cached_load(cache_key, self._load_suggested_artists) or []
+
+    def _load_suggested_artists(self) -> Optional[List[Dict]]:
+        # One lookup per curated name plus a generic fill, all concurrent
+        futures = [self._submit_search(self.search_artists, q, 1) for q in self.SUGGESTED_ARTIST_QUERIES]
+        futures.append(self._submit_search(self.search_artists, self.SUGGESTED_ARTISTS_FILL, 10))
+        return self._merge_artists([self._section_result(f, "suggested artists") for f in futures])
+
+    def _merge_artists(self, results: List[List[Dict]]) -> List[Dict]:
+        """Concatenate artist lists in order, dropping repeated IDs."""
+        artists, seen_ids = [], set()
+        for found in results:
+            for artist in found:
+                if artist["id"] not in seen_ids:
+                    artists.append(artist)
+                    seen_ids.add(artist["id"])
+        return artists
 
     # --------------------
     # NORMALIZATION HELPERS
@@ -517,17 +1234,10 @@ class JioSaavnService:
         """Normalize a single song with all available metadata."""
         album = item.get("album", {})
         
-        # Get artist name from various possible locations
-        artist = (
-            item.get("primaryArtists") or 
-            self._extract_artist_names(item.get("artists", {})) or
-            "Unknown Artist"
-        )
-
         return {
             "id": item.get("id"),
             "title": item.get("name"),
-            "artist": artist,
+            "artist": self._song_artist(item),
             "album": album.get("name") if album else None,
             "album_id": album.get("id") if album else None,
             "image": self._get_best_image(item.get("image", [])),
@@ -541,6 +1251,57 @@ class JioSaavnService:
             "explicit": item.get("explicitContent", False),
         }
 
+    def _song_artist(self, item: dict) -> str:
+        """Get artist name from various possible locations."""
+        return (
+            item.get("primaryArtists") or 
+            self._extract_artist_names(item.get("artists", {})) or
+            "Unknown Artist"
+        )
+
+    def _song_record(self, item: dict) -> tuple:
+        """Build the compact cached record for a raw upstream song."""
+        return song_record.pack_song(item, self._song_artist(item))
+
+    def _as_song_record(self, value: Any) -> Any:
+        """Cached song value as a record; MISSING if its layout is unknown."""
+        if value is None or song_record.is_record(value):
+            return value
+        if isinstance(value, dict):
+            # Raw upstream dict cached before records were introduced
+            return self._song_record(value)
+        return MISSING
+
+    def _normalize_artist_results(self, data: dict) -> List[Dict]:
+        """Normalize artist search results."""
+        raw_results = data.get("data", {}).get("results", [])
+        results = []
+        for item in raw_results:
+             results.append({
+                 "id": item.get("id"),
+                 "name": item.get("name"),
+                 "image": self._get_best_image(item.get("image", [])),
+                 "type": "artist",
+                 "role": item.get("role"),
+             })
+        return results
+
+    def _normalize_album_results(self, data: dict) -> List[Dict]:
+        """Normalize album search results."""
+        return [
+            {
+                "id": item.get("id"),
+                "name": item.get("name"),
+                "artist": item.get("primaryArtists") or self._extract_artist_names(item.get("artists") or {}),
+                "year": item.get("year"),
+                "language": item.get("language"),
+                "image": self._get_best_image(item.get("image", [])),
+                "url": item.get("url"),
+                "type": "album",
+            }
+            for item in data.get("data", {}).get("results", [])
+        ]
+
     def _get_best_image(self, images: list) -> Optional[str]:
         """Get highest quality image URL."""
         if not images:
@@ -558,15 +1319,111 @@ class JioSaavnService:
     # CACHE MANAGEMENT
     # --------------------
     def clear_cache(self):
-        """Clear the data cache."""
-        cache.clear()
+        """Invalidate every service namespace (and L1 in every worker)."""
+        self.namespaces.bump_all()
+        self.local_cache.invalidate_all()
+        self.missing_keys.clear()
         logger.info("Cache cleared")
 
+    def invalidate_namespace(self, namespace: str) -> int:
+        """Invalidate one namespace in O(1); returns its new generation."""
+        generation = self.namespaces.bump(namespace)
+        logger.info(f"Cache namespace invalidated: {namespace} -> {generation}")
+        return generation
+
+    # --------------------
+    # RESPONSE VERSIONS
+    # --------------------
+    def endpoint_key(self, kind: str, item_id: str) -> Optional[str]:
+        """
+        Cache key of the value behind a GET endpoint: a song, album or
+        artist by ID, or trending by language. None for invalid IDs.
+        """
+        if kind == "trending":
+            return self._key("trending", item_id)
+        if not self._validate_id(item_id):
+            return None
+        return self._key(kind, item_id)
+
+    def entry_version(self, key: str) -> Optional[float]:
+        """
+        Soft expiry of the value cached under key, fresh or stale; None if
+        nothing (or a negative entry) is cached. Every reload writes a new
+        one, so it identifies the value (see ResponseCache).
+        """
+        entry = self._get_entry(key)
+        return entry[1] if entry and entry[0] is not None else None
+
+    def count_hit(self, key: str):
+        """Count a response served from a value cached under key."""
+        self._cache_hit(key, "hits")
+
+    def invalidate_entity(self, kind: str, item_id: str) -> int:
+        """
+        Drop one song, album or artist and the entries derived from it.
+
+        Its own entries (for a song: record, lyrics and related lists) are
+        deleted, and the namespaces embedding it (ENTITY_DEPENDENTS) get a
+        new generation. Only those keys leave L1, here now and in other
+        workers within the broadcast interval (without broadcast, within
+        the L1 TTL). Returns the number of keys deleted.
+        """
+        if not self._validate_id(item_id):
+            raise ValueError(f"Invalid {kind} ID")
+        keys = self._entity_keys(kind, item_id)
+        cache.delete_many(keys)
+        for namespace in self.ENTITY_DEPENDENTS[kind]:
+            self.namespaces.bump(namespace)
+        self.local_cache.invalidate_keys(keys)
+        self._forget_missing(keys)
+        logger.info(f"Cache entity invalidated: {kind}:{item_id}")
+        return len(keys)
+
+    def _forget_missing(self, keys: Optional[List[str]]):
+        """Reset the negative filter if it may hold one of keys (None: any key)."""
+        # A Bloom filter can't drop single keys
+        if keys is None or any(key in self.missing_keys for key in keys):
+            self.missing_keys.clear()
+
+    def _entity_keys(self, kind: str, item_id: str) -> List[str]:
+        if kind == "song":
+            keys = [
+                self._key("song", item_id),
+                self._key("lyrics", item_id),
+                self._key("lyrics", "synced", item_id),
+            ]
+            keys += [self._key("related", item_id, limit) for limit in range(1, self.MAX_RELATED + 1)]
+            return keys
+        if kind in ("album", "artist"):
+            return [self._key(kind, item_id)]
+        raise ValueError(f"Unknown entity type: {kind}")
+
     def cache_stats(self) -> Dict:
-        """Get cache statistics."""
-        # Django cache backend agnostic stats are limited
+        """
+        Get cache statistics.
+
+        "metrics" is summed over every worker; the other sections describe
+        the process that served the request ("backend_stats" is host-wide
+        for the shared-memory cache).
+        """
+        backend_stats = getattr(cache, "stats", None)
         return {
             "status": "active",
             "backend": str(cache.__class__.__name__),
-            "ttl_seconds": self.CACHE_TTL,
+            "backend_stats": backend_stats() if callable(backend_stats) else None,
+            "ttl_seconds": {name: {"fresh": soft, "stale": hard} for name, (soft, hard) in self.ttls.items()},
+            "metrics": self.metrics.aggregate(),
+            "namespaces": self.namespaces.stats(),
+            "single_flight": self.flight.stats(),
+            "l1": self.local_cache.stats(),
+            "negative_cache": dict(
+                self.negative_stats,
+                ttl_seconds=self.NEGATIVE_TTL,
+                filter=self.missing_keys.stats(),
+            ),
+            "circuit_breakers": self.breakers.stats(),
+            "catalog": self.catalog.stats(),
+            "suggestions": self.suggestions.stats(),
+            "query_canon": self.query_canon.stats(),
+            "snapshot": self.hot_keys.stats(),
         }
@@ -0,0 +1,231 @@
+"""
+In-process L1 cache.
+- Bounded LRU (entry count and approximate byte size)
+- Short TTL so workers converge on the shared L2 cache quickly
+- Per-namespace hit/miss counters (namespace = key prefix before ':')
+- Optional invalidation broadcast through the L2 cache: a sequence number
+  plus one short-lived record per invalidation (the keys dropped, or all).
+  Workers replay the records they missed and clear everything when they
+  can't (too many, or expired); on_broadcast(keys) runs in each worker that
+  sees another one's broadcast, keys None for all. On an event loop the
+  sequence is read by a task (see housekeeping.py)
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from django.core.cache import cache
+
+from .housekeeping import sync_shared
+
+MISSING = object()
+
+
+def entry_size(value: Any) -> Optional[int]:
+    """Pickled size of a value (what Redis stores), None if unpicklable."""
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+
+
+def namespace_of(key: str) -> str:
+    """Cache namespace of a service key, e.g. 'song' for 'song:abc'."""
+    return key.split(":", 1)[0]
+
+
+class LocalLRUCache:
+    EPOCH_KEY = "jio:l1_epoch"  # sequence number of the last invalidation
+    INVALIDATION_KEY = "jio:l1_inval"  # + ":<seq>" -> keys dropped, or ALL
+    ALL = "*"
+    MAX_REPLAY = 64
+    INVALIDATION_TTL = 300
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 32 * 1024 * 1024,
+                 ttl: float = 5, broadcast: bool = True, broadcast_interval: float = 1.0,
+                 on_broadcast: Optional[Callable[[Optional[List[str]]], None]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.broadcast = broadcast
+        self.broadcast_interval = broadcast_interval
+        self.on_broadcast = on_broadcast
+
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._epoch = MISSING  # not read yet
+        self._epoch_checked_at = 0.0
+        self._evictions = 0
+        self._counters = defaultdict(lambda: {"l1_hits": 0, "l2_hits": 0, "misses": 0})
+
+    # --------------------
+    # LOOKUP
+    # --------------------
+    def get(self, key: str) -> Any:
+        """Return the cached value or MISSING."""
+        self._check_epoch()
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISSING
+            value, expires_at, _ = item
+            if expires_at <= now:
+                self._remove(key)
+                return MISSING
+            self._data.move_to_end(key)
+            self._counters[namespace_of(key)]["l1_hits"] += 1
+            return value
+
+    def peek(self, key: str) -> Any:
+        """Like get(), without counting a hit or refreshing recency."""
+        with self._lock:
+            item = self._data.get(key)
+        if item is None or item[1] <= time.monotonic():
+            return MISSING
+        return item[0]
+
+    def set(self, key: str, value: Any, size: int = None):
+        """Store a value, evicting least recently used entries over budget."""
+        if size is None:
+            size = entry_size(value)
+        if size is None:
+            return
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        # Caller holds the lock
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    # --------------------
+    # L2 ACCOUNTING
+    # --------------------
+    def record_l2(self, key: str, hit: bool):
+        """Count a lookup that fell through to the shared cache."""
+        with self._lock:
+            self._counters[namespace_of(key)]["l2_hits" if hit else "misses"] += 1
+
+    # --------------------
+    # INVALIDATION BROADCAST
+    # --------------------
+    def invalidate_all(self):
+        """Drop L1 here and, with broadcast on, in every other worker."""
+        self.clear()
+        if self.broadcast:
+            self._publish(self.ALL)
+
+    def invalidate_keys(self, keys: Iterable[str]):
+        """Drop these keys here and, with broadcast on, in every other worker."""
+        keys = list(keys)
+        for key in keys:
+            self.delete(key)
+        if self.broadcast:
+            self._publish(keys)
+
+    def _publish(self, keys):
+        try:
+            seq = cache.incr(self.EPOCH_KEY)
+        except ValueError:
+            # First invalidation, or evicted: start from the clock so the
+            # sequence never goes back to numbers other workers have seen
+            seq = time.time_ns()
+            cache.set(self.EPOCH_KEY, seq, timeout=None)
+        cache.set(self._record_key(seq), keys, timeout=self.INVALIDATION_TTL)
+        with self._lock:
+            if isinstance(self._epoch, int) and seq == self._epoch + 1:
+                self._epoch = seq  # nothing missed in between: don't replay our own
+
+    def _record_key(self, seq: int) -> str:
+        return f"{self.INVALIDATION_KEY}:{seq}"
+
+    def _check_epoch(self):
+        """Apply other workers' invalidations (checked at most once per interval)."""
+        if not self.broadcast:
+            return
+        now = time.monotonic()
+        if now - self._epoch_checked_at < self.broadcast_interval:
+            return
+        self._epoch_checked_at = now
+        sync_shared(self._sync_epoch, self._async_check_epoch)
+
+    def _sync_epoch(self):
+        seq = cache.get(self.EPOCH_KEY)
+        self._apply_epoch(seq, cache.get_many(self._missed(seq)))
+
+    async def _async_check_epoch(self):
+        seq = await cache.aget(self.EPOCH_KEY)
+        self._apply_epoch(seq, await cache.aget_many(self._missed(seq)))
+
+    def _missed(self, seq) -> List[str]:
+        """Record keys of the invalidations after the last one seen, up to seq; [] if too many."""
+        last = self._epoch
+        if not isinstance(last, int) or not isinstance(seq, int) or not 0 < seq - last <= self.MAX_REPLAY:
+            return []
+        return [self._record_key(n) for n in range(last + 1, seq + 1)]
+
+    def _apply_epoch(self, seq, records: Dict[str, Any]):
+        if seq == self._epoch:
+            return
+        if self._epoch is not MISSING:
+            dropped = [records.get(key) for key in self._missed(seq)]
+            if not dropped or any(keys is None or keys == self.ALL for keys in dropped):
+                self.clear()
+                keys = None
+            else:
+                keys = [key for record in dropped for key in record]
+                for key in keys:
+                    self.delete(key)
+            if self.on_broadcast is not None:
+                self.on_broadcast(keys)
+        self._epoch = seq
+
+    # --------------------
+    # STATS
+    # --------------------
+    def stats(self) -> Dict:
+        with self._lock:
+            namespaces = {}
+            for ns, c in self._counters.items():
+                lookups = c["l1_hits"] + c["l2_hits"] + c["misses"]
+                namespaces[ns] = dict(
+                    c,
+                    l1_hit_rate=round(c["l1_hits"] / lookups, 4) if lookups else 0.0,
+                    # Reads that never reached Redis/L2
+                    l2_reads_avoided=c["l1_hits"],
+                )
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "evictions": self._evictions,
+                "broadcast": self.broadcast,
+                "namespaces": namespaces,
+            }
@@ -0,0 +1,198 @@
+"""
+Cache and upstream statistics for JioSaavnService.
+- Per cache namespace: hits, stale serves, misses, negative hits, writes
+  and bytes written
+- Per upstream endpoint family: calls, errors, not-found answers and a
+  latency histogram (fixed millisecond buckets)
+- Counters are plain ints in process memory; each worker publishes a
+  snapshot to the shared cache at most once per interval (on an event
+  loop as a task, see housekeeping.py), and aggregate() sums the
+  snapshots of every live worker
+"""
+
+import os
+import time
+import socket
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+
+from .housekeeping import sync_shared
+from .local_cache import namespace_of
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+BUCKET_LABELS = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+CACHE_EVENTS = ("hits", "stale", "misses", "negative")
+
+
+def _new_namespace() -> Dict:
+    return dict.fromkeys(CACHE_EVENTS + ("writes", "bytes_written"), 0)
+
+
+def _new_endpoint() -> Dict:
+    return {
+        "calls": 0,
+        "errors": 0,
+        "not_found": 0,
+        "latency_ms_total": 0.0,
+        "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),  # last bucket: slower than all bounds
+    }
+
+
+def latency_percentile(histogram: List[int], q: float) -> Optional[str]:
+    """Label of the histogram bucket holding the q-th quantile; None if empty."""
+    total = sum(histogram)
+    if not total:
+        return None
+    threshold = q * total
+    seen = 0
+    for label, count in zip(BUCKET_LABELS, histogram):
+        seen += count
+        if seen >= threshold:
+            return label
+    return BUCKET_LABELS[-1]
+
+
+class ServiceMetrics:
+    PREFIX = "jio:stats"
+    WORKERS_KEY = "jio:stats:workers"
+
+    def __init__(self, publish_interval: float = 10, snapshot_ttl: float = 3600):
+        self.publish_interval = publish_interval
+        self.snapshot_ttl = snapshot_ttl
+
+        self._lock = threading.Lock()
+        self._namespaces = defaultdict(_new_namespace)
+        self._endpoints = defaultdict(_new_endpoint)
+        self._started_at = time.time()
+        self._published_at = 0.0
+
+    @property
+    def worker_id(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    # --------------------
+    # RECORDING
+    # --------------------
+    def cache_event(self, key: str, event: str, count: int = 1):
+        """Count a lookup outcome (one of CACHE_EVENTS) for key's namespace."""
+        with self._lock:
+            self._namespaces[namespace_of(key)][event] += count
+        self._maybe_publish()
+
+    def stored(self, key: str, size: int):
+        with self._lock:
+            counters = self._namespaces[namespace_of(key)]
+            counters["writes"] += 1
+            counters["bytes_written"] += size
+
+    def upstream_call(self, family: str, latency: float, outcome: str):
+        """Record an upstream request; outcome is "ok", "not_found" or "error"."""
+        latency_ms = latency * 1000
+        bucket = bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+        with self._lock:
+            counters = self._endpoints[family]
+            counters["calls"] += 1
+            if outcome == "error":
+                counters["errors"] += 1
+            elif outcome == "not_found":
+                counters["not_found"] += 1
+            counters["latency_ms_total"] += latency_ms
+            counters["histogram"][bucket] += 1
+        self._maybe_publish()
+
+    # --------------------
+    # SNAPSHOTS
+    # --------------------
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "worker": self.worker_id,
+                "started_at": self._started_at,
+                "at": time.time(),
+                "namespaces": {ns: dict(c) for ns, c in self._namespaces.items()},
+                "endpoints": {
+                    name: dict(c, histogram=list(c["histogram"])) for name, c in self._endpoints.items()
+                },
+            }
+
+    def _maybe_publish(self):
+        now = time.monotonic()
+        if now - self._published_at >= self.publish_interval:
+            self._published_at = now
+            sync_shared(self.publish, self.async_publish)
+
+    def publish(self):
+        """Write this worker's snapshot and register it in the worker list."""
+        snapshot = self.snapshot()
+        cache.set(f"{self.PREFIX}:{snapshot['worker']}", snapshot, timeout=self.snapshot_ttl)
+        # Read-modify-write; a lost update is repaired by the next publish
+        workers = self._live_workers(cache.get(self.WORKERS_KEY), snapshot)
+        cache.set(self.WORKERS_KEY, workers, timeout=None)
+
+    async def async_publish(self):
+        snapshot = self.snapshot()
+        await cache.aset(f"{self.PREFIX}:{snapshot['worker']}", snapshot, timeout=self.snapshot_ttl)
+        workers = self._live_workers(await cache.aget(self.WORKERS_KEY), snapshot)
+        await cache.aset(self.WORKERS_KEY, workers, timeout=None)
+
+    def _live_workers(self, workers: Optional[Dict], snapshot: Dict) -> Dict:
+        """The worker list with this worker's snapshot registered and expired workers dropped."""
+        workers = dict(workers or {}, **{snapshot["worker"]: snapshot["at"]})
+        cutoff = snapshot["at"] - self.snapshot_ttl
+        return {w: at for w, at in workers.items() if at >= cutoff}
+
+    # --------------------
+    # AGGREGATION
+    # --------------------
+    def aggregate(self) -> Dict:
+        """Sum the latest snapshot of every live worker (this one included)."""
+        self.publish()
+        workers = cache.get(self.WORKERS_KEY) or {}
+        found = cache.get_many([f"{self.PREFIX}:{w}" for w in workers])
+        snapshots = list(found.values())
+
+        namespaces = defaultdict(_new_namespace)
+        endpoints = defaultdict(_new_endpoint)
+        for snap in snapshots:
+            for ns, counters in snap.get("namespaces", {}).items():
+                for name, value in counters.items():
+                    namespaces[ns][name] += value
+            for family, counters in snap.get("endpoints", {}).items():
+                merged = endpoints[family]
+                for name, value in counters.items():
+                    if name == "histogram":
+                        merged["histogram"] = [a + b for a, b in zip(merged["histogram"], value)]
+                    else:
+                        merged[name] += value
+
+        return {
+            "workers": sorted(snap["worker"] for snap in snapshots),
+            "namespaces": {ns: self._namespace_report(c) for ns, c in sorted(namespaces.items())},
+            "upstream": {name: self._endpoint_report(c) for name, c in sorted(endpoints.items())},
+        }
+
+    def _namespace_report(self, counters: Dict) -> Dict:
+        lookups = sum(counters[event] for event in CACHE_EVENTS)
+        served = counters["hits"] + counters["stale"] + counters["negative"]
+        return dict(counters, hit_rate=round(served / lookups, 4) if lookups else 0.0)
+
+    def _endpoint_report(self, counters: Dict) -> Dict:
+        histogram = counters["histogram"]
+        calls = counters["calls"]
+        return {
+            "calls": calls,
+            "errors": counters["errors"],
+            "not_found": counters["not_found"],
+            "error_rate": round(counters["errors"] / calls, 4) if calls else 0.0,
+            "latency_ms": {
+                "mean": round(counters["latency_ms_total"] / calls, 1) if calls else None,
+                "p50": latency_percentile(histogram, 0.50),
+                "p90": latency_percentile(histogram, 0.90),
+                "p99": latency_percentile(histogram, 0.99),
+            },
+            "histogram": dict(zip(BUCKET_LABELS, histogram)),
+        }
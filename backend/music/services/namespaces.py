@@ -0,0 +1,112 @@
+"""
+Versioned cache namespaces.
+- Every service key embeds its namespace generation: "song:<gen>:<id>"
+- Invalidating a namespace bumps its generation (one cache write); old
+  entries become unreachable and age out on their own TTL
+- Other cache users (cache_page, throttling, sessions) are untouched
+- Workers re-read the generations at most once per sync interval; on an
+  event loop the re-read runs as a task (see housekeeping.py) and keys
+  use the generations read before. Only a process's first read is inline
+"""
+
+import time
+import threading
+from typing import Dict, Iterable
+
+from django.core.cache import cache
+
+from .housekeeping import sync_shared
+
+NAMESPACES = ("song", "search", "lyrics", "album", "artist", "related", "trending", "charts", "discover")
+
+
+class CacheNamespaces:
+    GEN_PREFIX = "jio:gen"
+
+    def __init__(self, names: Iterable[str] = NAMESPACES, sync_interval: float = 1.0):
+        self.names = tuple(names)
+        self.sync_interval = sync_interval
+
+        self._lock = threading.Lock()
+        self._generations: Dict[str, int] = {}
+        self._synced_at = float("-inf")
+        self._bumps = 0
+
+    def _gen_key(self, namespace: str) -> str:
+        return f"{self.GEN_PREFIX}:{namespace}"
+
+    def key(self, namespace: str, *parts) -> str:
+        """Cache key for parts in the current generation of namespace."""
+        return f"{namespace}:{self.generation(namespace)}:" + ":".join(str(p) for p in parts)
+
+    def generation(self, namespace: str) -> int:
+        if time.monotonic() - self._synced_at >= self.sync_interval:
+            if not self._generations:
+                self._sync()  # nothing to go on with yet
+            else:
+                self._synced_at = time.monotonic()  # one sync per interval, even while it runs
+                sync_shared(self._sync, self._async_sync)
+        return self._generations[namespace]
+
+    def _sync(self):
+        """Read every generation in one round trip, creating missing ones."""
+        gen_keys = {self._gen_key(name): name for name in self.names}
+        found = cache.get_many(list(gen_keys))
+        generations = {}
+        for gen_key, name in gen_keys.items():
+            gen = found.get(gen_key)
+            if gen is None:
+                # Start from the clock so a lost generation key never
+                # brings back entries from an older generation
+                cache.add(gen_key, time.time_ns() // 1000, timeout=None)
+                gen = cache.get(gen_key, 0)
+            generations[name] = gen
+        self._synced(generations)
+
+    async def _async_sync(self):
+        gen_keys = {self._gen_key(name): name for name in self.names}
+        found = await cache.aget_many(list(gen_keys))
+        generations = {}
+        for gen_key, name in gen_keys.items():
+            gen = found.get(gen_key)
+            if gen is None:
+                await cache.aadd(gen_key, time.time_ns() // 1000, timeout=None)
+                gen = await cache.aget(gen_key, 0)
+            generations[name] = gen
+        self._synced(generations)
+
+    def _synced(self, generations: Dict[str, int]):
+        with self._lock:
+            # A read racing with a local bump must not roll it back
+            for name, gen in self._generations.items():
+                generations[name] = max(gen, generations[name])
+            self._generations = generations
+            self._synced_at = time.monotonic()
+
+    def bump(self, namespace: str) -> int:
+        """Invalidate every key in namespace; returns the new generation."""
+        if namespace not in self.names:
+            raise ValueError(f"Unknown cache namespace: {namespace}")
+        gen_key = self._gen_key(namespace)
+        self.generation(namespace)  # make sure the generation key exists
+        try:
+            gen = cache.incr(gen_key)
+        except ValueError:
+            # Evicted since the last sync
+            gen = time.time_ns() // 1000
+            cache.set(gen_key, gen, timeout=None)
+        with self._lock:
+            self._generations[namespace] = gen
+            self._bumps += 1
+        return gen
+
+    def bump_all(self):
+        for name in self.names:
+            self.bump(name)
+
+    def stats(self) -> Dict:
+        return {
+            "generations": dict(self._generations),
+            "bumps": self._bumps,
+            "sync_interval_seconds": self.sync_interval,
+        }
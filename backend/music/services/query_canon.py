@@ -0,0 +1,334 @@
+"""
+Query canonicalization in front of song search.
+- Folds case, punctuation, whitespace and diacritics
+- Transliterates Devanagari to Latin ("अरिजीत" -> "arijeet")
+- Phonetic key per word folds romanization variants that never change a
+  word ("arijeet" / "arijit", "phir" / "fir", "dill" / "dil")
+- Small typos ("arjit singh") in queries users type map onto a past
+  query through a trigram index (partitioned by the words' first
+  letters) and a bounded, word-by-word edit distance. Looser variants
+  ("zindagi" / "jindagi", "khushi" / "kushi") count as one edit there.
+  Only words of five letters or more may differ (by a typo, so four in
+  the shorter spelling), and never by an ending ("believer" is not
+  "believe", "animals" is not "animal"): "bhaag" is not "bag", "love"
+  is not "live". The service's own queries (moods,
+  trending, related) are folded but never fuzzy-matched
+- Every query matching a known key counts one for its spelling; the most
+  common spelling is the group's canonical query, so all variants share
+  one search: cache entry and one upstream call. An early typo is
+  replaced as soon as the usual spelling outnumbers it
+- The index is per process (workers converge on the most common
+  spelling); stats compare the repeat rate of raw (folded) queries with
+  that of canonical queries
+"""
+
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, Optional
+
+from .suggest import normalize
+
+# --------------------
+# DEVANAGARI
+# --------------------
+_VOWELS = {
+    "अ": "a", "आ": "aa", "इ": "i", "ई": "ee", "उ": "u", "ऊ": "oo", "ऋ": "ri",
+    "ए": "e", "ऐ": "ai", "ओ": "o", "औ": "au",
+}
+_MATRAS = {
+    "ा": "aa", "ि": "i", "ी": "ee", "ु": "u", "ू": "oo", "ृ": "ri",
+    "े": "e", "ै": "ai", "ो": "o", "ौ": "au",
+}
+_CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n",
+    "च": "ch", "छ": "chh", "ज": "j", "झ": "jh", "ञ": "n",
+    "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n",
+    "त": "t", "थ": "th", "द": "d", "ध": "dh", "न": "n",
+    "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m",
+    "य": "y", "र": "r", "ल": "l", "व": "v",
+    "श": "sh", "ष": "sh", "स": "s", "ह": "h",
+}
+_SIGNS = {"ं": "n", "ँ": "n", "ः": "h"}
+_VIRAMA = "्"
+_NUKTA = "़"
+
+
+def has_devanagari(text: str) -> bool:
+    return any("ऀ" <= char <= "ॿ" for char in text)
+
+
+def transliterate(text: str) -> str:
+    """Devanagari to Latin (ITRANS-like), dropping the word-final inherent "a"."""
+    out = []
+    pending_a = False  # a consonant's inherent vowel, not yet written
+    for char in text:
+        if char == _NUKTA:
+            continue
+        if char in _MATRAS:
+            out.append(_MATRAS[char])
+            pending_a = False
+            continue
+        if char == _VIRAMA:
+            pending_a = False
+            continue
+        if pending_a and (char in _CONSONANTS or char in _SIGNS or char in _VOWELS):
+            out.append("a")
+        pending_a = False
+        if char in _CONSONANTS:
+            out.append(_CONSONANTS[char])
+            pending_a = True
+        elif char in _VOWELS:
+            out.append(_VOWELS[char])
+        elif char in _SIGNS:
+            out.append(_SIGNS[char])
+        else:
+            out.append(char)  # space, Latin, digits: word boundary drops the "a"
+    return "".join(out)
+
+
+# --------------------
+# PHONETIC KEYS
+# --------------------
+_PHONETIC_RULES = [
+    (re.compile(r"ee|ii|ie"), "i"),
+    (re.compile(r"oo|uu"), "u"),
+    (re.compile(r"aa"), "a"),
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"q|ck"), "k"),
+    (re.compile(r"(.)\1+"), r"\1"),  # doubled letters
+]
+# Also merge distinct words ("bhaag" / "bag"): fuzzy stage only
+_LOOSE_RULES = [
+    (re.compile(r"z"), "j"),
+    (re.compile(r"([bcdgjkpst])h"), r"\1"),  # aspirates and sh
+    (re.compile(r"(.)\1+"), r"\1"),
+]
+
+
+def fold(text: str) -> str:
+    """Case, punctuation, whitespace and diacritics folded; Devanagari transliterated."""
+    if has_devanagari(text):
+        text = transliterate(text)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return normalize(text)
+
+
+def phonetic_key(folded: str) -> str:
+    """Spelling-variant-insensitive key of a folded query."""
+    words = []
+    for word in folded.split(" "):
+        for pattern, replacement in _PHONETIC_RULES:
+            word = pattern.sub(replacement, word)
+        words.append(word)
+    return " ".join(words)
+
+
+def loose(word: str) -> str:
+    """A phonetic key word with the looser rules applied as well."""
+    for pattern, replacement in _LOOSE_RULES:
+        word = pattern.sub(replacement, word)
+    return word
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def signature(key: str) -> str:
+    """First letter of every (loose) word: fuzzy matches never change it."""
+    return "".join(loose(word)[:1] for word in key.split(" "))
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class QueryCanonicalizer:
+    CANDIDATES = 8  # fuzzy candidates compared by edit distance
+    MIN_WORD_LENGTH = 5  # shortest word a fuzzy match may change
+    MAX_SPELLINGS = 8  # spellings counted per key
+
+    def __init__(self, enabled: bool = True, max_queries: int = 50_000, min_fuzzy_length: int = 5):
+        self.enabled = enabled
+        self.max_queries = max_queries
+        self.min_fuzzy_length = min_fuzzy_length
+
+        self._lock = threading.Lock()
+        self._canonical: "OrderedDict[str, str]" = OrderedDict()  # phonetic key -> canonical query
+        self._spellings: Dict[str, Counter] = {}  # phonetic key -> queries it answered, by spelling
+        # (signature, trigram) -> phonetic keys; only same-signature keys are compared
+        self._grams: Dict[tuple, set] = defaultdict(set)
+        self._raw_seen: "OrderedDict[str, None]" = OrderedDict()
+        self._stats = Counter(dict.fromkeys(
+            ("queries", "exact", "variant", "fuzzy", "new", "promoted", "transliterated", "raw_repeats",
+             "canonical_repeats"), 0
+        ))
+
+    def canonical(self, query: str, fuzzy: bool = True) -> str:
+        """
+        The query to search and cache for this spelling (learns new queries).
+
+        fuzzy=False for queries the service builds itself: only spelling
+        variants of a known query (same phonetic key) are folded.
+        """
+        if not self.enabled:
+            return query
+        folded = fold(query)
+        if not folded:
+            return query
+        key = phonetic_key(folded)
+
+        with self._lock:
+            self._stats["queries"] += 1
+            if has_devanagari(query):
+                self._stats["transliterated"] += 1
+            raw_repeat = folded in self._raw_seen
+            self._remember_raw(folded)
+            if raw_repeat:
+                self._stats["raw_repeats"] += 1
+
+            # Devanagari queries keep their script for the upstream
+            spelling = folded if not has_devanagari(query) else normalize(query)
+            if key in self._canonical:
+                match = key
+            else:
+                match = self._fuzzy_match(key) if fuzzy else None
+            if match is None:
+                # New intent: the only spelling seen is canonical
+                canonical = spelling
+                self._add(key, spelling)
+                outcome = "new"
+            else:
+                self._canonical.move_to_end(match)
+                canonical = self._count(match, spelling)
+                if match != key:
+                    outcome = "fuzzy"
+                else:
+                    outcome = "exact" if canonical == spelling else "variant"
+            self._stats[outcome] += 1
+            if outcome != "new":
+                self._stats["canonical_repeats"] += 1
+            return canonical
+
+    def _remember_raw(self, folded: str):
+        # Caller holds the lock
+        self._raw_seen[folded] = None
+        self._raw_seen.move_to_end(folded)
+        if len(self._raw_seen) > self.max_queries:
+            self._raw_seen.popitem(last=False)
+
+    def _count(self, key: str, spelling: str) -> str:
+        """Count a spelling of key; returns the (possibly new) canonical query. Caller holds the lock."""
+        spellings = self._spellings[key]
+        spellings[spelling] += 1
+        canonical = self._canonical[key]
+        if spellings[spelling] > spellings[canonical]:
+            canonical = self._canonical[key] = spelling
+            self._stats["promoted"] += 1
+        if len(spellings) > self.MAX_SPELLINGS:
+            rarest = min((s for s in spellings if s != canonical), key=spellings.__getitem__)
+            del spellings[rarest]
+        return canonical
+
+    def _add(self, key: str, canonical: str):
+        # Caller holds the lock
+        self._canonical[key] = canonical
+        self._spellings[key] = Counter({canonical: 1})
+        sig = signature(key)
+        for gram in trigrams(key):
+            self._grams[sig, gram].add(key)
+        if len(self._canonical) > self.max_queries:
+            old, _ = self._canonical.popitem(last=False)
+            del self._spellings[old]
+            sig = signature(old)
+            for gram in trigrams(old):
+                keys = self._grams.get((sig, gram))
+                if keys is not None:
+                    keys.discard(old)
+                    if not keys:
+                        del self._grams[sig, gram]
+
+    def _fuzzy_match(self, key: str) -> Optional[str]:
+        """Closest known key within the allowed edit distance; caller holds the lock."""
+        if len(key) < self.min_fuzzy_length:
+            return None
+        limit = 1 if len(key) < 10 else 2
+        sig = signature(key)
+        shared = Counter()
+        for gram in trigrams(key):
+            for known in self._grams.get((sig, gram), ()):
+                shared[known] += 1
+
+        best, best_distance = None, limit + 1
+        for known, _ in shared.most_common(self.CANDIDATES):
+            if len(known) < self.min_fuzzy_length:
+                continue
+            distance = self._distance(key, known, limit)
+            if distance < best_distance:
+                best, best_distance = known, distance
+        return best
+
+    def _distance(self, key: str, known: str, limit: int) -> int:
+        """
+        Word-by-word edit distance, limit + 1 if the queries differ in intent.
+
+        Only typos inside longer words count as close: word counts, first
+        letters and words under MIN_WORD_LENGTH must match, no word may be
+        more than one edit away ("tera ban jaunga" is not "mera ban
+        jaunga", "dhoom 2" is not "dhoom 3", "atif malik" is not "anuv
+        malik"), and none may just add an ending to the other ("believer",
+        "animals"). Words equal under the looser rules are one edit apart.
+        """
+        words, known_words = key.split(" "), known.split(" ")
+        if len(words) != len(known_words):
+            return limit + 1
+        total = 0
+        for word, other in zip(words, known_words):
+            if word == other:
+                continue
+            loose_word, loose_other = loose(word), loose(other)
+            shorter, longer = sorted((len(word), len(other)))
+            if longer < self.MIN_WORD_LENGTH or shorter < self.MIN_WORD_LENGTH - 1:
+                return limit + 1
+            if loose_word[0] != loose_other[0]:
+                return limit + 1
+            if word.startswith(other) or other.startswith(word):
+                return limit + 1  # another word, not a typo
+            distance = 1 if loose_word == loose_other else edit_distance(word, other, 1)
+            total += distance
+            if distance > 1 or total > limit:
+                return limit + 1
+        return total
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            known = len(self._canonical)
+        queries = stats.get("queries", 0)
+        raw_rate = stats.get("raw_repeats", 0) / queries if queries else 0.0
+        canonical_rate = stats.get("canonical_repeats", 0) / queries if queries else 0.0
+        return dict(
+            stats,
+            enabled=self.enabled,
+            known_queries=known,
+            # Share of searches whose cache key was seen before, without and with canonicalization
+            raw_repeat_rate=round(raw_rate, 4),
+            canonical_repeat_rate=round(canonical_rate, 4),
+            hit_rate_improvement=round(canonical_rate - raw_rate, 4),
+        )
@@ -0,0 +1,179 @@
+"""
+Pre-encoded response bodies for hot GET endpoints (song, album, artist,
+trending).
+- Keyed by the service cache key of the value behind a response plus that
+  value's version (its soft expiry): a reload, invalidation or namespace
+  bump never serves an old body
+- A body is JSON-encoded once and compressed once per encoding (gzip;
+  brotli when installed). Hits skip the JSON encoder and the compressors
+- Content-Encoding negotiated from Accept-Encoding (br > gzip > identity),
+  with a strong ETag per coding ('"<hash>-gzip"'; RFC 9110 8.8.3.3) so
+  unchanged bodies answer If-None-Match with 304
+- Per process, LRU bounded by bytes; bodies are cheap to rebuild
+"""
+
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+class EncodedBody(NamedTuple):
+    identity: bytes
+    gzip: Optional[bytes]
+    br: Optional[bytes]
+    etag: str
+
+    @property
+    def size(self) -> int:
+        return len(self.identity) + len(self.gzip or b"") + len(self.br or b"")
+
+    def etag_for(self, coding: Optional[str]) -> str:
+        """Strong ETag of one representation: content-codings must not share one."""
+        return self.etag if coding is None else f'{self.etag[:-1]}-{coding}"'
+
+
+def accepted_encodings(header: str) -> set:
+    """Codings an Accept-Encoding header allows (q=0 excluded)."""
+    accepted = set()
+    for part in header.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip())
+    return accepted
+
+
+def negotiate(body: EncodedBody, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+    """(bytes to send, Content-Encoding) for a client's Accept-Encoding."""
+    accepted = accepted_encodings(accept_encoding)
+    if body.br is not None and ("br" in accepted or "*" in accepted):
+        return body.br, "br"
+    if body.gzip is not None and ("gzip" in accepted or "*" in accepted):
+        return body.gzip, "gzip"
+    return body.identity, None
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """If-None-Match test: "*" or a listed entity-tag weakly equal to etag (RFC 9110 13.1.2)."""
+    tags = parse_etags(if_none_match)
+    if tags == ["*"]:
+        return True
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+class ResponseCache:
+    def __init__(self, enabled: bool = True, max_bytes: int = 32 * 1024 * 1024,
+                 min_compress_bytes: int = 256, gzip_level: int = 6, brotli_quality: int = 8):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.min_compress_bytes = min_compress_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+        self._lock = threading.Lock()
+        self._bodies: "OrderedDict[str, Tuple[float, EncodedBody]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "encoded": 0, "evictions": 0, "not_modified": 0}
+
+    @classmethod
+    def from_settings(cls) -> "ResponseCache":
+        rc = getattr(settings, "JIOSAAVN_RESPONSE_CACHE", {})
+        return cls(
+            enabled=rc.get("ENABLED", True),
+            max_bytes=rc.get("MAX_BYTES", 32 * 1024 * 1024),
+            min_compress_bytes=rc.get("MIN_COMPRESS_BYTES", 256),
+            gzip_level=rc.get("GZIP_LEVEL", 6),
+            brotli_quality=rc.get("BROTLI_QUALITY", 8),
+        )
+
+    # --------------------
+    # BODIES
+    # --------------------
+    def get(self, key: str, version: float) -> Optional[EncodedBody]:
+        """Encoded body of version of the value under key, if kept."""
+        with self._lock:
+            found = self._bodies.get(key)
+            if found is None or found[0] != version:
+                self._stats["misses"] += 1
+                return None
+            self._bodies.move_to_end(key)
+            self._stats["hits"] += 1
+            return found[1]
+
+    def put(self, key: str, version: float, data: Any) -> EncodedBody:
+        """Encode data (the value's version under key) and keep the result."""
+        body = self.encode(data)
+        if body.size > self.max_bytes:
+            return body
+        with self._lock:
+            old = self._bodies.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1].size
+            self._bodies[key] = (version, body)
+            self._bytes += body.size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._bodies.popitem(last=False)
+                self._bytes -= evicted.size
+                self._stats["evictions"] += 1
+        return body
+
+    def encode(self, data: Any) -> EncodedBody:
+        """JSON bytes exactly as JsonResponse writes them, plus compressed variants."""
+        identity = json.dumps(data, cls=DjangoJSONEncoder).encode()
+        compressed_gzip = compressed_br = None
+        if len(identity) >= self.min_compress_bytes:
+            compressed_gzip = gzip.compress(identity, compresslevel=self.gzip_level, mtime=0)
+            if brotli is not None:
+                compressed_br = brotli.compress(identity, mode=brotli.MODE_TEXT, quality=self.brotli_quality)
+        self._stats["encoded"] += 1
+        etag = '"%s"' % hashlib.blake2b(identity, digest_size=12).hexdigest()
+        return EncodedBody(identity, compressed_gzip, compressed_br, etag)
+
+    # --------------------
+    # RESPONSES
+    # --------------------
+    def response(self, request, body: EncodedBody) -> HttpResponse:
+        """200 with the best encoding the client accepts, or 304 if it has that representation."""
+        content, coding = negotiate(body, request.headers.get("Accept-Encoding", ""))
+        etag = body.etag_for(coding)
+        if etag_matches(etag, request.headers.get("If-None-Match", "")):
+            self._stats["not_modified"] += 1
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type="application/json")
+            if coding:
+                response["Content-Encoding"] = coding
+            response["Content-Length"] = str(len(content))
+        response["ETag"] = etag
+        response["Vary"] = "Accept-Encoding"
+        return response
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(
+                self._stats,
+                enabled=self.enabled,
+                entries=len(self._bodies),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                brotli=brotli is not None,
+            )
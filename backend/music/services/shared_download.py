@@ -0,0 +1,282 @@
+"""
+One CDN download per song and byte range for concurrent listeners of
+/api/stream/<id>/ (a release spike: hundreds of plays of one new song).
+- A listener that misses the audio cache claims the download before the
+  song lookup; listeners arriving with the same Range header wait for its
+  CDN response instead of opening their own. Once it is open, a listener
+  asking for bytes inside its range (at most JOIN_AHEAD past what has
+  arrived) follows it too. Either way they skip the song lookup
+- The download is read at CDN speed by its own pump (StreamProxy.pump:
+  a thread for the sync view, a task on the event loop for the async
+  one) into a buffer every follower reads at its own position, so a slow
+  listener never holds back the download or the other listeners
+- The buffer lives while anyone follows; buffers count against MAX_BYTES
+  per process, and a download that does not fit is relayed to its one
+  listener as before. It stops early once every follower has left
+- Sharing is per worker process: a spike costs one download per worker
+  (not per listener) for each song and range
+"""
+
+import asyncio
+import threading
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .audio_cache import STORED_HEADERS, parse_byte_range, response_span
+
+
+class SharedDownload:
+    """A CDN download of bytes first..last of a song, buffered for every listener following it."""
+
+    def __init__(self, owner: "SharedDownloads", key: Tuple, requested: Optional[str]):
+        self.key = key
+        self.requested = requested  # Range header of the listener that claimed it
+        self.opening = True  # until the CDN response headers arrive
+        self.cancelled = False
+        self.first = self.last = self.size = None
+        self.headers: Dict = {}  # the CDN response's STORED_HEADERS, sent to followers that join
+        self.chunks: List[bytes] = []
+        self.offsets: List[int] = []  # first byte of each chunk
+        self.end = None  # next byte to arrive
+        self.done = False
+        self.listeners = 0
+        self.followed = False
+        self.released = False
+        self.pump = None  # thread or task reading the CDN (keeps the task referenced)
+
+        self._owner = owner
+        self._cond = threading.Condition()
+        self._changed: Optional[asyncio.Future] = None
+
+    @property
+    def length(self) -> int:
+        return 0 if self.first is None else self.last - self.first + 1
+
+    @property
+    def abandoned(self) -> bool:
+        """Every listener that started following has left."""
+        return self.followed and self.listeners == 0
+
+    # Claiming listener's side
+    def opened(self, status: int, headers) -> bool:
+        """Record the CDN response; False if it cannot be shared (relay it to one listener)."""
+        shared = self._owner._opened(self, status, headers)
+        self._notify()
+        return shared
+
+    def cancel(self):
+        """The claiming listener got no CDN download (song lookup or CDN failed)."""
+        self._owner._cancel(self)
+        self._notify()
+
+    # Pump side
+    def append(self, chunk: bytes):
+        with self._cond:
+            self.offsets.append(self.end)
+            self.chunks.append(chunk)
+            self.end += len(chunk)
+        self._notify()
+
+    def finish(self):
+        """No more bytes will arrive (complete, failed or abandoned)."""
+        with self._cond:
+            self.done = True
+        self._notify()
+        self._owner._finished(self)
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify_all()
+        if self._changed is not None:
+            if not self._changed.done():
+                self._changed.set_result(None)
+            self._changed = None
+
+    # Follower side
+    def span_for(self, byte_range: Optional[str]) -> Optional[Tuple[int, int]]:
+        """(first, last) byte a Range header asks of this download, None if it is not all here."""
+        if self.opening or self.cancelled:
+            return None
+        span = parse_byte_range(byte_range, self.size)
+        if span is None or not self.first <= span[0] or span[1] > self.last:
+            return None
+        return span
+
+    def wait_opened(self, byte_range: Optional[str], timeout: float) -> Optional[Tuple[int, int]]:
+        """span_for() once the claiming listener's CDN response is in (None on failure or timeout)."""
+        self.wait(lambda: not self.opening, timeout)
+        return self.span_for(byte_range)
+
+    async def await_opened(self, byte_range: Optional[str], timeout: float) -> Optional[Tuple[int, int]]:
+        await self.await_change(lambda: not self.opening, timeout)
+        return self.span_for(byte_range)
+
+    def subscribe(self):
+        self._owner._subscribe(self)
+
+    def unsubscribe(self, delivered: int):
+        self._owner._unsubscribe(self, delivered)
+
+    def read(self, position: int, last: int) -> List[bytes]:
+        """Arrived bytes from position up to last, in chunks ([] if none yet)."""
+        with self._cond:
+            if position >= self.end:
+                return []
+            pieces = []
+            i = bisect_right(self.offsets, position) - 1
+            for chunk_first, chunk in zip(self.offsets[i:], self.chunks[i:]):
+                if chunk_first > last:
+                    break
+                pieces.append(chunk[max(0, position - chunk_first):last - chunk_first + 1])
+            return pieces
+
+    def wait(self, ready: Callable[[], bool], timeout: float) -> bool:
+        """Block until ready() (checked on every change); False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(ready, timeout)
+
+    async def await_change(self, ready: Callable[[], bool], timeout: float) -> bool:
+        """Async wait() for downloads pumped on the running event loop."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not ready():
+            if self._changed is None:
+                self._changed = loop.create_future()
+            # asyncio.wait, unlike wait_for, does not cancel the future other followers await
+            changed, _ = await asyncio.wait({self._changed}, timeout=deadline - loop.time())
+            if not changed:
+                return False
+        return True
+
+
+class SharedDownloads:
+    """Per-process registry of the CDN downloads listeners can join."""
+
+    def __init__(self, enabled: bool = True, max_bytes: int = 256 * 1024 * 1024,
+                 join_ahead: int = 1024 * 1024):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.join_ahead = join_ahead
+
+        self._lock = threading.Lock()
+        self._downloads: Dict[Tuple, List[SharedDownload]] = {}
+        self._buffered = 0
+        self._stats = {
+            "downloads": 0, "listeners": 0, "not_shared": 0,
+            "bytes_downloaded": 0, "bytes_delivered": 0,
+        }
+
+    @classmethod
+    def from_settings(cls) -> "SharedDownloads":
+        sd = getattr(settings, "JIOSAAVN_SHARED_DOWNLOADS", {})
+        return cls(
+            enabled=sd.get("ENABLED", True),
+            max_bytes=sd.get("MAX_BYTES", 256 * 1024 * 1024),
+            join_ahead=sd.get("JOIN_AHEAD", 1024 * 1024),
+        )
+
+    @staticmethod
+    def _key(song_id: str, quality: str, loop: Optional[asyncio.AbstractEventLoop]) -> Tuple:
+        # Downloads pumped on an event loop wake followers through futures of that loop
+        return (song_id, quality, loop)
+
+    def claim(self, song_id: str, quality: str, byte_range: Optional[str],
+              loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[SharedDownload]:
+        """Register the download a listener is about to open, for others to wait on."""
+        if not self.enabled:
+            return None
+        key = self._key(song_id, quality, loop)
+        download = SharedDownload(self, key, byte_range)
+        with self._lock:
+            self._downloads.setdefault(key, []).append(download)
+        return download
+
+    def join(self, song_id: str, quality: str, byte_range: Optional[str],
+             loop: Optional[asyncio.AbstractEventLoop] = None) -> Tuple[Optional[SharedDownload], Optional[Tuple]]:
+        """
+        (download, (first, last)) of a running download covering a request;
+        (download, None) for one still opening with the same Range (wait_opened
+        gives the span); (None, None) if there is none.
+        """
+        with self._lock:
+            for download in self._downloads.get(self._key(song_id, quality, loop), ()):
+                if download.released:
+                    continue
+                if download.opening:
+                    if download.requested == byte_range:
+                        return download, None
+                    continue
+                span = download.span_for(byte_range)
+                if span is None or span[0] > download.end + self.join_ahead:
+                    continue
+                if download.done and span[1] >= download.end:
+                    continue  # stopped short of these bytes
+                return download, span
+        return None, None
+
+    def _opened(self, download: SharedDownload, status: int, headers) -> bool:
+        span = response_span(status, headers)
+        with self._lock:
+            download.opening = False
+            if span is None or self._buffered + span[1] - span[0] + 1 > self.max_bytes:
+                self._stats["not_shared"] += 1
+                download.cancelled = True
+                self._release(download)
+                return False
+            download.first, download.last, download.size = span
+            download.end = download.first
+            download.headers = {name: headers[name] for name in STORED_HEADERS if name in headers}
+            self._buffered += download.length
+            self._stats["downloads"] += 1
+            return True
+
+    def _cancel(self, download: SharedDownload):
+        with self._lock:
+            download.opening = False
+            download.cancelled = True
+            self._release(download)
+
+    def _subscribe(self, download: SharedDownload):
+        with self._lock:
+            download.listeners += 1
+            download.followed = True
+            self._stats["listeners"] += 1
+
+    def _unsubscribe(self, download: SharedDownload, delivered: int):
+        with self._lock:
+            download.listeners -= 1
+            self._stats["bytes_delivered"] += delivered
+            if download.done and not download.listeners:
+                self._release(download)
+
+    def _finished(self, download: SharedDownload):
+        with self._lock:
+            self._stats["bytes_downloaded"] += download.end - download.first
+            if not download.listeners:
+                self._release(download)
+
+    def _release(self, download: SharedDownload):
+        """Forget a download nobody follows any more (called with the lock held)."""
+        if download.released:
+            return
+        download.released = True
+        self._buffered -= download.length
+        downloads = self._downloads.get(download.key, [])
+        if download in downloads:
+            downloads.remove(download)
+        if not downloads:
+            self._downloads.pop(download.key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            downloaded = self._stats["bytes_downloaded"]
+            return dict(
+                self._stats,
+                active=sum(len(downloads) for downloads in self._downloads.values()),
+                buffered_bytes=self._buffered,
+                delivered_per_downloaded=round(self._stats["bytes_delivered"] / downloaded, 2) if downloaded else None,
+                enabled=self.enabled,
+                max_bytes=self.max_bytes,
+            )
@@ -0,0 +1,198 @@
+"""
+Single-flight request coalescing.
+- Concurrent loads of the same key inside a process share one call
+- Across gunicorn workers, a short-lived lock in the shared cache elects
+  one loader; the others poll the cache until the value is published
+- Counts how many calls were deduplicated. A follower that waits longer
+  than LOCK_TTL for a leader in its own process loads the key itself
+  (counted in local_timeouts)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Callable, Dict, Optional
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """An in-flight load that followers in the same process wait on."""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    LOCK_PREFIX = "singleflight"
+    LOCK_TTL = 15  # seconds, longer than an upstream call with retries
+    POLL_INTERVAL = 0.05
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        # asyncio futures are bound to their loop
+        self._futures = weakref.WeakKeyDictionary()
+        self._stats = {
+            "leader_calls": 0,
+            "deduplicated_local": 0,
+            "deduplicated_shared": 0,
+            "lock_timeouts": 0,
+            "local_timeouts": 0,
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return coalescing counters for this process."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["deduplicated_total"] = stats["deduplicated_local"] + stats["deduplicated_shared"]
+        return stats
+
+    # --------------------
+    # SYNC
+    # --------------------
+    def do(self, key: str, fn: Callable[[], Any], probe: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Run fn() once for all concurrent callers of key.
+
+        With a probe, the load is also coalesced across processes: probe()
+        reads the value the elected worker publishes to the shared cache.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.event.wait(self.LOCK_TTL):
+                return self._load_after_timeout(key, fn)
+            self._count("deduplicated_local")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_shared(key, fn, probe)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _load_after_timeout(self, key: str, fn: Callable[[], Any]) -> Any:
+        # The leader is still loading: its result (None so far) is no answer
+        self._count("local_timeouts")
+        logger.warning(f"Single-flight leader wait timed out: {key}")
+        self._count("leader_calls")
+        return fn()
+
+    def _do_shared(self, key: str, fn: Callable[[], Any], probe: Optional[Callable[[], Any]]) -> Any:
+        if probe is None:
+            self._count("leader_calls")
+            return fn()
+
+        lock_key = f"{self.LOCK_PREFIX}:{key}"
+        if cache.add(lock_key, os.getpid(), timeout=self.LOCK_TTL):
+            self._count("leader_calls")
+            try:
+                return fn()
+            finally:
+                cache.delete(lock_key)
+
+        # Another worker is loading this key: wait for it to publish
+        deadline = time.monotonic() + self.LOCK_TTL
+        while time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            result = probe()
+            if result is not None:
+                self._count("deduplicated_shared")
+                return result
+            if cache.get(lock_key) is None:
+                break
+        else:
+            self._count("lock_timeouts")
+            logger.warning(f"Single-flight lock wait timed out: {key}")
+
+        self._count("leader_calls")
+        return fn()
+
+    # --------------------
+    # ASYNC
+    # --------------------
+    async def ado(self, key: str, fn: Callable[[], Any], probe: Optional[Callable[[], Any]] = None) -> Any:
+        """Coroutine variant of do(); fn and probe are coroutine functions."""
+        loop = asyncio.get_running_loop()
+        futures = self._futures.setdefault(loop, {})
+
+        future = futures.get(key)
+        if future is not None:
+            done, _ = await asyncio.wait({future}, timeout=self.LOCK_TTL)
+            if not done:
+                self._count("local_timeouts")
+                logger.warning(f"Single-flight leader wait timed out: {key}")
+                self._count("leader_calls")
+                return await fn()
+            self._count("deduplicated_local")
+            return future.result()
+
+        future = futures[key] = loop.create_future()
+        try:
+            result = await self._ado_shared(key, fn, probe)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a future without followers doesn't warn
+            future.exception()
+            raise
+        finally:
+            futures.pop(key, None)
+
+    async def _ado_shared(self, key: str, fn: Callable[[], Any], probe: Optional[Callable[[], Any]]) -> Any:
+        if probe is None:
+            self._count("leader_calls")
+            return await fn()
+
+        lock_key = f"{self.LOCK_PREFIX}:{key}"
+        if await cache.aadd(lock_key, os.getpid(), timeout=self.LOCK_TTL):
+            self._count("leader_calls")
+            try:
+                return await fn()
+            finally:
+                await cache.adelete(lock_key)
+
+        deadline = time.monotonic() + self.LOCK_TTL
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            result = await probe()
+            if result is not None:
+                self._count("deduplicated_shared")
+                return result
+            if await cache.aget(lock_key) is None:
+                break
+        else:
+            self._count("lock_timeouts")
+            logger.warning(f"Single-flight lock wait timed out: {key}")
+
+        self._count("leader_calls")
+        return await fn()
@@ -0,0 +1,208 @@
+"""
+Hot-key cache snapshot for warm restarts.
+- Counts cache hits per key (bounded, like QueryLog)
+- Periodically and at exit, the hottest entries are written to a local
+  file (pickle, atomic replace), with their hard expiry and the namespace
+  generation keys they depend on
+- At boot (MusicConfig.ready, before the worker serves requests) the file
+  is loaded back into the cache; expired entries are skipped
+- Meant for LocMemCache, where every worker starts empty; with Redis the
+  cache outlives restarts and the snapshot is off by default
+- One instance per process, shared by the sync and async services;
+  workers overwrite the same file, last writer wins
+"""
+
+import os
+import time
+import atexit
+import pickle
+import logging
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .namespaces import NAMESPACES, CacheNamespaces
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+class HotKeySnapshot:
+    def __init__(self, path: str, enabled: bool = True, max_entries: int = 5000,
+                 interval: float = 300):
+        self.path = str(path)
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._hits_since_save = 0
+        self._started = False
+        self._stop = threading.Event()
+        self._export: Optional[Callable[[List[str]], Dict[str, tuple]]] = None
+        self._stats = {"loaded": 0, "load_skipped": 0, "load_ms": 0.0, "saves": 0, "saved": 0, "save_ms": 0.0}
+
+    # --------------------
+    # HIT COUNTS
+    # --------------------
+    def hit(self, key: str):
+        """Count a lookup served from the cache."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._hits[key] += 1
+            self._hits_since_save += 1
+            if len(self._hits) > 4 * self.max_entries:
+                self._hits = Counter(dict(self._hits.most_common(2 * self.max_entries)))
+
+    # --------------------
+    # SAVE
+    # --------------------
+    def save(self) -> int:
+        """Write the hottest entries still in the cache; returns how many."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            if not self._hits_since_save or self._export is None:
+                return 0  # nothing new; keep the previous file
+            hits = self._hits.most_common(self.max_entries)
+            self._hits_since_save = 0
+
+        start = time.perf_counter()
+        found = self._export([key for key, _ in hits])
+        entries = [(key, *found[key], count) for key, count in hits if key in found]
+
+        gen_keys = [f"{CacheNamespaces.GEN_PREFIX}:{name}" for name in NAMESPACES]
+        snapshot = {
+            "version": FORMAT_VERSION,
+            "saved_at": time.time(),
+            "generations": cache.get_many(gen_keys),
+            "entries": entries,
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Cache snapshot save failed ({self.path}): {e}")
+            return 0
+
+        self._stats["saves"] += 1
+        self._stats["saved"] = len(entries)
+        self._stats["save_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return len(entries)
+
+    # --------------------
+    # LOAD
+    # --------------------
+    def load(self) -> int:
+        """Put the snapshot's unexpired entries back in the cache; returns how many."""
+        if not self.enabled:
+            return 0
+        start = time.perf_counter()
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:  # truncated or from an incompatible version
+            logger.error(f"Cache snapshot load failed ({self.path}): {e}")
+            return 0
+        if not isinstance(snapshot, dict) or snapshot.get("version") != FORMAT_VERSION:
+            return 0
+
+        # Generations first: the snapshot's keys embed them. Never roll back
+        # one this worker already has.
+        for gen_key, gen in snapshot["generations"].items():
+            if not cache.add(gen_key, gen, timeout=None) and cache.get(gen_key, 0) < gen:
+                cache.set(gen_key, gen, timeout=None)
+
+        now = time.time()
+        loaded = skipped = 0
+        with self._lock:
+            # Coldest first: a cache that culls its oldest entries keeps the hottest
+            for key, entry, expires_at, count in reversed(snapshot["entries"]):
+                if expires_at <= now:
+                    skipped += 1
+                    continue
+                cache.set(key, entry, timeout=expires_at - now)
+                # Half the old count: old favourites rank high but can be overtaken
+                self._hits[key] += count // 2
+                loaded += 1
+
+        self._stats["loaded"] = loaded
+        self._stats["load_skipped"] = skipped
+        self._stats["load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(f"Cache snapshot: restored {loaded} entries in {self._stats['load_ms']} ms")
+        return loaded
+
+    # --------------------
+    # SCHEDULER
+    # --------------------
+    def start(self, export: Callable[[List[str]], Dict[str, tuple]]):
+        """
+        Save every interval on a daemon thread and once more at exit.
+
+        export(keys) returns key -> (cache entry, hard expiry as epoch
+        seconds) for the keys worth keeping.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._export = export
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._loop, name="jio-snapshot", daemon=True).start()
+        atexit.register(self._save_quietly)
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._save_quietly()
+
+    def _save_quietly(self):
+        try:
+            self.save()
+        except Exception as e:
+            logger.error(f"Cache snapshot save failed: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            tracked = len(self._hits)
+        return dict(
+            self._stats,
+            enabled=self.enabled,
+            path=self.path,
+            tracked_keys=tracked,
+            max_entries=self.max_entries,
+            interval_seconds=self.interval,
+        )
+
+
+_default: Optional[HotKeySnapshot] = None
+_default_lock = threading.Lock()
+
+
+def hot_key_snapshot() -> HotKeySnapshot:
+    """The process-wide snapshot, configured from JIOSAAVN_SNAPSHOT."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            sn = getattr(settings, "JIOSAAVN_SNAPSHOT", {})
+            _default = HotKeySnapshot(
+                path=sn.get("PATH", os.path.join(settings.BASE_DIR, "cache_snapshot.pickle")),
+                enabled=sn.get("ENABLED", False),
+                max_entries=sn.get("MAX_ENTRIES", 5000),
+                interval=sn.get("INTERVAL", 300),
+            )
+        return _default
@@ -0,0 +1,115 @@
+"""
+Compact song records for the song:{id} cache.
+- A plain tuple tagged with a layout version, built once at ingest
+- Holds only what song details, streams, lyrics and related songs need
+- Pickles far smaller than the raw upstream dict (no nested album/artist
+  objects, no unused fields, shared URL prefixes stored once)
+- Records with another version are treated as cache misses
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+RECORD_VERSION = 1
+
+# Tuple layout (version 1)
+(
+    VERSION, ID, TITLE, ARTIST, PRIMARY_ARTISTS, ALBUM, ALBUM_ID, IMAGES,
+    DURATION, YEAR, LANGUAGE, HAS_LYRICS, PLAY_COUNT, URL, EXPLICIT, DOWNLOADS,
+) = range(16)
+
+
+def _pack_urls(items: Any) -> Any:
+    """
+    [{"quality": q, "url": u}, ...] -> (prefix, suffix, ((q, middle), ...)).
+
+    The image sizes and download qualities of a song share most of their
+    URL, so only the part that differs is kept. Other shapes are stored as is.
+    """
+    if not isinstance(items, list) or not items:
+        return items
+    for item in items:
+        if not isinstance(item, dict) or set(item) != {"quality", "url"} or not isinstance(item["url"], str):
+            return items
+
+    urls = [item["url"] for item in items]
+    prefix = os.path.commonprefix(urls)
+    rests = [url[len(prefix):] for url in urls]
+    suffix = os.path.commonprefix([rest[::-1] for rest in rests])[::-1]
+    middles = [rest[:len(rest) - len(suffix)] for rest in rests]
+    return (prefix, suffix, tuple((item["quality"], middle) for item, middle in zip(items, middles)))
+
+
+def _unpack_urls(packed: Any) -> Any:
+    """Inverse of _pack_urls()."""
+    if not isinstance(packed, tuple):
+        return packed
+    prefix, suffix, parts = packed
+    return [{"quality": quality, "url": prefix + middle + suffix} for quality, middle in parts]
+
+
+def pack_song(item: dict, artist: str) -> tuple:
+    """Build a record from a raw upstream song dict and its display artist."""
+    album = item.get("album", {})
+    return (
+        RECORD_VERSION,
+        item.get("id"),
+        item.get("name"),
+        artist,
+        item.get("primaryArtists"),
+        album.get("name") if album else None,
+        album.get("id") if album else None,
+        _pack_urls(item.get("image", [])),
+        item.get("duration"),
+        item.get("year"),
+        item.get("language"),
+        item.get("hasLyrics", False),
+        item.get("playCount"),
+        item.get("url"),
+        item.get("explicitContent", False),
+        _pack_urls(item.get("downloadUrl", [])),
+    )
+
+
+def is_record(value: Any) -> bool:
+    return isinstance(value, tuple) and len(value) > VERSION and value[VERSION] == RECORD_VERSION
+
+
+def images(record: tuple) -> Any:
+    return _unpack_urls(record[IMAGES])
+
+
+def downloads(record: tuple) -> list:
+    """Download URLs as [{"quality": ..., "url": ...}]."""
+    return _unpack_urls(record[DOWNLOADS]) or []
+
+
+def best_image(record: tuple) -> Optional[str]:
+    """Highest quality image URL (the last one)."""
+    items = record[IMAGES]
+    if isinstance(items, tuple):
+        prefix, suffix, parts = items
+        return prefix + parts[-1][1] + suffix
+    if not items:
+        return None
+    return items[-1].get("url") if isinstance(items[-1], dict) else items[-1]
+
+
+def to_dict(record: tuple) -> Dict[str, Any]:
+    """Public song details shape returned by the API."""
+    return {
+        "id": record[ID],
+        "title": record[TITLE],
+        "artist": record[ARTIST],
+        "album": record[ALBUM],
+        "album_id": record[ALBUM_ID],
+        "image": best_image(record),
+        "images": images(record),
+        "duration": record[DURATION],
+        "year": record[YEAR],
+        "language": record[LANGUAGE],
+        "has_lyrics": record[HAS_LYRICS],
+        "play_count": record[PLAY_COUNT],
+        "url": record[URL],
+        "explicit": record[EXPLICIT],
+    }
@@ -0,0 +1,190 @@
+"""
+How /api/stream/<id>/ hands audio to a client, chosen per request.
+- proxy: relay the CDN bytes through this server (stream_proxy.py; the
+  only mode the app's players understand, and the default)
+- redirect: a 302 to the song's CDN URL, so the audio never passes
+  through this server
+- descriptor: JSON naming the CDN URL, its quality and duration, for
+  clients that fetch the URL themselves (the web player reads "url")
+- Redirects and descriptors are short-lived (Cache-Control max-age=TTL)
+  and carry a signed proxy fallback URL (Link header / "proxy_url"),
+  valid for TTL: a client that cannot reach the CDN gets the same file
+  relayed without another song lookup. The token is signed because it
+  names the URL this server fetches
+- Mode per request: ?delivery=proxy from the client first, then the first
+  network condition it reports with a rule (NETWORK_MODES: Save-Data,
+  the ECT client hint as "ect-2g", X-Network-Type), then its client type
+  (CLIENT_MODES: X-Client-Type or ?client=, else "app", "web" or "other"
+  from the User-Agent), then MODE
+- Responses per mode, client type and network condition; bytes sent
+  past this server are estimated from duration and bitrate (the CDN's
+  own byte count never reaches it)
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.http import HttpResponseRedirect, JsonResponse
+
+from .audio_cache import parse_byte_range
+
+MODES = ("proxy", "redirect", "descriptor")
+
+# User-Agent markers of the app's audio players (ExoPlayer, AVPlayer, Dart's HTTP client)
+APP_AGENTS = ("ExoPlayer", "AppleCoreMedia", "Dart/", "okhttp")
+
+SIGNING_SALT = "music.stream-delivery"
+
+
+def client_type(request, known=()) -> str:
+    """X-Client-Type header or ?client= if it names a known type, else guessed from the User-Agent."""
+    explicit = (request.headers.get("X-Client-Type") or request.GET.get("client") or "").strip().lower()
+    if explicit in known or explicit in ("app", "web"):
+        return explicit
+    agent = request.headers.get("User-Agent", "")
+    if any(marker in agent for marker in APP_AGENTS):
+        return "app"
+    if agent.startswith("Mozilla/"):
+        return "web"
+    return "other"
+
+
+def network_conditions(request) -> List[str]:
+    """Conditions the client reports about its network, most specific first."""
+    conditions = []
+    network = request.headers.get("X-Network-Type", "").strip().lower()
+    if network:
+        conditions.append(network[:32])
+    ect = request.headers.get("ECT", "").strip().lower()
+    if ect:
+        conditions.append(f"ect-{ect[:16]}")
+    if request.headers.get("Save-Data", "").strip().lower() == "on":
+        conditions.append("save-data")
+    return conditions
+
+
+def estimated_bytes(source: Dict[str, Any], byte_range: Optional[str]) -> int:
+    """Bytes a client fetches from the CDN for a request: duration x bitrate, cut to the Range."""
+    try:
+        size = int(float(source.get("duration") or 0) * int(source["quality"].removesuffix("kbps")) * 125)
+    except (KeyError, ValueError):
+        return 0
+    span = parse_byte_range(byte_range, size)
+    return span[1] - span[0] + 1 if span else 0
+
+
+class StreamDelivery:
+    def __init__(self, mode: str = "proxy", client_modes: Optional[Dict[str, str]] = None,
+                 network_modes: Optional[Dict[str, str]] = None, ttl: int = 300):
+        self.mode = mode if mode in MODES else "proxy"
+        self.client_modes = {k: v for k, v in (client_modes or {}).items() if v in MODES}
+        self.network_modes = {k: v for k, v in (network_modes or {}).items() if v in MODES}
+        self.ttl = ttl
+        self.signer = signing.TimestampSigner(salt=SIGNING_SALT)
+
+        self._lock = threading.Lock()
+        self._modes = {mode: {"responses": 0, "bytes_estimated": 0} for mode in MODES}  # no estimate for proxy
+        self._clients: Dict[str, Dict[str, int]] = {}
+        self._networks: Dict[str, Dict[str, int]] = {}
+        self._stats = {"fallback_tokens": 0, "bad_tokens": 0}
+
+    @classmethod
+    def from_settings(cls) -> "StreamDelivery":
+        sd = getattr(settings, "JIOSAAVN_STREAM_DELIVERY", {})
+        return cls(
+            mode=sd.get("MODE", "proxy"),
+            client_modes=sd.get("CLIENT_MODES", {}),
+            network_modes=sd.get("NETWORK_MODES", {}),
+            ttl=sd.get("TTL", 300),
+        )
+
+    def choose(self, request) -> Tuple[str, str, Optional[str]]:
+        """(mode, client type, network condition that decided it or None) for a stream request."""
+        client = client_type(request, self.client_modes)
+        if request.GET.get("delivery") == "proxy":
+            return "proxy", client, None
+        for condition in network_conditions(request):
+            if condition in self.network_modes:
+                return self.network_modes[condition], client, condition
+        return self.client_modes.get(client, self.mode), client, None
+
+    def record(self, mode: str, client: str, network: Optional[str], size: int = 0):
+        with self._lock:
+            self._modes[mode]["responses"] += 1
+            self._modes[mode]["bytes_estimated"] += size
+            counts = self._clients.setdefault(client, dict.fromkeys(MODES, 0))
+            counts[mode] += 1
+            if network is not None:
+                counts = self._networks.setdefault(network, dict.fromkeys(MODES, 0))
+                counts[mode] += 1
+
+    # --------------------
+    # PROXY FALLBACK
+    # --------------------
+    def fallback_url(self, request, song_id: str, source: Dict[str, Any]) -> str:
+        """This endpoint, proxying exactly source's URL for the next TTL seconds."""
+        token = self.signer.sign_object({"s": song_id, "u": source["url"]})
+        query = urlencode({"quality": source["quality"].removesuffix("kbps"), "delivery": "proxy", "token": token})
+        return request.build_absolute_uri(f"{request.path}?{query}")
+
+    def fallback_source(self, request, song_id: str) -> Optional[str]:
+        """The CDN URL a proxy fallback request's token names, if it is valid for song_id."""
+        token = request.GET.get("token")
+        if not token:
+            return None
+        try:
+            signed = self.signer.unsign_object(token, max_age=self.ttl)
+        except signing.BadSignature:  # also SignatureExpired
+            signed = None
+        with self._lock:
+            if not isinstance(signed, dict) or signed.get("s") != song_id:
+                self._stats["bad_tokens"] += 1
+                return None
+            self._stats["fallback_tokens"] += 1
+        return signed.get("u")
+
+    # --------------------
+    # RESPONSES
+    # --------------------
+    def respond(self, request, song_id: str, source: Dict[str, Any], mode: str, client: str,
+                network: Optional[str]):
+        """The redirect or descriptor response for a resolved song (mode is not "proxy")."""
+        byte_range = request.META.get("HTTP_RANGE")
+        self.record(mode, client, network, estimated_bytes(source, byte_range))
+        fallback = self.fallback_url(request, song_id, source)
+        if mode == "redirect":
+            response = HttpResponseRedirect(source["url"])
+            response["Link"] = f'<{fallback}>; rel="alternate"'
+        else:
+            response = JsonResponse({
+                "id": song_id,
+                "url": source["url"],
+                "quality": source["quality"],
+                "duration": source.get("duration"),
+                "expires_in": self.ttl,
+                "proxy_url": fallback,
+            })
+        response["Cache-Control"] = f"private, max-age={self.ttl}"
+        response["Vary"] = "User-Agent, X-Client-Type, X-Network-Type, ECT, Save-Data"
+        return response
+
+    def stats(self, proxied_bytes: int = 0) -> Dict:
+        """Counters; proxied_bytes is what the stream proxy relayed (its own count)."""
+        with self._lock:
+            return dict(
+                self._stats,
+                proxied_bytes=proxied_bytes,
+                redirected_bytes_estimated=sum(
+                    counts["bytes_estimated"] for mode, counts in self._modes.items() if mode != "proxy"
+                ),
+                modes={mode: dict(counts) for mode, counts in self._modes.items()},
+                clients={client: dict(counts) for client, counts in self._clients.items()},
+                networks={network: dict(counts) for network, counts in self._networks.items()},
+                mode=self.mode,
+                client_modes=self.client_modes,
+                network_modes=self.network_modes,
+                ttl=self.ttl,
+            )
@@ -0,0 +1,510 @@
+"""
+CDN connections and timing for the audio stream proxy (/api/stream/<id>/).
+- Audio downloads get their own keep-alive pools, apart from the API
+  session: a requests.Session for the sync view and one aiohttp session
+  per event loop for the async view, both capped per CDN host
+- Relay chunk size and socket read buffer come from settings; a chunk is
+  relayed as soon as any bytes arrive, never held back to fill it
+- Time to first byte per stream, split into plays and seeks (a Range not
+  starting at byte 0): from the request reaching the view and from the
+  CDN request being sent, in ServiceMetrics' latency buckets
+- Connections opened vs reused, bytes relayed (and how many came from
+  the audio cache) and interrupted streams, per process; each response
+  also carries its own lookup and CDN times (Server-Timing)
+- Downloads can be stored through an audio cache RangeWriter as they are
+  relayed, and cached songs stitched from disk and CDN gaps (stitch)
+- A download shared by concurrent listeners (services/shared_download.py)
+  is read by a pump at CDN speed and followed by each listener at its own
+  pace (pump / follow)
+"""
+
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from bisect import bisect_left
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import aiohttp
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from .audio_cache import AudioEntry, RangeWriter, parse_content_range
+from .shared_download import SharedDownload
+from .metrics import BUCKET_LABELS, LATENCY_BUCKETS_MS, latency_percentile
+
+logger = logging.getLogger(__name__)
+
+STREAM_KINDS = ("play", "seek")
+CDN_HEADERS = {"User-Agent": "VILLEN-Music/1.0", "Accept-Encoding": "identity"}
+
+
+def stream_kind(byte_range: Optional[str]) -> str:
+    """"seek" for a Range that does not start at byte 0, else "play"."""
+    if not byte_range:
+        return "play"
+    first = byte_range.strip()[len("bytes="):].partition("-")[0].strip()
+    return "play" if first == "0" else "seek"
+
+
+def server_timing(started: float, sent: Optional[float] = None, source: str = "disk") -> str:
+    """
+    Server-Timing header value: song lookup and CDN response header times,
+    or the time to find bytes that need no CDN request (source: disk, shared).
+    """
+    now = time.perf_counter()
+    if sent is None:
+        return f"{source};dur={(now - started) * 1000:.1f}"
+    return f"lookup;dur={(sent - started) * 1000:.1f}, cdn;dur={(now - sent) * 1000:.1f}"
+
+
+class GapMismatch(Exception):
+    """The CDN's answer to a gap request does not fit the cached song."""
+
+
+def _serves_gap(status: int, headers, first: int, size: int) -> bool:
+    """Whether a CDN response is the requested gap of the same size of file."""
+    parsed = parse_content_range(headers.get("Content-Range", "")) if status == 206 else None
+    return parsed is not None and parsed[0] == first and parsed[2] == size
+
+
+def _new_timing() -> Dict:
+    return {
+        "streams": 0,
+        "ttfb_ms_total": 0.0,
+        "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        "upstream_requests": 0,
+        "upstream_ttfb_ms_total": 0.0,
+        "upstream_histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+    }
+
+
+class StreamProxy:
+    def __init__(self, max_connections: int = 4096, max_per_host: int = 2048, keepalive: float = 60,
+                 connect_timeout: float = 10, read_timeout: float = 30,
+                 chunk_size: int = 64 * 1024, read_buffer: int = 256 * 1024):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.chunk_size = chunk_size
+        self.read_buffer = read_buffer
+
+        self._lock = threading.Lock()
+        self._timing = {kind: _new_timing() for kind in STREAM_KINDS}
+        self._stats = {
+            "bytes": 0, "bytes_from_disk": 0, "interrupted": 0,
+            "async_connections_opened": 0, "async_connections_reused": 0,
+        }
+
+        # Sync view: one pool per CDN host, up to max_per_host idle connections each
+        self.session = requests.Session()
+        self.session.headers.update(CDN_HEADERS)
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max_per_host, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Async view: aiohttp sessions are bound to the loop they were created on
+        self._clients = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_settings(cls) -> "StreamProxy":
+        sp = getattr(settings, "JIOSAAVN_STREAM_PROXY", {})
+        return cls(
+            max_connections=sp.get("MAX_CONNECTIONS", 4096),
+            max_per_host=sp.get("MAX_PER_HOST", 2048),
+            keepalive=sp.get("KEEPALIVE", 60),
+            connect_timeout=sp.get("CONNECT_TIMEOUT", 10),
+            read_timeout=sp.get("READ_TIMEOUT", 30),
+            chunk_size=sp.get("CHUNK_SIZE", 64 * 1024),
+            read_buffer=sp.get("READ_BUFFER", 256 * 1024),
+        )
+
+    # --------------------
+    # SYNC
+    # --------------------
+    def open(self, url: str, byte_range: Optional[str] = None) -> requests.Response:
+        """Start a CDN download (Range forwarded); the body is read by relay()."""
+        headers = {"Range": byte_range} if byte_range else None
+        return self.session.get(
+            url, stream=True, headers=headers, timeout=(self.connect_timeout, self.read_timeout),
+        )
+
+    def _body(self, upstream: requests.Response) -> Iterator[bytes]:
+        """The download's bytes as they arrive; the connection is released however it ends."""
+        try:
+            while True:
+                chunk = upstream.raw.read1(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            upstream.close()
+
+    def relay(self, upstream: requests.Response, song_id: str, kind: str,
+              started: float, sent: float, writer: Optional[RangeWriter] = None) -> Iterator[bytes]:
+        """Yield a CDN download to the client, storing it through writer (audio cache) if given."""
+        relayed = 0
+        try:
+            for chunk in self._body(upstream):
+                if not relayed:
+                    self._first_byte(kind, started, sent)
+                relayed += len(chunk)
+                if writer is not None:
+                    writer.write(chunk)
+                yield chunk
+        except (urllib3.exceptions.HTTPError, OSError) as e:
+            self._interrupted(song_id, e)
+        finally:
+            upstream.close()
+            self._relayed(relayed)
+            if writer is not None:
+                writer.commit()
+
+    def stitch(self, entry: AudioEntry, first: int, last: int, song_id: str, kind: str, started: float,
+               url: Optional[str] = None, writer: Optional[RangeWriter] = None) -> Iterator[bytes]:
+        """
+        Yield bytes first..last of a cached song: stored runs from its file,
+        gaps from CDN Range requests to url (stored through writer).
+        """
+        relayed = from_disk = 0
+        try:
+            for run_first, run_last, stored in entry.segments(first, last):
+                if stored:
+                    pieces = entry.iter_range(run_first, run_last, self.chunk_size)
+                else:
+                    sent = time.perf_counter()
+                    upstream = self.open(url, f"bytes={run_first}-{run_last}")
+                    if not _serves_gap(upstream.status_code, upstream.headers, run_first, entry.size):
+                        upstream.close()
+                        raise GapMismatch(f"CDN answered {upstream.status_code} "
+                                          f"{upstream.headers.get('Content-Range')}")
+                    if writer is not None:
+                        writer.seek(run_first)
+                    pieces = self._body(upstream)
+                awaiting_cdn = not stored
+                for chunk in pieces:
+                    if not relayed:
+                        self._first_byte(kind, started, None)
+                    if stored:
+                        from_disk += len(chunk)
+                    else:
+                        if awaiting_cdn:
+                            self._upstream_first_byte(sent, kind)
+                            awaiting_cdn = False
+                        if writer is not None:
+                            writer.write(chunk)
+                    relayed += len(chunk)
+                    yield chunk
+        except (requests.RequestException, urllib3.exceptions.HTTPError, OSError, GapMismatch) as e:
+            self._interrupted(song_id, e)
+        finally:
+            entry.close()
+            self._relayed(relayed, from_disk)
+            if writer is not None:
+                writer.commit()
+
+    def pump(self, download: SharedDownload, upstream: requests.Response, song_id: str, kind: str,
+             sent: float, writer: Optional[RangeWriter] = None):
+        """Read a shared CDN download into its buffer on a thread of its own, at CDN speed."""
+        download.pump = threading.Thread(
+            target=self._pump, args=(download, upstream, song_id, kind, sent, writer),
+            name=f"stream-pump-{song_id}", daemon=True,
+        )
+        download.pump.start()
+
+    def _pump(self, download: SharedDownload, upstream: requests.Response, song_id: str, kind: str,
+              sent: float, writer: Optional[RangeWriter]):
+        try:
+            for chunk in self._body(upstream):
+                if download.end == download.first:
+                    self._upstream_first_byte(sent, kind)
+                if writer is not None:
+                    writer.write(chunk)
+                download.append(chunk)
+                if download.abandoned:
+                    break
+        except (urllib3.exceptions.HTTPError, OSError) as e:
+            self._interrupted(song_id, e)
+        finally:
+            upstream.close()
+            download.finish()
+            if writer is not None:
+                writer.commit()
+
+    def follow(self, download: SharedDownload, first: int, last: int, song_id: str, kind: str,
+               started: float) -> Iterator[bytes]:
+        """Yield bytes first..last of a shared download as they arrive, at this listener's pace."""
+        relayed = 0
+        download.subscribe()
+        try:
+            position = first
+            while position <= last:
+                done = download.done  # read before the bytes: nothing arrives after done
+                pieces = download.read(position, last)
+                if not pieces:
+                    if done:
+                        break  # the download stopped short
+                    if not download.wait(lambda: download.end > position or download.done, self.read_timeout):
+                        raise TimeoutError(f"no bytes past {position} in {self.read_timeout}s")
+                    continue
+                for piece in pieces:
+                    if not relayed:
+                        self._first_byte(kind, started, None)
+                    relayed += len(piece)
+                    position += len(piece)
+                    yield piece
+        except TimeoutError as e:
+            self._interrupted(song_id, e)
+        finally:
+            download.unsubscribe(relayed)
+            self._relayed(relayed)
+
+    # --------------------
+    # ASYNC
+    # --------------------
+    def _get_client(self) -> aiohttp.ClientSession:
+        """Return the ClientSession for the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.closed:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection("async_connections_opened"))
+            trace.on_connection_reuseconn.append(self._on_connection("async_connections_reused"))
+            client = aiohttp.ClientSession(
+                headers=CDN_HEADERS,
+                # No overall deadline (a song plays for minutes); "connect" includes waiting for the pool
+                timeout=aiohttp.ClientTimeout(total=None, connect=self.connect_timeout,
+                                              sock_read=self.read_timeout),
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections, limit_per_host=self.max_per_host,
+                    keepalive_timeout=self.keepalive,
+                ),
+                auto_decompress=False,
+                read_bufsize=self.read_buffer,
+                trace_configs=[trace],
+            )
+            self._clients[loop] = client
+        return client
+
+    def _on_connection(self, counter: str):
+        async def hook(session, context, params):
+            with self._lock:
+                self._stats[counter] += 1
+        return hook
+
+    async def aopen(self, url: str, byte_range: Optional[str] = None) -> aiohttp.ClientResponse:
+        """Start a CDN download (Range forwarded); the body is read by arelay()."""
+        headers = {"Range": byte_range} if byte_range else None
+        return await self._get_client().get(url, headers=headers)
+
+    async def arelay(self, upstream: aiohttp.ClientResponse, song_id: str, kind: str, started: float,
+                     sent: float, writer: Optional[RangeWriter] = None) -> AsyncIterator[bytes]:
+        """Async relay() for aiohttp downloads (also released on client disconnect)."""
+        relayed = 0
+        try:
+            async for chunk in upstream.content.iter_chunked(self.chunk_size):
+                if not relayed:
+                    self._first_byte(kind, started, sent)
+                relayed += len(chunk)
+                if writer is not None:
+                    writer.write(chunk)
+                yield chunk
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            self._interrupted(song_id, e)
+        finally:
+            upstream.release()
+            self._relayed(relayed)
+            if writer is not None:
+                writer.commit()
+
+    async def astitch(self, entry: AudioEntry, first: int, last: int, song_id: str, kind: str, started: float,
+                      url: Optional[str] = None, writer: Optional[RangeWriter] = None) -> AsyncIterator[bytes]:
+        """
+        Async stitch(). Stored runs are read on the event loop: pread of a
+        recently used file is a page-cache copy, cheaper than a thread hop.
+        """
+        relayed = from_disk = 0
+        try:
+            for run_first, run_last, stored in entry.segments(first, last):
+                if stored:
+                    for chunk in entry.iter_range(run_first, run_last, self.chunk_size):
+                        if not relayed:
+                            self._first_byte(kind, started, None)
+                        relayed += len(chunk)
+                        from_disk += len(chunk)
+                        yield chunk
+                    continue
+
+                sent = time.perf_counter()
+                upstream = await self.aopen(url, f"bytes={run_first}-{run_last}")
+                try:
+                    if not _serves_gap(upstream.status, upstream.headers, run_first, entry.size):
+                        raise GapMismatch(f"CDN answered {upstream.status} {upstream.headers.get('Content-Range')}")
+                    if writer is not None:
+                        writer.seek(run_first)
+                    awaiting_cdn = True
+                    async for chunk in upstream.content.iter_chunked(self.chunk_size):
+                        if not relayed:
+                            self._first_byte(kind, started, None)
+                        if awaiting_cdn:
+                            self._upstream_first_byte(sent, kind)
+                            awaiting_cdn = False
+                        relayed += len(chunk)
+                        if writer is not None:
+                            writer.write(chunk)
+                        yield chunk
+                finally:
+                    upstream.release()
+        except (asyncio.TimeoutError, aiohttp.ClientError, OSError, GapMismatch) as e:
+            self._interrupted(song_id, e)
+        finally:
+            entry.close()
+            self._relayed(relayed, from_disk)
+            if writer is not None:
+                writer.commit()
+
+    def apump(self, download: SharedDownload, upstream: aiohttp.ClientResponse, song_id: str, kind: str,
+              sent: float, writer: Optional[RangeWriter] = None):
+        """pump() as a task on the running event loop."""
+        download.pump = asyncio.get_running_loop().create_task(
+            self._apump(download, upstream, song_id, kind, sent, writer),
+        )
+
+    async def _apump(self, download: SharedDownload, upstream: aiohttp.ClientResponse, song_id: str,
+                     kind: str, sent: float, writer: Optional[RangeWriter]):
+        try:
+            async for chunk in upstream.content.iter_chunked(self.chunk_size):
+                if download.end == download.first:
+                    self._upstream_first_byte(sent, kind)
+                if writer is not None:
+                    writer.write(chunk)
+                download.append(chunk)
+                if download.abandoned:
+                    break
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            self._interrupted(song_id, e)
+        finally:
+            upstream.release()
+            download.finish()
+            if writer is not None:
+                writer.commit()
+
+    async def afollow(self, download: SharedDownload, first: int, last: int, song_id: str, kind: str,
+                      started: float) -> AsyncIterator[bytes]:
+        """Async follow() of a download pumped on the running event loop."""
+        relayed = 0
+        download.subscribe()
+        try:
+            position = first
+            while position <= last:
+                done = download.done
+                pieces = download.read(position, last)
+                if not pieces:
+                    if done:
+                        break
+                    if not await download.await_change(
+                        lambda: download.end > position or download.done, self.read_timeout,
+                    ):
+                        raise asyncio.TimeoutError(f"no bytes past {position} in {self.read_timeout}s")
+                    continue
+                for piece in pieces:
+                    if not relayed:
+                        self._first_byte(kind, started, None)
+                    relayed += len(piece)
+                    position += len(piece)
+                    yield piece
+        except asyncio.TimeoutError as e:
+            self._interrupted(song_id, e)
+        finally:
+            download.unsubscribe(relayed)
+            self._relayed(relayed)
+
+    async def aclose(self):
+        """Close the session bound to the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    # --------------------
+    # STATS
+    # --------------------
+    def _first_byte(self, kind: str, started: float, sent: Optional[float]):
+        """Time to first byte of a stream; sent is None when the bytes do not start at the CDN."""
+        now = time.perf_counter()
+        ttfb_ms = (now - started) * 1000
+        with self._lock:
+            timing = self._timing[kind]
+            timing["streams"] += 1
+            timing["ttfb_ms_total"] += ttfb_ms
+            timing["histogram"][bisect_left(LATENCY_BUCKETS_MS, ttfb_ms)] += 1
+        if sent is not None:
+            self._upstream_first_byte(sent, kind)
+
+    def _upstream_first_byte(self, sent: float, kind: str):
+        """Time from a CDN request to its first byte."""
+        upstream_ms = (time.perf_counter() - sent) * 1000
+        with self._lock:
+            timing = self._timing[kind]
+            timing["upstream_requests"] += 1
+            timing["upstream_ttfb_ms_total"] += upstream_ms
+            timing["upstream_histogram"][bisect_left(LATENCY_BUCKETS_MS, upstream_ms)] += 1
+
+    def served_from_disk(self, kind: str, started: float, size: int):
+        """Count a stream sent whole from the audio cache (its bytes leave via sendfile)."""
+        self._first_byte(kind, started, None)
+        self._relayed(size, size)
+
+    def _relayed(self, size: int, from_disk: int = 0):
+        with self._lock:
+            self._stats["bytes"] += size
+            self._stats["bytes_from_disk"] += from_disk
+
+    def _interrupted(self, song_id: str, error: Exception):
+        logger.error(f"Stream proxy interrupted for {song_id}: {error}")
+        with self._lock:
+            self._stats["interrupted"] += 1
+
+    def _sync_connections(self) -> Dict:
+        """New vs reused connections of the sync pools (urllib3 counts per host pool)."""
+        opened = requests_sent = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                opened += pool.num_connections
+                requests_sent += pool.num_requests
+        return {"sync_connections_opened": opened, "sync_connections_reused": max(0, requests_sent - opened)}
+
+    @staticmethod
+    def _timing_report(timing: Dict) -> Dict:
+        report = {"streams": timing["streams"], "upstream_requests": timing["upstream_requests"]}
+        for name, count, total, histogram in (
+            ("ttfb_ms", "streams", "ttfb_ms_total", "histogram"),
+            ("upstream_ttfb_ms", "upstream_requests", "upstream_ttfb_ms_total", "upstream_histogram"),
+        ):
+            report[name] = {
+                "mean": round(timing[total] / timing[count], 1) if timing[count] else None,
+                "p50": latency_percentile(timing[histogram], 0.50),
+                "p90": latency_percentile(timing[histogram], 0.90),
+                "p99": latency_percentile(timing[histogram], 0.99),
+                "histogram": dict(zip(BUCKET_LABELS, timing[histogram])),
+            }
+        return report
+
+    def stats(self) -> Dict:
+        connections = self._sync_connections()
+        with self._lock:
+            return dict(
+                self._stats,
+                **connections,
+                **{kind: self._timing_report(timing) for kind, timing in self._timing.items()},
+                max_connections=self.max_connections,
+                max_per_host=self.max_per_host,
+                chunk_size=self.chunk_size,
+                read_buffer=self.read_buffer,
+            )
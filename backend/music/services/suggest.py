@@ -0,0 +1,254 @@
+"""
+Search-as-you-type suggestions, answered from process memory.
+- PrefixIndex: sorted array of normalized phrases searched with bisect;
+  every word start is indexed, so "singh" also completes "Arijit Singh"
+- Best completions of every prefix with many matches are precomputed at
+  build time; any other prefix scans a short slice, so a lookup is
+  bounded whatever the catalog size
+- Built from catalog titles and artists plus the popular query log, and
+  rebuilt on a background thread; requests never wait for a build
+- QueryLog: submitted searches counted per worker and shared through the
+  cache (the same snapshot scheme as ServiceMetrics)
+"""
+
+import os
+import time
+import heapq
+import socket
+import logging
+import threading
+from bisect import bisect_left
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+
+from .catalog import TOKEN_RE
+from .housekeeping import sync_shared
+
+logger = logging.getLogger(__name__)
+
+# Ranking weight per phrase kind; artists add one per catalog song
+QUERY_WEIGHT = 5
+TITLE_WEIGHT = 1
+ARTIST_WEIGHT = 1
+
+
+def normalize(text: str) -> str:
+    """Lower-cased words joined by single spaces."""
+    return " ".join(TOKEN_RE.findall(text.lower()))
+
+
+class PrefixIndex:
+    def __init__(self, phrases: Dict[str, list], top: int = 20, scan_limit: int = 128):
+        """phrases: normalized key -> [display text, kind, weight]."""
+        self.top = top
+        self.scan_limit = scan_limit
+
+        self._phrases: List[Tuple[str, str, int]] = [tuple(v) for v in phrases.values()]
+        # One entry per word start: (suffix, phrase number); suffixes that
+        # are the whole phrase rank first
+        entries = []
+        for ref, key in enumerate(phrases):
+            entries.append((key, ref))
+            for pos, char in enumerate(key):
+                if char == " ":
+                    entries.append((key[pos + 1:], ref))
+        entries.sort()
+        lengths = [len(key) for key in phrases]
+        self._keys = [key for key, _ in entries]
+        self._refs = [ref for _, ref in entries]
+        self._starts = [len(key) == lengths[ref] for key, ref in entries]
+
+        # Prefixes matching more than scan_limit entries -> their best entries
+        self._heavy: Dict[str, List[int]] = {}
+        if len(self._keys) > scan_limit:
+            self._collect("", 0, len(self._keys))
+
+    def __len__(self) -> int:
+        return len(self._phrases)
+
+    def _score(self, i: int) -> tuple:
+        # Whole-phrase matches first, then weight
+        return (self._starts[i], self._phrases[self._refs[i]][2])
+
+    def _best(self, indices: Iterable[int]) -> List[int]:
+        """Best entries, at most one per phrase, best first."""
+        best = {}
+        for i in indices:
+            ref = self._refs[i]
+            if ref not in best or self._score(i) > self._score(best[ref]):
+                best[ref] = i
+        return heapq.nlargest(self.top, best.values(), key=self._score)
+
+    def _collect(self, prefix: str, lo: int, hi: int) -> List[int]:
+        """
+        Best entries for keys[lo:hi] (all keys starting with prefix).
+
+        Small ranges are scanned; heavy ones merge the best entries of each
+        next-character child and are memoized, so no lookup ever scans more
+        than scan_limit entries.
+        """
+        if hi - lo <= self.scan_limit:
+            return self._best(range(lo, hi))
+        depth = len(prefix)
+        candidates = []
+        i = lo
+        while i < hi and len(self._keys[i]) == depth:
+            candidates.append(i)  # the prefix itself is a key
+            i += 1
+        while i < hi:
+            child = prefix + self._keys[i][depth]
+            j = bisect_left(self._keys, child[:-1] + chr(ord(child[-1]) + 1), i, hi)
+            candidates.extend(self._collect(child, i, j))
+            i = j
+        self._heavy[prefix] = best = self._best(candidates)
+        return best
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """Best phrases containing a word that starts with prefix."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        best = self._heavy.get(prefix)
+        if best is None:
+            lo = bisect_left(self._keys, prefix)
+            hi = bisect_left(self._keys, prefix + "\uffff", lo, min(len(self._keys), lo + self.scan_limit + 1))
+            best = self._best(range(lo, hi))
+        return [{"text": self._phrases[self._refs[i]][0], "type": self._phrases[self._refs[i]][1]} for i in best[:limit]]
+
+
+class QueryLog:
+    PREFIX = "jio:queries"
+    WORKERS_KEY = "jio:queries:workers"
+
+    def __init__(self, publish_interval: float = 60, snapshot_ttl: float = 7 * 24 * 3600,
+                 max_queries: int = 5000):
+        self.publish_interval = publish_interval
+        self.snapshot_ttl = snapshot_ttl
+        self.max_queries = max_queries
+
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._published_at = time.monotonic()
+
+    @property
+    def worker_id(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def record(self, query: str):
+        """Count a submitted search."""
+        query = normalize(query)
+        if len(query) < 2:
+            return
+        with self._lock:
+            self._counts[query] += 1
+            if len(self._counts) > 2 * self.max_queries:
+                self._counts = Counter(dict(self._counts.most_common(self.max_queries)))
+        now = time.monotonic()
+        if now - self._published_at >= self.publish_interval:
+            self._published_at = now
+            sync_shared(self.publish, self.async_publish)
+
+    def publish(self):
+        """Write this worker's counts and register it in the worker list."""
+        with self._lock:
+            counts = dict(self._counts.most_common(self.max_queries))
+        at = time.time()
+        cache.set(f"{self.PREFIX}:{self.worker_id}", counts, timeout=self.snapshot_ttl)
+        # Read-modify-write; a lost update is repaired by the next publish
+        cache.set(self.WORKERS_KEY, self._live_workers(cache.get(self.WORKERS_KEY), at), timeout=None)
+
+    async def async_publish(self):
+        with self._lock:
+            counts = dict(self._counts.most_common(self.max_queries))
+        at = time.time()
+        await cache.aset(f"{self.PREFIX}:{self.worker_id}", counts, timeout=self.snapshot_ttl)
+        await cache.aset(self.WORKERS_KEY, self._live_workers(await cache.aget(self.WORKERS_KEY), at), timeout=None)
+
+    def _live_workers(self, workers: Optional[Dict], at: float) -> Dict:
+        workers = dict(workers or {}, **{self.worker_id: at})
+        return {w: t for w, t in workers.items() if t >= at - self.snapshot_ttl}
+
+    def popular(self, n: int) -> List[Tuple[str, int]]:
+        """Most searched queries over every live worker (this one included)."""
+        self.publish()
+        workers = cache.get(self.WORKERS_KEY) or {}
+        total = Counter()
+        for counts in cache.get_many([f"{self.PREFIX}:{w}" for w in workers]).values():
+            total.update(counts)
+        return total.most_common(n)
+
+
+class SearchSuggestions:
+    def __init__(self, catalog, query_log: QueryLog, submit: Callable,
+                 rebuild_interval: float = 300, max_catalog_songs: int = 200_000,
+                 max_queries: int = 5000):
+        self.catalog = catalog
+        self.query_log = query_log
+        # submit(fn) runs fn on a background thread
+        self.submit = submit
+        self.rebuild_interval = rebuild_interval
+        self.max_catalog_songs = max_catalog_songs
+        self.max_queries = max_queries
+
+        self._index = PrefixIndex({})
+        self._lock = threading.Lock()
+        self._building = False
+        self._built_at = float("-inf")
+        self._stats = {"builds": 0, "build_ms": 0.0, "requests": 0}
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        self._maybe_rebuild()
+        self._stats["requests"] += 1
+        return self._index.complete(prefix, limit)
+
+    def _maybe_rebuild(self):
+        if time.monotonic() - self._built_at < self.rebuild_interval:
+            return
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        self.submit(self.rebuild)
+
+    def rebuild(self):
+        """Build a new index and swap it in (runs on the background thread)."""
+        start = time.perf_counter()
+        try:
+            index = PrefixIndex(self._phrases())
+            self._index = index
+            self._stats["builds"] += 1
+            self._stats["build_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            logger.error(f"Suggestion index build failed: {e}")
+        finally:
+            with self._lock:
+                self._building = False
+                self._built_at = time.monotonic()
+
+    def _phrases(self) -> Dict[str, list]:
+        phrases: Dict[str, list] = {}
+
+        def add(text: str, kind: str, weight: int):
+            key = normalize(text)
+            if not key:
+                return
+            phrase = phrases.get(key)
+            if phrase is None:
+                phrases[key] = [text.strip(), kind, weight]
+            else:
+                phrase[2] += weight
+                if kind == "query":
+                    phrase[1] = kind  # what users typed wins
+
+        for query, count in self.query_log.popular(self.max_queries):
+            add(query, "query", count * QUERY_WEIGHT)
+        for title, artist in self.catalog.titles_and_artists(self.max_catalog_songs):
+            add(title, "song", TITLE_WEIGHT)
+            for name in artist.split(","):
+                add(name, "artist", ARTIST_WEIGHT)
+        return phrases
+
+    def stats(self) -> Dict:
+        return dict(self._stats, phrases=len(self._index), rebuild_interval_seconds=self.rebuild_interval)
@@ -0,0 +1,157 @@
+"""
+Cache warmer: refreshes hot keys before they expire.
+- Targets: trending for every configured language, charts, suggested
+  artists, and every mood and time-of-day playlist
+- Entries expiring within the horizon are reloaded from the upstream now
+  (JioSaavnService.refresh_ahead); fresher ones are left alone
+- Bounded concurrency: a small thread pool per run
+- Report of the last run (per target: status, items, seconds) kept in the
+  shared cache and shown in cache stats
+- Scheduler: a daemon thread runs every interval; a cache lock lets one
+  worker per interval do the work
+- Also run on demand: python manage.py warm_cache
+"""
+
+import os
+import time
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    REPORT_KEY = "jio:warm:report"
+    LOCK_KEY = "jio:warm:lock"
+    REPORT_TTL = 7 * 24 * 3600
+
+    def __init__(self, service, languages: Iterable[str] = ("hindi",), concurrency: int = 4,
+                 horizon: float = 1200, interval: float = 900, initial_delay: float = 30):
+        # service: the sync JioSaavnService
+        self.service = service
+        self.languages = list(languages)
+        self.concurrency = concurrency
+        self.horizon = horizon
+        self.interval = interval
+        self.initial_delay = initial_delay
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_settings(cls, service) -> "CacheWarmer":
+        wc = getattr(settings, "JIOSAAVN_WARMER", {})
+        return cls(
+            service,
+            languages=wc.get("LANGUAGES", ["hindi", "english", "punjabi"]),
+            concurrency=wc.get("CONCURRENCY", 4),
+            horizon=wc.get("HORIZON", 1200),
+            interval=wc.get("INTERVAL", 900),
+            initial_delay=wc.get("INITIAL_DELAY", 30),
+        )
+
+    @property
+    def worker_id(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    # --------------------
+    # TARGETS
+    # --------------------
+    def targets(self) -> List[Tuple[str, Callable]]:
+        """(name, loader) for every hot key, in warm-up order."""
+        service = self.service
+        targets = [(f"trending:{language}", partial(service.get_trending, language)) for language in self.languages]
+        targets.append(("charts", service.get_charts))
+        targets.append(("suggested_artists", service.get_suggested_artists))
+        targets.extend((f"mood:{mood}", partial(service.get_mood_playlist, mood)) for mood in service.MOOD_QUERIES)
+        targets.extend(
+            (f"time_of_day:{query}", partial(service.get_time_of_day_playlist, start))
+            for start, _, query, _ in service.TIME_OF_DAY_PLAYLISTS
+        )
+        return targets
+
+    # --------------------
+    # WARMING
+    # --------------------
+    def warm(self, only: Optional[Iterable[str]] = None, horizon: Optional[float] = None) -> Dict:
+        """
+        Warm every target (or those whose name starts with one of only).
+
+        Returns the report, which is also stored for cache stats.
+        """
+        horizon = self.horizon if horizon is None else horizon
+        targets = self.targets()
+        if only:
+            prefixes = tuple(only)
+            targets = [(name, loader) for name, loader in targets if name.startswith(prefixes)]
+
+        started_at = time.time()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="jio-warm") as pool:
+            results = list(pool.map(lambda target: self._warm_target(*target, horizon), targets))
+
+        report = {
+            "worker": self.worker_id,
+            "started_at": started_at,
+            "seconds": round(time.perf_counter() - start, 3),
+            "horizon_seconds": horizon,
+            "concurrency": self.concurrency,
+            "warmed": sum(1 for r in results if r["status"] == "ok"),
+            "failed": sum(1 for r in results if r["status"] != "ok"),
+            "targets": results,
+        }
+        cache.set(self.REPORT_KEY, report, timeout=self.REPORT_TTL)
+        logger.info(
+            f"Cache warm: {report['warmed']}/{len(results)} targets in {report['seconds']}s "
+            f"({report['failed']} failed)"
+        )
+        return report
+
+    def _warm_target(self, name: str, loader: Callable, horizon: float) -> Dict:
+        start = time.perf_counter()
+        try:
+            with self.service.refresh_ahead(horizon):
+                result = loader()
+            items = len(result.get("songs", [])) if isinstance(result, dict) else len(result or [])
+            status = "ok" if items else "empty"
+        except Exception as e:
+            logger.error(f"Cache warm failed for {name}: {e}")
+            items, status = 0, "error"
+        return {"name": name, "status": status, "items": items, "seconds": round(time.perf_counter() - start, 3)}
+
+    def last_report(self) -> Optional[Dict]:
+        """Report of the most recent run by any worker."""
+        return cache.get(self.REPORT_KEY)
+
+    # --------------------
+    # SCHEDULER
+    # --------------------
+    def start(self):
+        """Run warm() every interval on a daemon thread (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="jio-warm-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        delay = self.initial_delay
+        while not self._stop.wait(delay):
+            delay = self.interval
+            # One worker per interval; the lock expires before the next run
+            if not cache.add(self.LOCK_KEY, self.worker_id, timeout=max(1, int(self.interval * 0.9))):
+                continue
+            try:
+                self.warm()
+            except Exception as e:
+                logger.error(f"Scheduled cache warm failed: {e}")
@@ -1,3 +1,1740 @@
-from django.test import TestCase
+import os
+import json
+import shutil
+import gzip
+import asyncio
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import async_views, views
+from .services import song_record
+from .services.async_jiosaavn_service import AsyncJioSaavnService
+from .services.audio_cache import AudioCache, parse_byte_range
+from .services.bloom import RotatingBloomFilter
+from .services.catalog import SongCatalog, query_tokens
+from .services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, endpoint_family
+from .services.jiosaavn_service import JioSaavnService
+from .services.local_cache import MISSING, LocalLRUCache, entry_size
+from .services.metrics import ServiceMetrics, latency_percentile
+from .services.namespaces import CacheNamespaces
+from .services.query_canon import QueryCanonicalizer
+from .services.response_cache import ResponseCache, accepted_encodings, etag_matches, negotiate
+from .services.shared_download import SharedDownloads
+from .services.singleflight import SingleFlight
+from .services.snapshot import HotKeySnapshot
+from .services.stream_delivery import StreamDelivery, estimated_bytes
+from .services.suggest import PrefixIndex, QueryLog, SearchSuggestions
+from .services.warmer import CacheWarmer
+from .services.stream_proxy import StreamProxy, stream_kind
+
+SONG = bytes(range(256)) * 4  # 1024 bytes
+
+
+class FakeCDNResponse:
+    """What StreamProxy reads of a requests.Response: the status, headers and a raw body."""
+
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self.raw = BytesIO(body)
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def cdn_range(first, last, song=SONG):
+    return FakeCDNResponse(206, {"Content-Range": f"bytes {first}-{last}/{len(song)}"}, song[first:last + 1])
+
+
+class ParseByteRangeTests(SimpleTestCase):
+    def test_no_header_is_the_whole_file(self):
+        self.assertEqual(parse_byte_range(None, 1000), (0, 999))
+        self.assertEqual(parse_byte_range("", 1000), (0, 999))
+        self.assertIsNone(parse_byte_range(None, 0))
+
+    def test_closed_range(self):
+        self.assertEqual(parse_byte_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_byte_range(" bytes=100-100 ", 1000), (100, 100))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_byte_range("bytes=900-", 1000), (900, 999))
+        self.assertEqual(parse_byte_range("bytes=0-", 1000), (0, 999))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_byte_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_byte_range("bytes=-5000", 1000), (0, 999))
+        self.assertIsNone(parse_byte_range("bytes=-0", 1000))
+        self.assertIsNone(parse_byte_range("bytes=-100", 0))
+
+    def test_last_past_the_end_is_clamped(self):
+        self.assertEqual(parse_byte_range("bytes=500-5000", 1000), (500, 999))
+
+    def test_out_of_range(self):
+        self.assertIsNone(parse_byte_range("bytes=1000-", 1000))
+        self.assertIsNone(parse_byte_range("bytes=1000-1100", 1000))
+        self.assertIsNone(parse_byte_range("bytes=200-100", 1000))
+
+    def test_malformed(self):
+        for header in ("bytes=abc-", "bytes=1-x", "items=0-99", "bytes=0-99,200-299", "bytes=", "bytes=-"):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_byte_range(header, 1000))
+
+
+class AudioCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = AudioCache(self.path, max_bytes=64 * 1024, max_file_bytes=16 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def store(self, first, last, size=len(SONG), etag='"v1"', song_id="song1"):
+        writer = self.cache.writer(song_id, "320kbps", size, {"ETag": etag})
+        writer.seek(first)
+        writer.write(SONG[first:last + 1])
+        writer.commit()
+
+    def lookup(self, song_id="song1"):
+        entry = self.cache.lookup(song_id, "320kbps")
+        if entry is not None:
+            self.addCleanup(entry.close)
+        return entry
+
+    def test_miss(self):
+        self.assertIsNone(self.lookup())
+
+    def test_covers_stored_ranges_only(self):
+        self.store(0, 99)
+        self.store(200, 299)
+        entry = self.lookup()
+        self.assertTrue(entry.covers(0, 99))
+        self.assertTrue(entry.covers(210, 250))
+        self.assertFalse(entry.covers(50, 250))
+        self.assertFalse(entry.covers(300, 300))
+        self.assertEqual(entry.segments(50, 349), [
+            (50, 99, True), (100, 199, False), (200, 299, True), (300, 349, False),
+        ])
+
+    def test_ranges_merge_in_any_order(self):
+        self.store(512, len(SONG) - 1)
+        self.store(0, 511)
+        entry = self.lookup()
+        self.assertEqual(entry.ranges, [[0, len(SONG)]])
+        self.assertEqual(b"".join(entry.iter_range(0, len(SONG) - 1, 100)), SONG)
+
+    def test_stitch_fills_gaps_from_the_cdn_and_stores_them(self):
+        self.store(0, 99)
+        self.store(200, 299)
+        proxy = StreamProxy(chunk_size=64)
+        opened = []
+
+        def cdn(url, byte_range=None):
+            opened.append(byte_range)
+            first, last = map(int, byte_range[len("bytes="):].split("-"))
+            return cdn_range(first, last)
+
+        writer = self.cache.writer("song1", "320kbps", len(SONG), {"ETag": '"v1"'})
+        with mock.patch.object(proxy, "open", side_effect=cdn):
+            body = b"".join(proxy.stitch(self.lookup(), 50, 349, "song1", "seek", 0.0, "https://cdn/x", writer))
+        self.assertEqual(body, SONG[50:350])
+        self.assertEqual(opened, ["bytes=100-199", "bytes=300-349"])
+        self.assertEqual(proxy.stats()["bytes_from_disk"], 150)
+        self.assertTrue(self.lookup().covers(0, 349))
+
+    def test_stitch_stops_when_the_cdn_file_changed(self):
+        self.store(0, 99)
+        proxy = StreamProxy()
+        other = SONG + b"longer"
+        with mock.patch.object(proxy, "open", return_value=cdn_range(100, 199, other)), \
+                self.assertLogs("music.services.stream_proxy", "ERROR"):
+            body = b"".join(proxy.stitch(self.lookup(), 0, 199, "song1", "seek", 0.0, "https://cdn/x"))
+        self.assertEqual(body, SONG[:100])
+        self.assertEqual(proxy.stats()["interrupted"], 1)
+
+    def test_new_size_drops_stored_ranges(self):
+        self.store(0, 99)
+        self.store(0, 9, size=len(SONG) - 1)
+        self.assertEqual(self.lookup().ranges, [[0, 10]])
+
+    def test_new_etag_drops_stored_ranges(self):
+        self.store(0, 99)
+        self.store(500, 509, etag='"v2"')
+        entry = self.lookup()
+        self.assertEqual(entry.ranges, [[500, 510]])
+        self.assertEqual(entry.headers, {"ETag": '"v2"'})
+
+    def test_same_file_keeps_stored_ranges(self):
+        self.store(0, 99)
+        self.store(500, 509)
+        self.assertEqual(self.lookup().ranges, [[0, 100], [500, 510]])
+
+    def test_write_to_a_replaced_file_is_not_committed(self):
+        self.store(0, 9)
+        writer = self.cache.writer("song1", "320kbps", len(SONG), {"ETag": '"v1"'})
+        writer.write(SONG[:100])
+        self.store(500, 509, etag='"v2"')  # the CDN file changed mid-download
+        writer.commit()
+        self.assertEqual(self.lookup().ranges, [[500, 510]])
+        self.assertEqual(self.cache.stats()["write_conflicts"], 1)
+
+    def test_too_large_songs_are_not_cached(self):
+        self.assertIsNone(self.cache.writer("song1", "320kbps", 32 * 1024, {}))
+        self.assertIsNone(self.cache.writer("song1", "320kbps", 0, {}))
+
+    def test_evicts_least_recently_used_songs(self):
+        size = 16 * 1024
+        for n in range(5):  # 80 KB over a 64 KB budget
+            writer = self.cache.writer(f"song{n}", "320kbps", size, {})
+            writer.write(b"x" * size)
+            writer.commit()
+            os.utime(writer.cache._paths(writer.key)[1], (n, n))  # song0 least recently used
+        self.cache.evict()
+        self.assertIsNone(self.lookup("song0"))
+        self.assertIsNotNone(self.lookup("song4"))
+        self.assertLessEqual(self.cache.stats()["stored_bytes"], 64 * 1024)
+        self.assertGreater(self.cache.stats()["evictions"], 0)
+
+
+class SharedDownloadsTests(SimpleTestCase):
+    def setUp(self):
+        self.downloads = SharedDownloads(max_bytes=4096, join_ahead=100)
+
+    def open_download(self, byte_range=None, status=200, headers=None):
+        download = self.downloads.claim("song1", "320kbps", byte_range)
+        headers = {"Content-Length": str(len(SONG)), "ETag": '"v1"'} if headers is None else headers
+        return download, download.opened(status, headers)
+
+    def assertReleased(self):
+        stats = self.downloads.stats()
+        self.assertEqual((stats["active"], stats["buffered_bytes"]), (0, 0))
+
+    def test_disabled(self):
+        self.assertIsNone(SharedDownloads(enabled=False).claim("song1", "320kbps", None))
+
+    def test_join_waits_on_a_download_opening_with_the_same_range(self):
+        download = self.downloads.claim("song1", "320kbps", "bytes=0-")
+        self.assertEqual(self.downloads.join("song1", "320kbps", "bytes=0-"), (download, None))
+        self.assertEqual(self.downloads.join("song1", "320kbps", "bytes=100-"), (None, None))
+        self.assertEqual(self.downloads.join("song1", "128kbps", "bytes=0-"), (None, None))
+        self.assertIsNone(download.span_for("bytes=0-"))
+
+    def test_followers_wait_for_the_cdn_response(self):
+        download = self.downloads.claim("song1", "320kbps", None)
+        spans = []
+        follower = threading.Thread(target=lambda: spans.append(download.wait_opened(None, timeout=5)))
+        follower.start()
+        download.opened(200, {"Content-Length": str(len(SONG))})
+        follower.join(5)
+        self.assertEqual(spans, [(0, len(SONG) - 1)])
+
+    def test_followers_wait_on_the_event_loop(self):
+        async def spike():
+            loop = asyncio.get_running_loop()
+            download = self.downloads.claim("song1", "320kbps", "bytes=0-99", loop)
+            joined, _ = self.downloads.join("song1", "320kbps", "bytes=0-99", loop)
+            self.assertEqual(self.downloads.join("song1", "320kbps", "bytes=0-99"), (None, None))  # other loop
+            follower = asyncio.ensure_future(joined.await_opened("bytes=0-99", timeout=5))
+            await asyncio.sleep(0)
+            download.opened(206, {"Content-Range": f"bytes 0-99/{len(SONG)}"})
+            return await follower
+
+        self.assertEqual(asyncio.run(spike()), (0, 99))
+
+    def test_join_a_running_download_within_its_range(self):
+        download, shared = self.open_download()
+        self.assertTrue(shared)
+        download.append(SONG[:200])
+        self.assertEqual(self.downloads.join("song1", "320kbps", None), (download, (0, len(SONG) - 1)))
+        self.assertEqual(self.downloads.join("song1", "320kbps", "bytes=250-"), (download, (250, len(SONG) - 1)))
+        self.assertEqual(self.downloads.join("song1", "320kbps", "bytes=400-"), (None, None))  # past JOIN_AHEAD
+        self.assertEqual(download.headers, {"ETag": '"v1"'})
+
+    def test_partial_download_only_serves_its_own_bytes(self):
+        download, _ = self.open_download("bytes=100-299", 206, {"Content-Range": f"bytes 100-299/{len(SONG)}"})
+        self.assertEqual(download.span_for("bytes=150-199"), (150, 199))
+        self.assertIsNone(download.span_for("bytes=0-199"))
+        self.assertIsNone(download.span_for("bytes=150-"))
+
+    def test_finished_download_short_of_the_bytes_is_not_joined(self):
+        download, _ = self.open_download()
+        download.subscribe()
+        download.append(SONG[:100])
+        download.finish()  # the CDN connection dropped
+        self.assertEqual(self.downloads.join("song1", "320kbps", "bytes=0-49"), (download, (0, 49)))
+        self.assertEqual(self.downloads.join("song1", "320kbps", "bytes=50-"), (None, None))
+
+    def test_read_from_any_position(self):
+        download, _ = self.open_download()
+        self.assertEqual(download.read(0, len(SONG) - 1), [])
+        for first in range(0, 300, 100):
+            download.append(SONG[first:first + 100])
+        self.assertEqual(b"".join(download.read(150, 249)), SONG[150:250])
+        self.assertEqual(b"".join(download.read(250, len(SONG) - 1)), SONG[250:300])
+        self.assertEqual(download.read(300, len(SONG) - 1), [])
+
+    def test_cancel(self):
+        download = self.downloads.claim("song1", "320kbps", None)
+        joined, _ = self.downloads.join("song1", "320kbps", None)
+        download.cancel()
+        self.assertIsNone(joined.wait_opened(None, timeout=1))
+        self.assertEqual(self.downloads.join("song1", "320kbps", None), (None, None))
+        self.assertReleased()
+
+    def test_not_shared_over_max_bytes(self):
+        download, shared = self.open_download(headers={"Content-Length": "8192"})
+        self.assertFalse(shared)
+        self.assertTrue(download.cancelled)
+        self.assertEqual(self.downloads.stats()["not_shared"], 1)
+        self.assertReleased()
+
+    def test_encoded_responses_are_not_shared(self):
+        _, shared = self.open_download(headers={"Content-Length": "100", "Content-Encoding": "gzip"})
+        self.assertFalse(shared)
+        self.assertReleased()
+
+    def test_buffer_is_released_after_the_last_follower_leaves(self):
+        download, _ = self.open_download()
+        self.open_download(headers={"Content-Length": "2048"})  # a second song range, never followed
+        download.subscribe()
+        download.subscribe()
+        download.append(SONG)
+        download.finish()
+        self.assertEqual(self.downloads.stats()["buffered_bytes"], len(SONG) + 2048)
+        download.unsubscribe(len(SONG))
+        self.assertEqual(self.downloads.stats()["active"], 2)
+        download.unsubscribe(len(SONG))
+        stats = self.downloads.stats()
+        self.assertEqual((stats["active"], stats["buffered_bytes"]), (1, 2048))
+        self.assertEqual(stats["delivered_per_downloaded"], 2.0)
+
+    def test_buffer_is_released_when_followers_leave_before_the_end(self):
+        download, _ = self.open_download()
+        download.subscribe()
+        download.append(SONG[:100])
+        download.unsubscribe(100)
+        self.assertTrue(download.abandoned)
+        download.finish()  # the pump stops once abandoned
+        self.assertReleased()
+
+    def test_buffer_is_released_when_nobody_followed(self):
+        download, _ = self.open_download()
+        download.append(SONG)
+        download.finish()
+        self.assertReleased()
+        self.assertEqual(self.downloads.stats()["bytes_downloaded"], len(SONG))
+
+    def test_released_buffers_make_room_for_new_downloads(self):
+        for _ in range(3):  # 3 x 2048 bytes through a 4096-byte budget
+            download, shared = self.open_download(headers={"Content-Length": "2048"})
+            self.assertTrue(shared)
+            download.append(b"x" * 2048)
+            download.finish()
+        self.assertReleased()
+        self.assertEqual(self.downloads.stats()["not_shared"], 0)
+
+
+class CacheWarmerTests(SimpleTestCase):
+    def setUp(self):
+        self.service = JioSaavnService()
+
+    def test_suggested_artist_searches_see_the_refresh_ahead_horizon(self):
+        service = views.service
+        horizons = []
+
+        def search_artists(query, limit):
+            horizons.append(getattr(service._warming, "horizon", None))
+            return [{"id": query, "name": query}]
+
+        with mock.patch.object(service, "search_artists", side_effect=search_artists):
+            with service.refresh_ahead(600):
+                service._load_suggested_artists()
+            self.assertEqual(horizons, [600] * (len(service.SUGGESTED_ARTIST_QUERIES) + 1))
+            horizons.clear()
+            service._load_suggested_artists()  # the pool threads do not keep it
+        self.assertEqual(set(horizons), {None})
+
+    def test_charts_are_not_page_cached(self):
+        request = RequestFactory().get("/api/browse/charts/")
+        for charts in ([{"id": "1"}], [{"id": "2"}]):  # as refreshed by the warmer
+            with mock.patch.object(views.service, "get_charts", return_value=charts):
+                self.assertEqual(views.ChartsView.as_view()(request).data, charts)
+
+    def test_refresh_ahead_reloads_only_entries_expiring_within_the_horizon(self):
+        soon, later = self.service._key("charts", "warm-soon"), self.service._key("charts", "warm-later")
+        cache.set(soon, (["old"], time.time() + 60), timeout=600)
+        cache.set(later, (["old"], time.time() + 3600), timeout=7200)
+        loader = mock.Mock(return_value=["new"])
+        with self.service.refresh_ahead(600):
+            self.assertEqual(self.service._cached_load(soon, loader), ["new"])
+            self.assertEqual(self.service._cached_load(later, loader), ["old"])
+        loader.assert_called_once()
+
+    def test_report_per_target(self):
+        warmer = CacheWarmer(self.service, languages=["hindi", "tamil"], concurrency=2)
+        with mock.patch.object(self.service, "get_trending", side_effect=[[{"id": "1"}], []]), \
+                mock.patch.object(self.service, "get_charts", side_effect=RuntimeError("boom")), \
+                self.assertLogs("music.services.warmer", "INFO"):
+            report = warmer.warm(only=["trending", "charts"])
+        statuses = {target["name"]: target["status"] for target in report["targets"]}
+        self.assertEqual(statuses, {"trending:hindi": "ok", "trending:tamil": "empty", "charts": "error"})
+        self.assertEqual((report["warmed"], report["failed"]), (1, 2))
+        self.assertEqual(warmer.last_report(), report)
+
+    def test_command_force_reloads_everything(self):
+        report = {"targets": [{"name": "charts", "status": "ok", "items": 20, "seconds": 0.1}],
+                  "warmed": 1, "seconds": 0.1, "concurrency": 4}
+        with mock.patch.object(CacheWarmer, "warm", return_value=report) as warm:
+            call_command("warm_cache", "--force", "--only", "charts", stdout=StringIO())
+        longest = max(soft for soft, _ in self.service.ttls.values())
+        warm.assert_called_once_with(only=["charts"], horizon=max(longest, self.service.CACHE_TTL))
+
+
+def catalog_song(song_id, title, artist="Arijit Singh"):
+    return {"id": song_id, "title": title, "artist": artist}
+
+
+class CatalogSearchTests(SimpleTestCase):
+    PREFIX_MATCHES = [catalog_song(str(i), f"Love Song {i}") for i in range(30)]
+
+    def setUp(self):
+        self.service = JioSaavnService()
+        mock.patch.object(self.service.catalog, "add").start()
+        self.addCleanup(mock.patch.stopall)
+        self.upstream = {"success": True, "data": {"results": [{"id": "up1", "name": "Love Me Like You Do"}]}}
+
+    def search(self, query, local):
+        with mock.patch.object(self.service.catalog, "search", return_value=(local, [])), \
+                mock.patch.object(self.service, "_api_get", return_value=self.upstream) as api:
+            songs = self.service.search(query, limit=5, typed=False)
+        return songs, api
+
+    def open_breaker(self):
+        breaker = self.service.breakers.for_endpoint("search/songs")
+        for _ in range(10):
+            breaker.record(0.01, False)
+
+    def test_prefix_matches_do_not_replace_the_upstream_ranking(self):
+        songs, api = self.search("love catalog test", self.PREFIX_MATCHES)
+        api.assert_called_once()
+        self.assertEqual([song["id"] for song in songs], ["up1"])
+
+    def test_an_exact_title_is_answered_locally_and_first(self):
+        local = self.PREFIX_MATCHES[:25] + [catalog_song("k", "Kesariya"), catalog_song("k2", "Kesariya Rangu")]
+        songs, api = self.search("Kesariya  arijit singh", local)
+        api.assert_not_called()
+        self.assertEqual([song["id"] for song in songs[:2]], ["k", "0"])
+
+    def test_too_few_exact_matches_go_upstream(self):
+        songs, api = self.search("Kesariya", [catalog_song("k", "Kesariya")])
+        api.assert_called_once()
+
+    def test_any_matches_answer_while_the_upstream_is_down(self):
+        self.open_breaker()
+        with mock.patch.object(self.service.catalog, "search", return_value=(self.PREFIX_MATCHES, [])):
+            songs = self.service.search("love degraded test", limit=5, typed=False)
+        self.assertEqual(songs, self.PREFIX_MATCHES[:5])
+        key = self.service._search_page_key("love degraded test", 0)
+        self.assertIsNone(self.service._get_cached(key))  # replaced by the upstream's page later
+
+    def test_stale_matches_are_refreshed_once(self):
+        local = [catalog_song("k", "Kesariya")] + self.PREFIX_MATCHES[:29]
+        with mock.patch.object(self.service.catalog, "search", return_value=(local, ["k", "0"])), \
+                mock.patch("music.services.jiosaavn_service._refresh_executor.submit") as submit:
+            self.assertEqual(self.service._search_catalog("kesariya", 0), local)
+            self.assertEqual(self.service._search_catalog("kesariya", 0), local)
+        submit.assert_called_once_with(self.service._run_catalog_refresh, ["k", "0"])
+        with mock.patch.object(self.service, "_load_song_batch") as load:
+            self.service._run_catalog_refresh(["k", "0"])
+        load.assert_called_once_with(["k", "0"])
+        self.assertEqual(self.service.catalog.claim_refresh(["k"]), ["k"])  # released
+
+    def test_async_service_answers_the_same_way(self):
+        service = AsyncJioSaavnService(shared=self.service)
+        self.open_breaker()
+        with mock.patch.object(self.service.catalog, "search", return_value=(self.PREFIX_MATCHES, [])):
+            songs = asyncio.run(service.search("love async degraded test", limit=5, typed=False))
+        self.assertEqual(songs, self.PREFIX_MATCHES[:5])
+
+
+class InvalidateEntityTests(SimpleTestCase):
+    def setUp(self):
+        self.service = JioSaavnService()
+        self.service.local_cache.broadcast_interval = 0
+        self.enterContext(mock.patch("music.services.jiosaavn_service.logger"))
+        # Another worker: its own L1, the same shared cache
+        self.other = LocalLRUCache(broadcast_interval=0, on_broadcast=mock.Mock())
+        self.service.local_cache.invalidate_keys([])  # the sequence number exists
+        self.other.get("warm-up")  # and this worker has read it
+
+    def test_dependent_namespaces_get_a_new_generation(self):
+        before = {name: self.service._key(name, "x") for name in self.service.namespaces.names}
+        self.service.invalidate_entity("song", "invalidate1")
+        after = {name: self.service._key(name, "x") for name in self.service.namespaces.names}
+        changed = {name for name in before if before[name] != after[name]}
+        self.assertEqual(changed, {"search", "album", "artist", "related", "trending", "charts"})
+
+    def test_only_the_entitys_l1_keys_are_evicted_in_every_worker(self):
+        song_key, kept_key = self.service._key("song", "invalidate2"), self.service._key("song", "kept2")
+        for l1 in (self.service.local_cache, self.other):
+            l1.set(song_key, {"id": "invalidate2"})
+            l1.set(kept_key, {"id": "kept2"})
+        self.service._set_cache(song_key, {"id": "invalidate2"})
+
+        self.service.invalidate_entity("song", "invalidate2")
+        for l1 in (self.service.local_cache, self.other):
+            self.assertIs(l1.get(song_key), MISSING)
+            self.assertEqual(l1.get(kept_key), {"id": "kept2"})
+        self.assertIsNone(self.service._get_cached(song_key))
+        keys = self.other.on_broadcast.call_args.args[0]
+        self.assertIn(song_key, keys)
+
+    def test_a_worker_too_far_behind_clears_everything(self):
+        self.other.set("kept", 1)
+        for i in range(LocalLRUCache.MAX_REPLAY + 1):
+            self.service.local_cache.invalidate_keys([f"song:{i}"])
+        self.assertIs(self.other.get("kept"), MISSING)
+        self.other.on_broadcast.assert_called_with(None)
+
+    def test_the_negative_filter_is_reset_only_if_it_may_hold_the_keys(self):
+        missing = self.service._key("album", "elsewhere3")
+        self.service.missing_keys.add(missing)
+        self.service.invalidate_entity("song", "invalidate3")
+        self.assertIn(missing, self.service.missing_keys)
+
+        self.service.missing_keys.add(self.service._key("artist", "invalidate4"))
+        self.service.invalidate_entity("artist", "invalidate4")
+        self.assertNotIn(missing, self.service.missing_keys)
+
+
+class SongCatalogTests(SimpleTestCase):
+    def test_query_tokens(self):
+        self.assertEqual(query_tokens("Arijit  Singh - Kesariya!"), ["arijit", "singh", "kesariya"])
+        self.assertEqual(query_tokens("अरिजीत सिंह"), ["अरिजीत", "सिंह"])
+
+    def test_exact_means_the_whole_title_or_title_and_artist(self):
+        song = catalog_song("k", "Kesariya (From Brahmastra)", artist="Arijit Singh")
+        self.assertTrue(SongCatalog.is_exact(query_tokens("kesariya from brahmastra"), song))
+        self.assertTrue(SongCatalog.is_exact(query_tokens("Kesariya From Brahmastra Arijit Singh"), song))
+        self.assertFalse(SongCatalog.is_exact(query_tokens("kesariya"), song))
+
+    def test_database_errors_skip_the_catalog_for_a_while(self):
+        catalog = SongCatalog(submit=mock.Mock(), error_backoff=30)
+        with mock.patch.object(catalog, "_match", side_effect=DatabaseError("no such table")) as match, \
+                self.assertLogs("music.services.catalog", "ERROR"):
+            self.assertIsNone(catalog.search("kesariya", 30))
+            self.assertIsNone(catalog.search("kesariya", 30))
+        match.assert_called_once()
+        self.assertEqual(catalog.stats()["errors"], 1)
+
+
+class SearchPagingTests(SimpleTestCase):
+    def get(self, view, query_string):
+        request = RequestFactory().get(f"/api/search/?q=kesariya&{query_string}")
+        response = view(request)
+        return asyncio.run(response) if asyncio.iscoroutine(response) else response
+
+    def test_offset_from_page_or_offset(self):
+        factory = RequestFactory()
+        self.assertEqual(views.search_offset(factory.get("/?page=3"), 20), 40)
+        self.assertEqual(views.search_offset(factory.get("/?offset=15"), 20), 15)
+        self.assertEqual(views.search_offset(factory.get("/?page=0"), 20), 0)
+        self.assertEqual(views.search_offset(factory.get("/?offset=99999"), 20), views.MAX_SEARCH_OFFSET)
+
+    def test_bad_page_or_offset_is_a_400(self):
+        for module in (views, async_views):
+            for query_string in ("page=abc", "offset=1.5", "page="):
+                with self.subTest(view=module.__name__, query=query_string), \
+                        mock.patch.object(module.service, "search") as search:
+                    self.assertEqual(self.get(module.search_songs, query_string).status_code, 400)
+                    search.assert_not_called()
+
+
+class PagedSearchCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.service = JioSaavnService()
+        self.results = [{"id": str(i)} for i in range(70)]  # 70 results upstream: pages of 30, 30, 10
+        size = self.service.SEARCH_PAGE_SIZE
+        self.load = mock.Mock(side_effect=lambda query, page: self.results[page * size:(page + 1) * size])
+        patcher = mock.patch.object(self.service, "_load_search", self.load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ids(self, songs):
+        return [int(song["id"]) for song in songs]
+
+    def test_different_limits_share_one_page(self):
+        self.assertEqual(self.ids(self.service.search("paging one", limit=20, typed=False)), list(range(20)))
+        self.assertEqual(self.ids(self.service.search("paging one", limit=30, typed=False)), list(range(30)))
+        self.load.assert_called_once_with("paging one", 0)
+
+    def test_windows_across_pages(self):
+        songs = self.service.search("paging two", limit=10, offset=25, typed=False)
+        self.assertEqual(self.ids(songs), list(range(25, 35)))
+        self.assertEqual([c.args[1] for c in self.load.call_args_list], [0, 1])
+        self.service.search("paging two", limit=30, offset=40, typed=False)
+        self.assertEqual(self.load.call_count, 3)  # page 1 reused
+
+    def test_stops_at_the_last_page(self):
+        songs = self.service.search("paging three", limit=50, offset=60, typed=False)
+        self.assertEqual(self.ids(songs), list(range(60, 70)))
+        self.assertEqual(self.service.search("paging three", limit=10, offset=90, typed=False), [])
+
+    def test_endpoint_next_offset(self):
+        with mock.patch.object(views.service, "search", return_value=[{"id": "1"}] * 20), \
+                mock.patch.object(views.service, "record_query") as record_query:
+            response = views.search_songs(RequestFactory().get("/api/search/?q=kesariya&page=2"))
+        body = json.loads(response.content)
+        self.assertEqual((body["offset"], body["limit"], body["next_offset"]), (20, 20, 40))
+        record_query.assert_not_called()  # later pages are the same search
+
+
+class CountingLock:
+    """A threading.Lock that counts how often it was taken."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.taken = 0
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.taken += 1
+
+    def __exit__(self, *exc):
+        self.lock.release()
+
+
+class AsyncServiceTests(SimpleTestCase):
+    def setUp(self):
+        self.sync = JioSaavnService()
+        self.service = AsyncJioSaavnService(shared=self.sync)
+
+    def test_uses_the_sync_services_state(self):
+        self.assertIs(self.service.local_cache, self.sync.local_cache)
+        self.assertIs(self.service.flight, self.sync.flight)
+        self.service.BASE_URL = "http://stub/api"
+        self.assertNotEqual(self.sync.BASE_URL, "http://stub/api")
+
+    def test_entry_version_is_a_value_on_both_services(self):
+        key = self.sync._key("trending", "entry-version-test")
+        self.sync._set_cache(key, [{"id": "1"}])
+        version = asyncio.run(self.service.entry_version(key))
+        self.assertIsInstance(version, float)
+        self.assertEqual(version, self.sync.entry_version(key))
+
+    def test_sync_code_reached_through_it_calls_sync_methods(self):
+        lyrics = {"success": True, "data": {"lyrics": "line one<br>line two"}}
+        with mock.patch.object(self.sync, "_api_get", return_value=lyrics):
+            synced = self.service._load_synced_lyrics("abc123")
+        self.assertIsInstance(synced, str)
+
+    def test_loads_through_the_async_api(self):
+        songs = {"success": True, "data": {"trending": {"data": [
+            {"id": "s1", "type": "song", "name": "One"}, {"id": "a1", "type": "album", "name": "Two"},
+        ]}}}
+        with mock.patch.object(self.service, "_api_request", new=mock.AsyncMock(return_value=songs)) as api:
+            first = asyncio.run(self.service.get_trending("async-test"))
+            second = asyncio.run(self.service.get_trending("async-test"))
+        self.assertEqual([song["id"] for song in first], ["s1"])
+        self.assertEqual(second, first)
+        api.assert_awaited_once()
+        self.assertEqual(self.sync.get_trending("async-test"), first)  # one cache entry for both
+
+    def test_background_refresh_shares_the_sync_services_guard(self):
+        key = self.sync._key("trending", "refresh-test")
+        self.sync._refresh_lock = lock = CountingLock()
+        load = mock.AsyncMock(return_value=[{"id": "new"}])
+
+        async def refresh():
+            self.sync._refreshing.add(key)  # a sync refresh thread has it
+            await self.service._refresh_in_background(key, load)
+            self.sync._refreshing.discard(key)
+            await self.service._refresh_in_background(key, load)
+            self.assertIn(key, self.sync._refreshing)
+            await asyncio.gather(*self.service._refresh_tasks)
+
+        asyncio.run(refresh())
+        load.assert_awaited_once()
+        self.assertNotIn(key, self.sync._refreshing)
+        self.assertEqual(lock.taken, 3)  # check-and-add twice, discard once
+        self.assertEqual(self.sync._get_cached(key), [{"id": "new"}])
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+
+    def lead(self, key, result, release):
+        """Start a leader for key that returns result once release is set."""
+        started = threading.Event()
+
+        def load():
+            started.set()
+            release.wait(5)
+            return result
+
+        leader = threading.Thread(target=self.flight.do, args=(key, load))
+        leader.start()
+        started.wait(5)
+        self.addCleanup(leader.join, 5)
+        self.addCleanup(release.set)
+        return leader
+
+    def test_followers_share_the_leaders_result(self):
+        release = threading.Event()
+        self.lead("song:1", "leader", release)
+        results = []
+        follower = threading.Thread(target=lambda: results.append(self.flight.do("song:1", lambda: "own")))
+        follower.start()
+        release.set()
+        follower.join(5)
+        self.assertEqual(results, ["leader"])
+        self.assertEqual(self.flight.stats()["deduplicated_local"], 1)
+
+    def test_slow_leader_is_not_waited_on_past_the_lock_ttl(self):
+        self.flight.LOCK_TTL = 0.05
+        self.lead("song:1", "leader", threading.Event())
+        with self.assertLogs("music.services.singleflight", "WARNING"):
+            self.assertEqual(self.flight.do("song:1", lambda: "own"), "own")
+        stats = self.flight.stats()
+        self.assertEqual((stats["local_timeouts"], stats["deduplicated_local"]), (1, 0))
+
+    def test_slow_async_leader_is_not_waited_on_past_the_lock_ttl(self):
+        self.flight.LOCK_TTL = 0.05
+
+        async def load(result, delay):
+            await asyncio.sleep(delay)
+            return result
+
+        async def calls():
+            leader = asyncio.ensure_future(self.flight.ado("song:1", lambda: load("leader", 0.5)))
+            await asyncio.sleep(0)
+            follower = await self.flight.ado("song:1", lambda: load("own", 0))
+            return await leader, follower
+
+        with self.assertLogs("music.services.singleflight", "WARNING"):
+            self.assertEqual(asyncio.run(calls()), ("leader", "own"))
+        self.assertEqual(self.flight.stats()["local_timeouts"], 1)
+
+
+class QueryCanonicalizerTests(SimpleTestCase):
+    def setUp(self):
+        self.canon = QueryCanonicalizer()
+
+    def test_spelling_variants_share_a_query(self):
+        self.assertEqual(self.canon.canonical("Arijit Singh"), "arijit singh")
+        self.assertEqual(self.canon.canonical("arijeet  singh"), "arijit singh")
+        self.assertEqual(self.canon.canonical("अरिजीत सिंह"), "arijit singh")
+
+    def test_typos_map_onto_a_past_query(self):
+        self.canon.canonical("arijit singh")
+        self.assertEqual(self.canon.canonical("arjit singh"), "arijit singh")
+        self.assertEqual(self.canon.canonical("kesaryia"), "kesaryia")  # new: no past query close enough
+        self.assertEqual(self.canon.canonical("kesariya song"), "kesariya song")
+        self.assertEqual(self.canon.canonical("kesarya song"), "kesariya song")
+
+    def test_different_titles_are_not_merged(self):
+        for first, second in (("believer", "believe"), ("animals", "animal"), ("love songs", "live songs"),
+                              ("bhaag milkha", "bag milkha"), ("dhoom 2", "dhoom 3"),
+                              ("tera ban jaunga", "mera ban jaunga"), ("heroes", "heroes tonight")):
+            with self.subTest(first=first, second=second):
+                canon = QueryCanonicalizer()
+                canon.canonical(first)
+                self.assertEqual(canon.canonical(second), second)
+
+    def test_service_queries_are_not_fuzzy_matched(self):
+        self.canon.canonical("romantic hindi song")
+        self.assertEqual(self.canon.canonical("romantik hindi song", fuzzy=False), "romantik hindi song")
+        self.assertEqual(self.canon.canonical("Romantic  Hindi Song", fuzzy=False), "romantic hindi song")
+
+    def test_disabled_passes_queries_through(self):
+        canon = QueryCanonicalizer(enabled=False)
+        self.assertEqual(canon.canonical("Arijeet  Singh"), "Arijeet  Singh")
+
+    def test_known_queries_are_bounded(self):
+        canon = QueryCanonicalizer(max_queries=2)
+        for query in ("kesariya", "tum hi ho", "channa mereya"):
+            canon.canonical(query)
+        self.assertEqual(canon.stats()["known_queries"], 2)
+        self.assertEqual(canon.canonical("kesariyaa"), "kesariyaa")  # forgotten: nothing to match
+
+    def test_hit_rate_improvement(self):
+        for query in ("Arijit Singh", "arijeet singh", "ARIJIT SINGH"):
+            self.canon.canonical(query)
+        stats = self.canon.stats()
+        self.assertEqual((stats["raw_repeats"], stats["canonical_repeats"]), (1, 2))
+        self.assertEqual(stats["hit_rate_improvement"], round(1 / 3, 4))
+
+    def test_spelling_variants_share_the_services_cache_entries(self):
+        service = JioSaavnService()
+        with mock.patch.object(service, "_load_search", return_value=[{"id": "1"}]) as load:
+            service.search("Arijit Singh canon")
+            service.search("arijeet singh canon")
+            service.search("Arjit Singh Canon")
+        load.assert_called_once_with("arijit singh canon", 0)
+
+    def test_most_common_spelling_becomes_canonical(self):
+        self.canon.canonical("arjit singh")
+        for _ in range(2):
+            self.canon.canonical("arijit singh")
+        self.assertEqual(self.canon.canonical("arjit singh"), "arijit singh")
+        self.assertEqual(self.canon.stats()["promoted"], 1)
+
+
+def run_refreshes_inline():
+    """Patch the background refresh pool to run work on the calling thread."""
+    return mock.patch("music.services.jiosaavn_service._refresh_executor.submit",
+                      side_effect=lambda fn, *args: fn(*args))
+
+
+def cache_stale(service, key, value):
+    """Put value in the shared cache past its soft TTL (and out of L1)."""
+    cache.set(key, (value, time.time() - 1), timeout=60)
+    service.local_cache.delete(key)
+
+
+class StaleWhileRevalidateTests(SimpleTestCase):
+    def setUp(self):
+        self.service = JioSaavnService()
+        self.key = self.service._key("trending", f"swr-{self.id()}")
+
+    def test_fresh_entries_skip_the_loader(self):
+        self.service._set_cache(self.key, ["cached"])
+        loader = mock.Mock(return_value=["new"])
+        self.assertEqual(self.service._cached_load(self.key, loader), ["cached"])
+        loader.assert_not_called()
+
+    def test_stale_entries_are_served_while_refreshed(self):
+        cache_stale(self.service, self.key, ["old"])
+        loader = mock.Mock(return_value=["new"])
+        with run_refreshes_inline():
+            self.assertEqual(self.service._cached_load(self.key, loader), ["old"])
+        loader.assert_called_once()
+        self.assertEqual(self.service._cached_load(self.key, loader), ["new"])
+        self.assertIsNone(cache.get(f"refresh:{self.key}"))
+
+    def test_a_failed_refresh_keeps_serving_stale(self):
+        cache_stale(self.service, self.key, ["old"])
+        with run_refreshes_inline(), self.assertLogs("music.services.jiosaavn_service", "WARNING"):
+            self.assertEqual(self.service._cached_load(self.key, mock.Mock(return_value=None)), ["old"])
+        loader = mock.Mock(return_value=["new"])
+        self.assertEqual(self.service._cached_load(self.key, loader), ["old"])
+        loader.assert_not_called()  # retries wait for the refresh lock to expire
+
+    def test_stale_entries_survive_an_upstream_outage(self):
+        cache_stale(self.service, self.key, ["old"])
+        with run_refreshes_inline(), mock.patch.object(self.service, "_api_request", return_value=None), \
+                self.assertLogs("music.services.jiosaavn_service", "WARNING"):
+            self.assertEqual(self.service.get_trending(self.key.rsplit(":", 1)[1]), ["old"])
+
+    def test_failed_misses_cache_nothing(self):
+        self.assertIsNone(self.service._cached_load(self.key, mock.Mock(return_value=None)))
+        self.assertIsNone(cache.get(self.key))
+
+
+class NamespaceTTLTests(SimpleTestCase):
+    @override_settings(JIOSAAVN_CACHE_TTLS={"trending": (60, 120)})
+    def test_per_namespace_ttls_can_be_overridden(self):
+        service = JioSaavnService()
+        self.assertEqual(service._ttl(service._key("trending", "hindi")), (60, 120))
+        self.assertEqual(service._ttl(service._key("song", "x")), service.NAMESPACE_TTLS["song"])
+
+    def test_entries_live_until_their_namespaces_hard_ttl(self):
+        service = JioSaavnService()
+        key = service._key("lyrics", "ttl")
+        with mock.patch("music.services.jiosaavn_service.cache") as l2:
+            service._set_cache(key, {"lyrics": "..."})
+        soft, hard = service.NAMESPACE_TTLS["lyrics"]
+        (_, (value, fresh_until)), kwargs = l2.set.call_args
+        self.assertEqual(kwargs, {"timeout": hard})
+        self.assertAlmostEqual(fresh_until, time.time() + soft, delta=5)
+
+
+class LocalLRUCacheTests(SimpleTestCase):
+    def l1(self, **options):
+        options.setdefault("broadcast", False)
+        return LocalLRUCache(**options)
+
+    def test_least_recently_used_entries_go_first(self):
+        l1 = self.l1(max_entries=2)
+        l1.set("song:a", 1)
+        l1.set("song:b", 2)
+        l1.get("song:a")
+        l1.set("song:c", 3)
+        self.assertIs(l1.get("song:b"), MISSING)
+        self.assertEqual((l1.get("song:a"), l1.get("song:c")), (1, 3))
+        self.assertEqual(l1.stats()["evictions"], 1)
+
+    def test_byte_budget(self):
+        l1 = self.l1(max_bytes=250)
+        l1.set("song:a", "x", size=100)
+        l1.set("song:b", "y", size=100)
+        l1.set("song:c", "z", size=100)
+        self.assertEqual(l1.stats()["bytes"], 200)
+        self.assertIs(l1.get("song:a"), MISSING)
+        l1.set("song:big", "w", size=251)
+        self.assertIs(l1.get("song:big"), MISSING)
+
+    def test_entries_expire_after_the_ttl(self):
+        l1 = self.l1(ttl=0.01)
+        l1.set("song:a", 1)
+        time.sleep(0.02)
+        self.assertIs(l1.get("song:a"), MISSING)
+
+    def test_invalidate_all_reaches_other_workers(self):
+        here = self.l1(broadcast=True, broadcast_interval=0)
+        there = self.l1(broadcast=True, broadcast_interval=0, on_broadcast=mock.Mock())
+        here.invalidate_keys([])
+        there.get("warm-up")
+        there.set("song:a", 1)
+        here.set("song:a", 1)
+        here.invalidate_all()
+        self.assertIs(here.get("song:a"), MISSING)
+        self.assertIs(there.get("song:a"), MISSING)
+        there.on_broadcast.assert_called_once_with(None)
+
+    def test_service_reads_hit_l1_before_the_shared_cache(self):
+        service = JioSaavnService()
+        key = service._key("song", "l1-hit")
+        service._set_cache(key, {"id": "l1-hit"})
+        with mock.patch("music.services.jiosaavn_service.cache") as l2:
+            self.assertEqual(service._get_cached(key), {"id": "l1-hit"})
+        l2.get.assert_not_called()
+        self.assertGreaterEqual(service.local_cache.stats()["namespaces"]["song"]["l1_hits"], 1)
+
+
+class NegativeCacheTests(SimpleTestCase):
+    NOT_FOUND = {"success": False, "status": 404}
+
+    def setUp(self):
+        self.service = JioSaavnService()
+
+    def test_missing_items_are_remembered(self):
+        with mock.patch.object(self.service, "_api_request", return_value=self.NOT_FOUND) as api:
+            self.assertIsNone(self.service.get_album("missing5a"))
+            self.assertIsNone(self.service.get_album("missing5a"))
+        api.assert_called_once()
+        self.assertEqual(self.service.negative_stats["negative_stored"], 1)
+        self.assertEqual(self.service.negative_stats["filter_rejects"], 1)
+
+    def test_other_workers_read_the_negative_entry(self):
+        with mock.patch.object(self.service, "_api_request", return_value=self.NOT_FOUND):
+            self.service.get_artist("missing5b")
+        other = JioSaavnService()
+        with mock.patch.object(other, "_api_request") as api:
+            self.assertIsNone(other.get_artist("missing5b"))
+        api.assert_not_called()
+        self.assertEqual(other.negative_stats["negative_hits"], 1)
+        self.assertIn(other._key("artist", "missing5b"), other.missing_keys)
+
+    def test_upstream_errors_are_not_cached_as_missing(self):
+        with mock.patch.object(self.service, "_api_request", return_value=None) as api:
+            self.service.get_album("missing5c")
+            self.service.get_album("missing5c")
+        self.assertEqual(api.call_count, 2)
+        self.assertNotIn(self.service._key("album", "missing5c"), self.service.missing_keys)
+
+
+class RotatingBloomFilterTests(SimpleTestCase):
+    def test_no_false_negatives_within_the_window(self):
+        bloom = RotatingBloomFilter(capacity=1000, window=60)
+        keys = [f"song:{i}" for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(f"album:{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 10)
+
+    def test_keys_are_forgotten_after_two_rotations(self):
+        with mock.patch("music.services.bloom.time.monotonic", return_value=1000.0) as clock:
+            bloom = RotatingBloomFilter(capacity=100, window=60)
+            bloom.add("song:a")
+            clock.return_value += 30
+            self.assertIn("song:a", bloom)  # one rotation: in the previous generation
+            clock.return_value += 30
+            self.assertNotIn("song:a", bloom)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("music.services.circuit_breaker.time.monotonic", return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("songs", min_requests=4, error_threshold=0.5, consecutive_failures=3,
+                                      open_seconds=30, default_timeout=10, min_timeout=0.5)
+
+    def test_consecutive_failures_open_it(self):
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(0.1, False)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.stats()["rejected"], 1)
+
+    def test_error_rate_opens_it(self):
+        for ok in (True, False, True, False):
+            self.breaker.record(0.1, ok)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_one_trial_call_after_the_cooldown(self):
+        for _ in range(3):
+            self.breaker.record(0.1, False)
+        self.clock.return_value += 30
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())  # the trial is in flight
+        self.breaker.record(0.1, True)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_a_failed_trial_reopens_it(self):
+        for _ in range(3):
+            self.breaker.record(0.1, False)
+        self.clock.return_value += 30
+        self.breaker.allow()
+        self.breaker.record(0.1, False)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()["opened"], 2)
+
+    def test_timeout_follows_the_p99(self):
+        self.assertEqual(self.breaker.timeout(), 10)
+        for _ in range(4):
+            self.breaker.record(0.4, True)
+        self.assertAlmostEqual(self.breaker.timeout(), 1.2)
+        for _ in range(4):
+            self.breaker.record(0.01, True)
+        self.assertAlmostEqual(self.breaker.timeout(), 1.2)  # p99 is still the slow calls
+        self.clock.return_value += 61
+        self.breaker.record(0.01, True)
+        self.assertEqual(self.breaker.timeout(), 10)  # too few samples left in the window
+
+    def test_endpoint_families(self):
+        self.assertEqual(endpoint_family("search/songs"), "search")
+        self.assertEqual(endpoint_family("songs/abc/lyrics"), "lyrics")
+        self.assertEqual(endpoint_family("songs/abc"), "songs")
+        self.assertEqual(endpoint_family("playlists"), "other")
+
+    def test_an_open_circuit_skips_the_upstream(self):
+        service = JioSaavnService()
+        breaker = service.breakers.for_endpoint("albums")
+        for _ in range(breaker.consecutive_failures):
+            breaker.record(0.1, False)
+        with mock.patch.object(service.session, "get") as get:
+            self.assertIsNone(service._api_request("albums", {"id": "x"}))
+        get.assert_not_called()
+
+
+def upstream_song(song_id, name=None):
+    """A raw upstream song dict, as in songs?ids= and search responses."""
+    return {
+        "id": song_id, "name": name or f"Song {song_id}", "duration": 200, "language": "hindi",
+        "album": {"id": "al1", "name": "Album"},
+        "artists": {"primary": [{"name": "Arijit Singh"}]},
+        "image": [{"quality": q, "url": f"https://c.example/{song_id}-{q}.jpg"} for q in ("50x50", "500x500")],
+        "downloadUrl": [{"quality": q, "url": f"https://a.example/{song_id}_{q}.mp4"} for q in ("96kbps", "320kbps")],
+    }
+
+
+class BatchSongTests(SimpleTestCase):
+    def setUp(self):
+        self.service = JioSaavnService()
+        for method in ("add", "remove"):
+            patcher = mock.patch.object(self.service.catalog, method)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def upstream(self, params):
+        ids = params["ids"].split(",")
+        return {"success": True, "data": [upstream_song(i) for i in ids if not i.startswith("gone")]}
+
+    def get_songs(self, ids):
+        fetch = mock.Mock(side_effect=lambda endpoint, params: self.upstream(params))
+        with mock.patch.object(self.service, "_api_get", fetch):
+            songs = self.service.get_songs(ids)
+        return songs, fetch
+
+    def test_results_in_request_order_with_none_for_unknown_ids(self):
+        songs, api = self.get_songs(["b7a", "gone7a", "bad id!", "a7a", "b7a"])
+        self.assertEqual([song and song["id"] for song in songs], ["b7a", None, None, "a7a", "b7a"])
+        api.assert_called_once_with("songs", {"ids": "b7a,gone7a,a7a"})
+
+    def test_cached_and_missing_songs_skip_the_upstream(self):
+        self.get_songs(["c7b", "gone7b"])
+        songs, api = self.get_songs(["gone7b", "c7b", "d7b"])
+        self.assertEqual([song and song["id"] for song in songs], [None, "c7b", "d7b"])
+        api.assert_called_once_with("songs", {"ids": "d7b"})
+        self.assertEqual(self.service.get_song_details("c7b")["title"], "Song c7b")
+
+    def test_misses_are_fetched_in_chunks(self):
+        self.service.SONG_BATCH_SIZE = 2
+        songs, api = self.get_songs([f"e7c{i}" for i in range(5)])
+        self.assertEqual(api.call_count, 3)
+        self.assertTrue(all(songs))
+
+    def test_a_failed_batch_caches_nothing(self):
+        with mock.patch.object(self.service, "_api_get", return_value=None):
+            self.assertEqual(self.service.get_songs(["f7d"]), [None])
+        songs, _ = self.get_songs(["f7d"])
+        self.assertEqual(songs[0]["id"], "f7d")
+
+    def test_endpoint_validates_ids(self):
+        factory = RequestFactory()
+        self.assertEqual(views.songs_batch(factory.get("/api/songs/batch/?ids=")).status_code, 400)
+        too_many = ",".join(f"id{i}" for i in range(views.MAX_BATCH_SONGS + 1))
+        self.assertEqual(views.songs_batch(factory.get(f"/api/songs/batch/?ids={too_many}")).status_code, 400)
+        with mock.patch.object(views.service, "get_songs", return_value=[{"id": "a"}, None]) as get_songs:
+            response = views.songs_batch(factory.get("/api/songs/batch/?ids=a, b"))
+        get_songs.assert_called_once_with(["a", "b"])
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(response.content, {"results": [{"id": "a"}, None], "count": 1})
+
+
+class SongRecordTests(SimpleTestCase):
+    def setUp(self):
+        self.service = JioSaavnService()
+        self.raw = upstream_song("r8")
+
+    def test_details_match_the_normalized_upstream_song(self):
+        record = self.service._song_record(self.raw)
+        self.assertTrue(song_record.is_record(record))
+        self.assertEqual(song_record.to_dict(record), self.service._normalize_song(self.raw))
+        self.assertEqual(song_record.downloads(record), self.raw["downloadUrl"])
+
+    def test_shared_url_parts_are_stored_once(self):
+        record = self.service._song_record(self.raw)
+        prefix, suffix, parts = record[song_record.DOWNLOADS]
+        self.assertEqual((prefix, suffix), ("https://a.example/r8_", "kbps.mp4"))
+        self.assertEqual(parts, (("96kbps", "96"), ("320kbps", "320")))
+        self.assertLess(entry_size(record), entry_size(self.raw))
+
+    def test_other_shapes_are_kept_as_is(self):
+        raw = dict(self.raw, image=["https://c.example/r8.jpg"], downloadUrl=[{"url": "https://a.example/x.mp4"}])
+        record = self.service._song_record(raw)
+        self.assertEqual(song_record.best_image(record), "https://c.example/r8.jpg")
+        self.assertEqual(song_record.downloads(record), [{"url": "https://a.example/x.mp4"}])
+
+    def test_records_of_another_layout_are_reloaded(self):
+        key = self.service._key("song", "r8old")
+        self.service._set_cache(key, (song_record.RECORD_VERSION + 1, "r8old"))
+        with mock.patch.object(self.service, "_api_get", return_value={"data": [upstream_song("r8old")]}) as api:
+            self.assertEqual(self.service.get_song_details("r8old")["title"], "Song r8old")
+        api.assert_called_once()
+        self.assertTrue(song_record.is_record(self.service._get_cached(key)))
+
+    def test_raw_dicts_cached_earlier_still_read(self):
+        key = self.service._key("song", "r8raw")
+        self.service._set_cache(key, upstream_song("r8raw"))
+        with mock.patch.object(self.service, "_api_get") as api:
+            self.assertEqual(self.service.get_song_details("r8raw")["title"], "Song r8raw")
+        api.assert_not_called()
+
+
+class CacheNamespacesTests(SimpleTestCase):
+    def test_a_bump_makes_old_keys_unreachable(self):
+        namespaces = CacheNamespaces(sync_interval=0)
+        old = namespaces.key("search", "songs", "kesariya")
+        self.assertEqual(old.split(":")[0], "search")
+        namespaces.bump("search")
+        self.assertNotEqual(namespaces.key("search", "songs", "kesariya"), old)
+        self.assertEqual(namespaces.key("song", "x"), namespaces.key("song", "x"))
+
+    def test_other_workers_follow_after_the_sync_interval(self):
+        here, there = CacheNamespaces(sync_interval=0), CacheNamespaces(sync_interval=3600)
+        before = there.key("lyrics", "x")
+        here.bump("lyrics")
+        self.assertEqual(there.key("lyrics", "x"), before)  # not re-read yet
+        there._synced_at = float("-inf")
+        self.assertEqual(there.key("lyrics", "x"), here.key("lyrics", "x"))
+
+    def test_a_lost_generation_never_goes_back(self):
+        namespaces = CacheNamespaces(sync_interval=0)
+        before = namespaces.generation("album")
+        cache.delete(namespaces._gen_key("album"))
+        self.assertGreater(namespaces.bump("album"), before)
+
+    def test_unknown_namespaces_are_rejected(self):
+        with self.assertRaises(ValueError):
+            CacheNamespaces().bump("users")
+
+
+class CacheInvalidateViewTests(SimpleTestCase):
+    def post(self, data, staff=True):
+        request = APIRequestFactory().post("/api/cache/invalidate/", data, format="json")
+        force_authenticate(request, user=mock.Mock(is_staff=staff, is_authenticated=True))
+        return views.CacheInvalidateView.as_view()(request)
+
+    def test_staff_only(self):
+        self.assertEqual(self.post({"namespace": "search"}, staff=False).status_code, 403)
+
+    def test_namespace_entity_and_bad_input(self):
+        with mock.patch.object(views.service, "invalidate_namespace", return_value=7):
+            self.assertEqual(self.post({"namespace": "search"}).data["generation"], 7)
+        with mock.patch.object(views.service, "invalidate_entity", return_value=3) as invalidate:
+            self.assertEqual(self.post({"entity": "album", "id": "abc"}).data["keys"], 3)
+        invalidate.assert_called_once_with("album", "abc")
+        self.assertEqual(self.post({"namespace": "users"}).status_code, 400)
+        self.assertEqual(self.post({"entity": "song", "id": "bad id!"}).status_code, 400)
+        self.assertEqual(self.post({}).status_code, 400)
+
+
+class ServiceMetricsTests(SimpleTestCase):
+    def worker(self, name):
+        metrics = ServiceMetrics(publish_interval=3600)
+        metrics.PREFIX, metrics.WORKERS_KEY = f"test:{self.id()}", f"test:{self.id()}:workers"
+        patcher = mock.patch.object(ServiceMetrics, "worker_id", new_callable=mock.PropertyMock, return_value=name)
+        return metrics, patcher
+
+    def test_counts_are_summed_over_workers(self):
+        first, as_first = self.worker("host:1")
+        second, as_second = self.worker("host:2")
+        with as_first:
+            first.cache_event("song:1:a", "hits", 3)
+            first.upstream_call("songs", 0.02, "ok")
+            first.publish()
+        with as_second:
+            second.cache_event("song:1:b", "misses")
+            second.upstream_call("songs", 0.3, "error")
+            report = second.aggregate()
+        self.assertEqual(report["workers"], ["host:1", "host:2"])
+        self.assertEqual(report["namespaces"]["song"]["hit_rate"], 0.75)
+        songs = report["upstream"]["songs"]
+        self.assertEqual((songs["calls"], songs["errors"], songs["error_rate"]), (2, 1, 0.5))
+        self.assertEqual(songs["latency_ms"]["p50"], "<=25ms")
+        self.assertEqual(songs["latency_ms"]["p99"], "<=500ms")
+
+    def test_latency_percentile(self):
+        self.assertIsNone(latency_percentile([0] * 12, 0.5))
+        histogram = [90] + [0] * 10 + [10]
+        self.assertEqual(latency_percentile(histogram, 0.9), "<=5ms")
+        self.assertEqual(latency_percentile(histogram, 0.99), ">10000ms")
+
+    def test_stats_endpoint_is_staff_only(self):
+        request = RequestFactory().get("/api/cache/stats/")
+        request.user = mock.Mock(is_staff=False)
+        self.assertEqual(views.cache_stats(request).status_code, 403)
+        request.user.is_staff = True
+        response = views.cache_stats(request)
+        self.assertEqual(response.status_code, 200)
+        sections = set(json.loads(response.content))
+        self.assertTrue({"metrics", "l1", "circuit_breakers", "stream", "audio_cache"} <= sections)
+
+
+class SearchSuggestionTests(SimpleTestCase):
+    def index(self, phrases, **options):
+        return PrefixIndex({" ".join(text.lower().split()): [text, kind, weight] for text, kind, weight in phrases},
+                           **options)
+
+    def test_completes_any_word_start(self):
+        index = self.index([("Arijit Singh", "artist", 3), ("Kesariya", "song", 1), ("Singham", "song", 1)])
+        self.assertEqual([s["text"] for s in index.complete("sing")], ["Singham", "Arijit Singh"])
+        self.assertEqual(index.complete("  KES "), [{"text": "Kesariya", "type": "song"}])
+        self.assertEqual(index.complete(""), [])
+
+    def test_heavy_prefixes_stay_bounded_and_ranked(self):
+        phrases = [(f"Song {i}", "song", i) for i in range(1000)]
+        index = self.index(phrases, top=5, scan_limit=16)
+        self.assertEqual([s["text"] for s in index.complete("so", limit=3)], ["Song 999", "Song 998", "Song 997"])
+        self.assertEqual([s["text"] for s in index.complete("song 12", limit=2)], ["Song 129", "Song 128"])
+
+    def suggestions(self, queries, songs):
+        catalog = mock.Mock(**{"titles_and_artists.return_value": songs})
+        query_log = QueryLog()
+        query_log.PREFIX, query_log.WORKERS_KEY = f"test:{self.id()}", f"test:{self.id()}:workers"
+        for query in queries:
+            query_log.record(query)
+        submit = mock.Mock()
+        return SearchSuggestions(catalog, query_log, submit=submit), submit
+
+    def test_built_in_the_background_from_the_catalog_and_queries(self):
+        suggestions, submit = self.suggestions(["kesariya", "Kesariya", "x"], [
+            ("Kesariya", "Arijit Singh"), ("Tum Hi Ho", "Arijit Singh, Mithoon"),
+        ])
+        self.assertEqual(suggestions.suggest("kes"), [])  # nothing built yet; the request doesn't wait
+        submit.assert_called_once_with(suggestions.rebuild)
+        suggestions.suggest("kes")
+        submit.assert_called_once()  # one build at a time
+        suggestions.rebuild()
+        self.assertEqual(suggestions.suggest("kes"), [{"text": "kesariya", "type": "query"}])  # what users typed
+        self.assertEqual(suggestions.suggest("mith"), [{"text": "Mithoon", "type": "artist"}])
+        self.assertEqual(suggestions.suggest("x"), [])  # one-letter queries are not logged
+
+    def test_endpoint(self):
+        results = [{"text": "Kesariya", "type": "song"}]
+        with mock.patch.object(views.service, "suggest", return_value=results) as suggest:
+            response = views.search_suggest(RequestFactory().get("/api/search/suggest/?q=kes&limit=500"))
+        suggest.assert_called_once_with("kes", limit=views.MAX_SUGGESTIONS)
+        self.assertJSONEqual(response.content, {"results": results, "count": 1})
+
+
+class FederatedSearchTests(SimpleTestCase):
+    def setUp(self):
+        self.service = JioSaavnService()
+
+    def test_sections_are_fetched_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def section(name):
+            def fetch(*args):
+                barrier.wait()  # returns once all three sections are in flight
+                return [{"id": name}]
+            return fetch
+
+        with mock.patch.object(self.service, "_search_songs", side_effect=section("song")), \
+                mock.patch.object(self.service, "search_artists", side_effect=section("artist")), \
+                mock.patch.object(self.service, "search_albums", side_effect=section("album")):
+            result = self.service.search_all("federated one")
+        self.assertEqual(result, {"songs": [{"id": "song"}], "artists": [{"id": "artist"}],
+                                  "albums": [{"id": "album"}]})
+
+    def test_a_failed_section_comes_back_empty(self):
+        with mock.patch.object(self.service, "_search_songs", return_value=[{"id": "s"}]), \
+                mock.patch.object(self.service, "search_artists", side_effect=RuntimeError("boom")), \
+                mock.patch.object(self.service, "search_albums", return_value=[{"id": "a"}]), \
+                self.assertLogs("music.services.jiosaavn_service", "ERROR"):
+            result = self.service.search_all("federated two")
+        self.assertEqual(result, {"songs": [{"id": "s"}], "artists": [], "albums": [{"id": "a"}]})
+
+    def test_async_sections_are_gathered(self):
+        service = AsyncJioSaavnService(shared=self.service)
+        started = []
+
+        def section(name, fail=False):
+            async def fetch(*args):
+                started.append(name)
+                await asyncio.sleep(0.01)
+                if fail:
+                    raise RuntimeError("boom")
+                self.assertEqual(len(started), 3)  # every section started before any finished
+                return [{"id": name}]
+            return fetch
+
+        with mock.patch.object(service, "_search_songs", side_effect=section("song")), \
+                mock.patch.object(service, "search_artists", side_effect=section("artist")), \
+                mock.patch.object(service, "search_albums", side_effect=section("album", fail=True)), \
+                self.assertLogs("music.services.async_jiosaavn_service", "ERROR"):
+            result = asyncio.run(service.search_all("federated three"))
+        self.assertEqual(result, {"songs": [{"id": "song"}], "artists": [{"id": "artist"}], "albums": []})
+
+    def test_endpoint_without_a_query(self):
+        response = views.search_all(RequestFactory().get("/api/search/all/?q=%20"))
+        self.assertJSONEqual(response.content, {"query": "", "songs": [], "artists": [], "albums": []})
+
+
+class HotKeySnapshotTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.service = JioSaavnService()
+        self.snapshot = self.snapshot_at("snapshot.pickle")
+
+    def snapshot_at(self, name):
+        snapshot = HotKeySnapshot(os.path.join(self.dir, name))
+        snapshot._export = self.service._export_entries
+        return snapshot
+
+    def cached(self, name, value):
+        key = self.service._key("charts", f"{self.id()}-{name}")
+        self.service._set_cache(key, value)
+        return key
+
+    def load(self, snapshot):
+        with self.assertLogs("music.services.snapshot", "INFO"):
+            return snapshot.load()
+
+    def forget(self, *keys):
+        cache.delete_many(keys)
+        for key in keys:
+            self.service.local_cache.delete(key)
+
+    def test_hot_entries_survive_a_restart(self):
+        hot, cold = self.cached("hot", ["hot"]), self.cached("cold", ["cold"])
+        self.snapshot.max_entries = 1
+        for _ in range(3):
+            self.snapshot.hit(hot)
+        self.snapshot.hit(cold)
+        self.assertEqual(self.snapshot.save(), 1)
+        self.forget(hot, cold)
+
+        restarted = self.snapshot_at("snapshot.pickle")
+        self.assertEqual(self.load(restarted), 1)
+        self.assertEqual(self.service._get_cached(hot), ["hot"])
+        self.assertIsNone(self.service._get_cached(cold))
+
+    def test_nothing_new_keeps_the_previous_file(self):
+        self.snapshot.hit(self.cached("a", ["a"]))
+        self.snapshot.save()
+        self.assertEqual(self.snapshot.save(), 0)
+        self.assertTrue(os.path.exists(self.snapshot.path))
+
+    def test_expired_entries_are_skipped(self):
+        key = self.cached("expired", ["x"])
+        self.snapshot.hit(key)
+        self.snapshot.save()
+        self.forget(key)
+        with mock.patch("music.services.snapshot.time.time", return_value=time.time() + 10 * 24 * 3600):
+            self.assertEqual(self.load(self.snapshot), 0)
+        self.assertEqual(self.snapshot.stats()["load_skipped"], 1)
+
+    def test_newer_generations_are_not_rolled_back(self):
+        self.snapshot.hit(self.cached("gen", ["g"]))
+        self.snapshot.save()
+        generation = self.service.namespaces.bump("charts")
+        self.load(self.snapshot)
+        self.assertEqual(cache.get(self.service.namespaces._gen_key("charts")), generation)
+
+    def test_a_corrupt_file_is_ignored(self):
+        with open(self.snapshot.path, "wb") as f:
+            f.write(b"not a pickle")
+        with self.assertLogs("music.services.snapshot", "ERROR"):
+            self.assertEqual(self.snapshot.load(), 0)
+
+
+class ResponseCacheTests(SimpleTestCase):
+    DATA = {"id": "abc", "title": "Kesariya", "lyrics": "la " * 200}
+
+    def setUp(self):
+        self.responses = ResponseCache()
+        self.body = self.responses.encode(self.DATA)
+
+    def get(self, **headers):
+        return self.responses.response(RequestFactory().get("/api/song/abc/", headers=headers), self.body)
+
+    def test_body_matches_json_response(self):
+        self.assertEqual(self.body.identity, JsonResponse(self.DATA).content)
+        self.assertEqual(gzip.decompress(self.body.gzip), self.body.identity)
+        self.assertIsNone(self.responses.encode({"id": "a"}).gzip)  # too small to be worth it
+
+    def test_accept_encoding_negotiation(self):
+        self.assertEqual(accepted_encodings("gzip;q=0, br;q=0.5, identity"), {"br", "identity"})
+        self.assertEqual(negotiate(self.body, "gzip, deflate")[1], "gzip")
+        self.assertEqual(negotiate(self.body, "gzip;q=0"), (self.body.identity, None))
+        self.assertEqual(negotiate(self.body, "")[1], None)
+
+    def test_each_coding_has_its_own_strong_etag(self):
+        plain, gzipped = self.get(), self.get(accept_encoding="gzip")
+        self.assertEqual(gzipped["Content-Encoding"], "gzip")
+        self.assertEqual(gzipped["Vary"], "Accept-Encoding")
+        self.assertEqual(gzipped.content, self.body.gzip)
+        self.assertNotEqual(plain["ETag"], gzipped["ETag"])
+        self.assertTrue(gzipped["ETag"].endswith('-gzip"'))
+
+    def test_if_none_match_answers_304(self):
+        etag = self.body.etag_for("gzip")
+        response = self.get(accept_encoding="gzip", if_none_match=f'"other", W/{etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.get(if_none_match="*").status_code, 304)
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)  # the gzip tag, identity asked
+        self.assertEqual(self.responses.stats()["not_modified"], 2)
+
+    def test_etag_matching(self):
+        self.assertTrue(etag_matches('"a"', '"b", "a"'))
+        self.assertTrue(etag_matches('"a"', 'W/"a"'))
+        self.assertFalse(etag_matches('"a"', '"ab"'))
+        self.assertFalse(etag_matches('"a"', ""))
+
+    def test_bodies_are_kept_per_version_within_the_byte_budget(self):
+        self.responses.put("song:1:a", 100.0, self.DATA)
+        self.assertIsNotNone(self.responses.get("song:1:a", 100.0))
+        self.assertIsNone(self.responses.get("song:1:a", 200.0))  # reloaded since
+        small = ResponseCache(max_bytes=self.body.size * 2)
+        for i in range(3):
+            small.put(f"song:1:{i}", 1.0, self.DATA)
+        self.assertIsNone(small.get("song:1:0", 1.0))
+        self.assertEqual(small.stats()["evictions"], 1)
+
+    def test_song_endpoint_revalidates_with_304(self):
+        song = {"id": "etag20", "title": "Kesariya"}
+        with mock.patch.object(views.service, "get_song_details", return_value=song), \
+                mock.patch.object(views.service, "entry_version", return_value=time.time() + 600):
+            first = views.song_details(RequestFactory().get("/api/song/etag20/"), "etag20")
+            again = views.song_details(
+                RequestFactory().get("/api/song/etag20/", headers={"if-none-match": first["ETag"]}), "etag20"
+            )
+        self.assertEqual(json.loads(first.content), song)
+        self.assertEqual(again.status_code, 304)
+
+
+async def cdn_server(requests_seen, song=SONG):
+    """A started local CDN for the async proxy: song with Range support, each Range header recorded."""
+    async def audio(request):
+        byte_range = request.headers.get("Range")
+        requests_seen.append(byte_range)
+        first, last = parse_byte_range(byte_range, len(song))
+        headers = {"Content-Type": "audio/mp4", "ETag": '"v1"', "Accept-Ranges": "bytes"}
+        if byte_range:
+            headers["Content-Range"] = f"bytes {first}-{last}/{len(song)}"
+        return web.Response(body=song[first:last + 1], status=206 if byte_range else 200, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/audio.mp4", audio)
+    server = TestServer(app)
+    await server.start_server(access_log=None)
+    return server
+
+
+class AsyncStreamProxyTests(SimpleTestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.proxy = StreamProxy(chunk_size=256)
+        self.cdn_requests = []
+        audio = AudioCache(self.path, max_bytes=64 * 1024, max_file_bytes=16 * 1024)
+        for patcher in (
+            mock.patch.object(views, "audio_cache", audio),
+            mock.patch.object(async_views, "audio_cache", audio),
+            mock.patch.object(async_views, "stream_proxy", self.proxy),
+            mock.patch.object(async_views, "shared_downloads", SharedDownloads(max_bytes=4096)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stream(self, song_id="asyncsong", byte_range=None, stream_url="/audio.mp4"):
+        """(response, body) of async_views.stream_song with the CDN served locally."""
+        headers = {"range": byte_range} if byte_range else {}
+        request = RequestFactory().get(f"/api/stream/{song_id}/", {"delivery": "proxy"}, headers=headers)
+
+        async def run():
+            async with await cdn_server(self.cdn_requests) as server:
+                url = str(server.make_url(stream_url)) if stream_url else None
+                with mock.patch.object(async_views.service, "get_stream", mock.AsyncMock(return_value=url)):
+                    response = await async_views.stream_song(request, song_id)
+                body = b"".join([chunk async for chunk in response.streaming_content]) if response.streaming else b""
+                await self.proxy.aclose()
+            return response, body
+
+        return asyncio.run(run())
+
+    def test_invalid_id_is_rejected(self):
+        response, _ = self.stream(song_id="bad id!")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.cdn_requests, [])
+
+    def test_missing_stream_is_404(self):
+        with self.assertLogs("music.async_views", "WARNING"):
+            response, _ = self.stream(stream_url=None)
+        self.assertEqual(response.status_code, 404)
+
+    def test_relays_the_cdn_response(self):
+        response, body = self.stream()
+        self.assertEqual((response.status_code, body), (200, SONG))
+        self.assertEqual(response["Content-Type"], "audio/mp4")
+        self.assertEqual(response["ETag"], '"v1"')
+        self.assertIn("cdn;dur=", response["Server-Timing"])
+        self.assertEqual(self.cdn_requests, [None])
+        self.assertEqual(self.proxy.stats()["bytes"], len(SONG))
+
+    def test_range_requests_are_forwarded(self):
+        response, body = self.stream(byte_range="bytes=100-199")
+        self.assertEqual((response.status_code, body), (206, SONG[100:200]))
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(SONG)}")
+        self.assertEqual(self.cdn_requests, ["bytes=100-199"])
+
+    def test_relayed_bytes_are_served_from_disk_next_time(self):
+        self.stream()
+        response, body = self.stream(byte_range="bytes=512-")
+        self.assertEqual((response.status_code, body), (206, SONG[512:]))
+        self.assertEqual(response["Content-Range"], f"bytes 512-1023/{len(SONG)}")
+        self.assertEqual(self.cdn_requests, [None])
+        self.assertEqual(async_views.audio_cache.stats()["hits"], 1)
+        self.assertEqual(self.proxy.stats()["bytes_from_disk"], 512)
+
+    def test_cdn_timeout_is_504(self):
+        with mock.patch.object(self.proxy, "aopen", side_effect=asyncio.TimeoutError), \
+                self.assertLogs("music.async_views", "ERROR"):
+            response, _ = self.stream()
+        self.assertEqual(response.status_code, 504)
+
+    def test_cdn_errors_are_502(self):
+        with self.assertLogs("music.async_views", "ERROR"):
+            response, _ = self.stream(stream_url="/missing.mp4")
+        self.assertEqual(response.status_code, 502)
+        with mock.patch.object(self.proxy, "aopen", side_effect=aiohttp.ClientConnectionError("reset")), \
+                self.assertLogs("music.async_views", "ERROR"):
+            response, _ = self.stream()
+        self.assertEqual(response.status_code, 502)
+
+
+class KeepAliveCDN(BaseHTTPRequestHandler):
+    """A local CDN for the sync proxy pool: SONG over keep-alive HTTP/1.1."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(SONG)))
+        self.end_headers()
+        self.wfile.write(SONG)
+
+    def log_message(self, *args):
+        pass
+
+
+class StreamProxyPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.proxy = StreamProxy(chunk_size=256)
+
+    def relay_async(self, byte_ranges):
+        """Bodies of one CDN download per Range header, relayed on one event loop."""
+        async def run():
+            bodies = []
+            async with await cdn_server([]) as server:
+                url = str(server.make_url("/audio.mp4"))
+                client = self.proxy._get_client()
+                for byte_range in byte_ranges:
+                    started = time.perf_counter()
+                    upstream = await self.proxy.aopen(url, byte_range)
+                    relay = self.proxy.arelay(upstream, "song1", stream_kind(byte_range), started, started)
+                    bodies.append(b"".join([chunk async for chunk in relay]))
+                self.assertIs(self.proxy._get_client(), client)
+                await self.proxy.aclose()
+            return bodies
+
+        return asyncio.run(run())
+
+    def test_settings(self):
+        with override_settings(JIOSAAVN_STREAM_PROXY={"MAX_PER_HOST": 8, "CHUNK_SIZE": 128}):
+            proxy = StreamProxy.from_settings()
+        stats = proxy.stats()
+        self.assertEqual((stats["max_per_host"], stats["chunk_size"]), (8, 128))
+        self.assertEqual(stats["max_connections"], 4096)
+
+    def test_stream_kind(self):
+        self.assertEqual(stream_kind(None), "play")
+        self.assertEqual(stream_kind("bytes=0-"), "play")
+        self.assertEqual(stream_kind("bytes=4096-"), "seek")
+        self.assertEqual(stream_kind("bytes=-500"), "seek")
+
+    def test_async_downloads_reuse_pooled_connections(self):
+        self.assertEqual(self.relay_async([None, "bytes=512-", None]), [SONG, SONG[512:], SONG])
+        stats = self.proxy.stats()
+        self.assertEqual(stats["async_connections_opened"], 1)
+        self.assertEqual(stats["async_connections_reused"], 2)
+        self.assertEqual(stats["bytes"], 2 * len(SONG) + 512)
+
+    def test_closed_sessions_are_replaced(self):
+        async def run():
+            client = self.proxy._get_client()
+            await client.close()
+            self.assertIsNot(self.proxy._get_client(), client)
+            await self.proxy.aclose()
+
+        asyncio.run(run())
+
+    def test_sync_downloads_reuse_pooled_connections(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveCDN)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/audio.mp4"
+        for _ in range(3):
+            started = time.perf_counter()
+            self.assertEqual(b"".join(self.proxy.relay(self.proxy.open(url), "song1", "play", started, started)), SONG)
+        stats = self.proxy.stats()
+        self.assertEqual(stats["sync_connections_opened"], 1)
+        self.assertEqual(stats["sync_connections_reused"], 2)
+
+    def test_first_byte_times_are_kept_apart_for_play_and_seek(self):
+        self.relay_async([None, "bytes=512-", "bytes=100-"])
+        self.proxy.served_from_disk("play", time.perf_counter(), len(SONG))
+        stats = self.proxy.stats()
+        self.assertEqual((stats["play"]["streams"], stats["play"]["upstream_requests"]), (2, 1))
+        self.assertEqual((stats["seek"]["streams"], stats["seek"]["upstream_requests"]), (2, 2))
+        self.assertIsNotNone(stats["seek"]["upstream_ttfb_ms"]["p50"])
+        self.assertEqual(sum(stats["seek"]["ttfb_ms"]["histogram"].values()), 2)
+        self.assertEqual(stats["bytes_from_disk"], len(SONG))
+
+
+class StreamDeliveryTests(SimpleTestCase):
+    SOURCE = {"url": "https://cdn.example/song.mp4", "quality": "320kbps", "duration": "100"}
+
+    def setUp(self):
+        self.delivery = StreamDelivery(mode="redirect", client_modes={"app": "proxy"},
+                                       network_modes={"save-data": "descriptor"})
+
+    def respond(self, mode="redirect", song_id="song1", **headers):
+        request = RequestFactory().get(f"/api/stream/{song_id}/", headers=headers)
+        return self.delivery.respond(request, song_id, self.SOURCE, mode, "web", None)
+
+    def fallback_request(self, url):
+        path, _, query = url.partition("?")
+        return RequestFactory().get(f"{path.removeprefix('http://testserver')}?{query}")
+
+    def test_choose(self):
+        factory = RequestFactory()
+        self.assertEqual(self.delivery.choose(factory.get("/", headers={"user-agent": "Mozilla/5.0"})),
+                         ("redirect", "web", None))
+        self.assertEqual(self.delivery.choose(factory.get("/", headers={"user-agent": "ExoPlayer/2.18"})),
+                         ("proxy", "app", None))
+        self.assertEqual(self.delivery.choose(factory.get("/", headers={"save-data": "on"})),
+                         ("descriptor", "other", "save-data"))
+        self.assertEqual(self.delivery.choose(factory.get("/", {"delivery": "proxy"}, headers={"save-data": "on"})),
+                         ("proxy", "other", None))
+
+    def test_redirect_names_the_cdn_url_and_a_fallback(self):
+        response = self.respond()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], self.SOURCE["url"])
+        self.assertRegex(response["Link"], r'^<http://testserver/api/stream/song1/\?quality=320&delivery=proxy&token=')
+        self.assertEqual(response["Cache-Control"], "private, max-age=300")
+
+    def test_descriptor(self):
+        data = json.loads(self.respond("descriptor", range="bytes=0-999").content)
+        self.assertEqual((data["url"], data["quality"], data["expires_in"]), (self.SOURCE["url"], "320kbps", 300))
+        self.assertIn("token=", data["proxy_url"])
+        self.assertEqual(estimated_bytes(self.SOURCE, None), 100 * 320 * 125)
+        self.assertEqual(self.delivery.stats()["modes"]["descriptor"]["bytes_estimated"], 1000)
+
+    def test_fallback_token_names_the_cdn_url(self):
+        url = json.loads(self.respond("descriptor").content)["proxy_url"]
+        self.assertEqual(self.delivery.fallback_source(self.fallback_request(url), "song1"), self.SOURCE["url"])
+        self.assertEqual(self.delivery.stats()["fallback_tokens"], 1)
+
+    def test_bad_tokens_are_rejected(self):
+        url = json.loads(self.respond("descriptor").content)["proxy_url"]
+        tampered = url[:-1] + ("A" if url[-1] != "A" else "B")
+        self.assertIsNone(self.delivery.fallback_source(self.fallback_request(tampered), "song1"))
+        self.assertIsNone(self.delivery.fallback_source(self.fallback_request(url), "song2"))  # another song's token
+        forged = signing.TimestampSigner(salt="other").sign_object({"s": "song1", "u": "https://evil.example/"})
+        self.assertIsNone(self.delivery.fallback_source(self.fallback_request(f"/?token={forged}"), "song1"))
+        self.assertEqual(self.delivery.stats()["bad_tokens"], 3)
+
+    def test_expired_tokens_are_rejected(self):
+        url = json.loads(self.respond("descriptor").content)["proxy_url"]
+        later = time.time() + self.delivery.ttl + 1
+        with mock.patch("django.core.signing.time.time", return_value=later):
+            self.assertIsNone(self.delivery.fallback_source(self.fallback_request(url), "song1"))
+        self.assertEqual(self.delivery.stats()["bad_tokens"], 1)
+
+    def test_stream_view_proxies_the_url_a_fallback_token_names(self):
+        cdn = FakeCDNResponse(200, {"Content-Length": str(len(SONG)), "Content-Type": "audio/mp4"}, SONG)
+        with mock.patch.object(views, "delivery", self.delivery), \
+                mock.patch.object(views, "audio_cache", AudioCache("", enabled=False)), \
+                mock.patch.object(views, "shared_downloads", SharedDownloads(enabled=False)), \
+                mock.patch.object(views.service, "get_stream_source", return_value=self.SOURCE), \
+                mock.patch.object(views.service, "get_stream") as get_stream, \
+                mock.patch.object(views.stream_proxy, "open", return_value=cdn) as cdn_open:
+            redirect = views.stream_song(RequestFactory().get("/api/stream/song1/"), "song1")
+            fallback = redirect["Link"][1:redirect["Link"].index(">")]
+            response = views.stream_song(self.fallback_request(fallback), "song1")
+            body = b"".join(response.streaming_content)
+        self.assertEqual((response.status_code, body), (200, SONG))
+        cdn_open.assert_called_once_with(self.SOURCE["url"], None)
+        get_stream.assert_not_called()
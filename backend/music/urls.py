@@ -1,32 +1,43 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 from rest_framework.routers import DefaultRouter
 
+# Upstream-bound endpoints run as coroutines when served through core/asgi.py
+if settings.ASYNC_UPSTREAM_VIEWS:
+    from . import async_views as upstream_views
+else:
+    upstream_views = views
+
 router = DefaultRouter()
 router.register(r'playlists', views.PlaylistViewSet, basename='playlist')
 
 
 urlpatterns = [
     # Search
-    path("search/", views.search_songs, name="search_songs"),
+    path("search/", upstream_views.search_songs, name="search_songs"),
+    path("search/suggest/", upstream_views.search_suggest, name="search_suggest"),
+    path("search/all/", upstream_views.search_all, name="search_all"),
     
     # Song endpoints
-    path("stream/<str:song_id>/", views.stream_song, name="stream_song"),
-    path("song/<str:song_id>/", views.song_details, name="song_details"),
-    path("song/<str:song_id>/lyrics/", views.song_lyrics, name="song_lyrics"),
+    path("stream/<str:song_id>/", upstream_views.stream_song, name="stream_song"),
+    path("song/<str:song_id>/", upstream_views.song_details, name="song_details"),
+    path("songs/batch/", upstream_views.songs_batch, name="songs_batch"),
+    path("song/<str:song_id>/lyrics/", upstream_views.song_lyrics, name="song_lyrics"),
     path("song/<str:song_id>/lyrics/synced/", views.SyncedLyricsView.as_view(), name="synced_lyrics"),
-    path("song/<str:song_id>/related/", views.song_related, name="song_related"),
+    path("song/<str:song_id>/related/", upstream_views.song_related, name="song_related"),
     
     # Album & Artist
-    path("album/<str:album_id>/", views.album_details, name="album_details"),
-    path("artist/<str:artist_id>/", views.artist_details, name="artist_details"),
+    path("album/<str:album_id>/", upstream_views.album_details, name="album_details"),
+    path("artist/<str:artist_id>/", upstream_views.artist_details, name="artist_details"),
     
     # Discovery
-    path("trending/", views.trending_songs, name="trending_songs"),
+    path("trending/", upstream_views.trending_songs, name="trending_songs"),
     
     # Debug
     path("cache/stats/", views.cache_stats, name="cache_stats"),
+    path("cache/invalidate/", views.CacheInvalidateView.as_view(), name="cache_invalidate"),
     path("csrf/", views.get_csrf_token, name="csrf"),
 
     # Auth & Sync
@@ -1,19 +1,66 @@
 # backend/music/views.py
 
+import time
 import logging
 import requests
-from django.http import StreamingHttpResponse
+from django.http import FileResponse, StreamingHttpResponse
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET
 from django.views.decorators.cache import cache_page
+from django.conf import settings
 
 from .services.jiosaavn_service import JioSaavnService
+from .services.response_cache import ResponseCache
+from .services.audio_cache import AudioCache, parse_byte_range
+from .services.shared_download import SharedDownloads
+from .services.stream_delivery import StreamDelivery
+from .services.stream_proxy import StreamProxy, server_timing, stream_kind
+from .services.warmer import CacheWarmer
 
 logger = logging.getLogger(__name__)
 
 # Single service instance (connection pooling benefits)
 service = JioSaavnService()
 
+# Hot keys refreshed ahead of expiry in the background (see services/warmer.py)
+warmer = CacheWarmer.from_settings(service)
+
+
+def start_background_tasks():
+    """Warmer and snapshot threads; MusicConfig.ready() starts them in server processes only."""
+    if getattr(settings, "JIOSAAVN_WARMER", {}).get("ENABLED", True):
+        warmer.start()
+    # Hottest cache entries written to disk for the next boot (see services/snapshot.py)
+    service.start_snapshots()
+
+
+# Hot GET bodies encoded and compressed once per cached value (see services/response_cache.py)
+responses = ResponseCache.from_settings()
+
+# Keep-alive CDN pools and time-to-first-byte stats for /api/stream/ (see services/stream_proxy.py)
+stream_proxy = StreamProxy.from_settings()
+
+# Proxied audio kept on local disk by byte range (see services/audio_cache.py)
+audio_cache = AudioCache.from_settings()
+
+# CDN downloads concurrent listeners of a song share (see services/shared_download.py)
+shared_downloads = SharedDownloads.from_settings()
+
+# Proxy, redirect or JSON descriptor per client and network (see services/stream_delivery.py)
+delivery = StreamDelivery.from_settings()
+
+# Upper bound on IDs per /api/songs/batch/ request
+MAX_BATCH_SONGS = 200
+
+# Deepest /api/search/ result offset clients may page to
+MAX_SEARCH_OFFSET = 300
+
+# Upper bound on completions per /api/search/suggest/ request
+MAX_SUGGESTIONS = 20
+
+# Upper bound on artists / albums per /api/search/all/ request
+MAX_SEARCH_SECTION = 20
+
 # FIX #12: Helper function to add Cache-Control headers
 def add_cache_headers(response, cache_control='max-age=3600, public'):
     """Add Cache-Control header to response for caching optimization."""
@@ -45,24 +92,149 @@ def success_response(data, message='Success', status_code=200):
     return JsonResponse(response_data, status=status_code)
 
 
+def pre_encoded_response(request, key, load, cache_control, not_found=None):
+    """
+    JSON response for the value the service caches under key, encoded and
+    compressed once per version of that value.
+
+    load() returns the response data (None: 404 with not_found). A fresh
+    value with a kept body is answered without calling it.
+    """
+    if not responses.enabled or key is None:
+        data = load()
+        if data is None:
+            return JsonResponse({"error": not_found}, status=404)
+        return add_cache_headers(JsonResponse(data), cache_control)
+
+    version = service.entry_version(key)
+    if version is not None and time.time() < version:
+        body = responses.get(key, version)
+        if body is not None:
+            service.count_hit(key)
+            return add_cache_headers(responses.response(request, body), cache_control)
+
+    # Miss or stale: the service loads (or refreshes in the background)
+    data = load()
+    if data is None:
+        return JsonResponse({"error": not_found}, status=404)
+    latest = service.entry_version(key)
+    if latest is None or (version is not None and latest != version):
+        # Not cached, or replaced while loading: no version to keep the body under
+        return add_cache_headers(JsonResponse(data), cache_control)
+    body = responses.get(key, latest) or responses.put(key, latest, data)
+    return add_cache_headers(responses.response(request, body), cache_control)
+
+
+def search_offset(request, limit):
+    """Result offset from ?offset= or 1-based ?page= (pages of limit results); None if not a number."""
+    try:
+        if "page" in request.GET:
+            offset = (int(request.GET["page"]) - 1) * limit
+        else:
+            offset = int(request.GET.get("offset", 0))
+    except ValueError:
+        return None
+    return min(max(offset, 0), MAX_SEARCH_OFFSET)
+
+
 @require_GET
 def search_songs(request):
     """Search for songs by query. FIX #12: Cached search results."""
     query = request.GET.get("q", "").strip()
     limit = min(int(request.GET.get("limit", 20)), 50)
+    offset = search_offset(request, limit)
+    if offset is None:
+        return JsonResponse({"error": "page and offset must be integers"}, status=400)
 
     if not query:
         return JsonResponse({"results": []})
 
-    results = service.search(query, limit=limit)
+    if offset == 0:
+        service.record_query(query)  # later pages are the same search
+    results = service.search(query, limit=limit, offset=offset)
     response = JsonResponse({
         "results": results,
         "count": len(results),
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if len(results) == limit and offset + limit <= MAX_SEARCH_OFFSET else None,
     })
     # FIX #12: Cache search results for 30 minutes (queries are stable)
     return add_cache_headers(response, 'max-age=1800, public')
 
 
+@require_GET
+def search_all(request):
+    """Songs, artists and albums for ?q= in one response (sections fetched concurrently)."""
+    query = request.GET.get("q", "").strip()
+    limit = min(int(request.GET.get("limit", 20)), 50)
+    artists_limit = min(int(request.GET.get("artists_limit", 6)), MAX_SEARCH_SECTION)
+    albums_limit = min(int(request.GET.get("albums_limit", 6)), MAX_SEARCH_SECTION)
+
+    if not query:
+        return JsonResponse({"query": query, "songs": [], "artists": [], "albums": []})
+
+    service.record_query(query)
+    sections = service.search_all(query, limit=limit, artists_limit=artists_limit, albums_limit=albums_limit)
+    response = JsonResponse({"query": query, **sections})
+    return add_cache_headers(response, 'max-age=1800, public')
+
+
+@require_GET
+def search_suggest(request):
+    """
+    Search-as-you-type completions for ?q=, served from memory.
+
+    Clients call this on every keystroke and /api/search/ only on submit.
+    """
+    prefix = request.GET.get("q", "").strip()
+    limit = min(int(request.GET.get("limit", 10)), MAX_SUGGESTIONS)
+
+    results = service.suggest(prefix, limit=limit)
+    response = JsonResponse({
+        "results": results,
+        "count": len(results),
+    })
+    return add_cache_headers(response, 'max-age=300, public')
+
+
+def forward_stream_headers(response, upstream_headers):
+    """Copy the upstream headers players need for seeking and caching."""
+    for header in ["Content-Length", "Content-Range", "Accept-Ranges", "Cache-Control", "ETag"]:
+        if header in upstream_headers:
+            response[header] = upstream_headers[header]
+
+    # Ensure seeking is supported
+    if "Accept-Ranges" not in response:
+        response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def cached_audio(song_id, quality, byte_range):
+    """(entry, (first, last)) of the requested bytes in the audio cache, or (None, None)."""
+    entry = audio_cache.lookup(song_id, quality)
+    if entry is None:
+        return None, None
+    span = parse_byte_range(byte_range, entry.size)
+    if span is None:
+        entry.close()  # not a single satisfiable range: the CDN answers it
+        return None, None
+    return entry, span
+
+
+def cached_audio_headers(response, entry, span, byte_range):
+    """Headers the CDN would send with bytes span of a cached song (or of a shared download)."""
+    first, last = span
+    response["Content-Length"] = str(last - first + 1)
+    if byte_range:
+        response["Content-Range"] = f"bytes {first}-{last}/{entry.size}"
+    for header, value in entry.headers.items():
+        if header != "Content-Type":
+            response[header] = value
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
 @require_GET
 def stream_song(request, song_id):
     """
@@ -71,76 +243,152 @@ def stream_song(request, song_id):
     FIX #23: Always proxy the audio stream.
     This ensures mobile players receive audio data, not JSON.
     The Flutter app calls this endpoint directly and expects audio bytes.
+    Proxying stays the default; clients and networks can be configured
+    for a CDN redirect or JSON descriptor instead (JIOSAAVN_STREAM_DELIVERY).
     """
+    started = time.perf_counter()
     preferred_quality = request.GET.get("quality", "320")
     
     # Validate song ID
     if not service._validate_id(song_id):
         return JsonResponse({"error": "Invalid song ID"}, status=400)
+
+    # Clients and networks configured for it get the CDN URL instead of the bytes
+    mode, client, network = delivery.choose(request)
+    if mode != "proxy":
+        source = service.get_stream_source(song_id, preferred_quality)
+        if not source:
+            logger.warning(f"Stream not available for song: {song_id}")
+            return JsonResponse({"error": "Stream not available for this song"}, status=404)
+        return delivery.respond(request, song_id, source, mode, client, network)
+    delivery.record("proxy", client, network)
+
+    # Bytes already in the audio cache skip the song lookup and the CDN
+    byte_range = request.META.get("HTTP_RANGE")
+    kind = stream_kind(byte_range)
+    entry, span = cached_audio(song_id, preferred_quality, byte_range)
+    if entry is not None and entry.covers(*span):
+        audio_cache.record("hits")
+        stream_proxy.served_from_disk(kind, started, span[1] - span[0] + 1)
+        response = FileResponse(
+            entry.file_slice(*span),
+            content_type=entry.headers.get("Content-Type", "audio/mpeg"),
+            status=206 if byte_range else 200,
+        )
+        response["Server-Timing"] = server_timing(started)
+        return cached_audio_headers(response, entry, span, byte_range)
+
+    # So do bytes a download running in this worker is fetching for another listener
+    download, shared_span = shared_downloads.join(song_id, preferred_quality, byte_range)
+    if download is not None and shared_span is None:  # same request, its CDN response not in yet
+        shared_span = download.wait_opened(byte_range, stream_proxy.connect_timeout + stream_proxy.read_timeout)
+    if shared_span is not None:
+        if entry is not None:
+            entry.close()
+        response = StreamingHttpResponse(
+            stream_proxy.follow(download, *shared_span, song_id, kind, started),
+            content_type=download.headers.get("Content-Type", "audio/mpeg"),
+            status=206 if byte_range else 200,
+        )
+        response["Server-Timing"] = server_timing(started, source="shared")
+        return cached_audio_headers(response, download, shared_span, byte_range)
+
+    # A miss: listeners asking the same from here on wait for this one's download
+    download = shared_downloads.claim(song_id, preferred_quality, byte_range) if entry is None else None
     
-    # Get stream URL from upstream
-    stream_url = service.get_stream(song_id, preferred_quality)
+    # Get stream URL from upstream (or the one a redirect's proxy fallback names)
+    stream_url = delivery.fallback_source(request, song_id) or service.get_stream(song_id, preferred_quality)
     if not stream_url:
+        if entry is not None:
+            entry.close()
+        if download is not None:
+            download.cancel()
         logger.warning(f"Stream not available for song: {song_id}")
         return JsonResponse(
             {"error": "Stream not available for this song"}, 
             status=404
         )
+
+    # Partly cached: stored runs from disk, gaps from the CDN (and stored)
+    if entry is not None:
+        audio_cache.record("partial_hits")
+        writer = audio_cache.writer(song_id, preferred_quality, entry.size, entry.headers)
+        response = StreamingHttpResponse(
+            stream_proxy.stitch(entry, *span, song_id, kind, started, stream_url, writer),
+            content_type=entry.headers.get("Content-Type", "audio/mpeg"),
+            status=206 if byte_range else 200,
+        )
+        response["Server-Timing"] = server_timing(started)
+        return cached_audio_headers(response, entry, span, byte_range)
     
-    # Always proxy the audio stream
+    # Otherwise proxy the audio stream, over the CDN keep-alive pool
+    audio_cache.record("misses")
+    upstream_response = None
     try:
         # Forward Range header for seeking support
-        headers = {
-            "User-Agent": "VILLEN-Music/1.0",
-        }
-        if "HTTP_RANGE" in request.META:
-            headers["Range"] = request.META["HTTP_RANGE"]
-
-        # Stream with generous timeout for slow connections
-        upstream_response = requests.get(
-            stream_url, 
-            stream=True, 
-            timeout=30,
-            headers=headers
-        )
+        sent = time.perf_counter()
+        upstream_response = stream_proxy.open(stream_url, byte_range)
         upstream_response.raise_for_status()
-        
-        response = StreamingHttpResponse(
-            upstream_response.iter_content(chunk_size=8192),
-            content_type=upstream_response.headers.get("Content-Type", "audio/mpeg"),
-            status=upstream_response.status_code
-        )
-        
-        # Forward important headers for seeking and caching
-        if "Content-Length" in upstream_response.headers:
-            response["Content-Length"] = upstream_response.headers["Content-Length"]
-        for header in ["Content-Range", "Accept-Ranges", "Cache-Control", "ETag"]:
-            if header in upstream_response.headers:
-                response[header] = upstream_response.headers[header]
-        
-        # Ensure seeking is supported
-        if "Accept-Ranges" not in response:
-            response["Accept-Ranges"] = "bytes"
-            
-        return response
     except requests.Timeout:
+        if download is not None:
+            download.cancel()
         logger.error(f"Stream proxy timeout for {song_id}")
         return JsonResponse({"error": "Stream server timeout"}, status=504)
     except requests.RequestException as e:
+        if upstream_response is not None:
+            upstream_response.close()
+        if download is not None:
+            download.cancel()
         logger.error(f"Stream proxy error for {song_id}: {e}")
         return JsonResponse({"error": "Failed to proxy stream"}, status=502)
 
+    writer = audio_cache.writer_for_response(
+        song_id, preferred_quality, upstream_response.status_code, upstream_response.headers,
+    )
+    # Shared: read by a pump thread at CDN speed, followed by each listener at its own pace
+    if download is not None and download.opened(upstream_response.status_code, upstream_response.headers):
+        stream_proxy.pump(download, upstream_response, song_id, kind, sent, writer)
+        body = stream_proxy.follow(download, download.first, download.last, song_id, kind, started)
+    else:
+        body = stream_proxy.relay(upstream_response, song_id, kind, started, sent, writer)
+    response = StreamingHttpResponse(
+        body,
+        content_type=upstream_response.headers.get("Content-Type", "audio/mpeg"),
+        status=upstream_response.status_code
+    )
+    response["Server-Timing"] = server_timing(started, sent)
+    return forward_stream_headers(response, upstream_response.headers)
+
 
 @require_GET
 def song_details(request, song_id):
     """Get full song metadata. FIX #12: Cached song metadata."""
-    details = service.get_song_details(song_id)
+    # FIX #12: Song metadata is immutable, cache for 24 hours
+    return pre_encoded_response(
+        request, service.endpoint_key("song", song_id),
+        lambda: service.get_song_details(song_id) or None,
+        'max-age=86400, public', not_found="Song not found",
+    )
 
-    if not details:
-        return JsonResponse({"error": "Song not found"}, status=404)
 
-    response = JsonResponse(details)
-    # FIX #12: Song metadata is immutable, cache for 24 hours
+@require_GET
+def songs_batch(request):
+    """
+    Get metadata for many songs in one call: ?ids=id1,id2,...
+
+    Results are in request order, with null for songs that don't exist.
+    """
+    ids = [i.strip() for i in request.GET.get("ids", "").split(",") if i.strip()]
+    if not ids:
+        return JsonResponse({"error": "ids parameter is required"}, status=400)
+    if len(ids) > MAX_BATCH_SONGS:
+        return JsonResponse({"error": f"At most {MAX_BATCH_SONGS} ids per request"}, status=400)
+
+    songs = service.get_songs(ids)
+    response = JsonResponse({
+        "results": songs,
+        "count": sum(1 for song in songs if song),
+    })
     return add_cache_headers(response, 'max-age=86400, public')
 
 
@@ -170,44 +418,40 @@ def song_related(request, song_id):
 @require_GET
 def album_details(request, album_id):
     """Get album details with track list. FIX #12: Cached album metadata."""
-    album = service.get_album(album_id)
-
-    if not album:
-        return JsonResponse({"error": "Album not found"}, status=404)
-
-    response = JsonResponse(album)
     # FIX #12: Album metadata is immutable, cache for 24 hours
-    return add_cache_headers(response, 'max-age=86400, public')
+    return pre_encoded_response(
+        request, service.endpoint_key("album", album_id),
+        lambda: service.get_album(album_id) or None,
+        'max-age=86400, public', not_found="Album not found",
+    )
 
 
 @require_GET
 def artist_details(request, artist_id):
     """Get artist details with top songs. FIX #12: Cached artist metadata."""
-    artist = service.get_artist(artist_id)
-
-    if not artist:
-        return JsonResponse({"error": "Artist not found"}, status=404)
-    
-    response = JsonResponse(artist)
     # FIX #12: Artist metadata is immutable, cache for 24 hours
-    return add_cache_headers(response, 'max-age=86400, public')
-
-    return JsonResponse(artist)
+    return pre_encoded_response(
+        request, service.endpoint_key("artist", artist_id),
+        lambda: service.get_artist(artist_id) or None,
+        'max-age=86400, public', not_found="Artist not found",
+    )
 
 
 @require_GET
 def trending_songs(request):
     """Get trending/popular songs. FIX #12: Cached for 1 hour."""
     language = request.GET.get("language", "hindi")
-    trending = service.get_trending(language=language)
 
-    response = JsonResponse({
-        "results": trending,
-        "count": len(trending),
-        "language": language,
-    })
+    def load():
+        trending = service.get_trending(language=language)
+        return {
+            "results": trending,
+            "count": len(trending),
+            "language": language,
+        }
+
     # FIX #12: Trending data changes slowly, cache for 1 hour
-    return add_cache_headers(response, 'max-age=3600, public')
+    return pre_encoded_response(request, service.endpoint_key("trending", language), load, 'max-age=3600, public')
 
 
 @require_GET
@@ -217,8 +461,12 @@ def cache_stats(request):
     if not request.user.is_staff:
         return JsonResponse({"error": "Unauthorized"}, status=403)
     
-    cache_data = cache.get('jio_cache_stats', {})
-    return JsonResponse(cache_data)
+    stream = stream_proxy.stats()
+    return JsonResponse(dict(
+        service.cache_stats(), warmer=warmer.last_report(), responses=responses.stats(),
+        stream=stream, audio_cache=audio_cache.stats(), shared_downloads=shared_downloads.stats(),
+        delivery=delivery.stats(proxied_bytes=stream["bytes"]),
+    ))
 
 
 @require_GET
@@ -340,6 +588,37 @@ class LogoutView(APIView):
         
         return response
 
+class CacheInvalidateView(APIView):
+    """
+    Staff-only cache invalidation.
+
+    POST {"namespace": "search"}            -> one namespace (O(1))
+    POST {"entity": "song", "id": "<id>"}   -> one song/album/artist
+    POST {"all": true}                      -> every service namespace
+    Other cache users (cache_page, throttling) are left alone. The async
+    views' service shares this one's L1 and negative filter, so under
+    ASGI the serving instance is invalidated too; other workers follow
+    through the L1 broadcast.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        namespace = request.data.get('namespace')
+        entity = request.data.get('entity')
+        try:
+            if namespace:
+                generation = service.invalidate_namespace(namespace)
+                return Response({"status": "invalidated", "namespace": namespace, "generation": generation})
+            if entity:
+                deleted = service.invalidate_entity(entity, request.data.get('id'))
+                return Response({"status": "invalidated", "entity": entity, "id": request.data.get('id'), "keys": deleted})
+            if request.data.get('all'):
+                service.clear_cache()
+                return Response({"status": "invalidated", "namespaces": list(service.namespaces.names)})
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({"error": "namespace, entity or all required"}, status=400)
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
@@ -636,39 +915,19 @@ class DiscoverWeeklyView(APIView):
 class SuggestedArtistsView(APIView):
     permission_classes = [permissions.AllowAny]
 
-    @method_decorator(cache_page(60 * 60 * 24)) # Cache for 24 hours
     def get(self, request):
         """Return a curated list of suggested artists for onboarding."""
-        # Since we can't easily query 'all top artists', we perform a search for 'Best Singers'
-        # Or search for a few popular ones and aggregate.
-        
-        # Queries to build a diverse list
-        queries = ["Arijit Singh", "Atif Aslam", "Pritam", "Badshah", "Kishore Kumar", "AR Rahman"]
-        
-        artists = []
-        seen_ids = set()
-        
-        for q in queries:
-            results = service.search_artists(q, limit=1)
-            for artist in results:
-                if artist['id'] not in seen_ids:
-                    artists.append(artist)
-                    seen_ids.add(artist['id'])
-        
-        # Add a generic search result to fill up
-        more = service.search_artists("Singers", limit=10)
-        for artist in more:
-             if artist['id'] not in seen_ids:
-                 artists.append(artist)
-                 seen_ids.add(artist['id'])
-                 
-        return Response(artists)
+        # Built from a few popular artists plus a generic search (see
+        # JioSaavnService.get_suggested_artists); kept warm by the cache
+        # warmer, so no cache_page in front of it to outlive a refresh
+        return Response(service.get_suggested_artists())
 
 class ChartsView(APIView):
     permission_classes = [permissions.AllowAny]
 
-    @method_decorator(cache_page(60 * 60 * 4)) # Cache for 4 hours
     def get(self, request):
+        # Kept warm by the cache warmer, so no cache_page in front of it
+        # to outlive a refresh (as SuggestedArtistsView)
         charts = service.get_charts()
         return Response(charts)
 
@@ -678,16 +937,8 @@ class MoodPlaylistView(APIView):
 
     def get(self, request):
         mood = request.query_params.get('mood', 'happy')
-        # Map mood to search query
-        query_map = {
-            'happy': 'party hits',
-            'sad': 'sad songs',
-            'romantic': 'romantic hits',
-            'workout': 'workout motivation',
-        }
-        query = query_map.get(mood, 'top hits')
-        
-        results = service.search(query, limit=20)
+        # Mood -> search query map: JioSaavnService.MOOD_QUERIES
+        results = service.get_mood_playlist(mood)
         return Response(results)
 
 class TimeAwarePlaylistView(APIView):
@@ -696,25 +947,8 @@ class TimeAwarePlaylistView(APIView):
     def get(self, request):
         import datetime
         hour = datetime.datetime.now().hour
-        
-        if 5 <= hour < 12:
-            query = "morning motivation"
-            title = "Morning Motivation"
-        elif 12 <= hour < 18:
-            query = "afternoon vibes"
-            title = "Afternoon Vibes"
-        elif 18 <= hour < 22:
-            query = "evening relax"
-            title = "Evening Relax"
-        else:
-            query = "sleep lo-fi"
-            title = "Late Night Lo-Fi"
-            
-        results = service.search(query, limit=20)
-        return Response({
-            "title": title,
-            "songs": results
-        })
+        # Hour -> playlist map: JioSaavnService.TIME_OF_DAY_PLAYLISTS
+        return Response(service.get_time_of_day_playlist(hour))
 
 class UserInsightsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
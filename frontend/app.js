@@ -508,6 +508,43 @@ function playAllLiked() {
 
 // ==================== SEARCH ====================
 let searchTimeout;
+let suggestTimeout;
+
+// While typing only completions are fetched (served from server memory);
+// the full search runs on submit (Enter or picking a suggestion)
+function handleSearchInput(query, event) {
+    clearTimeout(suggestTimeout);
+
+    if (!query.trim()) {
+        clearTimeout(searchTimeout);
+        showSection('home');
+        return;
+    }
+
+    // Picking a datalist option fires a plain Event / replacement input
+    if (event && (!(event instanceof InputEvent) || event.inputType === 'insertReplacementText')) {
+        handleSearch(query);
+        return;
+    }
+
+    suggestTimeout = setTimeout(() => updateSearchSuggestions(query), 150);
+}
+
+async function updateSearchSuggestions(query) {
+    try {
+        const res = await fetch(`${API_BASE}/search/suggest/?q=${encodeURIComponent(query.trim())}&limit=8`);
+        const data = await res.json();
+        const list = document.getElementById('searchSuggestions');
+        list.innerHTML = '';
+        (data.results || []).forEach(suggestion => {
+            const option = document.createElement('option');
+            option.value = suggestion.text;
+            list.appendChild(option);
+        });
+    } catch (err) {
+        // Suggestions are optional; submitting still searches
+    }
+}
 
 function handleSearch(query) {
     clearTimeout(searchTimeout);
@@ -14,6 +14,7 @@ class ApiConstants {
   
   // Song endpoints
   static const String search = '/search/';
+  static const String searchSuggest = '/search/suggest/';
   static const String trending = '/trending/';
   static String stream(String songId) => '/stream/$songId/';
   static String songDetails(String songId) => '/song/$songId/';
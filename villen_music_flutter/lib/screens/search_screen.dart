@@ -1,6 +1,6 @@
 // Search Screen
 // 
-// Full-screen search with real-time results.
+// Full-screen search: completions while typing, results on submit.
 
 import 'dart:async';
 import 'package:flutter/material.dart';
@@ -26,6 +26,7 @@ class _SearchScreenState extends State<SearchScreen> {
   Timer? _debounce;
   
   List<Song>? _results;
+  List<String> _suggestions = [];
   bool _isLoading = false;
   String? _error;
 
@@ -46,23 +47,43 @@ class _SearchScreenState extends State<SearchScreen> {
     super.dispose();
   }
 
+  // Typing only fetches completions; the full search runs on submit
   void _onSearchChanged(String query) {
     _debounce?.cancel();
-    _debounce = Timer(const Duration(milliseconds: 400), () {
+    _debounce = Timer(const Duration(milliseconds: 150), () {
       if (query.trim().isNotEmpty) {
-        _performSearch(query.trim());
+        _loadSuggestions(query.trim());
       } else {
         setState(() {
           _results = null;
+          _suggestions = [];
           _error = null;
         });
       }
     });
   }
 
+  Future<void> _loadSuggestions(String query) async {
+    try {
+      final suggestions = await context.read<ApiService>().suggest(query);
+      if (!mounted || _controller.text.trim() != query) return;
+      setState(() => _suggestions = suggestions);
+    } catch (_) {
+      // Suggestions are optional; submitting still searches
+    }
+  }
+
+  void _onSubmitted(String query) {
+    _debounce?.cancel();
+    if (query.trim().isNotEmpty) {
+      _performSearch(query.trim());
+    }
+  }
+
   Future<void> _performSearch(String query) async {
     setState(() {
       _isLoading = true;
+      _suggestions = [];
       _error = null;
     });
 
@@ -95,6 +116,8 @@ class _SearchScreenState extends State<SearchScreen> {
           controller: _controller,
           focusNode: _focusNode,
           onChanged: _onSearchChanged,
+          onSubmitted: _onSubmitted,
+          textInputAction: TextInputAction.search,
           style: const TextStyle(color: Colors.white),
           decoration: InputDecoration(
             hintText: 'Search songs, artists...',
@@ -111,6 +134,7 @@ class _SearchScreenState extends State<SearchScreen> {
                 _controller.clear();
                 setState(() {
                   _results = null;
+                  _suggestions = [];
                   _error = null;
                 });
               },
@@ -146,6 +170,24 @@ class _SearchScreenState extends State<SearchScreen> {
       );
     }
 
+    // Typing -> completions
+    if (_suggestions.isNotEmpty) {
+      return ListView.builder(
+        itemCount: _suggestions.length,
+        itemBuilder: (context, index) {
+          final suggestion = _suggestions[index];
+          return ListTile(
+            leading: const Icon(Icons.search),
+            title: Text(suggestion),
+            onTap: () {
+              _controller.text = suggestion;
+              _performSearch(suggestion);
+            },
+          );
+        },
+      );
+    }
+
     // Empty state (no query) -> Show History
     if (_results == null) {
       return Consumer<StorageService>(
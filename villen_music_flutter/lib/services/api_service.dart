@@ -167,6 +167,17 @@ class ApiService {
     }
   }
 
+  /// Search-as-you-type completions (cheap, call on every keystroke)
+  Future<List<String>> suggest(String query, {int limit = 8}) async {
+    final response = await _dio.get(
+      ApiConstants.searchSuggest,
+      queryParameters: {'q': query, 'limit': limit},
+    );
+
+    final List results = response.data['results'] ?? [];
+    return results.map((item) => item['text'] as String).toList();
+  }
+
   /// Get Trending Songs
   Future<List<Song>> getTrending({String language = 'hindi'}) async {
     try {